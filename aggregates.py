@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Retenção em camadas com agregados
+Os registros brutos ficam `data_retention_days` dias; antes de serem removidos
+eles são compactados em contagens por hora (agg_hourly) e por dia (agg_daily),
+por domínio e por cliente (separadas por fonte/Pi-hole), mantidas por mais
+tempo. As consultas do dashboard usam a resolução mais fina disponível para o
+período pedido.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+import metrics
+import partition_store
+
+logger = logging.getLogger(__name__)
+
+# Máximo de horas compactadas por execução (a compactação é incremental)
+MAX_HOURS_PER_RUN = 48
+
+RESOLUTIONS = ('raw', 'hourly', 'daily')
+
+AGG_KINDS = ('domain', 'client')
+
+def _create_aggregate_table(conn, table):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            bucket TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            source TEXT NOT NULL DEFAULT '{partition_store.DEFAULT_SOURCE}',
+            total INTEGER NOT NULL,
+            blocked INTEGER NOT NULL,
+            PRIMARY KEY (bucket, kind, key, source)
+        ) WITHOUT ROWID
+    """)
+
+def init_aggregates(conn):
+    """Cria as tabelas de agregados e de controle da compactação"""
+    for table in ('agg_hourly', 'agg_daily'):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if columns and 'source' not in columns:
+            # A chave primária passou a incluir a fonte: recria a tabela
+            logger.info(f"🔄 Adicionando coluna source a {table}...")
+            conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+            _create_aggregate_table(conn, table)
+            conn.execute(f"""
+                INSERT INTO {table} (bucket, kind, key, source, total, blocked)
+                SELECT bucket, kind, key, ?, total, blocked FROM {table}_old
+            """, (partition_store.DEFAULT_SOURCE,))
+            conn.execute(f"DROP TABLE {table}_old")
+        else:
+            _create_aggregate_table(conn, table)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS aggregate_state (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+def _fmt(dt):
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+def _floor_hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+def get_watermark(conn, name):
+    """Início do primeiro período ainda não compactado ('hourly' ou 'daily')"""
+    row = conn.execute("SELECT value FROM aggregate_state WHERE name = ?", (name,)).fetchone()
+    return datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S') if row else None
+
+def _set_watermark(conn, name, moment):
+    conn.execute("INSERT OR REPLACE INTO aggregate_state (name, value) VALUES (?, ?)",
+                 (name, _fmt(moment)))
+
+@metrics.timed_query('aggregates.compact')
+def compact(conn, now=None, max_hours=MAX_HOURS_PER_RUN):
+    """Compacta as horas fechadas desde a última execução
+
+    Processa no máximo `max_hours` horas por chamada e consolida em agg_daily
+    os dias cujas horas já foram todas compactadas. Retorna (horas, dias).
+    """
+    now = now or datetime.now()
+    watermark = get_watermark(conn, 'hourly')
+    if watermark is None:
+        first = conn.execute("SELECT MIN(min_ts) FROM partitions").fetchone()[0]
+        if not first:
+            return 0, 0
+        watermark = _floor_hour(datetime.strptime(first, '%Y-%m-%d %H:%M:%S'))
+
+    # A hora corrente ainda recebe registros e fica para a próxima execução
+    end = min(watermark + timedelta(hours=max_hours), _floor_hour(now))
+    hours = 0
+    if end > watermark:
+        source = partition_store.source_sql(conn, watermark, end - timedelta(seconds=1))
+        for kind in AGG_KINDS:
+            conn.execute(f"""
+                INSERT OR REPLACE INTO agg_hourly (bucket, kind, key, source, total, blocked)
+                SELECT substr(timestamp, 1, 13) || ':00:00', ?, COALESCE({kind}, ''), source,
+                       COUNT(*), SUM(CASE WHEN status = 'blocked' THEN 1 ELSE 0 END)
+                FROM {source}
+                WHERE timestamp >= ? AND timestamp < ?
+                GROUP BY 1, 3, 4
+            """, (kind, _fmt(watermark), _fmt(end)))
+        hours = int((end - watermark).total_seconds() // 3600)
+        _set_watermark(conn, 'hourly', end)
+        watermark = end
+
+    # Dias completamente cobertos pelos agregados horários
+    daily_watermark = get_watermark(conn, 'daily')
+    if daily_watermark is None:
+        first = conn.execute("SELECT MIN(bucket) FROM agg_hourly").fetchone()[0]
+        daily_watermark = (datetime.strptime(first[:10], '%Y-%m-%d') if first
+                           else watermark.replace(hour=0))
+    daily_end = watermark.replace(hour=0)
+    days = 0
+    if daily_end > daily_watermark:
+        conn.execute("""
+            INSERT OR REPLACE INTO agg_daily (bucket, kind, key, source, total, blocked)
+            SELECT substr(bucket, 1, 10), kind, key, source, SUM(total), SUM(blocked)
+            FROM agg_hourly
+            WHERE bucket >= ? AND bucket < ?
+            GROUP BY 1, 2, 3, 4
+        """, (_fmt(daily_watermark), _fmt(daily_end)))
+        days = (daily_end - daily_watermark).days
+        _set_watermark(conn, 'daily', daily_end)
+    elif get_watermark(conn, 'daily') is None:
+        _set_watermark(conn, 'daily', daily_watermark)
+
+    conn.commit()
+    if hours or days:
+        logger.info(f"📦 Compactação: {hours} hora(s) e {days} dia(s) agregados")
+    return hours, days
+
+@metrics.timed_query('aggregates.add_late_rows')
+def add_late_rows(conn, rows):
+    """Soma aos agregados as linhas recém-inseridas em horas já compactadas
+
+    Uma fonte que falhou recupera o atraso na importação seguinte, quando a
+    compactação já passou daquelas horas (e os brutos podem já ter expirado):
+    as contagens dessas linhas são somadas a agg_hourly e, nos dias já
+    consolidados, a agg_daily. Retorna quantas linhas eram atrasadas.
+    """
+    watermark = get_watermark(conn, 'hourly')
+    if watermark is None:
+        return 0
+    hourly_end = _fmt(watermark)
+    counts = {}
+    late = 0
+    for timestamp, domain, client, status, source in rows:
+        if timestamp >= hourly_end:
+            continue
+        late += 1
+        bucket = timestamp[:13] + ':00:00'
+        blocked = int(status == 'blocked')
+        for kind, key in (('domain', domain), ('client', client)):
+            entry = counts.setdefault((bucket, kind, key or '', source), [0, 0])
+            entry[0] += 1
+            entry[1] += blocked
+    if not counts:
+        return 0
+
+    daily_watermark = get_watermark(conn, 'daily')
+    daily_end = _fmt(daily_watermark) if daily_watermark else ''
+    by_day = {}
+    for (bucket, kind, key, source), (total, blocked) in counts.items():
+        if bucket < daily_end:
+            entry = by_day.setdefault((bucket[:10], kind, key, source), [0, 0])
+            entry[0] += total
+            entry[1] += blocked
+
+    for table, table_counts in (('agg_hourly', counts), ('agg_daily', by_day)):
+        conn.executemany(f"""
+            INSERT INTO {table} (bucket, kind, key, source, total, blocked) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (bucket, kind, key, source) DO UPDATE SET
+                total = total + excluded.total,
+                blocked = blocked + excluded.blocked
+        """, [key + tuple(value) for key, value in table_counts.items()])
+    conn.commit()
+    logger.info(f"📦 {late} registro(s) atrasado(s) somados aos agregados")
+    return late
+
+def raw_safe_until(conn):
+    """Dia a partir do qual os registros brutos ainda não foram compactados
+
+    A retenção dos brutos nunca deve remover dias a partir dessa data.
+    """
+    watermark = get_watermark(conn, 'hourly')
+    return watermark.date() if watermark else None
+
+def apply_retention(conn, hourly_days, daily_days, today=None):
+    """Remove agregados horários e diários mais antigos que suas retenções"""
+    today = today or datetime.now().date()
+    hourly_cutoff = (today - timedelta(days=int(hourly_days))).isoformat()
+    daily_cutoff = (today - timedelta(days=int(daily_days))).isoformat()
+    removed_hourly = conn.execute("DELETE FROM agg_hourly WHERE bucket < ?", (hourly_cutoff,)).rowcount
+    removed_daily = conn.execute("DELETE FROM agg_daily WHERE bucket < ?", (daily_cutoff,)).rowcount
+    conn.commit()
+    return removed_hourly, removed_daily
+
+def _has_archived_days(conn, start_day, end_day=None):
+    sql = "SELECT 1 FROM partitions WHERE archive_path IS NOT NULL AND day >= ?"
+    params = [start_day.isoformat()]
+    if end_day:
+        sql += " AND day <= ?"
+        params.append(end_day.isoformat())
+    return conn.execute(sql + " LIMIT 1", params).fetchone() is not None
+
+def pick_resolution(conn, start_day, end_day=None, read_archive=False):
+    """Resolução mais fina que cobre todo o período [start_day, end_day]
+
+    Sem `read_archive`, um período com dias arquivados usa os agregados
+    horários quando eles o cobrem: os totais são os mesmos e o dia não
+    precisa ser descomprimido a cada consulta.
+    """
+    first_raw = conn.execute("SELECT MIN(day) FROM partitions").fetchone()[0]
+    first_hourly = conn.execute("SELECT MIN(bucket) FROM agg_hourly").fetchone()[0]
+    hourly_covers = first_hourly and first_hourly[:10] <= start_day.isoformat()
+    if first_raw and first_raw <= start_day.isoformat():
+        if read_archive or not hourly_covers or not _has_archived_days(conn, start_day, end_day):
+            return 'raw'
+        return 'hourly'
+    if hourly_covers:
+        return 'hourly'
+    first_daily = conn.execute("SELECT MIN(bucket) FROM agg_daily").fetchone()[0]
+    if first_daily:
+        return 'daily'
+    return 'raw' if first_raw else ('hourly' if first_hourly else 'raw')
+
+def _day_bounds(start_day, end_day):
+    return f"{start_day.isoformat()} 00:00:00", f"{(end_day + timedelta(days=1)).isoformat()} 00:00:00"
+
+def _hourly_source(conn, start_day, end_day):
+    """agg_hourly do período + o trecho ainda não compactado, agregado na hora
+
+    As datas vêm de objetos date já validados, por isso podem ser embutidas.
+    """
+    start, end = _day_bounds(start_day, end_day)
+    watermark = get_watermark(conn, 'hourly')
+    split = _fmt(watermark) if watermark else start
+    split = min(max(split, start), end)
+
+    parts = [f"""SELECT bucket, kind, key, source, total, blocked FROM agg_hourly
+                 WHERE bucket >= '{start}' AND bucket < '{split}'"""]
+    if split < end:
+        source = partition_store.source_sql(conn, split, end_day)
+        for kind in AGG_KINDS:
+            parts.append(f"""SELECT substr(timestamp, 1, 13) || ':00:00' AS bucket, '{kind}' AS kind,
+                                    COALESCE({kind}, '') AS key, source, COUNT(*) AS total,
+                                    SUM(CASE WHEN status = 'blocked' THEN 1 ELSE 0 END) AS blocked
+                             FROM {source}
+                             WHERE timestamp >= '{split}' AND timestamp < '{end}'
+                             GROUP BY 1, 3, 4""")
+    return f"({' UNION ALL '.join(parts)})"
+
+def _daily_source(conn, start_day, end_day):
+    """agg_daily do período + dias ainda não consolidados, a partir dos horários"""
+    start, end = start_day.isoformat(), (end_day + timedelta(days=1)).isoformat()
+    watermark = get_watermark(conn, 'daily')
+    split = watermark.date().isoformat() if watermark else start
+    split = min(max(split, start), end)
+
+    parts = [f"""SELECT bucket, kind, key, source, total, blocked FROM agg_daily
+                 WHERE bucket >= '{start}' AND bucket < '{split}'"""]
+    if split < end:
+        hourly = _hourly_source(conn, datetime.strptime(split, '%Y-%m-%d').date(), end_day)
+        parts.append(f"""SELECT substr(bucket, 1, 10) AS bucket, kind, key, source,
+                                SUM(total) AS total, SUM(blocked) AS blocked
+                         FROM {hourly}
+                         GROUP BY 1, 2, 3, 4""")
+    return f"({' UNION ALL '.join(parts)})"
+
+def _aggregate_source(conn, resolution, start_day, end_day):
+    if resolution == 'hourly':
+        return _hourly_source(conn, start_day, end_day)
+    return _daily_source(conn, start_day, end_day)
+
+def _source_filter(source):
+    """Cláusula AND e parâmetros do filtro por fonte (nenhum se None)"""
+    return (" AND source = ?", [source]) if source else ("", [])
+
+@metrics.timed_query('aggregates.query_stats')
+def query_stats(conn, start_day, end_day, resolution=None, source=None):
+    """(total, bloqueados, clientes únicos, domínios únicos, resolução) do período"""
+    resolution = resolution or pick_resolution(conn, start_day, end_day)
+    where, params = _source_filter(source)
+    cursor = conn.cursor()
+    if resolution == 'raw':
+        table = partition_store.source_sql(conn, start_day, end_day, source=source)
+        cursor.execute(f"""
+            SELECT
+                COUNT(*),
+                COALESCE(SUM(CASE WHEN status = 'blocked' THEN 1 ELSE 0 END), 0),
+                COUNT(DISTINCT client),
+                COUNT(DISTINCT domain)
+            FROM {table}
+            WHERE 1=1{where}
+        """, params)
+    else:
+        table = _aggregate_source(conn, resolution, start_day, end_day)
+        cursor.execute(f"""
+            SELECT
+                COALESCE(SUM(CASE WHEN kind = 'client' THEN total END), 0),
+                COALESCE(SUM(CASE WHEN kind = 'client' THEN blocked END), 0),
+                COUNT(DISTINCT CASE WHEN kind = 'client' THEN key END),
+                COUNT(DISTINCT CASE WHEN kind = 'domain' THEN key END)
+            FROM {table}
+            WHERE 1=1{where}
+        """, params)
+    return cursor.fetchone() + (resolution,)
+
+@metrics.timed_query('aggregates.query_activity')
+def query_activity(conn, start_day, end_day, resolution=None, source=None):
+    """Série (rótulo, total, bloqueados) do período e a resolução usada
+
+    Em um único dia os rótulos são horas; em períodos maiores ou na resolução
+    diária, são dias.
+    """
+    resolution = resolution or pick_resolution(conn, start_day, end_day)
+    by_hour = start_day == end_day and resolution != 'daily'
+    where, params = _source_filter(source)
+    cursor = conn.cursor()
+    if resolution == 'raw':
+        table = partition_store.source_sql(conn, start_day, end_day, source=source)
+        label = "substr(timestamp, 12, 2) || ':00'" if by_hour else "substr(timestamp, 1, 10)"
+        cursor.execute(f"""
+            SELECT {label} AS label, COUNT(*),
+                   SUM(CASE WHEN status = 'blocked' THEN 1 ELSE 0 END)
+            FROM {table}
+            WHERE 1=1{where}
+            GROUP BY label
+            ORDER BY label
+        """, params)
+    else:
+        table = _aggregate_source(conn, resolution, start_day, end_day)
+        label = "substr(bucket, 12, 2) || ':00'" if by_hour else "substr(bucket, 1, 10)"
+        cursor.execute(f"""
+            SELECT {label} AS label, SUM(total), SUM(blocked)
+            FROM {table}
+            WHERE kind = 'client'{where}
+            GROUP BY label
+            ORDER BY label
+        """, params)
+    return cursor.fetchall(), resolution
+
+@metrics.timed_query('aggregates.query_top')
+def query_top(conn, start_day, end_day, kind, blocked_only=False, exclude=None,
+              limit=10, resolution=None, source=None):
+    """Top `limit` de domínios ou clientes no período e a resolução usada"""
+    resolution = resolution or pick_resolution(conn, start_day, end_day)
+    params = []
+    cursor = conn.cursor()
+    if resolution == 'raw':
+        table = partition_store.source_sql(conn, start_day, end_day, source=source)
+        where = ["1=1"]
+        if blocked_only:
+            where.append("status = 'blocked'")
+        if exclude:
+            where.append(f"{kind} != ?")
+            params.append(exclude)
+        if source:
+            where.append("source = ?")
+            params.append(source)
+        sql = f"""
+            SELECT {kind}, COUNT(*) AS count
+            FROM {table}
+            WHERE {' AND '.join(where)}
+            GROUP BY {kind}
+        """
+    else:
+        table = _aggregate_source(conn, resolution, start_day, end_day)
+        measure = 'blocked' if blocked_only else 'total'
+        sql = f"""
+            SELECT key, SUM({measure}) AS count
+            FROM {table}
+            WHERE kind = ?{' AND key != ?' if exclude else ''}{' AND source = ?' if source else ''}
+            GROUP BY key
+            HAVING count > 0
+        """
+        params.append(kind)
+        if exclude:
+            params.append(exclude)
+        if source:
+            params.append(source)
+    cursor.execute(sql + " ORDER BY count DESC LIMIT ?", params + [limit])
+    return cursor.fetchall(), resolution
+
+@metrics.timed_query('aggregates.query_buckets')
+def query_buckets(conn, start, end, resolution, kind=None, key=None, source=None):
+    """Contagens [(bucket, total, bloqueados)] de [start, end) em ordem cronológica
+
+    'raw' agrupa os registros brutos por minuto ('AAAA-MM-DD HH:MM'); 'hourly'
+    e 'daily' leem os agregados ('AAAA-MM-DD HH:00:00' e 'AAAA-MM-DD').
+    `kind` ('client' ou 'domain') e `key` restringem a um cliente ou domínio.
+    """
+    last_day = (end - timedelta(seconds=1)).date()
+    params = []
+    cursor = conn.cursor()
+    if resolution == 'raw':
+        table = partition_store.source_sql(conn, start.date(), last_day, source=source)
+        where = "timestamp >= ? AND timestamp < ?"
+        params += [_fmt(start), _fmt(end)]
+        if kind:
+            where += f" AND {kind} = ?"
+            params.append(key)
+        if source:
+            where += " AND source = ?"
+            params.append(source)
+        cursor.execute(f"""
+            SELECT substr(timestamp, 1, 16) AS minute, COUNT(*),
+                   SUM(CASE WHEN status = 'blocked' THEN 1 ELSE 0 END)
+            FROM {table}
+            WHERE {where}
+            GROUP BY minute
+            ORDER BY minute
+        """, params)
+        return cursor.fetchall()
+
+    table = _aggregate_source(conn, resolution, start.date(), last_day)
+    if resolution == 'hourly':
+        params += [_fmt(start), _fmt(end)]
+    else:
+        params += [start.date().isoformat(), (last_day + timedelta(days=1)).isoformat()]
+    # Total e bloqueados da rede = soma de todos os clientes
+    where = "bucket >= ? AND bucket < ? AND kind = ?"
+    params.append(kind or 'client')
+    if kind:
+        where += " AND key = ?"
+        params.append(key)
+    if source:
+        where += " AND source = ?"
+        params.append(source)
+    cursor.execute(f"""
+        SELECT bucket, SUM(total), SUM(blocked)
+        FROM {table}
+        WHERE {where}
+        GROUP BY bucket
+        ORDER BY bucket
+    """, params)
+    return cursor.fetchall()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Motor de detecção de picos de tráfego
+Carrega matrizes horárias de contagem (cliente x hora, domínio x hora) em arrays
+NumPy e avalia todas as entidades em uma única passada vetorizada
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import metrics
+import partition_store
+
+DB_PATH = 'pihole_logs.db'
+
+# Horas de histórico usadas para calcular a linha de base
+BASELINE_HOURS = 24
+
+# Fator de suavização da EWMA (peso da hora mais recente)
+EWMA_ALPHA = 0.3
+
+# Linha de base mínima (consultas/hora) para evitar divisões por zero
+MIN_BASELINE_RATE = 1.0
+
+# Volume mínimo no período de análise para que um pico seja considerado
+MIN_EVENTS = {
+    'ip_spike': 50,
+    'domain_spike': 100,
+    'network_spike': 0
+}
+
+# Tempo de validade do resultado em cache (segundos)
+CACHE_TTL_SECONDS = 60
+
+# Clientes internos do Pi-hole que não devem gerar alertas
+IGNORED_CLIENTS = ('127.0.0.1', '::1', 'localhost')
+
+ALERT_TITLES = {
+    'ip_spike': 'Pico de Tráfego - IP {target}',
+    'domain_spike': 'Pico de Tráfego - Domínio {target}',
+    'network_spike': 'Pico de Tráfego na Rede'
+}
+
+SEVERITY_LABELS = {
+    'medium': 'Médio',
+    'high': 'Alto',
+    'critical': 'Crítico'
+}
+
+def _setting(settings, key, camel_key, default):
+    """Lê uma configuração aceitando tanto snake_case quanto camelCase"""
+    value = settings.get(key, settings.get(camel_key, default))
+    if isinstance(value, str):
+        if value.lower() in ('true', 'false'):
+            return value.lower() == 'true'
+        try:
+            return type(default)(value)
+        except (TypeError, ValueError):
+            return default
+    return value if value is not None else default
+
+def load_hourly_matrix(conn, column, start, end):
+    """Carrega contagens horárias agrupadas por `column` em uma matriz NumPy
+
+    Retorna (entidades, matriz) onde matriz[i, h] é o número de consultas da
+    entidade i na hora h contada a partir de `start`.
+    """
+    n_hours = int((end - start).total_seconds() // 3600)
+    start_str = start.strftime('%Y-%m-%d %H:%M:%S')
+    end_str = end.strftime('%Y-%m-%d %H:%M:%S')
+
+    # Apenas as partições diárias do intervalo entram na consulta
+    source = partition_store.source_sql(conn, start, end)
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {column},
+               (strftime('%s', timestamp) - strftime('%s', ?)) / 3600 AS hour_index,
+               COUNT(*)
+        FROM {source}
+        WHERE timestamp >= ? AND timestamp < ?
+        GROUP BY {column}, hour_index
+    """, (start_str, start_str, end_str))
+    rows = cursor.fetchall()
+
+    if not rows:
+        return [], np.zeros((0, n_hours), dtype=np.float64)
+
+    # Códigos inteiros por entidade (dicionário é mais rápido que np.unique em strings)
+    index = {}
+    codes = np.fromiter((index.setdefault(row[0], len(index)) for row in rows),
+                        dtype=np.int64, count=len(rows))
+    hours = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+    counts = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+
+    valid = (hours >= 0) & (hours < n_hours)
+    matrix = np.zeros((len(index), n_hours), dtype=np.float64)
+    # GROUP BY garante pares (entidade, hora) únicos, então a atribuição direta basta
+    matrix[codes[valid], hours[valid]] = counts[valid]
+
+    return list(index), matrix
+
+def compute_baseline(history, method='ewma', alpha=EWMA_ALPHA):
+    """Calcula a linha de base horária de todas as entidades de uma vez
+
+    `history` tem formato (entidades, horas). Retorna (baseline, dispersão).
+    """
+    n_hours = history.shape[1]
+    if n_hours == 0:
+        zeros = np.zeros(history.shape[0])
+        return zeros, zeros
+
+    if method == 'median':
+        baseline = np.median(history, axis=1)
+        spread = 1.4826 * np.median(np.abs(history - baseline[:, None]), axis=1)
+        return baseline, spread
+
+    # EWMA em forma fechada: um único produto matriz-vetor com pesos decrescentes
+    weights = (1.0 - alpha) ** np.arange(n_hours - 1, -1, -1, dtype=np.float64)
+    weights /= weights.sum()
+    baseline = history @ weights
+    spread = np.sqrt(np.maximum((history ** 2) @ weights - baseline ** 2, 0.0))
+    return baseline, spread
+
+def detect_spikes(entities, matrix, analysis_hours, threshold, alert_type,
+                  method='ewma', min_events=0):
+    """Avalia todas as entidades de uma matriz e retorna os picos detectados"""
+    if matrix.shape[0] == 0 or analysis_hours <= 0:
+        return []
+
+    history = matrix[:, :-analysis_hours]
+    recent = matrix[:, -analysis_hours:]
+
+    baseline, spread = compute_baseline(history, method)
+    recent_total = recent.sum(axis=1)
+    recent_rate = recent_total / analysis_hours
+    ratio = recent_rate / np.maximum(baseline, MIN_BASELINE_RATE)
+
+    mask = (ratio > threshold) & (recent_total >= min_events)
+    hits = np.flatnonzero(mask)
+    if hits.size == 0:
+        return []
+
+    # Ordenar do maior para o menor pico
+    hits = hits[np.argsort(-ratio[hits])]
+
+    spikes = []
+    for i in hits:
+        r = float(ratio[i])
+        if r >= threshold * 4:
+            severity = 'critical'
+        elif r >= threshold * 2:
+            severity = 'high'
+        else:
+            severity = 'medium'
+        spikes.append({
+            'alert_type': alert_type,
+            'target': entities[i],
+            'current_count': int(recent_total[i]),
+            'average_count': float(baseline[i]) * analysis_hours,
+            'ratio': r,
+            'spread': float(spread[i]),
+            'threshold': threshold,
+            'severity_level': severity
+        })
+    return spikes
+
+def _format_alert(spike, analysis_hours):
+    """Converte um pico detectado no formato de alerta usado pelas APIs"""
+    target = spike['target']
+    title = ALERT_TITLES[spike['alert_type']].format(target=target)
+    subject = {
+        'ip_spike': f'IP {target}',
+        'domain_spike': f'Domínio {target}',
+        'network_spike': 'A rede'
+    }[spike['alert_type']]
+    message = (f"{subject} apresentou {spike['current_count']} consultas nas últimas "
+               f"{analysis_hours} horas (média: {spike['average_count']:.1f}, "
+               f"{spike['ratio']:.1f}x)")
+
+    alert = dict(spike)
+    alert.update({
+        'type': 'danger' if spike['severity_level'] in ('high', 'critical') else 'warning',
+        'severity': SEVERITY_LABELS[spike['severity_level']],
+        'title': title,
+        'message': message,
+        'timestamp': datetime.now().isoformat()
+    })
+    return alert
+
+def describe_stored_alert(alert):
+    """Acrescenta título e rótulo de severidade a um alerta persistido (alert_store)"""
+    alert['title'] = ALERT_TITLES.get(alert['type'], alert['type']).format(target=alert['target'])
+    alert['severity_label'] = SEVERITY_LABELS.get(alert['severity'], alert['severity'])
+    return alert
+
+def evaluate_alerts(settings, db_path=DB_PATH, now=None, method='ewma', window=None):
+    """Executa a detecção de picos de IP, domínio e rede
+
+    Com uma janela quente (hot_window.HotWindow) que cubra o período, as
+    matrizes saem da memória em vez do banco.
+    """
+    analysis_hours = max(1, int(_setting(settings, 'analysis_period_hours', 'analysisPeriodHours', 2)))
+    ip_threshold = float(_setting(settings, 'ip_spike_threshold', 'ipSpikeThreshold', 3.0))
+    domain_threshold = float(_setting(settings, 'domain_spike_threshold', 'domainSpikeThreshold', 5.0))
+    network_threshold = float(_setting(settings, 'network_spike_threshold', 'networkSpikeThreshold', 2.5))
+
+    end = now or datetime.now()
+    start = end - timedelta(hours=BASELINE_HOURS + analysis_hours)
+
+    if window is not None and window.covers(start):
+        metrics.cache_hit('hot_window', True)
+        clients, client_matrix = window.hourly_matrix('client', start, end)
+        domains, domain_matrix = window.hourly_matrix('domain', start, end)
+    else:
+        if window is not None:
+            metrics.cache_hit('hot_window', False)
+        conn = sqlite3.connect(db_path)
+        try:
+            clients, client_matrix = load_hourly_matrix(conn, 'client', start, end)
+            domains, domain_matrix = load_hourly_matrix(conn, 'domain', start, end)
+        finally:
+            conn.close()
+
+    # Série da rede inteira = soma de todos os clientes (inclui o próprio Pi-hole)
+    network_matrix = client_matrix.sum(axis=0, keepdims=True)
+
+    if clients:
+        keep = np.array([client not in IGNORED_CLIENTS for client in clients])
+        clients = [client for client, k in zip(clients, keep) if k]
+        client_matrix = client_matrix[keep]
+
+    spikes = []
+    spikes += detect_spikes(['rede'], network_matrix, analysis_hours, network_threshold,
+                            'network_spike', method, MIN_EVENTS['network_spike'])
+    spikes += detect_spikes(clients, client_matrix, analysis_hours, ip_threshold,
+                            'ip_spike', method, MIN_EVENTS['ip_spike'])
+    spikes += detect_spikes(domains, domain_matrix, analysis_hours, domain_threshold,
+                            'domain_spike', method, MIN_EVENTS['domain_spike'])
+
+    return [_format_alert(spike, analysis_hours) for spike in spikes]
+
+class AlertEngine:
+    """Mantém o último resultado da avaliação em cache para as rotas de alerta"""
+
+    def __init__(self, db_path=DB_PATH, ttl=CACHE_TTL_SECONDS, on_evaluate=None):
+        self.db_path = db_path
+        self.ttl = ttl
+        # Chamado com (alertas, configurações) a cada nova avaliação
+        self.on_evaluate = on_evaluate
+        self._lock = threading.Lock()
+        self._alerts = []
+        self._evaluated_at = 0.0
+        self._settings_key = None
+
+    def invalidate(self):
+        """Descarta o resultado em cache (ex.: após mudança de limiares)"""
+        with self._lock:
+            self._evaluated_at = 0.0
+
+    def get_alerts(self, settings, force=False, window=None):
+        """Retorna os alertas, reavaliando apenas se o cache expirou
+
+        `window` é a janela quente a usar nesta avaliação; quem chama decide se
+        ela está atualizada (com vários workers pode estar uma importação atrás).
+        """
+        key = tuple(sorted((k, str(v)) for k, v in settings.items()))
+        with self._lock:
+            fresh = (time.monotonic() - self._evaluated_at) < self.ttl
+            if not force and fresh and key == self._settings_key:
+                metrics.cache_hit('alerts', True)
+                return self._alerts
+
+            metrics.cache_hit('alerts', False)
+            with metrics.alert_evaluation_seconds.time(engine='spikes'):
+                self._alerts = evaluate_alerts(settings, self.db_path, window=window)
+            if self.on_evaluate:
+                self.on_evaluate(self._alerts, settings)
+            self._evaluated_at = time.monotonic()
+            self._settings_key = key
+            return self._alerts
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Ciclo de vida dos alertas na tabela `alerts` (ver create_alerts_table.py)
+Cada alerta é identificado por (tipo, alvo, janela); enquanto estiver aberto,
+novas detecções do mesmo tipo/alvo apenas atualizam o registro existente
+"""
+
+from datetime import datetime, timedelta
+
+# Intervalo mínimo entre dois alertas do mesmo tipo/alvo
+COOLDOWN_MINUTES = 30
+
+# Alertas abertos sem nova detecção por esse período são resolvidos automaticamente
+AUTO_RESOLVE_MINUTES = 180
+
+# Supressão aplicada ao resolver manualmente (evita reabrir o mesmo alerta em seguida)
+RESOLVE_SUPPRESS_MINUTES = 60
+
+ALERT_COLUMNS = ('id', 'type', 'target', 'current_count', 'average_count', 'threshold',
+                 'severity', 'message', 'created_at', 'window_start', 'last_seen_at',
+                 'occurrences', 'resolved', 'resolved_at', 'resolved_by', 'notified_at')
+
+def _fmt(dt):
+    return dt.strftime('%Y-%m-%d %H:%M:%S')
+
+def window_start_for(moment, window_minutes):
+    """Início da janela fixa de `window_minutes` que contém `moment`"""
+    window_seconds = max(1, int(window_minutes)) * 60
+    epoch = int(moment.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % window_seconds)
+
+def is_suppressed(conn, alert_type, target, now=None):
+    """Verifica se há uma janela de supressão ativa para o tipo/alvo"""
+    now = now or datetime.now()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT 1 FROM alert_suppressions
+        WHERE type = ? AND target IN (?, '*') AND suppressed_until > ?
+        LIMIT 1
+    """, (alert_type, target, _fmt(now)))
+    return cursor.fetchone() is not None
+
+def suppress(conn, alert_type, target, minutes, reason=None, now=None):
+    """Cria uma janela de supressão para o tipo/alvo ('*' para todos os alvos)"""
+    now = now or datetime.now()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO alert_suppressions (type, target, suppressed_until, reason, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (alert_type, target, _fmt(now + timedelta(minutes=minutes)), reason, _fmt(now)))
+    conn.commit()
+    return cursor.lastrowid
+
+def upsert_alert(conn, alert_type, target, current_count, average_count, threshold,
+                 severity='medium', message=None, window_start=None, now=None):
+    """Cria ou atualiza o alerta aberto de (tipo, alvo)
+
+    Retorna (id, criado) — `criado` é True apenas quando um novo alerta foi
+    aberto, que é quando ele deve ser notificado. Retorna (None, False) se o
+    tipo/alvo estiver suprimido.
+    """
+    now = now or datetime.now()
+    window_start = window_start or now
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT id, current_count FROM alerts
+        WHERE resolved = 0 AND type = ? AND target = ?
+        ORDER BY created_at DESC
+        LIMIT 1
+    """, (alert_type, target))
+    row = cursor.fetchone()
+
+    if row:
+        alert_id, previous_count = row
+        cursor.execute("""
+            UPDATE alerts
+            SET current_count = ?, average_count = ?, threshold = ?, severity = ?,
+                message = COALESCE(?, message), last_seen_at = ?,
+                occurrences = COALESCE(occurrences, 1) + 1
+            WHERE id = ?
+        """, (max(int(current_count), previous_count), int(round(average_count)), threshold,
+              severity, message, _fmt(now), alert_id))
+        conn.commit()
+        return alert_id, False
+
+    if is_suppressed(conn, alert_type, target, now):
+        return None, False
+
+    # Uma janela já resolvida não é reaberta: apenas registra a nova ocorrência
+    cursor.execute("""
+        SELECT id FROM alerts WHERE type = ? AND target = ? AND window_start = ?
+    """, (alert_type, target, _fmt(window_start)))
+    row = cursor.fetchone()
+    if row:
+        cursor.execute("""
+            UPDATE alerts SET last_seen_at = ?, occurrences = COALESCE(occurrences, 1) + 1
+            WHERE id = ?
+        """, (_fmt(now), row[0]))
+        conn.commit()
+        return row[0], False
+
+    cursor.execute("""
+        INSERT INTO alerts (type, target, current_count, average_count, threshold, severity,
+                            message, created_at, window_start, last_seen_at, occurrences)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+    """, (alert_type, target, int(current_count), int(round(average_count)), threshold,
+          severity, message, _fmt(now), _fmt(window_start), _fmt(now)))
+    conn.commit()
+    return cursor.lastrowid, True
+
+def record_alert(conn, alert_type, target, current_count, average_count, threshold,
+                 severity='medium', message=None, cooldown_minutes=COOLDOWN_MINUTES, now=None):
+    """Registra um alerta usando janelas de `cooldown_minutes`
+
+    Retorna o id do alerta recém-aberto ou None se ele apenas atualizou um
+    alerta já aberto (ou estava suprimido).
+    """
+    now = now or datetime.now()
+    alert_id, created = upsert_alert(conn, alert_type, target, current_count, average_count,
+                                     threshold, severity, message,
+                                     window_start_for(now, cooldown_minutes), now)
+    return alert_id if created else None
+
+def mark_notified(conn, alert_id, now=None):
+    """Marca o alerta como notificado"""
+    conn.execute("UPDATE alerts SET notified_at = ? WHERE id = ?",
+                 (_fmt(now or datetime.now()), alert_id))
+    conn.commit()
+
+def resolve_alert(conn, alert_id, resolved_by='user', suppress_minutes=RESOLVE_SUPPRESS_MINUTES, now=None):
+    """Resolve um alerta e suprime o mesmo tipo/alvo por `suppress_minutes`"""
+    now = now or datetime.now()
+    cursor = conn.cursor()
+    cursor.execute("SELECT type, target FROM alerts WHERE id = ? AND resolved = 0", (alert_id,))
+    row = cursor.fetchone()
+    if not row:
+        return False
+
+    cursor.execute("""
+        UPDATE alerts SET resolved = 1, resolved_at = ?, resolved_by = ?
+        WHERE id = ?
+    """, (_fmt(now), resolved_by, alert_id))
+    conn.commit()
+
+    if suppress_minutes:
+        suppress(conn, row[0], row[1], suppress_minutes, f'Resolvido por {resolved_by}', now)
+    return True
+
+def auto_resolve(conn, idle_minutes=AUTO_RESOLVE_MINUTES, now=None):
+    """Resolve alertas abertos que não foram detectados novamente"""
+    now = now or datetime.now()
+    cutoff = _fmt(now - timedelta(minutes=idle_minutes))
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE alerts SET resolved = 1, resolved_at = ?, resolved_by = 'auto'
+        WHERE resolved = 0 AND COALESCE(last_seen_at, created_at) < ?
+    """, (_fmt(now), cutoff))
+    conn.commit()
+    return cursor.rowcount
+
+def _row_to_dict(row):
+    alert = dict(zip(ALERT_COLUMNS, row))
+    alert['resolved'] = bool(alert['resolved'])
+    return alert
+
+def get_active_alerts(conn, limit=100):
+    """Alertas abertos, mais recentes primeiro (usa idx_alerts_active)"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {', '.join(ALERT_COLUMNS)} FROM alerts
+        WHERE resolved = 0
+        ORDER BY created_at DESC
+        LIMIT ?
+    """, (limit,))
+    return [_row_to_dict(row) for row in cursor.fetchall()]
+
+def get_alert_history(conn, limit=100, alert_type=None, target=None):
+    """Histórico de alertas (abertos e resolvidos)"""
+    sql = f"SELECT {', '.join(ALERT_COLUMNS)} FROM alerts WHERE 1=1"
+    params = []
+    if alert_type:
+        sql += " AND type = ?"
+        params.append(alert_type)
+    if target:
+        sql += " AND target = ?"
+        params.append(target)
+    sql += " ORDER BY created_at DESC LIMIT ?"
+    params.append(limit)
+
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    return [_row_to_dict(row) for row in cursor.fetchall()]
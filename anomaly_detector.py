@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Detector incremental de anomalias avaliado durante a ingestão
+Mantém média/variância EWMA por cliente, por domínio base e para a rede inteira,
+alimentado com contadores por minuto a cada importação de dados
+"""
+
+import math
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+
+from alert_engine import _setting
+from alert_store import record_alert, COOLDOWN_MINUTES
+from create_alerts_table import create_alerts_table
+from domain_utils import extract_base_domain
+
+DB_PATH = 'pihole_logs.db'
+
+# Fator de suavização das médias móveis (por minuto)
+EWMA_ALPHA = 0.05
+
+# Minutos observados antes de uma entidade poder gerar alertas
+WARMUP_MINUTES = 30
+
+# Desvios-padrão acima da média exigidos além do multiplicador configurado
+Z_THRESHOLD = 4.0
+
+# Limite de minutos sem atividade aplicados de uma vez (mantém a atualização O(1))
+GAP_CAP_MINUTES = 120
+
+# Entidades sem atividade há mais que isso são descartadas do estado
+IDLE_MINUTES = 7 * 24 * 60
+
+# Minutos antigos (ex.: primeira importação) alimentam o estado mas não disparam alertas
+MAX_ALERT_AGE_MINUTES = 60
+
+# Volume mínimo por minuto para considerar um pico
+MIN_COUNTS = {
+    'client': 30,
+    'domain': 30,
+    'network': 60
+}
+
+ALERT_TYPES = {
+    'client': 'ip_spike',
+    'domain': 'domain_spike',
+    'network': 'network_spike'
+}
+
+class MinuteBatch:
+    """Acumula contadores por minuto durante o loop de importação"""
+
+    def __init__(self):
+        self.minutes = {}
+
+    def add(self, timestamp, domain, client):
+        """Conta uma consulta (timestamp local 'YYYY-MM-DD HH:MM:SS')"""
+        minute = timestamp[:16]
+        bucket = self.minutes.get(minute)
+        if bucket is None:
+            bucket = self.minutes[minute] = (Counter(), Counter())
+        bucket[0][client] += 1
+        bucket[1][extract_base_domain(domain)] += 1
+
+    def merge(self, other):
+        """Incorpora os contadores de outro lote"""
+        for minute, (clients, domains) in other.minutes.items():
+            bucket = self.minutes.get(minute)
+            if bucket is None:
+                self.minutes[minute] = (clients, domains)
+            else:
+                bucket[0].update(clients)
+                bucket[1].update(domains)
+
+    def __len__(self):
+        return len(self.minutes)
+
+class StreamingDetector:
+    """Estado EWMA por entidade com atualização O(1) por observação"""
+
+    def __init__(self, db_path=DB_PATH, alpha=EWMA_ALPHA, cooldown_minutes=COOLDOWN_MINUTES):
+        self.db_path = db_path
+        self.alpha = alpha
+        self.cooldown_minutes = cooldown_minutes
+        # (tipo, entidade) -> [média, variância, último minuto, minutos observados]
+        self.state = {}
+        self.last_minute = 0
+        self._last_fired = {}
+        # Minuto corrente ainda incompleto, processado na próxima importação
+        self._pending = MinuteBatch()
+        self._lock = threading.Lock()
+
+        create_alerts_table(db_path)
+        self._create_state_table()
+        self.load()
+
+    def _create_state_table(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS detector_state (
+                    kind TEXT NOT NULL,
+                    entity TEXT NOT NULL,
+                    mean REAL NOT NULL,
+                    var REAL NOT NULL,
+                    last_minute INTEGER NOT NULL,
+                    n INTEGER NOT NULL,
+                    PRIMARY KEY (kind, entity)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS detector_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def load(self):
+        """Restaura o estado salvo (após reinício da aplicação)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT kind, entity, mean, var, last_minute, n FROM detector_state")
+            self.state = {(kind, entity): [mean, var, last_minute, n]
+                          for kind, entity, mean, var, last_minute, n in cursor.fetchall()}
+            cursor.execute("SELECT value FROM detector_meta WHERE key = 'last_minute'")
+            row = cursor.fetchone()
+            self.last_minute = int(row[0]) if row else 0
+        finally:
+            conn.close()
+
+    def save(self):
+        """Persiste o estado, descartando entidades inativas"""
+        with self._lock:
+            horizon = self.last_minute - IDLE_MINUTES
+            self.state = {key: value for key, value in self.state.items() if value[2] >= horizon}
+            rows = [(kind, entity, v[0], v[1], v[2], v[3]) for (kind, entity), v in self.state.items()]
+
+            conn = sqlite3.connect(self.db_path)
+            try:
+                conn.execute("DELETE FROM detector_state")
+                conn.executemany("""
+                    INSERT INTO detector_state (kind, entity, mean, var, last_minute, n)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, rows)
+                conn.execute("INSERT OR REPLACE INTO detector_meta (key, value) VALUES ('last_minute', ?)",
+                             (str(self.last_minute),))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _update(self, key, minute, x):
+        """Atualiza o estado de uma entidade e retorna (média, desvio) anteriores"""
+        alpha = self.alpha
+        entry = self.state.get(key)
+        if entry is None:
+            self.state[key] = [float(x), 0.0, minute, 1]
+            return None
+
+        mean, var, last, n = entry
+        # Minutos sem atividade contam como zero (limitado para manter custo constante)
+        gap = min(minute - last - 1, GAP_CAP_MINUTES)
+        for _ in range(max(gap, 0)):
+            var = (1 - alpha) * (var + alpha * mean * mean)
+            mean -= alpha * mean
+
+        previous = (mean, math.sqrt(var))
+        diff = x - mean
+        mean += alpha * diff
+        var = (1 - alpha) * (var + alpha * diff * diff)
+        entry[0], entry[1], entry[2], entry[3] = mean, var, minute, n + max(gap, 0) + 1
+        return previous if n >= WARMUP_MINUTES else None
+
+    def _check(self, kind, entity, minute, x, previous, threshold, fire):
+        """Avalia uma observação contra a linha de base anterior"""
+        if previous is None or not fire or x < MIN_COUNTS[kind]:
+            return None
+        mean, std = previous
+        ratio = x / max(mean, 1.0)
+        z = (x - mean) / max(std, 1.0)
+        if ratio <= threshold or z <= Z_THRESHOLD:
+            return None
+        return {
+            'kind': kind,
+            'entity': entity,
+            'minute': minute,
+            'count': x,
+            'mean': mean,
+            'ratio': ratio,
+            'threshold': threshold
+        }
+
+    def process(self, batch, settings, now=None):
+        """Processa os minutos de um lote em ordem cronológica e registra alertas"""
+        now = now or datetime.now()
+        now_minute = int(now.timestamp() // 60)
+        thresholds = {
+            'client': float(_setting(settings, 'ip_spike_threshold', 'ipSpikeThreshold', 3.0)),
+            'domain': float(_setting(settings, 'domain_spike_threshold', 'domainSpikeThreshold', 5.0)),
+            'network': float(_setting(settings, 'network_spike_threshold', 'networkSpikeThreshold', 2.5))
+        }
+        alerts_enabled = bool(_setting(settings, 'alerts_enabled', 'alertsEnabled', True))
+
+        anomalies = []
+        with self._lock:
+            pending, self._pending = self._pending, MinuteBatch()
+            pending.merge(batch)
+
+            for minute_str in sorted(pending.minutes):
+                minute = int(datetime.strptime(minute_str, '%Y-%m-%d %H:%M').timestamp() // 60)
+                # Minutos já processados em importações anteriores são ignorados
+                if minute <= self.last_minute:
+                    continue
+                if minute >= now_minute:
+                    self._pending.minutes[minute_str] = pending.minutes[minute_str]
+                    continue
+
+                clients, domains = pending.minutes[minute_str]
+                fire = alerts_enabled and now_minute - minute <= MAX_ALERT_AGE_MINUTES
+
+                total = sum(clients.values())
+                previous = self._update(('network', '*'), minute, total)
+                anomaly = self._check('network', 'rede', minute, total, previous,
+                                      thresholds['network'], fire)
+                if anomaly:
+                    anomalies.append(anomaly)
+
+                for kind, counter in (('client', clients), ('domain', domains)):
+                    threshold = thresholds[kind]
+                    for entity, x in counter.items():
+                        previous = self._update((kind, entity), minute, x)
+                        anomaly = self._check(kind, entity, minute, x, previous, threshold, fire)
+                        if anomaly:
+                            anomalies.append(anomaly)
+
+                self.last_minute = minute
+
+        fired = [anomaly for anomaly in anomalies if self._fire(anomaly, now_minute)]
+        if fired:
+            print(f"🚨 Detector: {len(fired)} novo(s) alerta(s) registrado(s)")
+        return fired
+
+    def _fire(self, anomaly, now_minute):
+        """Grava o alerta respeitando o cooldown em memória e no banco"""
+        alert_type = ALERT_TYPES[anomaly['kind']]
+        key = (alert_type, anomaly['entity'])
+        last = self._last_fired.get(key)
+        if last is not None and now_minute - last < self.cooldown_minutes:
+            return False
+
+        when = datetime.fromtimestamp(anomaly['minute'] * 60).strftime('%H:%M')
+        subject = {
+            'client': f"IP {anomaly['entity']}",
+            'domain': f"Domínio {anomaly['entity']}",
+            'network': 'A rede'
+        }[anomaly['kind']]
+        message = (f"{subject} fez {anomaly['count']} consultas no minuto {when} "
+                   f"(média: {anomaly['mean']:.1f}/min, {anomaly['ratio']:.1f}x)")
+        severity = 'high' if anomaly['ratio'] >= anomaly['threshold'] * 2 else 'medium'
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            alert_id = record_alert(conn, alert_type, anomaly['entity'], anomaly['count'],
+                                    anomaly['mean'], anomaly['threshold'], severity, message,
+                                    cooldown_minutes=self.cooldown_minutes)
+        finally:
+            conn.close()
+
+        self._last_fired[key] = now_minute
+        if alert_id is None:
+            return False
+        anomaly.update({'id': alert_id, 'type': alert_type, 'message': message, 'severity': severity})
+        return True
@@ -3,13 +3,24 @@ import tempfile
 import os
 from flask import Flask, render_template, request, jsonify
 import re
+import threading
+import time
 import paramiko
 from datetime import datetime, timedelta
+from operator import attrgetter
 import logging
 from config import SSH_CONFIG, FLASK_CONFIG, LOGGING_CONFIG, FILTER_CONFIG
+from domain_utils import extract_base_domain
+from log_record import LogRecord, TimestampFormatter, text
+import profiling
+import fast_json
+import query_budget
 
 app = Flask(__name__)
 
+# Server-Timing (ssh/sql/python/serialize) e registro de consultas lentas
+profiling.init_app(app)
+
 # Configurar logging
 logging.basicConfig(
     level=getattr(logging, LOGGING_CONFIG["level"]),
@@ -26,20 +37,22 @@ def fetch_remote_log_tail(ip=None, user=None, password=None, remote_path=None, l
     remote_path = remote_path or SSH_CONFIG["log_path"]
     
     try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            ip, 
-            username=user, 
-            password=password, 
-            timeout=SSH_CONFIG["timeout"]
-        )
+        with profiling.phase('ssh'):
+            ssh = paramiko.SSHClient()
+            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh.connect(
+                ip, 
+                port=SSH_CONFIG.get("port", 22),
+                username=user, 
+                password=password, 
+                timeout=SSH_CONFIG["timeout"]
+            )
 
-        # Usar tail para pegar apenas as últimas linhas
-        command = f"tail -n {lines} {remote_path}"
-        stdin, stdout, stderr = ssh.exec_command(command)
-        content = stdout.read().decode("utf-8").splitlines()
-        ssh.close()
+            # Usar tail para pegar apenas as últimas linhas
+            command = f"tail -n {lines} {remote_path}"
+            stdin, stdout, stderr = ssh.exec_command(command)
+            content = stdout.read().decode("utf-8").splitlines()
+            ssh.close()
         
         logger.info(f"✅ Últimas {len(content)} linhas carregadas com sucesso")
         return content
@@ -55,22 +68,24 @@ def fetch_remote_log_by_date(ip=None, user=None, password=None, remote_path=None
     remote_path = remote_path or SSH_CONFIG["log_path"]
     
     try:
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            ip, 
-            username=user, 
-            password=password, 
-            timeout=SSH_CONFIG["timeout"]
-        )
+        with profiling.phase('ssh'):
+            ssh = paramiko.SSHClient()
+            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh.connect(
+                ip, 
+                port=SSH_CONFIG.get("port", 22),
+                username=user, 
+                password=password, 
+                timeout=SSH_CONFIG["timeout"]
+            )
 
-        # Buscar em TODO o arquivo quando há filtros
-        command = f"cat {remote_path}"
-        logger.info(f" Buscando em TODO o arquivo (filtros aplicados)")
+            # Buscar em TODO o arquivo quando há filtros
+            command = f"cat {remote_path}"
+            logger.info(f" Buscando em TODO o arquivo (filtros aplicados)")
         
-        stdin, stdout, stderr = ssh.exec_command(command)
-        content = stdout.read().decode("utf-8").splitlines()
-        ssh.close()
+            stdin, stdout, stderr = ssh.exec_command(command)
+            content = stdout.read().decode("utf-8").splitlines()
+            ssh.close()
         
         logger.info(f"✅ Logs carregados: {len(content)} linhas")
         return content
@@ -116,14 +131,7 @@ def parse_log_line(line):
                 if "blocked" in line.lower() or "blacklisted" in line.lower():
                     status = "blocked"
                 
-                return {
-                    "timestamp": timestamp,
-                    "type": query_type,
-                    "domain": domain,
-                    "ip": ip,
-                    "status": status,
-                    "raw_line": line
-                }
+                return LogRecord(timestamp, query_type, domain, ip, status, raw_line=line)
             elif "forwarded" in line:
                 # Para logs de forwarded
                 domain = match.group(2)
@@ -133,14 +141,7 @@ def parse_log_line(line):
                 if info == "127.0.0.1#53" or info == "127.0.0.1" or info == "localhost":
                     return None
                 
-                return {
-                    "timestamp": timestamp,
-                    "type": "FORWARD",
-                    "domain": domain,
-                    "ip": info,
-                    "status": "allowed",
-                    "raw_line": line
-                }
+                return LogRecord(timestamp, "FORWARD", domain, info, "allowed", raw_line=line)
             elif "cached-stale" in line:
                 # Para logs de cached-stale (consultas antigas em cache)
                 domain = match.group(2)
@@ -150,14 +151,7 @@ def parse_log_line(line):
                 if info == "127.0.0.1#53" or info == "127.0.0.1" or info == "localhost":
                     return None
                 
-                return {
-                    "timestamp": timestamp,
-                    "type": "CACHE_STALE",
-                    "domain": domain,
-                    "ip": info,
-                    "status": "allowed",
-                    "raw_line": line
-                }
+                return LogRecord(timestamp, "CACHE_STALE", domain, info, "allowed", raw_line=line)
     
     return None
 
@@ -207,12 +201,20 @@ def parse_timestamp(timestamp_str):
         logger.warning(f"⚠️ Erro ao parsear timestamp '{timestamp_str}': {e}")
         return None
 
-def filter_logs(logs, query="", type_filter="", status_filter="", start_date=None, end_date=None):
-    """Filtra logs baseado nos critérios fornecidos - versão que filtra consultas internas e cache"""
+# Consultas internas do Pi-hole e registros de cache não aparecem na listagem
+INTERNAL_CLIENTS = frozenset(["127.0.0.1#53", "127.0.0.1", "localhost", "N/A"])
+CACHE_TYPES = frozenset(["CACHE", "CACHE_STALE"])
+
+def filter_logs(logs, query="", type_filter="", status_filter="", start_date=None, end_date=None, summary=True):
+    """Filtra logs baseado nos critérios fornecidos - versão que filtra consultas internas e cache
+
+    `summary=False` omite os resumos em INFO (usado a cada lote das respostas em fluxo).
+    """
     filtered_logs = []
     
-    logger.info(f"🔍 Aplicando filtros: query='{query}', type='{type_filter}', status='{status_filter}'")
-    logger.info(f"🔍 Filtros de data: start_date={start_date}, end_date={end_date}")
+    if summary:
+        logger.info(f"🔍 Aplicando filtros: query='{query}', type='{type_filter}', status='{status_filter}'")
+        logger.info(f"🔍 Filtros de data: start_date={start_date}, end_date={end_date}")
     
     # Contadores para debug
     total_logs = len(logs)
@@ -223,44 +225,38 @@ def filter_logs(logs, query="", type_filter="", status_filter="", start_date=Non
     status_filtered = 0
     date_filtered = 0
     date_included = 0
+    query_lower = query.lower()
     
     for log in logs:
         # FILTRAR consultas internas do Pi-hole
-        if log.get("ip") in ["127.0.0.1#53", "127.0.0.1", "localhost", "N/A"]:
+        if log.ip in INTERNAL_CLIENTS:
             internal_filtered += 1
             continue
         
         # FILTRAR registros de cache
-        if log.get("type") in ["CACHE", "CACHE_STALE"]:
+        if log.type in CACHE_TYPES:
             cache_filtered += 1
             continue
         
         # Filtro de busca geral
         if query:
-            query_lower = query.lower()
-            log_values = [
-                str(log.get("domain", "")),
-                str(log.get("ip", "")),
-                str(log.get("type", "")),
-                str(log.get("status", ""))
-            ]
-            if not any(query_lower in value.lower() for value in log_values):
+            if not any(query_lower in value.lower() for value in (log.domain, log.ip, log.type, log.status)):
                 query_filtered += 1
                 continue
         
         # Filtro por tipo
-        if type_filter and log.get("type") != type_filter:
+        if type_filter and log.type != type_filter:
             type_filtered += 1
             continue
         
         # Filtro por status
-        if status_filter and log.get("status") != status_filter:
+        if status_filter and log.status != status_filter:
             status_filtered += 1
             continue
         
         # Filtro por data - MELHORADO
         if start_date or end_date:
-            log_timestamp = parse_timestamp(log.get("timestamp", ""))
+            log_timestamp = parse_timestamp(log.timestamp)
             if log_timestamp:
                 # Comparar timestamp completo (com hora)
                 if start_date and log_timestamp < start_date:
@@ -277,13 +273,16 @@ def filter_logs(logs, query="", type_filter="", status_filter="", start_date=Non
                 logger.debug(f"✅ Log {log_timestamp} dentro do período {start_date} - {end_date}")
             else:
                 # Se não conseguir parsear o timestamp, incluir para não perder logs
-                logger.debug(f"⚠️ Incluindo log sem timestamp parseável: {log.get('timestamp')}")
+                logger.debug(f"⚠️ Incluindo log sem timestamp parseável: {log.timestamp}")
         else:
             # Se não há filtros de data, incluir todos
-            logger.debug(f"✅ Sem filtros de data, incluindo log: {log.get('timestamp')}")
+            logger.debug(f"✅ Sem filtros de data, incluindo log: {log.timestamp}")
         
         filtered_logs.append(log)
     
+    if not summary:
+        return filtered_logs
+    
     logger.info(f"🔍 RESUMO DOS FILTROS:")
     logger.info(f"   - Total de logs: {total_logs}")
     logger.info(f"   - Consultas internas filtradas: {internal_filtered}")
@@ -297,97 +296,6 @@ def filter_logs(logs, query="", type_filter="", status_filter="", start_date=Non
     
     return filtered_logs
 
-def extract_base_domain(domain):
-    """Extrai o domínio base com agrupamento mais inteligente"""
-    if not domain or domain == "N/A":
-        return domain
-    
-    # Lista expandida de domínios conhecidos para agrupamento
-    known_domains = [
-        # Google/Alphabet
-        "google.com", "gstatic.com", "gvt1.com", "gvt2.com", "gvt3.com", "googleapis.com",
-        "googlevideo.com", "googleusercontent.com", "google-analytics.com",
-        
-        # Amazon
-        "amazon.com", "amazon.com.br", "amazonaws.com", "amazon-adsystem.com",
-        
-        # Facebook/Meta
-        "facebook.com", "fbcdn.net", "instagram.com", "messenger.com",
-        
-        # Microsoft
-        "microsoft.com", "microsoftonline.com", "office.com", "live.com",
-        "bing.com", "msn.com", "skype.com",
-        
-        # Apple
-        "apple.com", "icloud.com", "me.com", "mzstatic.com",
-        
-        # Netflix
-        "netflix.com", "nflxvideo.net", "nflximg.net",
-        
-        # WhatsApp
-        "whatsapp.net", "whatsapp.com",
-        
-        # Cloudflare
-        "cloudflare.com", "cloudflare.net",
-        
-        # Datadog
-        "datadoghq.com", "datadog.com",
-        
-        # Betha (sistema específico)
-        "betha.cloud",
-        
-        # Amurel
-        "amurel.org.br",
-        
-        # CDNs comuns
-        "cdn.jsdelivr.net", "cdnjs.cloudflare.com", "unpkg.com",
-        "jsdelivr.net", "bootstrapcdn.com",
-        
-        # Analytics e tracking
-        "doubleclick.net", "googlesyndication.com", "googleadservices.com",
-        "facebook.net", "fbsbx.com",
-        
-        # Streaming
-        "youtube.com", "ytimg.com", "googlevideo.com",
-        "twitch.tv", "ttvnw.net",
-        
-        # Redes sociais
-        "twitter.com", "t.co", "twimg.com",
-        "linkedin.com", "licdn.com",
-        "reddit.com", "redd.it",
-        
-        # E-commerce
-        "shopify.com", "shopifycdn.com",
-        "ebay.com", "ebaystatic.com",
-        
-        # Outros serviços populares
-        "github.com", "githubusercontent.com",
-        "stackoverflow.com", "stackexchange.com",
-        "wikipedia.org", "wikimedia.org",
-        "dropbox.com", "db.tt",
-        "slack.com", "slack-msgs.com"
-    ]
-    
-    # Verificar se o domínio termina com algum dos domínios conhecidos
-    for known_domain in known_domains:
-        if domain.endswith("." + known_domain) or domain == known_domain:
-            return known_domain
-    
-    # Para domínios .com.br, usar domínio de segundo nível
-    if domain.endswith(".com.br"):
-        parts = domain.split(".")
-        if len(parts) >= 3:
-            return f"{parts[-3]}.{parts[-2]}.{parts[-1]}"
-    
-    # Para outros domínios, tentar extrair domínio de segundo nível
-    parts = domain.split(".")
-    if len(parts) >= 2:
-        # Retornar domínio de segundo nível (ex: example.com de sub.example.com)
-        return f"{parts[-2]}.{parts[-1]}"
-    
-    # Se não conseguir, retornar o domínio original
-    return domain
-
 def group_logs(logs, group_by, sort_by="timestamp", sort_order="desc"):
     """Agrupa logs por critério especificado - versão SUPER melhorada"""
     if not group_by:
@@ -399,38 +307,39 @@ def group_logs(logs, group_by, sort_by="timestamp", sort_order="desc"):
         # Determinar a chave de agrupamento
         if group_by == "domain":
             # Usar domínio base para agrupamento
-            key = extract_base_domain(log.get("domain", "N/A"))
+            key = extract_base_domain(log.domain or "N/A")
         elif group_by == "ip":
-            key = log.get("ip", "N/A")
+            key = log.ip
         elif group_by == "type":
-            key = log.get("type", "N/A")
+            key = log.type
         elif group_by == "status":
-            key = log.get("status", "N/A")
+            key = log.status
         else:
             key = "N/A"
         
-        if key not in grouped:
-            # Criar entrada agrupada
+        group = grouped.get(key)
+        if group is None:
+            # Criar entrada agrupada (o primeiro registro representa o grupo)
             grouped[key] = {
-                "timestamp": log.get("timestamp"),
+                "timestamp": log.timestamp,
                 "domain": key,  # Usar o domínio base
-                "ip": log.get("ip"),
-                "status": log.get("status"),
+                "ip": log.ip,
+                "status": log.status,
                 "count": 1,
-                "types": set([log.get("type")]),  # Manter tipos únicos
-                "subdomains": set([log.get("domain")]),  # Manter subdomínios únicos
-                "raw_line": log.get("raw_line")
+                "types": {log.type},  # Manter tipos únicos
+                "subdomains": {log.domain},  # Manter subdomínios únicos
+                "first": log
             }
         else:
             # Incrementar contador
-            grouped[key]["count"] += 1
+            group["count"] += 1
             # Adicionar tipo se não existir
-            grouped[key]["types"].add(log.get("type"))
+            group["types"].add(log.type)
             # Adicionar subdomínio se não existir
-            grouped[key]["subdomains"].add(log.get("domain"))
+            group["subdomains"].add(log.domain)
             # Manter o timestamp mais recente
-            if log.get("timestamp") > grouped[key]["timestamp"]:
-                grouped[key]["timestamp"] = log.get("timestamp")
+            if log.timestamp > group["timestamp"]:
+                group["timestamp"] = log.timestamp
     
     # Converter para lista e processar tipos e subdomínios
     result = []
@@ -453,7 +362,7 @@ def group_logs(logs, group_by, sort_by="timestamp", sort_order="desc"):
             "count": data["count"],
             "types": types_str,
             "subdomains": subdomains_str,
-            "raw_line": data["raw_line"]
+            "raw_line": data["first"].raw_line
         })
     
     # Ordenar
@@ -470,189 +379,288 @@ def group_logs(logs, group_by, sort_by="timestamp", sort_order="desc"):
     
     return result
 
-def fetch_ftl_database(query="", start_date=None, end_date=None, limit=5000):
-    """Busca dados do banco SQLite do Pi-hole FTL"""
+def copy_ftl_database():
+    """Copia o pihole-FTL.db do servidor para um arquivo temporário local e retorna o caminho"""
+    temp_db_path = None
     try:
-        logger.info(f"🔍 Iniciando busca no banco FTL: query='{query}', start_date={start_date}, end_date={end_date}")
-        
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            SSH_CONFIG["host"], 
-            username=SSH_CONFIG["username"], 
-            password=SSH_CONFIG["password"], 
-            timeout=SSH_CONFIG["timeout"]
-        )
+        with profiling.phase('ssh'):
+            ssh = paramiko.SSHClient()
+            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh.connect(
+                SSH_CONFIG["host"], 
+                port=SSH_CONFIG.get("port", 22),
+                username=SSH_CONFIG["username"], 
+                password=SSH_CONFIG["password"], 
+                timeout=SSH_CONFIG["timeout"]
+            )
 
-        # Criar arquivo temporário local para receber o banco
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as temp_db:
-            temp_db_path = temp_db.name
+            # Criar arquivo temporário local para receber o banco
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as temp_db:
+                temp_db_path = temp_db.name
 
-        logger.info(f"📁 Copiando banco de dados para: {temp_db_path}")
+            logger.info(f"📁 Copiando banco de dados para: {temp_db_path}")
         
-        # Tentar copiar o banco de forma segura
-        try:
-            # Primeiro, tentar fazer uma cópia local no servidor
-            remote_copy_cmd = f"cp {SSH_CONFIG['db_path']} /tmp/pihole-ftl-copy.db"
-            stdin, stdout, stderr = ssh.exec_command(remote_copy_cmd)
-            exit_status = stdout.channel.recv_exit_status()
+            # Tentar copiar o banco de forma segura
+            try:
+                # Primeiro, tentar fazer uma cópia local no servidor (nome único por
+                # requisição: buscas simultâneas não podem apagar a cópia uma da outra)
+                remote_copy_path = f"/tmp/pihole-ftl-copy-{os.getpid()}-{threading.get_ident()}.db"
+                remote_copy_cmd = f"cp {SSH_CONFIG['db_path']} {remote_copy_path}"
+                stdin, stdout, stderr = ssh.exec_command(remote_copy_cmd)
+                exit_status = stdout.channel.recv_exit_status()
             
-            if exit_status == 0:
-                # Se a cópia local foi bem-sucedida, copiar o arquivo temporário
-                sftp = ssh.open_sftp()
-                sftp.get("/tmp/pihole-ftl-copy.db", temp_db_path)
-                sftp.close()
+                if exit_status == 0:
+                    # Se a cópia local foi bem-sucedida, copiar o arquivo temporário
+                    sftp = ssh.open_sftp()
+                    sftp.get(remote_copy_path, temp_db_path)
+                    sftp.close()
                 
-                # Limpar o arquivo temporário no servidor
-                ssh.exec_command("rm -f /tmp/pihole-ftl-copy.db")
-                logger.info(f"✅ Banco copiado com sucesso (método seguro)")
-            else:
-                # Fallback: tentar copiar diretamente
-                logger.warning("⚠️ Cópia local falhou, tentando cópia direta...")
-                sftp = ssh.open_sftp()
-                sftp.get(SSH_CONFIG["db_path"], temp_db_path)
-                sftp.close()
-                logger.info(f"✅ Banco copiado com sucesso (método direto)")
+                    # Limpar o arquivo temporário no servidor
+                    ssh.exec_command(f"rm -f {remote_copy_path}")
+                    logger.info(f"✅ Banco copiado com sucesso (método seguro)")
+                else:
+                    # Fallback: tentar copiar diretamente
+                    logger.warning("⚠️ Cópia local falhou, tentando cópia direta...")
+                    sftp = ssh.open_sftp()
+                    sftp.get(SSH_CONFIG["db_path"], temp_db_path)
+                    sftp.close()
+                    logger.info(f"✅ Banco copiado com sucesso (método direto)")
                 
-        except Exception as copy_error:
-            logger.error(f"❌ Erro na cópia do banco: {copy_error}")
-            ssh.close()
-            raise
+            except Exception as copy_error:
+                logger.error(f"❌ Erro na cópia do banco: {copy_error}")
+                ssh.close()
+                raise
         
-        ssh.close()
+            ssh.close()
 
         # Verificar se o arquivo foi copiado corretamente
         if not os.path.exists(temp_db_path) or os.path.getsize(temp_db_path) == 0:
             raise Exception("Arquivo do banco não foi copiado corretamente")
+        return temp_db_path
 
-        # Conectar ao banco local
-        conn = sqlite3.connect(temp_db_path)
-        cursor = conn.cursor()
+    except Exception:
+        # Limpar arquivo temporário em caso de erro
+        remove_temp_file(temp_db_path)
+        raise
 
-        # Processar query para busca combinada
-        query_parts = query.strip().split() if query else []
-        ip_query = None
-        domain_query = None
-        
-        # Identificar IP e domínio na query
-        for part in query_parts:
-            if '.' in part and any(c.isdigit() for c in part):
-                # Provavelmente é um IP
-                ip_query = part
-            elif '.' in part and not any(c.isdigit() for c in part):
-                # Provavelmente é um domínio
-                domain_query = part
-            elif ':' in part:
-                # Provavelmente é um IP com porta
-                ip_query = part.split(':')[0]
-        
-        # Construir query SQL
-        sql = """
-        SELECT 
-            timestamp,
-            type,
-            domain,
-            client,
-            status,
-            reply_type
-        FROM queries 
-        WHERE 1=1
-        """
-        params = []
+def remove_temp_file(path):
+    if not path:
+        return
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
 
-        # Adicionar filtros baseados no tipo de busca
-        if ip_query and domain_query:
-            # Busca combinada: IP E domínio
-            sql += " AND client = ? AND domain LIKE ?"
-            params.extend([ip_query, f"%{domain_query}%"])
-            logger.info(f"🔍 Busca combinada: IP='{ip_query}' E domínio='{domain_query}'")
-        elif ip_query:
-            # Busca apenas por IP (busca exata para IPs)
-            if '.' in ip_query and any(c.isdigit() for c in ip_query):
-                # É um IP, usar busca exata
-                sql += " AND client = ?"
-                params.append(ip_query)
-                logger.info(f"🔍 Busca por IP exato: '{ip_query}'")
-            else:
-                # Não é um IP, usar LIKE
-                sql += " AND client LIKE ?"
-                params.append(f"%{ip_query}%")
-                logger.info(f"🔍 Busca por cliente: '{ip_query}'")
-        elif domain_query:
-            # Busca apenas por domínio
-            sql += " AND domain LIKE ?"
-            params.append(f"%{domain_query}%")
-            logger.info(f"🔍 Busca por domínio: '{domain_query}'")
-        elif query:
-            # Busca geral (fallback)
-            sql += " AND (domain LIKE ? OR client LIKE ?)"
-            params.extend([f"%{query}%", f"%{query}%"])
-            logger.info(f"🔍 Busca geral: '{query}'")
+def build_ftl_query(query="", start_date=None, end_date=None, limit=5000):
+    """SQL e parâmetros da busca no banco FTL (IP e/ou domínio na query, mais recentes primeiro)"""
+    # Processar query para busca combinada
+    query_parts = query.strip().split() if query else []
+    ip_query = None
+    domain_query = None
+    
+    # Identificar IP e domínio na query
+    for part in query_parts:
+        if '.' in part and any(c.isdigit() for c in part):
+            # Provavelmente é um IP
+            ip_query = part
+        elif '.' in part and not any(c.isdigit() for c in part):
+            # Provavelmente é um domínio
+            domain_query = part
+        elif ':' in part:
+            # Provavelmente é um IP com porta
+            ip_query = part.split(':')[0]
+    
+    # Construir query SQL
+    sql = """
+    SELECT 
+        timestamp,
+        type,
+        domain,
+        client,
+        status,
+        reply_type
+    FROM queries 
+    WHERE 1=1
+    """
+    params = []
 
-        if start_date:
-            sql += " AND timestamp >= ?"
-            params.append(int(start_date.timestamp()))
+    # Adicionar filtros baseados no tipo de busca
+    if ip_query and domain_query:
+        # Busca combinada: IP E domínio
+        sql += " AND client = ? AND domain LIKE ?"
+        params.extend([ip_query, f"%{domain_query}%"])
+        logger.info(f"🔍 Busca combinada: IP='{ip_query}' E domínio='{domain_query}'")
+    elif ip_query:
+        # Busca apenas por IP (busca exata para IPs)
+        if '.' in ip_query and any(c.isdigit() for c in ip_query):
+            # É um IP, usar busca exata
+            sql += " AND client = ?"
+            params.append(ip_query)
+            logger.info(f"🔍 Busca por IP exato: '{ip_query}'")
+        else:
+            # Não é um IP, usar LIKE
+            sql += " AND client LIKE ?"
+            params.append(f"%{ip_query}%")
+            logger.info(f"🔍 Busca por cliente: '{ip_query}'")
+    elif domain_query:
+        # Busca apenas por domínio
+        sql += " AND domain LIKE ?"
+        params.append(f"%{domain_query}%")
+        logger.info(f"🔍 Busca por domínio: '{domain_query}'")
+    elif query:
+        # Busca geral (fallback)
+        sql += " AND (domain LIKE ? OR client LIKE ?)"
+        params.extend([f"%{query}%", f"%{query}%"])
+        logger.info(f"🔍 Busca geral: '{query}'")
 
-        if end_date:
-            sql += " AND timestamp <= ?"
-            params.append(int(end_date.timestamp()))
+    if start_date:
+        sql += " AND timestamp >= ?"
+        params.append(int(start_date.timestamp()))
 
-        sql += " ORDER BY timestamp DESC LIMIT ?"
-        params.append(limit)
+    if end_date:
+        sql += " AND timestamp <= ?"
+        params.append(int(end_date.timestamp()))
 
-        logger.info(f"🔍 Executando SQL: {sql}")
-        logger.info(f"🔍 Parâmetros: {params}")
+    sql += " ORDER BY timestamp DESC LIMIT ?"
+    params.append(limit)
 
-        cursor.execute(sql, params)
-        rows = cursor.fetchall()
-        conn.close()
+    logger.info(f"🔍 Executando SQL: {sql}")
+    logger.info(f"🔍 Parâmetros: {params}")
+    return sql, params
 
-        # Limpar arquivo temporário
+def ftl_rows_to_records(rows, format_timestamp):
+    """Converte linhas do banco em registros compactos (dicionários só na resposta)"""
+    logs = []
+    for row in rows:
         try:
-            os.unlink(temp_db_path)
-        except:
-            pass
-
-        # Converter para formato de log
-        logs = []
-        for row in rows:
+            timestamp, type_, domain, client, status, reply_type = row
+            
+            # Converter timestamp para texto
             try:
-                timestamp, type_, domain, client, status, reply_type = row
-                
-                # Converter timestamp para datetime
-                try:
-                    dt = datetime.fromtimestamp(timestamp)
-                    timestamp_str = dt.strftime("%d/%m/%Y %H:%M:%S")
-                except:
-                    timestamp_str = str(timestamp)
-                
-                log_entry = {
-                    'timestamp': timestamp_str,
-                    'type': str(type_) if type_ else '',
-                    'domain': str(domain) if domain else '',
-                    'ip': str(client) if client else '',
-                    'status': str(status) if status else '',
-                    'reply_type': str(reply_type) if reply_type else ''
-                }
-                logs.append(log_entry)
-                
-            except Exception as row_error:
-                logger.warning(f"⚠️ Erro ao processar linha: {row_error}")
-                continue
+                timestamp_str = format_timestamp(timestamp)
+            except (TypeError, ValueError, OverflowError, OSError):
+                timestamp_str = str(timestamp)
+            
+            logs.append(LogRecord(timestamp_str, text(type_), text(domain), text(client),
+                                  text(status), text(reply_type)))
+            
+        except Exception as row_error:
+            logger.warning(f"⚠️ Erro ao processar linha: {row_error}")
+            continue
+    return logs
+
+def fetch_ftl_database(query="", start_date=None, end_date=None, limit=5000, budget=None):
+    """Busca dados do banco SQLite do Pi-hole FTL
+
+    Com um QueryBudget, a consulta para quando o orçamento acaba e devolve
+    as linhas lidas até ali (budget.truncated indica o corte).
+    """
+    try:
+        logger.info(f"🔍 Iniciando busca no banco FTL: query='{query}', start_date={start_date}, end_date={end_date}")
+        
+        temp_db_path = copy_ftl_database()
+        try:
+            # Conectar ao banco local
+            conn = sqlite3.connect(temp_db_path, factory=profiling.ProfiledConnection)
+            sql, params = build_ftl_query(query, start_date, end_date, limit)
+            budget = budget or query_budget.QueryBudget()
+            cursor = conn.cursor()
+            with budget.bind(conn):
+                rows = budget.fetch(cursor) if budget.execute(cursor, sql, params) else []
+            conn.close()
+        finally:
+            # Limpar arquivo temporário
+            remove_temp_file(temp_db_path)
+
+        logs = ftl_rows_to_records(rows, TimestampFormatter("%d/%m/%Y %H:%M:%S"))
 
         logger.info(f"✅ {len(logs)} registros processados com sucesso")
         return logs
 
     except Exception as e:
         logger.error(f"❌ Erro ao buscar no banco FTL: {e}")
-        # Limpar arquivo temporário em caso de erro
-        try:
-            if 'temp_db_path' in locals():
-                os.unlink(temp_db_path)
-        except:
-            pass
         raise
 
+def stream_ftl_logs(query, start_date, end_date, limit, type_filter="", status_filter="", budget=None):
+    """Resposta em fluxo da busca no banco FTL copiado
+
+    A cópia via SSH e a consulta acontecem antes da resposta (erros ainda
+    viram 500); depois o cursor é lido em lotes, filtrado com filter_logs e
+    enviado aos pedaços, com total_found/limited no final do objeto. A cópia
+    local é apagada quando o fluxo termina.
+    """
+    logger.info(f"🔍 Busca em fluxo no banco FTL: query='{query}', start_date={start_date}, end_date={end_date}")
+    temp_db_path = copy_ftl_database()
+    try:
+        conn = sqlite3.connect(temp_db_path, factory=profiling.ProfiledConnection)
+        budget = (budget or query_budget.QueryBudget()).attach(conn)
+        sql, params = build_ftl_query(query, start_date, end_date, limit)
+        cursor = conn.cursor()
+        budget.execute(cursor, sql, params)
+    except Exception:
+        remove_temp_file(temp_db_path)
+        raise
+    
+    counts = {"fetched": 0, "returned": 0}
+    format_timestamp = TimestampFormatter("%d/%m/%Y %H:%M:%S")
+    
+    def batches():
+        try:
+            for rows in budget.batches(cursor, fast_json.STREAM_BATCH_ROWS):
+                counts["fetched"] += len(rows)
+                logs = filter_logs(ftl_rows_to_records(rows, format_timestamp), query, type_filter,
+                                   status_filter, start_date, end_date, summary=False)
+                counts["returned"] += len(logs)
+                yield logs_to_json(logs)
+        finally:
+            conn.close()
+            remove_temp_file(temp_db_path)
+            logger.info(f"✅ Logs enviados em fluxo: {counts['returned']} de {counts['fetched']} lidos")
+    
+    def trailer(error):
+        data = {
+            "total_found": counts["returned"],
+            "total_returned": counts["returned"],
+            "limited": counts["fetched"] >= limit
+        }
+        data.update(budget.info())
+        if error:
+            data["error"] = str(error)
+        return data
+    
+    return fast_json.stream_response(fast_json.iter_json(batches(), trailer))
+
+def logs_to_json(logs):
+    """Converte os registros em dicionários na resposta (mesmas chaves de antes)
+
+    Linhas do pihole.log levam `raw_line`; linhas do banco FTL, `reply_type`.
+    Grupos de group_logs já são dicionários.
+    """
+    result = []
+    for log in logs:
+        if not isinstance(log, LogRecord):
+            result.append(log)
+        elif log.reply is None:
+            result.append(log.to_dict("raw_line"))
+        else:
+            result.append(log.to_dict(reply_type=log.reply))
+    return result
+
+# Colunas comuns a todas as linhas no formato colunar
+LOG_COLUMNS = ("timestamp", "type", "domain", "ip", "status")
+
+def logs_to_columnar(logs):
+    """Mesmos campos de logs_to_json, em colunas (fast_json.columnar)"""
+    if not logs:
+        columns = LOG_COLUMNS
+    elif not isinstance(logs[0], LogRecord):
+        columns = tuple(logs[0])
+    elif logs[0].reply is None:
+        columns = LOG_COLUMNS + ("raw_line",)
+    else:
+        columns = LOG_COLUMNS + ("reply_type",)
+    return fast_json.columnar(logs, columns)
+
 @app.route("/")
 def index():
     return render_template("index.html")
@@ -719,10 +727,18 @@ def get_logs():
         logger.info(f"   - start_date: {bool(start_date)}")
         logger.info(f"   - end_date: {bool(end_date)}")
         
+        # Limites de tempo e linhas da busca no banco (QUERY_BUDGET_CONFIG["endpoints"]["ftl_logs"])
+        budget = query_budget.QueryBudget.for_endpoint("ftl_logs", request.environ)
+        
+        # ?stream=1 em buscas no banco sem agrupamento: registros enviados conforme são lidos
+        if has_filters and not group_by and fast_json.wants_stream(request.args):
+            return stream_ftl_logs(query, start_date, end_date, FILTER_CONFIG["max_results"],
+                                   type_filter, status_filter, budget)
+        
         # Escolher método de busca
         if has_filters:
             # Usar banco SQLite para busca com filtros (mais histórico)
-            logs = fetch_ftl_database(query, start_date, end_date, FILTER_CONFIG["max_results"])
+            logs = fetch_ftl_database(query, start_date, end_date, FILTER_CONFIG["max_results"], budget)
             logger.info(f"🔍 Filtros aplicados, buscando no banco FTL")
         else:
             # Quando não há filtros, buscar últimas 100 linhas do log por padrão
@@ -740,14 +756,14 @@ def get_logs():
         
         # DEBUG: Mostrar alguns exemplos de timestamps
         if logs:
-            sample_timestamps = [log.get("timestamp", "") for log in logs[:5]]
+            sample_timestamps = [log.timestamp for log in logs[:5]]
             logger.info(f"🔍 Exemplos de timestamps: {sample_timestamps}")
             
             # Mostrar alguns exemplos de logs com IP específico se houver query
             if query:
-                matching_logs = [log for log in logs if query in str(log.get("ip", "")).lower()]
+                matching_logs = [log for log in logs if query in log.ip.lower()]
                 if matching_logs:
-                    logger.info(f"🔍 Exemplos de logs com IP '{query}': {[log.get('timestamp') for log in matching_logs[:3]]}")
+                    logger.info(f"🔍 Exemplos de logs com IP '{query}': {[log.timestamp for log in matching_logs[:3]]}")
                 else:
                     logger.info(f"🔍 Nenhum log encontrado com IP '{query}'")
         
@@ -762,7 +778,7 @@ def get_logs():
         else:
             final_logs = filtered_logs
             # Ordenar por timestamp (mais recentes primeiro)
-            final_logs.sort(key=lambda x: x["timestamp"], reverse=True)
+            final_logs.sort(key=attrgetter("timestamp"), reverse=True)
         
         # Limitar resultados se necessário
         total_found = len(final_logs)
@@ -774,13 +790,18 @@ def get_logs():
         
         # Retornar também informações sobre o total encontrado
         response_data = {
-            "logs": final_logs,
             "total_found": total_found,
             "total_returned": len(final_logs),
             "limited": total_found > len(final_logs)
         }
+        response_data.update(budget.info())
+        if fast_json.wants_columnar(request.args):
+            response_data["format"] = "columnar"
+            response_data["logs"] = logs_to_columnar(final_logs)
+        else:
+            response_data["logs"] = logs_to_json(final_logs)
         
-        return jsonify(response_data)
+        return fast_json.response(response_data)
 
     except Exception as e:
         logger.error(f"❌ ERRO AO PROCESSAR LOGS: {e}")
@@ -797,6 +818,7 @@ def status():
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             ssh.connect(
                 SSH_CONFIG["host"], 
+                port=SSH_CONFIG.get("port", 22),
                 username=SSH_CONFIG["username"], 
                 password=SSH_CONFIG["password"], 
                 timeout=SSH_CONFIG["timeout"]
@@ -828,6 +850,7 @@ def status():
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             ssh.connect(
                 SSH_CONFIG["host"], 
+                port=SSH_CONFIG.get("port", 22),
                 username=SSH_CONFIG["username"], 
                 password=SSH_CONFIG["password"], 
                 timeout=SSH_CONFIG["timeout"]
@@ -888,9 +911,9 @@ def dashboard_stats():
         
         # Calcular estatísticas reais
         total_queries = len(logs_data)
-        blocked_queries = len([log for log in logs_data if log.get('status') == 'blocked' or 'blocked' in str(log.get('status', '')).lower()])
-        unique_clients = len(set(log.get('ip', '') for log in logs_data if log.get('ip')))
-        unique_domains = len(set(log.get('domain', '') for log in logs_data if log.get('domain')))
+        blocked_queries = sum(1 for log in logs_data if 'blocked' in log.status.lower())
+        unique_clients = len({log.ip for log in logs_data if log.ip})
+        unique_domains = len({log.domain for log in logs_data if log.domain})
         
         return jsonify({
             'success': True,
@@ -924,7 +947,7 @@ def dashboard_top_domains():
         # Agrupar por domínio
         domain_counts = {}
         for log in logs_data:
-            domain = log.get('domain', '')
+            domain = log.domain
             if domain:
                 domain_counts[domain] = domain_counts.get(domain, 0) + 1
         
@@ -953,41 +976,34 @@ def dashboard_top_domains():
 def dashboard_hourly_activity():
     """Retorna atividade por hora das últimas 24 horas"""
     try:
-        # Buscar dados reais do banco
-        logs_data = fetch_ftl_database(limit=100000)
-        
-        if not logs_data:
-            return jsonify({
-                'success': False,
-                'error': 'Não foi possível acessar o banco de dados'
-            })
-        
-        # Agrupar por hora
-        hourly_data = {}
-        total_queries = 0
+        # Horas reais (epoch do FTL / 3600), não a hora do dia somada entre dias
+        current_hour = int(time.time()) // 3600 * 3600
+        since = current_hour - 23 * 3600
         
-        for log in logs_data:
-            try:
-                # Converter timestamp para hora
-                timestamp = log.get('timestamp', '')
-                if timestamp:
-                    # Assumir formato "dd/mm/yyyy hh:mm:ss"
-                    if ' ' in timestamp:
-                        time_part = timestamp.split(' ')[1]
-                        hour = int(time_part.split(':')[0])
-                        hourly_data[hour] = hourly_data.get(hour, 0) + 1
-                        total_queries += 1
-            except:
-                continue
-        
-        # Preencher horas sem dados
+        temp_db_path = copy_ftl_database()
+        try:
+            conn = sqlite3.connect(temp_db_path, factory=profiling.ProfiledConnection)
+            rows = conn.execute("""
+                SELECT timestamp / 3600 * 3600 AS hour_start, COUNT(*)
+                FROM queries
+                WHERE timestamp >= ?
+                GROUP BY hour_start
+            """, (since,)).fetchall()
+            conn.close()
+        finally:
+            remove_temp_file(temp_db_path)
+        
+        hourly_data = dict(rows)
+        total_queries = sum(hourly_data.values())
+        
+        # Uma entrada por hora, da mais antiga à atual (horas sem dados valem 0)
         hourly_activity = []
-        for hour in range(24):
-            count = hourly_data.get(hour, 0)
+        for hour_start in range(since, current_hour + 3600, 3600):
+            count = hourly_data.get(hour_start, 0)
             percentage = (count / total_queries * 100) if total_queries > 0 else 0
             
             hourly_activity.append({
-                'hour': hour,
+                'hour': time.localtime(hour_start).tm_hour,
                 'count': count,
                 'percentage': round(percentage, 1)
             })
@@ -1019,10 +1035,10 @@ def dashboard_recent_activity():
         recent_activity = []
         for log in logs_data:
             recent_activity.append({
-                'time': log.get('timestamp', '').split(' ')[1] if ' ' in log.get('timestamp', '') else log.get('timestamp', ''),
-                'domain': log.get('domain', ''),
-                'ip': log.get('ip', ''),
-                'status': 'blocked' if 'blocked' in str(log.get('status', '')).lower() else 'permitted'
+                'time': log.timestamp.split(' ')[1] if ' ' in log.timestamp else log.timestamp,
+                'domain': log.domain,
+                'ip': log.ip,
+                'status': 'blocked' if 'blocked' in log.status.lower() else 'permitted'
             })
         
         return jsonify({
@@ -4,151 +4,258 @@ Pi-hole Log Viewer com Banco Local
 Versão otimizada que usa banco SQLite próprio para melhor performance
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 import sqlite3
 import os
 import json
-import requests
 import re
 from datetime import datetime, timedelta
 import subprocess
-import paramiko
-from config import FLASK_CONFIG, SSH_CONFIG
+import threading
+import logging
+import fcntl
+from contextlib import contextmanager
+from config import FLASK_CONFIG
+from alert_engine import AlertEngine, _setting, describe_stored_alert
+from anomaly_detector import StreamingDetector, MinuteBatch
+from telegram_queue import TelegramNotifier, telegram_config
+from settings_service import SettingsService
+from hot_window import HotWindow
+from shared_cache import SharedCache
+import partition_store
+import aggregates
+import log_export
+import reports
+import alert_store
+import ingest
+import metrics
+import profiling
+import fast_json
+import timeseries
+import query_budget
+import backends
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# Latência de todas as rotas em /metrics; Server-Timing e ?profile=1 por requisição
+metrics.init_app(app)
+profiling.init_app(app)
+
 # Configurações
 ALERT_SETTINGS_FILE = 'alert_settings.json'
 DATA_RETENTION_DAYS = 90  # Padrão: 90 dias
 
+def init_local_db():
+    """Banco local particionado por dia (migra a tabela única antiga na primeira execução)"""
+    conn = partition_store.connect()
+    try:
+        partition_store.init_storage(conn)
+        aggregates.init_aggregates(conn)
+    finally:
+        conn.close()
+
+init_local_db()
+
+# Últimas horas em arrays NumPy: dashboard do dia e alertas de pico sem ir ao SQLite
+hot_window = HotWindow.from_config()
+
+def load_hot_window():
+    """Carrega a janela quente a partir do banco local"""
+    if not hot_window.enabled:
+        return
+    conn = partition_store.connect()
+    try:
+        started = datetime.now()
+        count = hot_window.load(conn)
+        elapsed = (datetime.now() - started).total_seconds()
+        print(f"🔥 Janela quente: {count} registros das últimas {hot_window.hours}h carregados em {elapsed:.1f}s")
+    except Exception as e:
+        print(f"Erro ao carregar a janela quente: {e}")
+    finally:
+        conn.close()
+
+load_hot_window()
+
+# Resultados do dashboard compartilhados entre os workers do serve.py (invalidados a cada importação)
+dashboard_cache = SharedCache.for_app(f"local-{FLASK_CONFIG.get('port', 5000)}")
+# Entradas de uma execução anterior (outro banco, outra versão) não valem; com
+# o serve.py isto roda uma vez, no mestre
+dashboard_cache.bump()
+# Início da importação em andamento, visível a todos os workers (None quando parada)
+dashboard_cache.set_meta('update_started_at', None)
+# /metrics soma os contadores de todos os workers, publicados neste mesmo cache
+metrics.share_across_processes(dashboard_cache)
+
+# Geração dos dados que a janela quente deste processo já reflete
+hot_window_generation = dashboard_cache.generation()
+_hot_window_reload = threading.Lock()
+
+def hot_window_in_sync():
+    """False enquanto a janela deste processo não tem a última importação
+
+    Com vários workers, a importação roda em um só deles; os outros percebem
+    a nova geração e recarregam a janela em segundo plano (até lá, o SQLite).
+    """
+    current = dashboard_cache.generation()
+    if current == hot_window_generation:
+        return True
+    if _hot_window_reload.acquire(blocking=False):
+        threading.Thread(target=reload_hot_window, args=(current,), daemon=True).start()
+    return False
+
+def reload_hot_window(generation):
+    global hot_window_generation
+    try:
+        load_hot_window()
+        hot_window_generation = generation
+    finally:
+        _hot_window_reload.release()
+
+def hot_window_covers(start_day):
+    """True se o período que começa em `start_day` pode ser respondido pela janela quente"""
+    if not hot_window.enabled:
+        return False
+    covered = hot_window_in_sync() and hot_window.covers(start_day)
+    metrics.cache_hit('hot_window', covered)
+    return covered
+
+# Leituras encaminhadas ao backend mais rápido (banco local, FTL direto ou SSH; BACKENDS_CONFIG)
+backend_router = backends.Router.from_config()
+
+# Detector incremental alimentado a cada importação (também cria a tabela de alertas)
+detector = StreamingDetector('pihole_logs.db')
+
+# Configurações em memória, relidas apenas quando o arquivo muda
+settings_service = SettingsService(ALERT_SETTINGS_FILE)
+settings_service.start_watcher()
+
 def load_alert_settings():
-    """Carregar configurações de alerta"""
-    if os.path.exists(ALERT_SETTINGS_FILE):
-        with open(ALERT_SETTINGS_FILE, 'r') as f:
-            settings = json.load(f)
-            # Adicionar configuração de retenção se não existir
-            if 'data_retention_days' not in settings:
-                settings['data_retention_days'] = DATA_RETENTION_DAYS
-            return settings
-    return {
-        'alerts_enabled': True,
-        'ip_spike_threshold': 3.0,
-        'domain_spike_threshold': 5.0,
-        'network_spike_threshold': 2.5,
-        'analysis_period_hours': 2,
-        'telegram_enabled': False,
-        'telegram_chat_id': '',
-        'telegram_bot_token': '',
-        'data_retention_days': DATA_RETENTION_DAYS,
-        'pdf_title': 'Relatório de Logs do Pi-hole',
-        'pdf_author': 'Pi-hole Log Viewer',
-        'pdf_subject': 'Relatório de Logs'
-    }
+    """Carregar configurações de alerta (do cache em memória)"""
+    return settings_service.get().to_dict()
 
 def save_alert_settings(settings):
-    """Salvar configurações de alerta"""
-    with open(ALERT_SETTINGS_FILE, 'w') as f:
-        json.dump(settings, f, indent=2)
+    """Salvar configurações de alerta (gravação atômica)"""
+    settings_service.save(settings)
 
-def send_telegram_notification(message):
-    """Enviar notificação via Telegram"""
-    settings = load_alert_settings()
+# Fila de notificações do Telegram (entrega em segundo plano)
+notifier = TelegramNotifier(lambda: load_alert_settings(), 'pihole_logs.db')
+notifier.start()
+
+def send_telegram_notification(message, on_sent=None):
+    """Agendar notificação via Telegram (não bloqueia a requisição)"""
+    enabled, chat_id, bot_token = telegram_config(load_alert_settings())
     
-    if not settings.get('telegramEnabled'):
+    if not enabled or not chat_id or not bot_token:
         return False
     
-    chat_id = settings.get('telegramChatId')
-    bot_token = settings.get('telegramBotToken')
-    
-    if not chat_id or not bot_token:
-        return False
+    notifier.enqueue(message, on_sent)
+    return True
+
+def persist_alerts(alerts, settings):
+    """Grava os alertas avaliados na tabela `alerts` e notifica apenas os novos"""
+    now = datetime.now()
+    analysis_hours = max(1, int(_setting(settings, 'analysis_period_hours', 'analysisPeriodHours', 2)))
+    window_start = alert_store.window_start_for(now, analysis_hours * 60)
+    new_alerts = []
     
+    conn = sqlite3.connect('pihole_logs.db')
     try:
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        data = {
-            'chat_id': chat_id,
-            'text': f"🚨 **Pi-hole Alert**\n\n{message}",
-            'parse_mode': 'Markdown'
-        }
-        
-        response = requests.post(url, data=data, timeout=10)
-        response_data = response.json()
+        alert_store.auto_resolve(conn, now=now)
         
-        if response.status_code == 200 and response_data.get('ok'):
-            return True
-        else:
-            error_msg = response_data.get('description', 'Erro desconhecido')
-            print(f"Erro Telegram API: {error_msg}")
-            return False
-    except Exception as e:
-        print(f"Erro ao enviar notificação Telegram: {e}")
-        return False
+        for alert in alerts:
+            alert_id, created = alert_store.upsert_alert(
+                conn, alert['alert_type'], alert['target'], alert['current_count'],
+                alert['average_count'], alert['threshold'], alert['severity_level'],
+                alert['message'], window_start, now)
+            alert['id'] = alert_id
+            alert['is_new'] = created
+            if created:
+                new_alerts.append(alert)
+        
+    finally:
+        conn.close()
+    
+    # Notificar somente alertas recém-abertos (não a cada verificação)
+    for alert in new_alerts:
+        send_telegram_notification(alert['message'], lambda alert_id=alert['id']: mark_alert_notified(alert_id))
+
+def mark_alert_notified(alert_id):
+    """Callback da fila do Telegram após a entrega de um alerta"""
+    conn = sqlite3.connect('pihole_logs.db')
+    try:
+        alert_store.mark_notified(conn, alert_id)
+    finally:
+        conn.close()
+
+def deliver_report(entry, path):
+    """Agenda o envio de um relatório recém-gerado ao Telegram, se habilitado
+
+    O envio acontece na fila em segundo plano (não segura a importação); as
+    falhas definitivas vão para o dead-letter como as dos alertas.
+    """
+    if not load_alert_settings()['report_telegram']:
+        return
+    notifier.enqueue_document(entry['file'], path,
+                              f"📄 {reports.KIND_LABELS[entry['kind']]} — {entry['period']}",
+                              lambda: reports.mark_sent(entry))
 
-def check_all_alerts():
-    """Verificar todos os alertas"""
+# Motor de alertas com cache do último resultado; cada nova avaliação é persistida
+alert_engine = AlertEngine('pihole_logs.db', on_evaluate=persist_alerts)
+
+def on_settings_changed(old, new):
+    """Reage a mudanças de configuração sem reler o arquivo"""
+    if (old.ip_spike_threshold, old.domain_spike_threshold, old.network_spike_threshold,
+            old.analysis_period_hours, old.alerts_enabled) != \
+            (new.ip_spike_threshold, new.domain_spike_threshold, new.network_spike_threshold,
+             new.analysis_period_hours, new.alerts_enabled):
+        alert_engine.invalidate()
+    if old.data_retention_days != new.data_retention_days:
+        print(f"⚙️ Retenção de dados alterada para {new.data_retention_days} dias")
+
+settings_service.subscribe(on_settings_changed)
+
+def pre_fork():
+    """serve.py: para as threads de segundo plano antes dos forks (o filho herdaria locks presos)"""
+    settings_service.stop_watcher()
+    notifier.stop()
+
+def post_fork():
+    """serve.py: threads de segundo plano próprias de cada worker"""
+    settings_service.start_watcher()
+    notifier.start()
+    metrics.start_publisher()
+
+def on_shutdown():
+    """serve.py: entrega as notificações pendentes antes de o worker sair"""
+    notifier.flush(timeout=5)
+    notifier.stop()
+    metrics.stop_publisher()
+
+def dashboard_key(*args, **kwargs):
+    """Chave do cache: rota e parâmetros (e o dia atual, de que dependem os padrões)"""
+    params = '&'.join(f"{name}={value}" for name, value in sorted(request.args.items(multi=True)))
+    return f"{request.path}?{params}@{datetime.now().date()}"
+
+def cacheable(result):
+    """Só respostas de sucesso vão para o cache"""
+    return isinstance(result, dict) and result.get('success')
+
+def check_all_alerts(force=False):
+    """Verificar todos os alertas (picos por IP, domínio e rede)"""
     settings = load_alert_settings()
     
     if not settings.get('alerts_enabled'):
         return []
     
-    alerts = []
-    
-    # Verificar picos de tráfego por IP
     try:
-        conn = sqlite3.connect('pihole_logs.db')
-        cursor = conn.cursor()
-        
-        # Análise de picos por IP
-        cursor.execute("""
-            SELECT client, COUNT(*) as count
-            FROM queries 
-            WHERE timestamp >= datetime('now', '-2 hours')
-            GROUP BY client
-            ORDER BY count DESC
-            LIMIT 10
-        """)
-        
-        recent_ips = cursor.fetchall()
-        
-        if recent_ips:
-            # Calcular média histórica
-            cursor.execute("""
-                SELECT client, AVG(count) as avg_count
-                FROM (
-                    SELECT client, COUNT(*) as count
-                    FROM queries 
-                    WHERE timestamp >= datetime('now', '-24 hours')
-                    GROUP BY client, strftime('%H', timestamp)
-                )
-                GROUP BY client
-            """)
-            
-            historical_avg = cursor.fetchall()
-            avg_dict = {ip: avg for ip, avg in historical_avg}
-            
-            for ip, count in recent_ips:
-                if ip in avg_dict and avg_dict[ip] > 0:
-                    ratio = count / avg_dict[ip]
-                    if ratio > settings.get('ip_spike_threshold', 3.0):
-                        alerts.append({
-                            'type': 'warning',
-                            'severity': 'Médio',
-                            'title': f'Pico de Tráfego - IP {ip}',
-                            'message': f'IP {ip} apresentou {count} consultas nas últimas 2 horas (média: {avg_dict[ip]:.1f})',
-                            'timestamp': datetime.now().isoformat()
-                        })
-        
-        conn.close()
-        
+        # Só a janela em dia com a última importação substitui o banco
+        window = hot_window if hot_window.enabled and hot_window_in_sync() else None
+        return alert_engine.get_alerts(settings, force=force, window=window)
     except Exception as e:
         print(f"Erro ao verificar alertas: {e}")
-    
-    # Enviar notificações se houver alertas
-    if alerts and settings.get('telegramEnabled'):
-        for alert in alerts:
-            send_telegram_notification(alert['message'])
-    
-    return alerts
+        return []
 
 @app.route('/')
 def index():
@@ -165,157 +272,241 @@ def config():
     """Página de configurações"""
     return render_template('config.html')
 
+# Campos de cada linha de /api/logs (ordem das colunas no formato colunar)
+LOG_COLUMNS = ('domain', 'ip', 'status', 'count', 'timestamp', 'activity_time', 'duration_minutes')
+
+def log_row_to_dict(row):
+    """Linha agrupada (domínio, cliente, status) de /api/logs no formato da resposta"""
+    # Calcular tempo de atividade formatado
+    duration_minutes = row[6] if row[6] else 0
+    
+    if duration_minutes == 0:
+        activity_time = "Momentâneo"
+    elif duration_minutes < 60:
+        activity_time = f"{duration_minutes} min"
+    elif duration_minutes < 1440:  # menos de 24 horas
+        hours = duration_minutes // 60
+        minutes = duration_minutes % 60
+        activity_time = f"{hours}h {minutes}min"
+    else:
+        days = duration_minutes // 1440
+        hours = (duration_minutes % 1440) // 60
+        activity_time = f"{days}d {hours}h"
+    
+    return {
+        'domain': row[0],
+        'ip': row[1],
+        'status': row[2],
+        'count': row[3],
+        'timestamp': row[5],  # último acesso
+        'activity_time': activity_time,
+        'duration_minutes': duration_minutes
+    }
+
+def stream_log_rows(conn, cursor, lines, budget):
+    """/api/logs em fluxo: cada lote do cursor vira um pedaço do JSON; success e totais vão no final"""
+    counts = {'returned': 0}
+    
+    def batches():
+        try:
+            for rows in budget.batches(cursor, fast_json.STREAM_BATCH_ROWS):
+                counts['returned'] += len(rows)
+                yield [log_row_to_dict(row) for row in rows]
+        finally:
+            conn.close()
+    
+    def trailer(error):
+        data = {
+            'success': error is None,
+            'total_found': counts['returned'],
+            'total_returned': counts['returned'],
+            'limited': counts['returned'] >= lines
+        }
+        data.update(budget.info())
+        if error:
+            data['error'] = str(error)
+        return data
+    
+    return fast_json.stream_response(fast_json.iter_json(batches(), trailer))
+
 # API Routes
 @app.route('/api/logs')
 def api_logs():
     """API para buscar logs"""
     try:
         # Parâmetros da requisição
-        ip_search = request.args.get('ip', '').strip()
-        domain_search = request.args.get('domain', '').strip()
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        start_time = request.args.get('start_time', '00:00')
-        end_time = request.args.get('end_time', '23:59')
+        filters = log_export.parse_log_filters(request.args)
         lines = request.args.get('lines', 5000, type=int)
+        # Paginação da tabela virtual: `lines` é o tamanho da página
+        offset = max(0, request.args.get('offset', 0, type=int))
         
-        conn = sqlite3.connect('pihole_logs.db')
+        conn = partition_store.connect()
         cursor = conn.cursor()
         
-        # Construir query para calcular tempo de atividade
-        sql = """
-            SELECT 
-                domain,
-                client,
-                status,
-                COUNT(*) as count,
-                MIN(timestamp) as first_seen,
-                MAX(timestamp) as last_seen,
-                ROUND((julianday(MAX(timestamp)) - julianday(MIN(timestamp))) * 24 * 60) as duration_minutes
-            FROM queries 
-            WHERE 1=1
-        """
-        params = []
-        
-        # Adicionar filtros
-        if ip_search:
-            sql += " AND client LIKE ?"
-            params.append(f"%{ip_search}%")
-        
-        if domain_search:
-            sql += " AND domain LIKE ?"
-            params.append(f"%{domain_search}%")
-        
-        if start_date:
-            start_datetime = f"{start_date} {start_time}"
-            sql += " AND timestamp >= ?"
-            params.append(start_datetime)
-        
-        if end_date:
-            end_datetime = f"{end_date} {end_time}"
-            sql += " AND timestamp <= ?"
-            params.append(end_datetime)
+        summary = log_export.summary_filter_sql(filters)
+        if summary is not None:
+            # Dias inteiros: contagens e horários somados do resumo de atividade
+            where, params = summary
+            sql = f"""
+                SELECT 
+                    domain,
+                    client,
+                    status,
+                    SUM(count) as count,
+                    MIN(first_seen) as first_seen,
+                    MAX(last_seen) as last_seen,
+                    ROUND((julianday(MAX(last_seen)) - julianday(MIN(first_seen))) * 24 * 60) as duration_minutes
+                FROM activity_summary
+                WHERE 1=1{where}
+            """
+        else:
+            # Apenas as partições do período pedido entram na consulta
+            source = partition_store.source_sql(conn, filters['start_date'], filters['end_date'],
+                                                domain_like=filters['domain'], client_like=filters['ip'],
+                                                source=filters['source'])
+            
+            # Construir query para calcular tempo de atividade
+            sql = f"""
+                SELECT 
+                    domain,
+                    client,
+                    status,
+                    COUNT(*) as count,
+                    MIN(timestamp) as first_seen,
+                    MAX(timestamp) as last_seen,
+                    ROUND((julianday(MAX(timestamp)) - julianday(MIN(timestamp))) * 24 * 60) as duration_minutes
+                FROM {source}
+                WHERE 1=1
+            """
+            
+            # Adicionar filtros
+            where, params = log_export.filter_sql(filters)
+            sql += where
         
         # Agrupar por domínio, IP e status
         sql += " GROUP BY domain, client, status"
         
-        # Ordenar por contagem decrescente
-        sql += " ORDER BY count DESC"
+        # Ordenar por contagem decrescente (desempate fixo para as páginas não se sobreporem)
+        sql += " ORDER BY count DESC, domain, client, status"
         
         # Limitar resultados
-        sql += f" LIMIT {lines}"
+        sql += f" LIMIT {lines} OFFSET {offset}"
         
-        cursor.execute(sql, params)
-        rows = cursor.fetchall()
+        # Limites de tempo e linhas (QUERY_BUDGET_CONFIG); a desconexão do cliente também interrompe
+        budget = query_budget.QueryBudget.for_endpoint('api_logs', request.environ).attach(conn)
+        
+        # ?stream=1: linhas enviadas em lotes conforme saem do cursor
+        if fast_json.wants_stream(request.args):
+            with metrics.timed_query('logs.search'):
+                budget.execute(cursor, sql, params)
+            return stream_log_rows(conn, cursor, lines, budget)
+        
+        with metrics.timed_query('logs.search'):
+            rows = budget.fetch(cursor) if budget.execute(cursor, sql, params) else []
         
         # Converter para formato esperado
-        logs = []
-        for row in rows:
-            # Calcular tempo de atividade formatado
-            duration_minutes = row[6] if row[6] else 0
-            
-            if duration_minutes == 0:
-                activity_time = "Momentâneo"
-            elif duration_minutes < 60:
-                activity_time = f"{duration_minutes} min"
-            elif duration_minutes < 1440:  # menos de 24 horas
-                hours = duration_minutes // 60
-                minutes = duration_minutes % 60
-                activity_time = f"{hours}h {minutes}min"
-            else:
-                days = duration_minutes // 1440
-                hours = (duration_minutes % 1440) // 60
-                activity_time = f"{days}d {hours}h"
-            
-            log = {
-                'domain': row[0],
-                'ip': row[1],
-                'status': row[2],
-                'count': row[3],
-                'timestamp': row[5],  # último acesso
-                'activity_time': activity_time,
-                'duration_minutes': duration_minutes
-            }
-            logs.append(log)
+        logs = [log_row_to_dict(row) for row in rows]
         
         conn.close()
         
-        return jsonify({
+        response_data = {
             'success': True,
             'logs': logs,
             'total_found': len(logs),
             'total_returned': len(logs),
-            'limited': len(logs) >= lines
-        })
+            'limited': len(logs) >= lines,
+            'offset': offset
+        }
+        response_data.update(budget.info())
+        if fast_json.wants_columnar(request.args):
+            response_data['format'] = 'columnar'
+            response_data['logs'] = fast_json.columnar(logs, LOG_COLUMNS)
+        
+        return fast_json.response(response_data)
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'pdf': 'application/pdf'
+}
+
+@app.route('/api/export/<fmt>')
+def api_export(fmt):
+    """Exporta os registros filtrados em fluxo contínuo (CSV, NDJSON ou PDF)"""
+    try:
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': f'Formato não suportado: {fmt}'})
+        
+        # Mesmos filtros de /api/logs; sem `limit` exporta tudo
+        filters = log_export.parse_log_filters(request.args)
+        limit = request.args.get('limit', type=int)
+        # Períodos anteriores ao banco local vêm do backend que tiver o histórico
+        backend, batches = backend_router.query(filters, limit)
+        
+        if fmt == 'csv':
+            chunks = log_export.csv_chunks(batches)
+        elif fmt == 'ndjson':
+            chunks = log_export.ndjson_chunks(batches)
+        else:
+            settings = load_alert_settings()
+            chunks = log_export.pdf_chunks(batches, settings['pdf_title'], settings['pdf_author'],
+                                           settings['pdf_subject'], log_export.describe_filters(filters))
+        
+        filename = f"pihole-logs-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+        return Response(stream_with_context(chunks), content_type=EXPORT_FORMATS[fmt], headers={
+            'Content-Disposition': f'attachment; filename={filename}',
+            'X-Accel-Buffering': 'no',
+            'X-Backend': backend
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+def get_selected_day(selected_date):
+    """Valida a data da requisição (AAAA-MM-DD); padrão é o dia atual"""
+    if selected_date:
+        return datetime.strptime(selected_date, '%Y-%m-%d').date()
+    return datetime.now().date()
+
+def get_selected_range():
+    """Período da requisição: start_date/end_date ou o dia de `date`"""
+    day = get_selected_day(request.args.get('date'))
+    start_day = get_selected_day(request.args.get('start_date') or day.isoformat())
+    end_day = get_selected_day(request.args.get('end_date') or start_day.isoformat())
+    if end_day < start_day:
+        start_day, end_day = end_day, start_day
+    return start_day, end_day
+
+def get_selected_source():
+    """Fonte (Pi-hole) da requisição; None agrega todas"""
+    return request.args.get('source') or None
+
 @app.route('/api/stats')
+@dashboard_cache.cached(dashboard_key, store_if=cacheable)
 def api_stats():
     """API para estatísticas do dashboard"""
     try:
-        # Obter data da requisição
-        selected_date = request.args.get('date')
+        # Obter período da requisição (a resolução é escolhida conforme a retenção)
+        start_day, end_day = get_selected_range()
         
-        conn = sqlite3.connect('pihole_logs.db')
-        cursor = conn.cursor()
-        
-        # Construir filtro de data
-        date_filter = ""
-        if selected_date:
-            date_filter = f"WHERE date(timestamp) = '{selected_date}'"
+        if hot_window_covers(start_day):
+            total_queries, blocked_queries, unique_clients, unique_domains = \
+                hot_window.stats(start_day, end_day, get_selected_source())
+            resolution = 'raw'
         else:
-            # Se não foi especificada data, usar apenas o dia atual
-            date_filter = "WHERE date(timestamp) = date('now')"
-        
-        # Total de consultas
-        cursor.execute(f"SELECT COUNT(*) FROM queries {date_filter}")
-        total_queries = cursor.fetchone()[0]
-        
-        # Consultas bloqueadas
-        if selected_date:
-            blocked_filter = f"WHERE date(timestamp) = '{selected_date}' AND status = 'blocked'"
-        else:
-            blocked_filter = "WHERE date(timestamp) = date('now') AND status = 'blocked'"
-        cursor.execute(f"SELECT COUNT(*) FROM queries {blocked_filter}")
-        blocked_queries = cursor.fetchone()[0]
-        
-        # Clientes únicos
-        cursor.execute(f"SELECT COUNT(DISTINCT client) FROM queries {date_filter}")
-        unique_clients = cursor.fetchone()[0]
-        
-        # Domínios únicos
-        cursor.execute(f"SELECT COUNT(DISTINCT domain) FROM queries {date_filter}")
-        unique_domains = cursor.fetchone()[0]
+            conn = partition_store.connect()
+            total_queries, blocked_queries, unique_clients, unique_domains, resolution = \
+                aggregates.query_stats(conn, start_day, end_day, source=get_selected_source())
+            conn.close()
         
         # Taxa de bloqueio
         block_rate = (blocked_queries / total_queries * 100) if total_queries > 0 else 0
         
-        conn.close()
-        
-        return jsonify({
+        return {
             'success': True,
+            'resolution': resolution,
             'stats': {
                 'total_queries': total_queries,
                 'blocked_queries': blocked_queries,
@@ -323,183 +514,178 @@ def api_stats():
                 'unique_domains': unique_domains,
                 'block_rate': round(block_rate, 1)
             }
-        })
+        }
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/activity-chart')
+@dashboard_cache.cached(dashboard_key, store_if=cacheable)
 def api_activity_chart():
     """API para gráfico de atividade"""
     try:
-        # Obter data da requisição
-        selected_date = request.args.get('date')
+        # Por hora em um único dia; por dia em períodos maiores
+        start_day, end_day = get_selected_range()
         
-        conn = sqlite3.connect('pihole_logs.db')
-        cursor = conn.cursor()
-        
-        # Construir filtro de data
-        if selected_date:
-            date_filter = f"WHERE date(timestamp) = '{selected_date}'"
+        if hot_window_covers(start_day):
+            data, resolution = hot_window.activity(start_day, end_day, get_selected_source()), 'raw'
         else:
-            # Se não foi especificada data, usar apenas o dia atual
-            date_filter = "WHERE date(timestamp) = date('now')"
-        
-        # Dados por hora para a data selecionada
-        cursor.execute(f"""
-            SELECT 
-                strftime('%H', timestamp) as hour,
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'blocked' THEN 1 ELSE 0 END) as blocked
-            FROM queries 
-            {date_filter}
-            GROUP BY strftime('%H', timestamp)
-            ORDER BY hour
-        """)
-        
-        data = cursor.fetchall()
-        
-        labels = [f"{hour}:00" for hour, _, _ in data]
+            conn = partition_store.connect()
+            data, resolution = aggregates.query_activity(conn, start_day, end_day, source=get_selected_source())
+            conn.close()
+        
+        labels = [label for label, _, _ in data]
         queries = [total for _, total, _ in data]
         blocked = [blocked for _, _, blocked in data]
         
-        conn.close()
-        
-        return jsonify({
+        return {
             'success': True,
+            'resolution': resolution,
             'data': {
                 'labels': labels,
                 'queries': queries,
                 'blocked': blocked
             }
-        })
+        }
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/timeseries')
+def api_timeseries():
+    """Série temporal com resolução adaptativa
+
+    start/end (data ou data e hora; sem eles, o período de date/start_date/
+    end_date), points (pontos desejados) e series ('total', 'blocked',
+    'client:<ip>', 'domain:<nome>', separadas por vírgula).
+    """
+    try:
+        if request.args.get('start'):
+            start = timeseries.parse_moment(request.args['start'])
+            end = timeseries.parse_moment(request.args['end'], end=True) if request.args.get('end') \
+                else datetime.now()
+        else:
+            start_day, end_day = get_selected_range()
+            start = datetime.combine(start_day, datetime.min.time())
+            end = datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+        points = request.args.get('points', timeseries.DEFAULT_POINTS, type=int)
+        series = timeseries.parse_series(request.args.get('series'))
+        
+        def build():
+            conn = partition_store.connect()
+            try:
+                window = hot_window if hot_window.enabled and hot_window_in_sync() else None
+                result = timeseries.build(conn, start, end, points, series, source=get_selected_source(),
+                                          window=window)
+            finally:
+                conn.close()
+            result['success'] = True
+            return result
+        
+        return fast_json.response(dashboard_cache.get_or_compute(dashboard_key(), build))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+def query_top(kind, blocked_only=False, exclude=None, limit=10):
+    """Top N de domínios/clientes para o período da requisição: (linhas, resolução, backend)"""
+    start_day, end_day = get_selected_range()
+    
+    if hot_window_covers(start_day):
+        return hot_window.top(start_day, end_day, kind, blocked_only, exclude, limit,
+                              source=get_selected_source()), 'raw', 'local_db'
+    
+    # Agregados locais; períodos anteriores a eles vão ao backend que tiver o histórico
+    backend, rows = backend_router.aggregate(start_day, end_day, kind, blocked_only, exclude, limit,
+                                             get_selected_source())
+    if backend != 'local_db':
+        # FTL e SSH contam os registros brutos
+        return rows, 'raw', backend
+    conn = partition_store.connect()
+    try:
+        return rows, aggregates.pick_resolution(conn, start_day, end_day), backend
+    finally:
+        conn.close()
+
 @app.route('/api/top-domains')
+@dashboard_cache.cached(dashboard_key, store_if=cacheable)
 def api_top_domains():
     """API para top domínios"""
     try:
-        # Obter data da requisição
-        selected_date = request.args.get('date')
-        
-        conn = sqlite3.connect('pihole_logs.db')
-        cursor = conn.cursor()
-        
-        # Construir filtro de data
-        if selected_date:
-            date_filter = f"WHERE date(timestamp) = '{selected_date}'"
-        else:
-            # Se não foi especificada data, usar apenas o dia atual
-            date_filter = "WHERE date(timestamp) = date('now')"
-        
-        cursor.execute(f"""
-            SELECT domain, COUNT(*) as count
-            FROM queries 
-            {date_filter}
-            GROUP BY domain
-            ORDER BY count DESC
-            LIMIT 10
-        """)
-        
-        domains = [{'domain': domain, 'count': count} for domain, count in cursor.fetchall()]
-        conn.close()
-        
-        return jsonify({'success': True, 'domains': domains})
+        rows, resolution, backend = query_top('domain')
+        domains = [{'domain': domain, 'count': count} for domain, count in rows]
+        return {'success': True, 'domains': domains, 'resolution': resolution, 'backend': backend}
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/top-blocked-domains')
+@dashboard_cache.cached(dashboard_key, store_if=cacheable)
 def api_top_blocked_domains():
     """API para top domínios bloqueados"""
     try:
-        # Obter data da requisição
-        selected_date = request.args.get('date')
-        
-        conn = sqlite3.connect('pihole_logs.db')
-        cursor = conn.cursor()
-        
-        # Construir filtro de data
-        if selected_date:
-            date_filter = f"WHERE date(timestamp) = '{selected_date}' AND status = 'blocked'"
-        else:
-            # Se não foi especificada data, usar apenas o dia atual
-            date_filter = "WHERE date(timestamp) = date('now') AND status = 'blocked'"
-        
-        cursor.execute(f"""
-            SELECT domain, COUNT(*) as count
-            FROM queries 
-            {date_filter}
-            GROUP BY domain
-            ORDER BY count DESC
-            LIMIT 10
-        """)
-        
-        domains = [{'domain': domain, 'count': count} for domain, count in cursor.fetchall()]
-        conn.close()
-        
-        return jsonify({'success': True, 'domains': domains})
+        rows, resolution, backend = query_top('domain', blocked_only=True)
+        domains = [{'domain': domain, 'count': count} for domain, count in rows]
+        return {'success': True, 'domains': domains, 'resolution': resolution, 'backend': backend}
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/top-ips')
+@dashboard_cache.cached(dashboard_key, store_if=cacheable)
 def api_top_ips():
     """API para top IPs"""
     try:
-        # Obter data da requisição
-        selected_date = request.args.get('date')
-        
-        conn = sqlite3.connect('pihole_logs.db')
-        cursor = conn.cursor()
-        
-        # Construir filtro de data
-        if selected_date:
-            date_filter = f"WHERE date(timestamp) = '{selected_date}' AND client != '127.0.0.1'"
-        else:
-            # Se não foi especificada data, usar apenas o dia atual
-            date_filter = "WHERE date(timestamp) = date('now') AND client != '127.0.0.1'"
-        
-        cursor.execute(f"""
-            SELECT client, COUNT(*) as count
-            FROM queries 
-            {date_filter}
-            GROUP BY client
-            ORDER BY count DESC
-            LIMIT 10
-        """)
-        
-        ips = [{'ip': ip, 'count': count} for ip, count in cursor.fetchall()]
-        conn.close()
-        
-        return jsonify({'success': True, 'ips': ips})
+        rows, resolution, backend = query_top('client', exclude='127.0.0.1')
+        ips = [{'ip': ip, 'count': count} for ip, count in rows]
+        return {'success': True, 'ips': ips, 'resolution': resolution, 'backend': backend}
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/api/recent-activity')
 def api_recent_activity():
-    """API para atividade recente"""
+    """API para atividade recente (do backend mais atual: o FTL, se habilitado)"""
     try:
-        conn = sqlite3.connect('pihole_logs.db')
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT timestamp, domain, client, status
-            FROM queries 
-            ORDER BY timestamp DESC
-            LIMIT 20
-        """)
+        _, recent = backend_router.tail(20, get_selected_source())
         
         activities = []
-        for timestamp, domain, client, status in cursor.fetchall():
+        for timestamp, domain, client, status, origin in recent:
             activities.append({
                 'timestamp': timestamp,
                 'domain': domain,
                 'ip': client,
-                'status': 'blocked' if status == 'blocked' else 'allowed'
+                'status': 'blocked' if status == 'blocked' else 'allowed',
+                'source': origin
             })
         
-        conn.close()
-        
-        return jsonify({'success': True, 'activities': activities})
+        return {'success': True, 'activities': activities}
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/tail')
+def api_tail():
+    """Últimos registros (?lines=, ?source=) do backend mais atual"""
+    try:
+        lines = max(1, min(request.args.get('lines', 100, type=int), log_export.FETCH_SIZE))
+        backend, rows = backend_router.tail(lines, get_selected_source())
+        logs = [dict(zip(partition_store.QUERY_COLUMNS, row)) for row in rows]
+        return jsonify({'success': True, 'backend': backend, 'logs': logs})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/backends')
+def api_backends():
+    """Backends habilitados: custo de cada operação, disponibilidade e período coberto"""
+    try:
+        return jsonify({'success': True, 'backends': backend_router.status()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/sources')
+def api_sources():
+    """Fontes (Pi-hole) configuradas e o atraso de importação de cada uma"""
+    try:
+        conn = partition_store.connect()
+        try:
+            sources = ingest.source_lag(conn, ingest.load_sources())
+        finally:
+            conn.close()
+        return jsonify({'success': True, 'sources': sources})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -516,11 +702,94 @@ def api_alerts():
 def api_check_alerts():
     """API para verificar alertas"""
     try:
-        alerts = check_all_alerts()
+        alerts = check_all_alerts(force=True)
+        return jsonify({'success': True, 'alerts': alerts})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/alerts/active')
+def alerts_active():
+    """Alertas persistidos ainda não resolvidos (painel do dashboard)
+
+    A avaliação em cache do motor roda antes, para que a tabela tenha os picos atuais.
+    """
+    try:
+        limit = request.args.get('limit', 100, type=int)
+        check_all_alerts()
+        conn = sqlite3.connect('pihole_logs.db')
+        try:
+            alerts = [describe_stored_alert(alert) for alert in alert_store.get_active_alerts(conn, limit)]
+        finally:
+            conn.close()
         return jsonify({'success': True, 'alerts': alerts})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/alerts/check')
+def alerts_check():
+    """Força uma nova avaliação e retorna apenas os alertas recém-abertos"""
+    try:
+        alerts = check_all_alerts(force=True)
+        new_alerts = [alert for alert in alerts if alert.get('is_new')]
+        return jsonify({'success': True, 'alerts': new_alerts})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/alerts/resolve/<int:alert_id>', methods=['GET', 'POST'])
+def alerts_resolve(alert_id):
+    """Resolver um alerta (suprime o mesmo tipo/alvo por um período)"""
+    try:
+        suppress_minutes = request.args.get('suppress_minutes', alert_store.RESOLVE_SUPPRESS_MINUTES, type=int)
+        resolved_by = request.args.get('resolved_by', 'user')
+        conn = sqlite3.connect('pihole_logs.db')
+        try:
+            resolved = alert_store.resolve_alert(conn, alert_id, resolved_by, suppress_minutes)
+        finally:
+            conn.close()
+        if not resolved:
+            return jsonify({'success': False, 'error': 'Alerta não encontrado ou já resolvido'})
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/alerts/history')
+def alerts_history():
+    """Histórico de alertas"""
+    try:
+        conn = sqlite3.connect('pihole_logs.db')
+        try:
+            alerts = alert_store.get_alert_history(
+                conn,
+                request.args.get('limit', 100, type=int),
+                request.args.get('type') or None,
+                request.args.get('target') or None
+            )
+        finally:
+            conn.close()
+        return jsonify({'success': True, 'alerts': alerts})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/alerts/suppress', methods=['POST'])
+def alerts_suppress():
+    """Criar uma janela de supressão para um tipo/alvo"""
+    try:
+        data = request.json or {}
+        if not data.get('type'):
+            return jsonify({'success': False, 'error': 'Tipo de alerta obrigatório'})
+        conn = sqlite3.connect('pihole_logs.db')
+        try:
+            suppression_id = alert_store.suppress(
+                conn, data['type'], data.get('target', '*'),
+                int(data.get('minutes', alert_store.RESOLVE_SUPPRESS_MINUTES)),
+                data.get('reason')
+            )
+        finally:
+            conn.close()
+        return jsonify({'success': True, 'id': suppression_id})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 # Configurações
 @app.route('/api/config', methods=['GET', 'POST'])
 def api_config():
@@ -543,200 +812,335 @@ def api_config():
 def api_test_notification():
     """API para testar notificação"""
     try:
-        settings = load_alert_settings()
+        enabled, chat_id, bot_token = telegram_config(load_alert_settings())
         
-        if not settings.get('telegramEnabled'):
+        if not enabled:
             return jsonify({'success': False, 'error': 'Telegram não habilitado'})
         
-        message = "🧪 **Teste de Notificação**\n\nEsta é uma notificação de teste do Pi-hole Log Viewer."
+        message = "🧪 <b>Teste de Notificação</b>\n\nEsta é uma notificação de teste do Pi-hole Log Viewer."
         
-        if send_telegram_notification(message):
+        # Envio direto (fora da fila) para dar retorno imediato na tela
+        ok, error = notifier.send_now(message)
+        if ok:
             return jsonify({'success': True, 'message': 'Notificação enviada com sucesso!'})
         else:
-            return jsonify({'success': False, 'error': 'Bot foi bloqueado pelo usuário. Desbloqueie o bot no Telegram e tente novamente.'})
+            return jsonify({'success': False, 'error': error or 'Erro desconhecido'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/notifications/metrics')
+def api_notification_metrics():
+    """Métricas da fila de notificações"""
+    return jsonify({'success': True, 'metrics': notifier.get_metrics()})
+
+@app.route('/api/notifications/dead-letter')
+def api_notification_dead_letter():
+    """Notificações que não puderam ser entregues"""
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        return jsonify({'success': True, 'messages': notifier.get_dead_letters(limit)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/reports')
+def api_reports():
+    """Lista os relatórios pré-gerados"""
+    try:
+        kind = request.args.get('kind')
+        entries = [entry for entry in reports.load_manifest() if not kind or entry['kind'] == kind]
+        for entry in entries:
+            entry['url'] = f"/api/reports/{entry['kind']}/{entry['period']}?version={entry['version']}"
+        return jsonify({'success': True, 'reports': entries})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/reports/<kind>/<period>')
+def api_report_file(kind, period):
+    """Entrega o PDF de um relatório (última versão por padrão)"""
+    try:
+        entry = reports.find_report(kind, period, request.args.get('version', type=int))
+        if not entry:
+            return jsonify({'success': False, 'error': 'Relatório não encontrado'})
+        return send_file(os.path.abspath(reports.report_path(entry)), mimetype='application/pdf',
+                         as_attachment=request.args.get('download') == '1', download_name=entry['file'])
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/reports/run', methods=['POST'])
+def api_reports_run():
+    """Gera relatórios sob demanda
+
+    Sem parâmetros gera os períodos encerrados pendentes; com `kind` e `date`
+    (re)gera o período indicado, criando uma nova versão se `force` for true.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        settings = load_alert_settings()
+        conn = partition_store.connect()
+        try:
+            if data.get('kind'):
+                if data['kind'] not in reports.REPORT_KINDS:
+                    return jsonify({'success': False, 'error': f"Tipo inválido: {data['kind']}"})
+                day = get_selected_day(data.get('date'))
+                entry, created = reports.generate_report(conn, data['kind'], day, settings,
+                                                         force=bool(data.get('force')))
+                if created and data.get('send'):
+                    deliver_report(entry, reports.report_path(entry))
+                created_entries = [entry] if created else []
+            else:
+                created_entries = reports.generate_due_reports(conn, settings, on_generated=deliver_report)
+        finally:
+            conn.close()
+        return jsonify({'success': True, 'reports': created_entries})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+def format_update_time(value):
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y, %H:%M:%S')
+
 @app.route('/api/last-update')
 def api_last_update():
-    """API para obter a última atualização do Pi-hole"""
-    try:
-        # Verificar se existe arquivo de log de atualização
-        log_file = 'auto_update.log'
-        last_update = "Nunca"
-        
-        if os.path.exists(log_file):
-            # Ler as últimas linhas do arquivo de log
-            with open(log_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                
-            # Procurar pela última linha de sucesso
-            for line in reversed(lines):
-                if '✅ Dados atualizados com sucesso!' in line:
-                    # Extrair timestamp da linha
-                    try:
-                        timestamp_str = line.split(' - ')[0]
-                        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S,%f')
-                        last_update = timestamp.strftime('%d/%m/%Y, %H:%M:%S')
-                    except:
-                        # Se não conseguir parsear, usar a linha completa
-                        last_update = line.strip()
-                    break
-                elif '🔄 Iniciando atualização automática' in line:
-                    # Se encontrou início de atualização mas não sucesso, usar essa linha
-                    try:
-                        timestamp_str = line.split(' - ')[0]
-                        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S,%f')
-                        last_update = timestamp.strftime('%d/%m/%Y, %H:%M:%S') + ' (em andamento)'
-                    except:
-                        last_update = line.strip()
-                    break
+    """API para obter a última atualização do Pi-hole (estado real de sync_state)"""
+    try:
+        conn = partition_store.connect()
+        try:
+            sources = ingest.source_lag(conn, ingest.load_sources())
+        finally:
+            conn.close()
+        
+        successes = [source['last_success_at'] for source in sources if source['last_success_at']]
+        last_update = format_update_time(max(successes)) if successes else "Nunca"
+        in_progress = dashboard_cache.get_meta('update_started_at') is not None
+        if in_progress:
+            last_update += ' (em andamento)'
         
         return jsonify({
             'success': True,
-            'last_update': last_update
+            'last_update': last_update,
+            'in_progress': in_progress,
+            'errors': {source['id']: source['last_error'] for source in sources if source['last_error']}
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def collect_state_metrics():
+    """Métricas lidas do estado comum no momento da coleta (fontes, banco e janela quente)"""
+    conn = partition_store.connect()
+    try:
+        sources = ingest.source_lag(conn, ingest.load_sources())
+        stored_rows = partition_store.count_rows(conn)
+    finally:
+        conn.close()
+    
+    def epoch(value):
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').timestamp() if value else None
+    
+    return [
+        ('pihole_ingest_lag_seconds', 'gauge', 'Atraso do registro mais recente importado em relação ao horário atual',
+         [({'source': source['id']}, source['lag_seconds']) for source in sources]),
+        ('pihole_ingest_last_success_timestamp_seconds', 'gauge', 'Horário da última importação bem-sucedida',
+         [({'source': source['id']}, epoch(source['last_success_at'])) for source in sources]),
+        ('pihole_ingest_source_up', 'gauge', '1 se a última importação da fonte não falhou',
+         [({'source': source['id']}, 0 if source['last_error'] else 1) for source in sources]),
+        ('pihole_ingest_in_progress', 'gauge', '1 durante uma importação',
+         [({}, int(dashboard_cache.get_meta('update_started_at') is not None))]),
+        ('pihole_stored_rows', 'gauge', 'Registros brutos nas partições locais', [({}, stored_rows)]),
+        ('pihole_hot_window_rows', 'gauge', 'Registros na janela quente em memória', [({}, len(hot_window))]),
+        ('pihole_hot_window_bytes', 'gauge', 'Memória dos arrays da janela quente', [({}, hot_window.nbytes())])
+    ]
+
+def collect_telegram_metrics():
+    """Fila do Telegram deste worker (somada entre os workers em /metrics)"""
+    telegram = notifier.get_metrics()
+    return [
+        ('pihole_telegram_queue_depth', 'gauge', 'Mensagens aguardando envio ao Telegram',
+         [({}, telegram['queue_depth'])]),
+        ('pihole_telegram_events_total', 'counter', 'Eventos da fila do Telegram',
+         [({'event': key}, telegram[key]) for key in ('enqueued', 'sent_messages', 'sent_alerts', 'coalesced',
+                                                       'retries', 'rate_limited', 'failures', 'dead_lettered')])
+    ]
+
+metrics.register_collector(collect_state_metrics)
+metrics.register_collector(collect_telegram_metrics, per_process=True)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas no formato de texto do Prometheus"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/debug/slow-queries')
+def api_debug_slow_queries():
+    """Consultas SQL acima de PROFILING_CONFIG['slow_query_ms'] com o plano de execução"""
+    try:
+        if request.args.get('clear') == '1':
+            profiling.clear_slow_queries()
+        return jsonify({'success': True, 'threshold_ms': profiling.load_config()['slow_query_ms'],
+                        'queries': profiling.slow_queries(request.args.get('limit', type=int))})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/debug/profile')
+def api_debug_profile():
+    """Amostra todas as threads por ?seconds=N e devolve as pilhas em formato collapsed"""
+    try:
+        if not profiling.load_config()['sampling_enabled']:
+            return jsonify({'success': False, 'error': 'Amostragem desabilitada (PROFILING_CONFIG sampling_enabled)'})
+        sampler = profiling.profile_process(request.args.get('seconds', 10, type=float))
+        name = profiling.save_profile(sampler, 'process')
+        return Response(sampler.collapsed(), content_type='text/plain; charset=utf-8',
+                        headers={'X-Profile': name})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/debug/profiles')
+@app.route('/api/debug/profiles/<name>')
+def api_debug_profiles(name=None):
+    """Lista os perfis gravados ou entrega um deles"""
+    try:
+        if name is None:
+            return jsonify({'success': True, 'profiles': profiling.list_profiles()})
+        path = profiling.profile_path(name)
+        if not path:
+            return jsonify({'success': False, 'error': 'Perfil não encontrado'})
+        return send_file(os.path.abspath(path), mimetype='text/plain', as_attachment=True, download_name=name)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+def publish_import():
+    """Invalida o cache do dashboard em todos os workers após uma importação"""
+    global hot_window_generation
+    previous = hot_window_generation
+    generation = dashboard_cache.bump()
+    # A janela deste processo recebeu as linhas em feed_detector; só está em dia
+    # se nenhum outro worker importou desde a última sincronização
+    if generation == previous + 1:
+        hot_window_generation = generation
+
+# Trava da importação, comum a todos os workers do serve.py (e às threads de cada um)
+IMPORT_LOCK_FILE = partition_store.DB_PATH + '.import.lock'
+
+@contextmanager
+def import_lock():
+    """flock exclusivo de IMPORT_LOCK_FILE; produz False se outra importação está em andamento"""
+    with open(IMPORT_LOCK_FILE, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 @app.route('/api/update-data')
 def api_update_data():
     """API para atualizar dados do Pi-hole"""
+    # Uma importação por vez: o estado do detector e as marcas d'água têm um único escritor
+    with import_lock() as acquired:
+        if not acquired:
+            return jsonify({'success': False, 'error': 'Já existe uma importação em andamento'})
+        return import_data()
+
+def import_data():
+    """Importa as fontes, compacta, aplica as retenções e avalia as anomalias (sob import_lock)"""
+    dashboard_cache.set_meta('update_started_at', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
     try:
-        # Verificar se é primeira atualização (banco vazio)
-        conn = sqlite3.connect('pihole_logs.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM queries")
-        current_count = cursor.fetchone()[0]
+        conn = partition_store.connect()
+        current_count = partition_store.count_rows(conn)
         
         # Obter horário atual para limitar importação
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        # Se banco vazio, pegar dados até o horário atual
-        if current_count == 0:
-            print(f"🔄 Primeira atualização: Importando dados até {current_time}...")
-            # Converter horário local para UTC para a query
-            current_utc = (datetime.strptime(current_time, '%Y-%m-%d %H:%M:%S') + timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')
-            command = f"sqlite3 /etc/pihole/pihole-FTL.db 'SELECT datetime(timestamp, \"unixepoch\"), domain, client, status FROM queries WHERE datetime(timestamp, \"unixepoch\") <= \"{current_utc}\" ORDER BY timestamp DESC;'"
-        else:
-            # Pegar apenas registros mais recentes que o último no banco local, mas até o horário atual
-            cursor.execute("SELECT MAX(timestamp) FROM queries")
-            last_timestamp = cursor.fetchone()[0]
-            if last_timestamp:
-                print(f"🔄 Atualização incremental: Importando registros após {last_timestamp} até {current_time}...")
-                # Converter horário local para UTC para a query
-                current_utc = (datetime.strptime(current_time, '%Y-%m-%d %H:%M:%S') + timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')
-                command = f"sqlite3 /etc/pihole/pihole-FTL.db 'SELECT datetime(timestamp, \"unixepoch\"), domain, client, status FROM queries WHERE timestamp > (SELECT strftime(\"%s\", \"{last_timestamp}\")) AND datetime(timestamp, \"unixepoch\") <= \"{current_utc}\" ORDER BY timestamp DESC;'"
-            else:
-                print(f"🔄 Atualização: Importando dados das últimas 24 horas até {current_time}...")
-                # Converter horário local para UTC para a query
-                current_utc = (datetime.strptime(current_time, '%Y-%m-%d %H:%M:%S') + timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')
-                command = f"sqlite3 /etc/pihole/pihole-FTL.db 'SELECT datetime(timestamp, \"unixepoch\"), domain, client, status FROM queries WHERE timestamp >= strftime(\"%s\", \"now\", \"-24 hours\") AND datetime(timestamp, \"unixepoch\") <= \"{current_utc}\" ORDER BY timestamp DESC;'"
+        # Carregar configurações
+        settings = load_alert_settings()
+        retention_days = settings['data_retention_days']
         
-        conn.close()
+        # Cada Pi-hole é buscado em paralelo a partir da sua própria marca d'água
+        sources = ingest.load_sources()
+        batch = MinuteBatch()
         
-        # Conectar ao servidor Pi-hole via SSH
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        def feed_detector(rows):
+            # Só as linhas inseridas nesta importação (ver ingest.sync_sources)
+            for timestamp, domain, client, _, _ in rows:
+                batch.add(timestamp, domain, client)
+            hot_window.append(rows)
+            # Linhas de horas já compactadas (fonte que estava fora do ar)
+            aggregates.add_late_rows(conn, rows)
         
-        ssh.connect(
-            SSH_CONFIG['host'],
-            port=SSH_CONFIG.get('port', 22),
-            username=SSH_CONFIG['username'],
-            password=SSH_CONFIG['password']
-        )
+        print(f"🔄 Importando {len(sources)} fonte(s) até {current_time}...")
+        with profiling.phase('ssh'):
+            results = ingest.sync_sources(conn, sources, current_time, ingest.max_workers(), feed_detector)
         
-        # Executar comando para obter dados do Pi-hole FTL
-        stdin, stdout, stderr = ssh.exec_command(command)
-        output = stdout.read().decode('utf-8')
-        error = stderr.read().decode('utf-8')
+        failed = {source_id: result['error'] for source_id, result in results.items() if result['error']}
+        if len(failed) == len(sources):
+            conn.close()
+            return jsonify({'success': False, 'error': 'Erro SSH: ' + '; '.join(
+                f"{source_id}: {error}" for source_id, error in failed.items()), 'sources': results})
         
-        ssh.close()
+        inserted_count = sum(result['inserted'] for result in results.values())
+        skipped_future = sum(result['skipped_future'] for result in results.values())
         
-        if error:
-            return jsonify({'success': False, 'error': f'Erro SSH: {error}'})
+        print(f"✅ Importação concluída: {inserted_count} inseridos, {skipped_future} futuros ignorados")
         
-        # Processar dados e inserir no banco local
-        conn = sqlite3.connect('pihole_logs.db')
-        cursor = conn.cursor()
+        # Compactar as horas fechadas em agregados antes de aplicar as retenções
+        aggregates.compact(conn)
         
-        # Carregar configurações
-        settings = load_alert_settings()
-        retention_days = settings.get('data_retention_days', DATA_RETENTION_DAYS)
-        
-        # Limpar dados antigos baseado na configuração
-        cursor.execute(f"DELETE FROM queries WHERE timestamp < datetime('now', '-{retention_days} days')")
-        
-        # Inserir novos dados
-        lines = output.strip().split('\n')
-        inserted_count = 0
-        skipped_future = 0
-        
-        print(f"🔄 Processando {len(lines)} linhas de dados...")
-        
-        for line in lines:
-            if line.strip():
-                try:
-                    parts = line.split('|')
-                    if len(parts) >= 4:
-                        timestamp, domain, client, status = parts[:4]
-                        
-                        # Verificar se o timestamp não é futuro
-                        # Converter timestamp para datetime para comparação
-                        try:
-                            timestamp_dt = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
-                            current_dt = datetime.strptime(current_time, '%Y-%m-%d %H:%M:%S')
-                            
-                            # O Pi-hole usa UTC, então precisamos converter para horário local
-                            # Subtrair 3 horas para converter UTC para horário local (-03)
-                            timestamp_local = timestamp_dt - timedelta(hours=3)
-                            
-                            # Verificar se o timestamp convertido não é futuro
-                            if timestamp_local <= current_dt + timedelta(hours=1):
-                                # Mapear status do Pi-hole para nosso formato
-                                # Status 1 = bloqueado, outros = permitido
-                                mapped_status = 'blocked' if status == '1' else 'allowed'
-                                
-                                # Inserir no banco local com timestamp convertido para horário local
-                                local_timestamp = timestamp_local.strftime('%Y-%m-%d %H:%M:%S')
-                                
-                                cursor.execute("""
-                                    INSERT OR IGNORE INTO queries (timestamp, domain, client, status)
-                                    VALUES (?, ?, ?, ?)
-                                """, (local_timestamp, domain, client, mapped_status))
-                                inserted_count += 1
-                                
-                                if inserted_count % 1000 == 0:
-                                    print(f"✅ Processados {inserted_count} registros...")
-                            else:
-                                skipped_future += 1
-                                if skipped_future <= 5:  # Log apenas os primeiros 5
-                                    print(f"⚠️ Ignorando registro futuro: {timestamp} (convertido: {local_timestamp}, atual: {current_time})")
-                        except ValueError as e:
-                            print(f"⚠️ Erro ao processar timestamp: {timestamp} - {e}")
-                            continue
-                except Exception as e:
-                    print(f"Erro ao processar linha: {line} - {e}")
-                    continue
+        # Limpar dados brutos antigos (partições inteiras), preservando o que ainda não foi compactado
+        partition_store.drop_expired(conn, retention_days, keep_from=aggregates.raw_safe_until(conn))
+        aggregates.apply_retention(conn, settings['hourly_retention_days'], settings['daily_retention_days'])
         
-        print(f"✅ Importação concluída: {inserted_count} inseridos, {skipped_future} futuros ignorados")
+        # Dias fechados mais antigos que archive_after_days vão para o arquivo comprimido
+        archived_days = []
+        if settings['archive_after_days'] < retention_days:
+            archived_days = partition_store.archive_closed_days(conn, settings['archive_after_days'])
+        
+        # Relatórios dos dias/semanas que acabaram de fechar (renderizados uma única vez)
+        new_reports = []
+        if settings['reports_enabled']:
+            try:
+                new_reports = reports.generate_due_reports(conn, settings, on_generated=deliver_report)
+            except Exception as e:
+                logger.error(f"❌ Erro ao gerar relatórios: {e}")
         
-        conn.commit()
         conn.close()
         
+        # Avaliar anomalias nos minutos recém-importados
+        new_alerts = []
+        try:
+            # O estado em memória é o do fork (ou da última importação deste
+            # worker); a última importação pode ter rodado em outro worker
+            detector.load()
+            with metrics.alert_evaluation_seconds.time(engine='anomaly'):
+                new_alerts = detector.process(batch, settings)
+            detector.save()
+            for alert in new_alerts:
+                send_telegram_notification(alert['message'], lambda alert_id=alert['id']: mark_alert_notified(alert_id))
+        except Exception as e:
+            print(f"Erro no detector de anomalias: {e}")
+        
         return jsonify({
             'success': True, 
-            'message': f'Dados atualizados com sucesso! {inserted_count} registros inseridos, {skipped_future} futuros ignorados.',
+            'message': f'Dados atualizados com sucesso! {inserted_count} registros inseridos, {skipped_future} futuros ignorados.'
+                       + (f" Falha em: {', '.join(failed)}." if failed else ''),
             'inserted_count': inserted_count,
             'skipped_future': skipped_future,
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'total_records': current_count + inserted_count,
             'retention_days': retention_days,
-            'current_time': current_time
+            'archived_days': archived_days,
+            'new_reports': [entry['file'] for entry in new_reports],
+            'current_time': current_time,
+            'sources': results,
+            'new_alerts': len(new_alerts)
         })
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
+    finally:
+        # Mesmo uma importação com falha pode ter gravado parte das fontes
+        publish_import()
+        dashboard_cache.set_meta('update_started_at', None)
 
 if __name__ == '__main__':
     app.run(**FLASK_CONFIG) 
\ No newline at end of file
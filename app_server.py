@@ -7,9 +7,15 @@ Acesso direto ao banco SQLite sem SFTP
 import sqlite3
 import logging
 from datetime import datetime, timedelta
+from operator import attrgetter
 from flask import Flask, render_template, request, jsonify
 import os
 from config import FLASK_CONFIG, LOGGING_CONFIG, FILTER_CONFIG
+from log_record import LogRecord, TimestampFormatter
+import profiling
+import fast_json
+import query_budget
+import backends
 
 # Configurar logging
 logging.basicConfig(
@@ -21,8 +27,11 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Configuração do banco
-DB_PATH = "/etc/pihole/pihole-FTL.db"
+# Server-Timing (sql/python/serialize) e registro de consultas lentas
+profiling.init_app(app)
+
+# Configuração do banco (PIHOLE_FTL_DB ou BACKENDS_CONFIG["ftl"]["db_path"]; ex.: testes de carga)
+DB_PATH = backends.ftl_db_path()
 
 def check_database_access():
     """Verifica se conseguimos acessar o banco de dados"""
@@ -44,14 +53,9 @@ def check_database_access():
         logger.error(f"❌ Erro ao acessar banco: {e}")
         return False
 
-def fetch_ftl_data(query="", start_date=None, end_date=None, limit=5000):
-    """Busca dados diretamente do banco SQLite"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # Construir query SQL
-        sql = """
+def build_ftl_query(query="", start_date=None, end_date=None, limit=5000):
+    """SQL e parâmetros da busca no banco FTL (mais recentes primeiro)"""
+    sql = """
         SELECT 
             timestamp,
             type,
@@ -62,56 +66,70 @@ def fetch_ftl_data(query="", start_date=None, end_date=None, limit=5000):
         FROM queries 
         WHERE 1=1
         """
-        params = []
+    params = []
 
-        # Adicionar filtros
-        if query:
-            sql += " AND (domain LIKE ? OR client LIKE ?)"
-            params.extend([f"%{query}%", f"%{query}%"])
+    # Adicionar filtros
+    if query:
+        sql += " AND (domain LIKE ? OR client LIKE ?)"
+        params.extend([f"%{query}%", f"%{query}%"])
 
-        if start_date:
-            sql += " AND timestamp >= ?"
-            params.append(int(start_date.timestamp()))
+    if start_date:
+        sql += " AND timestamp >= ?"
+        params.append(int(start_date.timestamp()))
 
-        if end_date:
-            sql += " AND timestamp <= ?"
-            params.append(int(end_date.timestamp()))
+    if end_date:
+        sql += " AND timestamp <= ?"
+        params.append(int(end_date.timestamp()))
 
-        sql += " ORDER BY timestamp DESC LIMIT ?"
-        params.append(limit)
+    sql += " ORDER BY timestamp DESC LIMIT ?"
+    params.append(limit)
+    return sql, params
+
+def row_to_record(row, format_timestamp):
+    """Linha da tabela queries -> LogRecord (raw_line só é montado na resposta)"""
+    timestamp, query_type, domain, client, status, reply_type = row
+    
+    # Converter timestamp para texto
+    try:
+        timestamp_str = format_timestamp(timestamp)
+    except (ValueError, TypeError, OverflowError, OSError):
+        timestamp_str = "Jan 01 00:00:00"
+    
+    # Garantir que todos os campos são strings
+    return LogRecord(
+        timestamp_str,
+        str(query_type) if query_type is not None else "",
+        str(domain) if domain is not None else "",
+        str(client) if client is not None else "",
+        "blocked" if status == 1 else "allowed",
+        str(reply_type) if reply_type is not None else ""
+    )
+
+def fetch_ftl_data(query="", start_date=None, end_date=None, limit=5000, budget=None):
+    """Busca dados diretamente do banco SQLite
+
+    Com um QueryBudget, a busca para quando o orçamento acaba e devolve as
+    linhas lidas até ali (budget.truncated indica o corte).
+    """
+    try:
+        conn = sqlite3.connect(DB_PATH, factory=profiling.ProfiledConnection)
+        cursor = conn.cursor()
+
+        sql, params = build_ftl_query(query, start_date, end_date, limit)
 
         logger.info(f"🔍 Executando SQL: {sql}")
         logger.info(f"🔍 Parâmetros: {params}")
 
-        # Executar query
-        cursor.execute(sql, params)
-        rows = cursor.fetchall()
+        # Executar query (mais recentes primeiro: um corte ainda traz os registros mais novos)
+        budget = budget or query_budget.QueryBudget()
+        with budget.bind(conn):
+            rows = budget.fetch(cursor) if budget.execute(cursor, sql, params) else []
 
         logger.info(f"📊 Resultados encontrados: {len(rows)}")
 
-        # Converter para formato compatível
-        logs = []
-        for row in rows:
-            timestamp, query_type, domain, client, status, reply_type = row
-            
-            # Converter timestamp para datetime
-            try:
-                dt = datetime.fromtimestamp(timestamp)
-                timestamp_str = dt.strftime("%b %d %H:%M:%S")
-            except (ValueError, TypeError):
-                timestamp_str = "Jan 01 00:00:00"
-                dt = datetime.now()
-            
-            # Garantir que todos os campos são strings
-            logs.append({
-                "timestamp": timestamp_str,
-                "type": str(query_type) if query_type is not None else "",
-                "domain": str(domain) if domain is not None else "",
-                "ip": str(client) if client is not None else "",
-                "status": "blocked" if status == 1 else "allowed",
-                "raw_line": f"{timestamp_str} query[{query_type}] {domain} from {client}",
-                "reply": str(reply_type) if reply_type is not None else ""
-            })
+        # Converter para registros compactos (raw_line só é montado na resposta)
+        format_timestamp = TimestampFormatter("%b %d %H:%M:%S")
+        logs = [row_to_record(row, format_timestamp) for row in rows]
 
         conn.close()
         logger.info(f"✅ Dados carregados: {len(logs)} entradas")
@@ -123,6 +141,60 @@ def fetch_ftl_data(query="", start_date=None, end_date=None, limit=5000):
         logger.error(f"❌ Traceback: {traceback.format_exc()}")
         raise
 
+def stream_ftl_logs(query, start_date, end_date, limit, type_filter="", status_filter="", sort_order="desc",
+                    budget=None):
+    """Resposta em fluxo da busca: o cursor é lido em lotes e cada lote vira um pedaço do JSON
+
+    A consulta é executada antes da resposta (erros de SQL ainda viram 500);
+    total_found/limited vão no final do objeto.
+    """
+    conn = sqlite3.connect(DB_PATH, factory=profiling.ProfiledConnection)
+    budget = (budget or query_budget.QueryBudget()).attach(conn)
+    try:
+        sql, params = build_ftl_query(query, start_date, end_date, limit)
+        if sort_order != "desc":
+            # Os mesmos `limit` registros mais recentes, do mais antigo ao mais novo
+            sql = f"SELECT * FROM ({sql}) ORDER BY timestamp ASC"
+        cursor = conn.cursor()
+        budget.execute(cursor, sql, params)
+    except Exception:
+        conn.close()
+        raise
+    
+    counts = {"fetched": 0, "returned": 0}
+    format_timestamp = TimestampFormatter("%b %d %H:%M:%S")
+    
+    def batches():
+        try:
+            for rows in budget.batches(cursor, fast_json.STREAM_BATCH_ROWS):
+                counts["fetched"] += len(rows)
+                logs = []
+                for row in rows:
+                    log = row_to_record(row, format_timestamp)
+                    if type_filter and log.type != type_filter:
+                        continue
+                    if status_filter and log.status != status_filter:
+                        continue
+                    logs.append(log.to_dict("raw_line", reply=log.reply))
+                counts["returned"] += len(logs)
+                yield logs
+        finally:
+            conn.close()
+            logger.info(f"✅ Logs enviados em fluxo: {counts['returned']} de {counts['fetched']} lidos")
+    
+    def trailer(error):
+        data = {
+            "total_found": counts["returned"],
+            "total_returned": counts["returned"],
+            "limited": counts["fetched"] >= limit
+        }
+        data.update(budget.info())
+        if error:
+            data["error"] = str(error)
+        return data
+    
+    return fast_json.stream_response(fast_json.iter_json(batches(), trailer))
+
 @app.route("/")
 def index():
     """Página principal"""
@@ -231,27 +303,32 @@ def get_logs():
         has_filters = bool(query or type_filter or status_filter or start_date or end_date)
         logger.info(f"🔍 Filtros aplicados: {has_filters}")
         
+        # Limites de tempo e linhas da busca (QUERY_BUDGET_CONFIG["endpoints"]["ftl_logs"])
+        budget = query_budget.QueryBudget.for_endpoint("ftl_logs", request.environ)
+        
+        # ?stream=1: envia os registros conforme são lidos, sem montar a lista inteira
+        if fast_json.wants_stream(request.args):
+            return stream_ftl_logs(query, start_date, end_date, FILTER_CONFIG["max_results"],
+                                   type_filter, status_filter, sort_order, budget)
+        
         # Buscar dados do banco
-        logs = fetch_ftl_data(query, start_date, end_date, FILTER_CONFIG["max_results"])
+        logs = fetch_ftl_data(query, start_date, end_date, FILTER_CONFIG["max_results"], budget)
         
         # Aplicar filtros adicionais
         filtered_logs = []
         for log in logs:
             # Filtro por tipo
-            if type_filter and log.get("type") != type_filter:
+            if type_filter and log.type != type_filter:
                 continue
             
             # Filtro por status
-            if status_filter and log.get("status") != status_filter:
+            if status_filter and log.status != status_filter:
                 continue
             
             filtered_logs.append(log)
         
         # Ordenar por timestamp
-        if sort_order == "desc":
-            filtered_logs.sort(key=lambda x: x["timestamp"], reverse=True)
-        else:
-            filtered_logs.sort(key=lambda x: x["timestamp"])
+        filtered_logs.sort(key=attrgetter("timestamp"), reverse=sort_order == "desc")
         
         # Limitar resultados se necessário
         total_found = len(filtered_logs)
@@ -263,13 +340,20 @@ def get_logs():
         
         # Retornar resposta
         response_data = {
-            "logs": filtered_logs,
             "total_found": total_found,
             "total_returned": len(filtered_logs),
             "limited": total_found > len(filtered_logs)
         }
+        response_data.update(budget.info())
+        if fast_json.wants_columnar(request.args):
+            # raw_line é montado a partir das outras colunas; o navegador refaz se precisar
+            response_data["format"] = "columnar"
+            response_data["logs"] = fast_json.columnar(
+                filtered_logs, ("timestamp", "type", "domain", "ip", "status", "reply"))
+        else:
+            response_data["logs"] = [log.to_dict("raw_line", reply=log.reply) for log in filtered_logs]
         
-        return jsonify(response_data)
+        return fast_json.response(response_data)
 
     except Exception as e:
         logger.error(f"❌ ERRO AO PROCESSAR LOGS: {e}")
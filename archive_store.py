@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Camada de arquivo frio em formato colunar comprimido
+Cada dia fechado vira um arquivo .npz com as colunas comprimidas (horário em
+segundos do dia, domínio, cliente e fonte codificados por dicionário, status em
+1 byte) e um .json ao lado com os metadados usados para poda (intervalo de
+horários, quantidade de linhas, tamanho dos dicionários e fontes presentes)
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+ARCHIVE_DIR = 'archive'
+
+# Versão 2 acrescentou a coluna `source` (arquivos v1 são lidos como 'default')
+FORMAT_VERSION = 2
+
+DEFAULT_SOURCE = 'default'
+
+# Separador dos dicionários (não aparece em domínios nem em endereços de clientes)
+DICT_SEPARATOR = '\n'
+
+# Linhas decodificadas por vez em iter_rows (limita a memória ao ler um dia inteiro)
+READ_CHUNK_ROWS = 50000
+
+STATUS_CODES = {'allowed': 0, 'blocked': 1}
+STATUS_NAMES = np.array(['allowed', 'blocked'], dtype=object)
+
+def archive_paths(day, archive_dir=ARCHIVE_DIR):
+    """Caminhos (dados, metadados) do arquivo de um dia 'AAAA-MM-DD'"""
+    base = os.path.join(archive_dir, f"queries_{str(day).replace('-', '')}")
+    return base + '.npz', base + '.json'
+
+def _encode_dictionary(values):
+    """Codifica uma coluna de texto em (códigos, dicionário)"""
+    index = {}
+    codes = np.fromiter((index.setdefault(value or '', len(index)) for value in values),
+                        dtype=np.uint32, count=len(values))
+    return codes, list(index)
+
+def _pack_dictionary(entries):
+    return np.frombuffer(DICT_SEPARATOR.join(entries).encode('utf-8'), dtype=np.uint8)
+
+def _unpack_dictionary(packed):
+    return np.array(packed.tobytes().decode('utf-8').split(DICT_SEPARATOR), dtype=object)
+
+def _atomic_write(path, writer):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.archive.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            writer(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_archive(day, rows, archive_dir=ARCHIVE_DIR):
+    """Grava as linhas (timestamp, domain, client, status, source) de um dia
+
+    Retorna os metadados gravados no .json. As linhas devem ser todas do mesmo
+    dia; elas são ordenadas por horário antes de serem gravadas.
+    """
+    if not rows:
+        raise ValueError(f"Nenhum registro para arquivar em {day}")
+
+    os.makedirs(archive_dir, exist_ok=True)
+    data_path, meta_path = archive_paths(day, archive_dir)
+    rows = sorted(rows, key=lambda row: row[0])
+
+    timestamps = [row[0] for row in rows]
+    seconds = np.fromiter((int(ts[11:13]) * 3600 + int(ts[14:16]) * 60 + int(ts[17:19])
+                           for ts in timestamps), dtype=np.uint32, count=len(rows))
+    domain_codes, domains = _encode_dictionary([row[1] for row in rows])
+    client_codes, clients = _encode_dictionary([row[2] for row in rows])
+    status = np.fromiter((STATUS_CODES.get(row[3], 0) for row in rows),
+                         dtype=np.uint8, count=len(rows))
+    source_codes, sources = _encode_dictionary([row[4] or DEFAULT_SOURCE for row in rows])
+
+    _atomic_write(data_path, lambda f: np.savez_compressed(
+        f,
+        seconds=seconds,
+        domain=domain_codes,
+        client=client_codes,
+        status=status,
+        source=source_codes,
+        domain_dict=_pack_dictionary(domains),
+        client_dict=_pack_dictionary(clients),
+        source_dict=_pack_dictionary(sources)
+    ))
+
+    metadata = {
+        'version': FORMAT_VERSION,
+        'day': str(day),
+        'rows': len(rows),
+        'min_ts': timestamps[0],
+        'max_ts': timestamps[-1],
+        'blocked': int(status.sum()),
+        'domains': len(domains),
+        'clients': len(clients),
+        'sources': sources,
+        'bytes': os.path.getsize(data_path)
+    }
+    _atomic_write(meta_path, lambda f: f.write(json.dumps(metadata, indent=2).encode('utf-8')))
+    return metadata
+
+def read_metadata(day, archive_dir=ARCHIVE_DIR):
+    """Metadados de um dia arquivado (None se não houver arquivo)"""
+    _, meta_path = archive_paths(day, archive_dir)
+    try:
+        with open(meta_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _matching_codes(dictionary, needle):
+    """Códigos cujo valor contém `needle` (mesma semântica do LIKE '%x%')"""
+    needle = needle.lower()
+    return np.fromiter((i for i, value in enumerate(dictionary) if needle in value.lower()),
+                       dtype=np.uint32)
+
+def iter_rows(data_path, day, domain_like=None, client_like=None, source=None, chunk_rows=READ_CHUNK_ROWS):
+    """Decodifica as linhas de um arquivo em listas de até `chunk_rows`, opcionalmente filtradas
+
+    Os filtros são avaliados primeiro nos dicionários: se nenhum valor casar,
+    as colunas de dados nem chegam a ser descomprimidas. As colunas ficam em
+    arrays compactos; só o bloco corrente vira tuplas Python.
+    """
+    with np.load(data_path) as data:
+        mask = None
+        if 'source' in data.files:
+            source_names = _unpack_dictionary(data['source_dict'])
+            source_codes = data['source']
+        else:
+            source_names = np.array([DEFAULT_SOURCE], dtype=object)
+            source_codes = np.zeros(data['seconds'].shape, dtype=np.uint32)
+        if source:
+            matches = np.flatnonzero(source_names == source)
+            if matches.size == 0:
+                return
+            mask = source_codes == matches[0]
+        for column, needle in (('domain', domain_like), ('client', client_like)):
+            if not needle:
+                continue
+            codes = _matching_codes(_unpack_dictionary(data[f'{column}_dict']), needle)
+            if codes.size == 0:
+                return
+            column_mask = np.isin(data[column], codes)
+            mask = column_mask if mask is None else mask & column_mask
+
+        seconds = data['seconds']
+        domain_codes = data['domain']
+        client_codes = data['client']
+        status = data['status']
+        if mask is not None:
+            seconds, domain_codes = seconds[mask], domain_codes[mask]
+            client_codes, status = client_codes[mask], status[mask]
+            source_codes = source_codes[mask]
+        if seconds.size == 0:
+            return
+
+        domain_names = _unpack_dictionary(data['domain_dict'])
+        client_names = _unpack_dictionary(data['client_dict'])
+
+    for offset in range(0, seconds.size, chunk_rows):
+        part = slice(offset, offset + chunk_rows)
+        # Formata cada segundo distinto do bloco uma única vez
+        unique_seconds, inverse = np.unique(seconds[part], return_inverse=True)
+        labels = np.array([f"{day} {s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}"
+                           for s in unique_seconds.tolist()], dtype=object)
+        yield list(zip(labels[inverse].tolist(), domain_names[domain_codes[part]].tolist(),
+                       client_names[client_codes[part]].tolist(), STATUS_NAMES[status[part]].tolist(),
+                       source_names[source_codes[part]].tolist()))
+
+def read_rows(data_path, day, domain_like=None, client_like=None, source=None):
+    """Todas as linhas (filtradas) de um arquivo em uma única lista; veja iter_rows"""
+    return [row for chunk in iter_rows(data_path, day, domain_like, client_like, source) for row in chunk]
+
+def delete_archive(day, archive_dir=ARCHIVE_DIR):
+    """Remove os arquivos de um dia"""
+    for path in archive_paths(day, archive_dir):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
@@ -9,7 +9,10 @@ import logging
 import requests
 import subprocess
 import os
+import signal
+import threading
 from datetime import datetime
+from settings_service import SettingsService
 
 # Configurar logging
 logging.basicConfig(
@@ -55,7 +58,7 @@ def check_application_status():
         return False
 
 def start_application():
-    """Inicia a aplicação se não estiver rodando"""
+    """Inicia a aplicação se não estiver rodando; True se foi iniciada aqui"""
     try:
         # Verificar se a aplicação está rodando
         if not check_application_status():
@@ -67,8 +70,8 @@ def start_application():
             # Ativar ambiente virtual
             activate_cmd = "source venv/bin/activate"
             
-            # Iniciar aplicação em background
-            start_cmd = f"{activate_cmd} && nohup python3 app_local_db.py > app.log 2>&1 &"
+            # Iniciar aplicação em background (servidor prefork, veja serve.py)
+            start_cmd = f"{activate_cmd} && nohup python3 serve.py app_local_db > app.log 2>&1 &"
             
             subprocess.run(start_cmd, shell=True, check=True)
             
@@ -77,6 +80,7 @@ def start_application():
             
             if check_application_status():
                 logger.info("✅ Aplicação iniciada com sucesso!")
+                return True
             else:
                 logger.error("❌ Falha ao iniciar aplicação")
         else:
@@ -85,8 +89,23 @@ def start_application():
     except Exception as e:
         logger.error(f"❌ Erro ao iniciar aplicação: {e}")
 
-def get_update_interval():
+def stop_application(pid_file='serve.pid'):
+    """Encerra o servidor (SIGTERM: as requisições em andamento terminam antes)"""
+    try:
+        with open(pid_file) as f:
+            pid = int(f.read().strip())
+        os.kill(pid, signal.SIGTERM)
+        logger.info(f"🛑 Servidor {pid} encerrando...")
+    except (FileNotFoundError, ProcessLookupError, ValueError):
+        pass
+    except Exception as e:
+        logger.error(f"❌ Erro ao encerrar aplicação: {e}")
+
+def get_update_interval(settings_service=None):
     """Lê o intervalo de atualização da configuração"""
+    if settings_service is not None:
+        return settings_service.get().update_interval
+    
     try:
         # Tentar ler da configuração via API
         response = requests.get('http://localhost:8082/api/config', timeout=5)
@@ -101,6 +120,12 @@ def get_update_interval():
     # Valor padrão se não conseguir ler
     return 30
 
+def schedule_updates(interval):
+    """(Re)agenda a atualização periódica"""
+    schedule.clear('update')
+    schedule.every(interval).minutes.do(update_pihole_data).tag('update')
+    logger.info(f"⏰ Atualizações a cada {interval} minutos")
+
 def main():
     """Função principal"""
     logger.info("🚀 Iniciando Script de Atualização Automática")
@@ -111,14 +136,21 @@ def main():
         return
     
     # Iniciar aplicação se necessário
-    start_application()
+    started_here = start_application()
     
-    # Obter intervalo de atualização
-    interval = get_update_interval()
-    logger.info(f"⏰ Atualizações a cada {interval} minutos")
+    # Configurações observadas: mudanças no intervalo são aplicadas sem reiniciar
+    settings_service = SettingsService('alert_settings.json')
+    settings_service.start_watcher()
+    interval_changed = threading.Event()
+    
+    def on_settings_changed(old, new):
+        if old.update_interval != new.update_interval:
+            interval_changed.set()
+    
+    settings_service.subscribe(on_settings_changed)
     
     # Agendar atualizações
-    schedule.every(interval).minutes.do(update_pihole_data)
+    schedule_updates(get_update_interval(settings_service))
     
     # Executar primeira atualização imediatamente
     logger.info("🔄 Executando primeira atualização...")
@@ -128,11 +160,17 @@ def main():
     logger.info("⏰ Aguardando próximas atualizações...")
     while True:
         try:
+            if interval_changed.is_set():
+                interval_changed.clear()
+                schedule_updates(get_update_interval(settings_service))
+            
             schedule.run_pending()
             time.sleep(60)  # Verificar a cada minuto
             
         except KeyboardInterrupt:
             logger.info("🛑 Script interrompido pelo usuário")
+            if started_here:
+                stop_application()
             break
         except Exception as e:
             logger.error(f"❌ Erro no loop principal: {e}")
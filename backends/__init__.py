@@ -0,0 +1,14 @@
+"""
+Backends de leitura dos registros do Pi-hole
+As três variantes do projeto leem os mesmos dados por caminhos diferentes:
+o banco local particionado (app_local_db.py), o pihole-FTL.db direto no
+Pi-hole (app_server.py) e o pihole-FTL.db remoto via SSH (app.py). Aqui cada
+caminho é um backend com a mesma interface (base.Backend: query, aggregate,
+tail, status) e registros no mesmo formato, e o Router encaminha cada pedido
+ao backend mais rápido que o atende. Configurado por BACKENDS_CONFIG no
+config.py.
+"""
+
+from backends.base import (AGGREGATE, OPERATIONS, QUERY, STATUS, TAIL, Backend, BackendError,
+                           ftl_status, period_bounds)
+from backends.router import REGISTRY, Router, create, ftl_db_path, load_config
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Interface comum dos backends de leitura
+Todo backend devolve registros normalizados no formato do banco local: tuplas
+(timestamp, domain, client, status, source), com o timestamp
+'AAAA-MM-DD HH:MM:SS' no horário do banco local e o status 'blocked' ou
+'allowed', seja qual for a origem (partições locais, pihole-FTL.db direto ou
+via SSH). Os filtros são os de log_export.parse_log_filters. Este módulo não
+importa nada pesado: o roteador o carrega sem carregar os backends.
+"""
+
+from datetime import datetime, timedelta
+
+# Operações
+QUERY = 'query'
+AGGREGATE = 'aggregate'
+TAIL = 'tail'
+STATUS = 'status'
+OPERATIONS = (QUERY, AGGREGATE, TAIL, STATUS)
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Status do FTL contado como bloqueio (a mesma regra da importação)
+FTL_BLOCKED_STATUS = 1
+
+# Agrupamentos aceitos por aggregate()
+AGGREGATE_KINDS = ('domain', 'client')
+
+class BackendError(Exception):
+    """Backend indisponível ou sem suporte à operação"""
+
+def ftl_status(code):
+    """Status do FTL (número ou texto) -> 'blocked'/'allowed'"""
+    return 'blocked' if str(code) == str(FTL_BLOCKED_STATUS) else 'allowed'
+
+def period_bounds(filters):
+    """(início, fim) do período dos filtros em datetime; None onde não há limite
+
+    O início é inclusivo e o fim exclusivo no minuto pedido, como a
+    comparação de texto de log_export.filter_sql ('... 23:59' deixa de fora
+    o último minuto).
+    """
+    start = end = None
+    if filters.get('start_date'):
+        start = datetime.strptime(f"{filters['start_date']} {filters.get('start_time', '00:00')}", '%Y-%m-%d %H:%M')
+    if filters.get('end_date'):
+        end = datetime.strptime(f"{filters['end_date']} {filters.get('end_time', '23:59')}", '%Y-%m-%d %H:%M')
+    return start, end
+
+def day_bounds(start_day, end_day):
+    """[início, fim) dos dias start_day..end_day em datetime"""
+    return (datetime.combine(start_day, datetime.min.time()),
+            datetime.combine(end_day + timedelta(days=1), datetime.min.time()))
+
+class Backend:
+    """Base dos backends; cada um implementa as operações que suporta
+
+    - query(filters, limit, budget): iterador de lotes de registros em ordem
+      cronológica. O comando já foi executado quando query() retorna, para
+      que uma falha ainda permita ao roteador tentar outro backend.
+    - aggregate(start_day, end_day, kind, ...): top [(chave, contagem)] de
+      domínios ou clientes no período.
+    - tail(lines, source): os registros mais recentes, do mais novo ao mais
+      antigo.
+    - status(): dicionário com disponibilidade, volume e período coberto.
+    - covers(operation, start): se o backend tem dados desde `start`.
+    """
+
+    name = None
+
+    def query(self, filters, limit=None, budget=None):
+        raise BackendError(f"{self.name}: query não suportado")
+
+    def aggregate(self, start_day, end_day, kind, blocked_only=False, exclude=None, limit=10, source=None):
+        raise BackendError(f"{self.name}: aggregate não suportado")
+
+    def tail(self, lines=100, source=None):
+        raise BackendError(f"{self.name}: tail não suportado")
+
+    def status(self):
+        raise BackendError(f"{self.name}: status não suportado")
+
+    def covers(self, operation, start):
+        return True
+
+    def close(self):
+        pass
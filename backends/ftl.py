@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Backend do pihole-FTL.db lido diretamente (o mesmo acesso do app_server.py)
+Serve quando a aplicação roda no próprio Pi-hole: o tail é o mais recente
+possível e as buscas alcançam todo o histórico que o FTL guarda, inclusive
+o anterior à retenção do banco local. Os epochs do FTL viram o horário do
+banco local (UTC - UTC_OFFSET_HOURS, como na importação) e o status numérico
+vira 'blocked'/'allowed'. As funções de SQL também são usadas pelo backend
+SSH, que roda as mesmas consultas no Pi-hole remoto.
+"""
+
+import calendar
+import os
+import sqlite3
+from datetime import timedelta
+
+import partition_store
+import profiling
+from backends.base import (AGGREGATE_KINDS, FTL_BLOCKED_STATUS, TIMESTAMP_FORMAT, Backend, BackendError,
+                           day_bounds, ftl_status, period_bounds)
+from backends.router import ftl_db_path
+from log_record import TimestampFormatter, text
+
+FETCH_SIZE = 5000
+
+def to_epoch(moment):
+    """datetime no horário do banco local -> epoch do FTL"""
+    return calendar.timegm((moment + timedelta(hours=partition_store.UTC_OFFSET_HOURS)).timetuple())
+
+def timestamp_formatter():
+    """Epoch do FTL -> 'AAAA-MM-DD HH:MM:SS' no horário do banco local"""
+    return TimestampFormatter(TIMESTAMP_FORMAT, -partition_store.UTC_OFFSET_HOURS * 3600)
+
+def to_records(rows, format_timestamp, source):
+    """Linhas (epoch, domain, client, status) do FTL -> registros normalizados"""
+    return [(format_timestamp(int(epoch)), text(domain), text(client), ftl_status(status), source)
+            for epoch, domain, client, status in rows]
+
+def _period_sql(start, end):
+    sql = ''
+    params = []
+    if start is not None:
+        sql += " AND timestamp >= ?"
+        params.append(to_epoch(start))
+    if end is not None:
+        sql += " AND timestamp < ?"
+        params.append(to_epoch(end))
+    return sql, params
+
+def query_sql(filters, limit=None):
+    """SQL e parâmetros da busca (mesmos filtros de log_export.filter_sql), em ordem cronológica"""
+    sql = "SELECT timestamp, domain, client, status FROM queries WHERE 1=1"
+    params = []
+    if filters.get('ip'):
+        sql += " AND client LIKE ?"
+        params.append(f"%{filters['ip']}%")
+    if filters.get('domain'):
+        sql += " AND domain LIKE ?"
+        params.append(f"%{filters['domain']}%")
+    period, period_params = _period_sql(*period_bounds(filters))
+    sql += period + " ORDER BY timestamp"
+    params += period_params
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql, params
+
+def tail_sql(lines):
+    return "SELECT timestamp, domain, client, status FROM queries ORDER BY timestamp DESC LIMIT ?", [lines]
+
+def aggregate_sql(start_day, end_day, kind, blocked_only=False, exclude=None, limit=10):
+    """Top de domínios/clientes dos dias start_day..end_day"""
+    if kind not in AGGREGATE_KINDS:
+        raise ValueError(f"Agrupamento inválido: {kind}")
+    period, params = _period_sql(*day_bounds(start_day, end_day))
+    sql = f"SELECT {kind}, COUNT(*) AS count FROM queries WHERE 1=1{period}"
+    if blocked_only:
+        sql += " AND status = ?"
+        params.append(FTL_BLOCKED_STATUS)
+    if exclude:
+        sql += f" AND {kind} != ?"
+        params.append(exclude)
+    sql += f" GROUP BY {kind} ORDER BY count DESC LIMIT ?"
+    params.append(limit)
+    return sql, params
+
+STATUS_SQL = "SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM queries"
+
+def status_fields(row, format_timestamp):
+    total, oldest, newest = row
+    return {
+        'total_records': int(total or 0),
+        'oldest_date': format_timestamp(int(oldest)) if oldest else None,
+        'newest_date': format_timestamp(int(newest)) if newest else None
+    }
+
+class FTLBackend(Backend):
+    name = 'ftl'
+
+    def __init__(self, db_path=None, source=partition_store.DEFAULT_SOURCE):
+        self.db_path = db_path or ftl_db_path()
+        self.source = source
+
+    def _connect(self):
+        # sqlite3.connect criaria um banco vazio no lugar de um caminho errado
+        if not os.path.exists(self.db_path):
+            raise BackendError(f"Banco FTL não encontrado: {self.db_path}")
+        return sqlite3.connect(self.db_path, factory=profiling.ProfiledConnection)
+
+    def _other_source(self, source):
+        """True se o pedido é de outra fonte: este banco só tem a própria"""
+        return bool(source) and source != self.source
+
+    def covers(self, operation, start):
+        conn = self._connect()
+        try:
+            oldest = conn.execute("SELECT MIN(timestamp) FROM queries").fetchone()[0]
+        finally:
+            conn.close()
+        return oldest is not None and oldest <= to_epoch(start)
+
+    def query(self, filters, limit=None, budget=None):
+        if self._other_source(filters.get('source')):
+            return iter(())
+        conn = self._connect()
+        try:
+            sql, params = query_sql(filters, limit)
+            cursor = conn.cursor()
+            if budget is None:
+                cursor.execute(sql, params)
+                batches = iter(lambda: cursor.fetchmany(FETCH_SIZE), [])
+            else:
+                budget.attach(conn)
+                batches = budget.batches(cursor, FETCH_SIZE) if budget.execute(cursor, sql, params) else iter(())
+        except Exception:
+            conn.close()
+            raise
+        return self._records(conn, batches)
+
+    def _records(self, conn, batches):
+        format_timestamp = timestamp_formatter()
+        try:
+            for rows in batches:
+                yield to_records(rows, format_timestamp, self.source)
+        finally:
+            conn.close()
+
+    def aggregate(self, start_day, end_day, kind, blocked_only=False, exclude=None, limit=10, source=None):
+        if self._other_source(source):
+            return []
+        sql, params = aggregate_sql(start_day, end_day, kind, blocked_only, exclude, limit)
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def tail(self, lines=100, source=None):
+        if self._other_source(source):
+            return []
+        conn = self._connect()
+        try:
+            rows = conn.execute(*tail_sql(lines)).fetchall()
+        finally:
+            conn.close()
+        return to_records(rows, timestamp_formatter(), self.source)
+
+    def status(self):
+        conn = self._connect()
+        try:
+            row = conn.execute(STATUS_SQL).fetchone()
+        finally:
+            conn.close()
+        return dict(status_fields(row, timestamp_formatter()), available=True, path=self.db_path,
+                    source=self.source)
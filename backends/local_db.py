@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Backend do banco local particionado (o mesmo do app_local_db.py)
+As buscas leem as partições do período (dias arquivados inclusive) e os
+agregados vêm de agg_hourly/agg_daily quando os brutos não cobrem o período.
+Os dados só vão até a última importação.
+"""
+
+import itertools
+
+import aggregates
+import log_export
+import metrics
+import partition_store
+from backends.base import AGGREGATE, QUERY, Backend
+
+class LocalDBBackend(Backend):
+    name = 'local_db'
+
+    def __init__(self, db_path=partition_store.DB_PATH):
+        self.db_path = db_path
+
+    def _first_day(self, conn, operation):
+        """Primeiro dia com dados para a operação ('AAAA-MM-DD' ou None)"""
+        days = [conn.execute("SELECT MIN(day) FROM partitions").fetchone()[0]]
+        if operation == AGGREGATE:
+            days.append(conn.execute("SELECT substr(MIN(bucket), 1, 10) FROM agg_hourly").fetchone()[0])
+            days.append(conn.execute("SELECT substr(MIN(bucket), 1, 10) FROM agg_daily").fetchone()[0])
+        days = [day for day in days if day]
+        return min(days) if days else None
+
+    def covers(self, operation, start):
+        if operation not in (QUERY, AGGREGATE):
+            return True
+        conn = partition_store.connect(self.db_path)
+        try:
+            first_day = self._first_day(conn, operation)
+        finally:
+            conn.close()
+        return first_day is not None and first_day <= start.date().isoformat()
+
+    def query(self, filters, limit=None, budget=None):
+        batches = log_export.iter_log_batches(filters, limit, self.db_path, budget)
+        # O gerador só executa ao avançar: o primeiro lote é lido aqui, para que
+        # um erro (tabela ausente, banco travado) chegue ao roteador antes de a
+        # resposta começar
+        try:
+            first = next(batches)
+        except StopIteration:
+            return iter(())
+        return itertools.chain([first], batches)
+
+    def aggregate(self, start_day, end_day, kind, blocked_only=False, exclude=None, limit=10, source=None):
+        conn = partition_store.connect(self.db_path)
+        try:
+            rows, _ = aggregates.query_top(conn, start_day, end_day, kind, blocked_only, exclude, limit,
+                                           source=source)
+            return rows
+        finally:
+            conn.close()
+
+    def tail(self, lines=100, source=None):
+        conn = partition_store.connect(self.db_path)
+        try:
+            table = partition_store.recent_source(conn)
+            with metrics.timed_query('logs.recent'):
+                return conn.execute(f"""
+                    SELECT {', '.join(partition_store.QUERY_COLUMNS)}
+                    FROM {table}
+                    {'WHERE source = ?' if source else ''}
+                    ORDER BY timestamp DESC
+                    LIMIT ?
+                """, ([source] if source else []) + [lines]).fetchall()
+        finally:
+            conn.close()
+
+    def status(self):
+        conn = partition_store.connect(self.db_path)
+        try:
+            first_day = self._first_day(conn, AGGREGATE)
+            raw_day, partitions, archived = conn.execute("""
+                SELECT MIN(day), COUNT(*), COUNT(archive_path) FROM partitions
+            """).fetchone()
+            return {
+                'available': True,
+                'path': self.db_path,
+                'total_records': partition_store.count_rows(conn),
+                'oldest_date': f"{raw_day} 00:00:00" if raw_day else None,
+                'oldest_aggregate_date': f"{first_day} 00:00:00" if first_day else None,
+                'newest_date': partition_store.last_timestamp(conn),
+                'partitions': partitions,
+                'archived_partitions': archived
+            }
+        finally:
+            conn.close()
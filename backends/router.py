@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Roteamento das leituras entre os backends
+Cada backend registrado declara o custo relativo das operações que suporta
+(menor = mais rápido). Para cada pedido o roteador tenta, em ordem de custo,
+os backends que têm dados desde o início do período; os que não cobrem o
+período ficam por último. Uma falha passa ao próximo candidato. Os backends
+(e os módulos que eles importam, como paramiko e NumPy) só são carregados
+quando são escolhidos pela primeira vez.
+"""
+
+import importlib
+import logging
+import os
+import threading
+
+import metrics
+from backends.base import AGGREGATE, QUERY, STATUS, TAIL, BackendError, day_bounds, period_bounds
+
+logger = logging.getLogger(__name__)
+
+# Nome -> (módulo, classe, custo de cada operação suportada)
+REGISTRY = {
+    # Partições locais e agregados: o mais rápido para agregados e buscas
+    # no período importado; o tail fica atrasado até a próxima importação
+    'local_db': ('backends.local_db', 'LocalDBBackend', {AGGREGATE: 1, QUERY: 2, TAIL: 5, STATUS: 1}),
+    # pihole-FTL.db lido direto (no próprio Pi-hole): o tail mais recente e o
+    # histórico inteiro que o FTL guarda, com agregados por varredura
+    'ftl': ('backends.ftl', 'FTLBackend', {TAIL: 1, QUERY: 3, AGGREGATE: 4, STATUS: 2}),
+    # pihole-FTL.db remoto via sqlite3 por SSH: último recurso
+    'ssh': ('backends.ssh', 'SSHBackend', {TAIL: 3, QUERY: 5, AGGREGATE: 6, STATUS: 3})
+}
+
+DEFAULT_CONFIG = {
+    # Backends usados, por nome do REGISTRY
+    'enabled': ['local_db'],
+    # Custos próprios, ex.: {"ssh": {"tail": 1}}
+    'costs': {},
+    # Opções de cada backend (repassadas ao construtor)
+    'local_db': {},
+    'ftl': {},
+    'ssh': {}
+}
+
+DEFAULT_FTL_DB = '/etc/pihole/pihole-FTL.db'
+
+def load_config():
+    """BACKENDS_CONFIG do config.py sobre os padrões"""
+    try:
+        import config
+        overrides = getattr(config, 'BACKENDS_CONFIG', {})
+    except ImportError:
+        overrides = {}
+    return dict(DEFAULT_CONFIG, **overrides)
+
+def ftl_db_path():
+    """pihole-FTL.db local: PIHOLE_FTL_DB, BACKENDS_CONFIG["ftl"]["db_path"] ou o caminho padrão"""
+    return (os.environ.get('PIHOLE_FTL_DB') or load_config()['ftl'].get('db_path')
+            or DEFAULT_FTL_DB)
+
+def create(name, **options):
+    """Instancia o backend `name`, importando o módulo só agora"""
+    if name not in REGISTRY:
+        raise ValueError(f"Backend desconhecido: {name}")
+    module_name, class_name, _ = REGISTRY[name]
+    return getattr(importlib.import_module(module_name), class_name)(**options)
+
+class Router:
+    """Escolhe o backend de cada operação; veja o docstring do módulo"""
+
+    def __init__(self, names, options=None, costs=None):
+        unknown = [name for name in names if name not in REGISTRY]
+        if unknown:
+            raise ValueError(f"Backends desconhecidos: {', '.join(unknown)}")
+        options = options or {}
+        costs = costs or {}
+        self.names = list(names)
+        self.options = {name: options.get(name, {}) for name in self.names}
+        self.costs = {name: dict(REGISTRY[name][2], **costs.get(name, {})) for name in self.names}
+        self._backends = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        config = load_config()
+        return cls(config['enabled'], {name: config.get(name, {}) for name in REGISTRY}, config['costs'])
+
+    def capabilities(self):
+        """{backend: {operação: custo}}"""
+        return {name: dict(self.costs[name]) for name in self.names}
+
+    def backend(self, name):
+        """Instância do backend (criada no primeiro uso)"""
+        with self._lock:
+            if name not in self._backends:
+                self._backends[name] = create(name, **self.options[name])
+            return self._backends[name]
+
+    def candidates(self, operation):
+        """Backends que suportam a operação, do mais barato ao mais caro"""
+        names = [name for name in self.names if operation in self.costs[name]]
+        return sorted(names, key=lambda name: self.costs[name][operation])
+
+    def route(self, operation, start=None):
+        """Backends na ordem de tentativa
+
+        Os que cobrem `start` vêm primeiro (por custo); a cobertura só é
+        verificada até o primeiro candidato ser aceito, então os backends
+        mais caros nem chegam a ser carregados.
+        """
+        names = self.candidates(operation)
+        if not names:
+            raise BackendError(f"Nenhum backend habilitado suporta {operation}")
+        uncovered = []
+        for name in names:
+            try:
+                covered = start is None or self.backend(name).covers(operation, start)
+            except Exception as e:
+                logger.warning(f"⚠️ Backend {name} indisponível: {e}")
+                continue
+            if covered:
+                yield name
+            else:
+                uncovered.append(name)
+        yield from uncovered
+
+    def call(self, operation, *args, start=None, **kwargs):
+        """(backend, resultado) do primeiro backend que atender a operação"""
+        errors = []
+        for name in self.route(operation, start):
+            try:
+                result = getattr(self.backend(name), operation)(*args, **kwargs)
+            except Exception as e:
+                logger.warning(f"⚠️ {operation} falhou em {name}: {e}")
+                metrics.backend_requests.inc(backend=name, operation=operation, result='error')
+                errors.append(f"{name}: {e}")
+                continue
+            metrics.backend_requests.inc(backend=name, operation=operation, result='ok')
+            return name, result
+        raise BackendError('; '.join(errors) or f"Nenhum backend disponível para {operation}")
+
+    def query(self, filters, limit=None, budget=None):
+        """(backend, lotes) da busca; o período escolhe quem tem o histórico"""
+        start, _ = period_bounds(filters)
+        return self.call(QUERY, filters, limit, budget, start=start)
+
+    def aggregate(self, start_day, end_day, kind, blocked_only=False, exclude=None, limit=10, source=None):
+        start, _ = day_bounds(start_day, end_day)
+        return self.call(AGGREGATE, start_day, end_day, kind, blocked_only, exclude, limit, source, start=start)
+
+    def tail(self, lines=100, source=None):
+        return self.call(TAIL, lines, source)
+
+    def status(self):
+        """Estado de cada backend habilitado (carrega todos)"""
+        result = {}
+        for name in self.names:
+            entry = {'capabilities': self.costs[name]}
+            try:
+                entry.update(self.backend(name).status())
+            except Exception as e:
+                entry.update({'available': False, 'error': str(e)})
+            result[name] = entry
+        return result
+
+    def close(self):
+        with self._lock:
+            for backend in self._backends.values():
+                backend.close()
+            self._backends.clear()
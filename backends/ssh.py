@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Backend do pihole-FTL.db remoto via SSH (o mesmo Pi-hole do app.py)
+Em vez de copiar o banco inteiro, roda as consultas do backend FTL no próprio
+Pi-hole com o sqlite3 (como a importação) e lê só as linhas pedidas. Os
+parâmetros vão como literais SQL escapados, e o comando inteiro é citado
+para o shell. Cada operação abre uma conexão SSH: o roteador só chega aqui
+quando nenhum backend local atende.
+"""
+
+import shlex
+
+import ingest
+import profiling
+from backends import ftl
+from backends.base import Backend, BackendError
+
+def sql_literal(value):
+    """Parâmetro -> literal SQL (números como estão, textos entre aspas simples escapadas)"""
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def inline(sql, params):
+    """Substitui os '?' pelos literais (os comandos daqui não têm '?' fora dos parâmetros)"""
+    parts = sql.split('?')
+    if len(parts) != len(params) + 1:
+        raise ValueError('Número de parâmetros não confere com o SQL')
+    return parts[0] + ''.join(sql_literal(param) + part for param, part in zip(params, parts[1:]))
+
+class SSHBackend(Backend):
+    name = 'ssh'
+
+    def __init__(self, source=None, **overrides):
+        sources = ingest.load_sources()
+        if source is None:
+            selected = sources[0]
+        else:
+            selected = next((item for item in sources if item['id'] == source), None)
+            if selected is None:
+                raise BackendError(f"Fonte desconhecida: {source}")
+        self.config = dict(selected, **overrides)
+        self.source = self.config['id']
+        self.db_path = self.config.get('db_path', ingest.DEFAULT_FTL_DB)
+
+    def _run(self, sql, params):
+        """Linhas (campos separados por '|') da consulta executada no Pi-hole"""
+        command = f"sqlite3 {shlex.quote(self.db_path)} {shlex.quote(inline(sql, params))}"
+        try:
+            with profiling.phase('ssh'):
+                output = ingest.fetch_source(self.config, command)
+        except Exception as e:
+            raise BackendError(f"{self.source}: {e}") from e
+        return [line.split('|') for line in output.splitlines() if line.strip()]
+
+    def _records(self, sql, params):
+        rows = [row[:4] for row in self._run(sql, params) if len(row) >= 4]
+        return ftl.to_records(rows, ftl.timestamp_formatter(), self.source)
+
+    def query(self, filters, limit=None, budget=None):
+        # O orçamento não alcança o sqlite3 remoto: só o limite de linhas vale aqui
+        if budget is not None and budget.rows is not None:
+            limit = budget.rows if limit is None else min(limit, budget.rows)
+        if filters.get('source') and filters['source'] != self.source:
+            return iter(())
+        records = self._records(*ftl.query_sql(filters, limit))
+        return (records[i:i + ftl.FETCH_SIZE] for i in range(0, len(records), ftl.FETCH_SIZE))
+
+    def aggregate(self, start_day, end_day, kind, blocked_only=False, exclude=None, limit=10, source=None):
+        if source and source != self.source:
+            return []
+        rows = self._run(*ftl.aggregate_sql(start_day, end_day, kind, blocked_only, exclude, limit))
+        return [(key, int(count)) for key, count in rows]
+
+    def tail(self, lines=100, source=None):
+        if source and source != self.source:
+            return []
+        return self._records(*ftl.tail_sql(lines))
+
+    def status(self):
+        rows = self._run(ftl.STATUS_SQL, [])
+        row = [int(value) if value else None for value in rows[0]] if rows else (0, None, None)
+        return dict(ftl.status_fields(row, ftl.timestamp_formatter()), available=True,
+                    host=self.config['host'], path=self.db_path, source=self.source)
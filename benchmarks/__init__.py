@@ -0,0 +1,6 @@
+"""
+Benchmarks reprodutíveis do Pi-hole Log Viewer
+Gerador determinístico de dados sintéticos (banco FTL e pihole.log) e medição
+de tempo e memória dos caminhos críticos, com saída em JSON para comparar
+versões (python -m benchmarks.run / python -m benchmarks.compare)
+"""
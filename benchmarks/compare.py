@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compara dois resultados de benchmarks.run
+Mostra a variação da mediana de tempo e do pico de memória de cada caso e
+termina com código 1 se algum caso piorar além do limite (uso em CI/release).
+
+Uso: python -m benchmarks.compare base.json novo.json [--threshold 0.15]
+"""
+
+import argparse
+import json
+import sys
+
+DEFAULT_THRESHOLD = 0.15
+
+def load_results(path):
+    with open(path, 'r') as f:
+        report = json.load(f)
+    return report.get('meta', {}), {result['name']: result for result in report['results']}
+
+def _ratio(new, old):
+    if not old or new is None:
+        return None
+    return new / old
+
+def compare(base, new, threshold=DEFAULT_THRESHOLD):
+    """Lista (nome, razão de tempo, razão de memória, regrediu) dos casos em comum"""
+    rows = []
+    for name, result in new.items():
+        if name not in base:
+            continue
+        time_ratio = _ratio(result['seconds']['median'], base[name]['seconds']['median'])
+        memory_ratio = _ratio(result.get('peak_python_bytes'), base[name].get('peak_python_bytes'))
+        regressed = any(ratio is not None and ratio > 1 + threshold for ratio in (time_ratio, memory_ratio))
+        rows.append((name, time_ratio, memory_ratio, regressed))
+    return rows
+
+def _fmt(ratio):
+    return f"{(ratio - 1) * 100:+7.1f}%" if ratio is not None else '      -'
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara dois resultados de benchmark')
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='piora relativa tolerada (0.15 = 15%%)')
+    args = parser.parse_args()
+
+    base_meta, base = load_results(args.base)
+    new_meta, new = load_results(args.new)
+    if base_meta.get('rows') != new_meta.get('rows'):
+        print(f"⚠️ Tamanhos diferentes: {base_meta.get('rows')} x {new_meta.get('rows')} linhas")
+
+    print(f"{'caso':<36} {'tempo':>8} {'memória':>8}")
+    regressions = 0
+    for name, time_ratio, memory_ratio, regressed in compare(base, new, args.threshold):
+        regressions += regressed
+        print(f"{name:<36} {_fmt(time_ratio)} {_fmt(memory_ratio)}{'  ❌' if regressed else ''}")
+
+    missing = sorted(set(base) - set(new))
+    if missing:
+        print(f"⚠️ Casos ausentes no novo resultado: {', '.join(missing)}")
+    if regressions:
+        print(f"❌ {regressions} caso(s) pioraram mais de {args.threshold * 100:.0f}%")
+        sys.exit(1)
+    print("✅ Nenhuma regressão acima do limite")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Gerador determinístico de dados sintéticos do Pi-hole
+Produz um banco com o esquema de `queries` do pihole-FTL.db e um pihole.log
+(formato dnsmasq) a partir do mesmo fluxo de consultas. Domínios e clientes
+seguem distribuições de Zipf (poucos domínios/clientes concentram a maior
+parte das consultas); a mesma semente gera sempre os mesmos dados.
+
+Uso: python -m benchmarks.datagen --size 1m --out benchmarks/data
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from domain_utils import KNOWN_DOMAINS
+
+SIZES = {
+    '100k': 100_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+    '50m': 50_000_000
+}
+
+DEFAULT_SEED = 42
+
+# Início fixo (UTC, como no FTL) para que os dados não dependam da data atual
+DEFAULT_START = datetime(2026, 1, 5)
+DEFAULT_DAYS = 7
+
+# Consultas geradas por lote (memória constante mesmo com 50M linhas)
+CHUNK_ROWS = 250_000
+
+# Expoentes de Zipf (domínios têm cauda mais longa que clientes)
+DOMAIN_ZIPF = 1.1
+CLIENT_ZIPF = 1.3
+
+# Fração dos domínios que estão na gravity (sempre bloqueados)
+BLOCKED_FRACTION = 0.08
+
+# Códigos de tipo do FTL e pesos aproximados de uma rede doméstica
+QUERY_TYPES = {1: 'A', 2: 'AAAA', 6: 'PTR', 7: 'TXT', 10: 'HTTPS', 4: 'SRV'}
+QUERY_TYPE_WEIGHTS = (0.62, 0.27, 0.04, 0.01, 0.05, 0.01)
+
+# Status do FTL: 1 = gravity (bloqueado), 2 = encaminhado, 3 = cache
+STATUS_GRAVITY = 1
+STATUS_FORWARDED = 2
+STATUS_CACHED = 3
+
+SUBDOMAIN_PREFIXES = ('', 'www.', 'api.', 'cdn.', 'static.', 'edge-01.')
+SYLLABLES = ('ba', 'ke', 'lo', 'mi', 'nu', 'ra', 'si', 'to', 'vu', 'ze', 'dra', 'fen', 'gor', 'hul', 'pix', 'tri')
+TLDS = ('com', 'net', 'org', 'com.br', 'io', 'cloud')
+
+def size_rows(size):
+    """Número de linhas a partir de '1m', '10m', '50m' ou de um inteiro"""
+    size = str(size).lower()
+    return SIZES[size] if size in SIZES else int(size.replace('_', ''))
+
+def _zipf_cdf(count, exponent):
+    weights = 1.0 / np.arange(1, count + 1, dtype=np.float64) ** exponent
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+def _synthetic_name(index):
+    """Nome de domínio legível e único para o índice"""
+    parts = []
+    index += 1
+    while index:
+        index, digit = divmod(index, len(SYLLABLES))
+        parts.append(SYLLABLES[digit])
+    return ''.join(parts)
+
+class Population:
+    """Domínios e clientes com as respectivas distribuições de Zipf"""
+
+    def __init__(self, rows, seed=DEFAULT_SEED):
+        rng = np.random.default_rng(seed)
+        # O vocabulário cresce de forma sublinear com o volume (como em redes reais)
+        domain_count = max(2_000, int(rows ** 0.72))
+        client_count = max(20, min(2_000, int(rows ** 0.35)))
+
+        domains = []
+        for rank in range(domain_count):
+            prefix = SUBDOMAIN_PREFIXES[rank % len(SUBDOMAIN_PREFIXES)]
+            base_rank = rank // len(SUBDOMAIN_PREFIXES)
+            if base_rank < len(KNOWN_DOMAINS):
+                base = KNOWN_DOMAINS[base_rank]
+            else:
+                base = f"{_synthetic_name(base_rank)}.{TLDS[base_rank % len(TLDS)]}"
+            domains.append(prefix + base)
+        # Os domínios conhecidos ocupam as primeiras posições de popularidade
+        self.domains = domains
+        self.domain_cdf = _zipf_cdf(domain_count, DOMAIN_ZIPF)
+        self.blocked = rng.random(domain_count) < BLOCKED_FRACTION
+
+        self.clients = [f"192.168.{1 + i // 250}.{2 + i % 250}" for i in range(client_count)]
+        # Uma parte das consultas vem do próprio Pi-hole
+        self.clients[min(5, client_count - 1)] = '127.0.0.1'
+        self.client_cdf = _zipf_cdf(client_count, CLIENT_ZIPF)
+
+def iter_query_chunks(rows, seed=DEFAULT_SEED, start=DEFAULT_START, days=DEFAULT_DAYS, population=None):
+    """Lotes de consultas em ordem cronológica
+
+    Cada lote é uma tupla de arrays (epoch, índice do domínio, índice do
+    cliente, tipo, status) cobrindo uma fatia consecutiva do período.
+    """
+    population = population or Population(rows, seed)
+    rng = np.random.default_rng(seed + 1)
+    type_codes = np.array(list(QUERY_TYPES), dtype=np.int64)
+    type_cdf = np.cumsum(QUERY_TYPE_WEIGHTS)
+    type_cdf /= type_cdf[-1]
+
+    start_epoch = int((start - datetime(1970, 1, 1)).total_seconds())
+    span = days * 86400
+    chunks = (rows + CHUNK_ROWS - 1) // CHUNK_ROWS
+    for chunk in range(chunks):
+        size = min(CHUNK_ROWS, rows - chunk * CHUNK_ROWS)
+        slice_start = start_epoch + span * chunk // chunks
+        slice_end = start_epoch + span * (chunk + 1) // chunks
+        epochs = np.sort(rng.integers(slice_start, max(slice_end, slice_start + 1), size))
+        domain_idx = np.searchsorted(population.domain_cdf, rng.random(size))
+        client_idx = np.searchsorted(population.client_cdf, rng.random(size))
+        types = type_codes[np.searchsorted(type_cdf, rng.random(size))]
+        status = np.where(population.blocked[domain_idx], STATUS_GRAVITY,
+                          np.where(rng.random(size) < 0.45, STATUS_CACHED, STATUS_FORWARDED))
+        yield epochs, domain_idx, client_idx, types, status
+
+def _metadata(kind, rows, seed, start, days):
+    return {'kind': kind, 'rows': rows, 'seed': seed, 'start': start.isoformat(), 'days': days,
+            'domain_zipf': DOMAIN_ZIPF, 'client_zipf': CLIENT_ZIPF, 'chunk_rows': CHUNK_ROWS}
+
+def _is_current(path, metadata):
+    """O arquivo já existe e foi gerado com os mesmos parâmetros"""
+    try:
+        with open(path + '.json', 'r') as f:
+            return os.path.exists(path) and json.load(f) == metadata
+    except (FileNotFoundError, ValueError):
+        return False
+
+def _write_metadata(path, metadata):
+    with open(path + '.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+def write_ftl_db(path, rows, seed=DEFAULT_SEED, start=DEFAULT_START, days=DEFAULT_DAYS, force=False):
+    """Gera um banco com a tabela `queries` do pihole-FTL.db (reutiliza se já existir)"""
+    metadata = _metadata('ftl', rows, seed, start, days)
+    if not force and _is_current(path, metadata):
+        return path
+
+    if os.path.exists(path):
+        os.unlink(path)
+    population = Population(rows, seed)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    # Esquema da tabela de consultas do FTL (v5)
+    conn.execute("""
+        CREATE TABLE queries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER NOT NULL,
+            type INTEGER NOT NULL,
+            status INTEGER NOT NULL,
+            domain TEXT NOT NULL,
+            client TEXT NOT NULL,
+            forward TEXT,
+            additional_info TEXT,
+            reply_type INTEGER,
+            reply_time REAL,
+            dnssec INTEGER
+        )
+    """)
+    conn.execute("CREATE TABLE ftl (id INTEGER PRIMARY KEY NOT NULL, value BLOB NOT NULL)")
+    conn.execute("INSERT INTO ftl (id, value) VALUES (0, 13)")
+
+    domains, clients = population.domains, population.clients
+    for epochs, domain_idx, client_idx, types, status in iter_query_chunks(rows, seed, start, days, population):
+        forward = np.where(status == STATUS_FORWARDED, '1.1.1.1#53', None)
+        conn.executemany("""
+            INSERT INTO queries (timestamp, type, status, domain, client, forward, reply_type, reply_time, dnssec)
+            VALUES (?, ?, ?, ?, ?, ?, 4, 0.002, 0)
+        """, zip(epochs.tolist(), types.tolist(), status.tolist(),
+                 [domains[i] for i in domain_idx.tolist()],
+                 [clients[i] for i in client_idx.tolist()],
+                 forward.tolist()))
+        conn.commit()
+    conn.execute("CREATE INDEX idx_queries_timestamps ON queries (timestamp)")
+    conn.commit()
+    conn.close()
+    _write_metadata(path, metadata)
+    return path
+
+def write_pihole_log(path, rows, seed=DEFAULT_SEED, start=DEFAULT_START, days=DEFAULT_DAYS, force=False):
+    """Gera um pihole.log (dnsmasq) com as mesmas consultas do banco FTL"""
+    metadata = _metadata('log', rows, seed, start, days)
+    if not force and _is_current(path, metadata):
+        return path
+
+    population = Population(rows, seed)
+    domains, clients = population.domains, population.clients
+    labels = {}
+    with open(path, 'w', encoding='utf-8') as f:
+        for epochs, domain_idx, client_idx, types, status in iter_query_chunks(rows, seed, start, days, population):
+            lines = []
+            for epoch, d, c, query_type, code in zip(epochs.tolist(), domain_idx.tolist(), client_idx.tolist(),
+                                                     types.tolist(), status.tolist()):
+                prefix = labels.get(epoch)
+                if prefix is None:
+                    # Formato do syslog: "Jan  5 08:21:20" (dia alinhado com espaço)
+                    moment = datetime(1970, 1, 1) + timedelta(seconds=epoch)
+                    prefix = labels[epoch] = f"{moment.strftime('%b')} {moment.day:2d} {moment.strftime('%H:%M:%S')} dnsmasq[812]: "
+                    if len(labels) > 100_000:
+                        labels.clear()
+                domain = domains[d]
+                lines.append(f"{prefix}query[{QUERY_TYPES[query_type]}] {domain} from {clients[c]}\n")
+                if code == STATUS_GRAVITY:
+                    lines.append(f"{prefix}gravity blocked {domain} is 0.0.0.0\n")
+                elif code == STATUS_CACHED:
+                    lines.append(f"{prefix}cached {domain} is 104.16.{d % 256}.{c % 256}\n")
+                else:
+                    lines.append(f"{prefix}forwarded {domain} to 1.1.1.1\n")
+                    lines.append(f"{prefix}reply {domain} is 104.16.{d % 256}.{c % 256}\n")
+            f.write(''.join(lines))
+    _write_metadata(path, metadata)
+    return path
+
+def dataset_paths(out_dir, rows, seed=DEFAULT_SEED):
+    """Caminhos (banco FTL, pihole.log) de um conjunto de dados"""
+    base = os.path.join(out_dir, f"synthetic-{rows}-s{seed}")
+    return base + '-pihole-FTL.db', base + '-pihole.log'
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera dados sintéticos do Pi-hole')
+    parser.add_argument('--size', default='1m', help="1m, 10m, 50m ou número de linhas")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS)
+    parser.add_argument('--out', default=os.path.join('benchmarks', 'data'))
+    parser.add_argument('--skip-log', action='store_true', help='não gerar o pihole.log')
+    parser.add_argument('--force', action='store_true', help='regerar mesmo se já existir')
+    args = parser.parse_args()
+
+    rows = size_rows(args.size)
+    os.makedirs(args.out, exist_ok=True)
+    db_path, log_path = dataset_paths(args.out, rows, args.seed)
+
+    started = time.perf_counter()
+    write_ftl_db(db_path, rows, args.seed, days=args.days, force=args.force)
+    print(f"✅ {db_path} ({rows:,} consultas, {time.perf_counter() - started:.1f}s)")
+    if not args.skip_log:
+        started = time.perf_counter()
+        write_pihole_log(log_path, rows, args.seed, days=args.days, force=args.force)
+        print(f"✅ {log_path} ({time.perf_counter() - started:.1f}s)")
+
+if __name__ == '__main__':
+    main()
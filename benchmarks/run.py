@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Benchmarks dos caminhos críticos
+Mede o parsing do pihole.log (parse_log_line, parse_timestamp, filter_logs,
+group_logs do app.py), o loop de importação do app_local_db (parsing da saída
+do sqlite3 e inserção nas partições), a compactação dos agregados e as rotas
+do dashboard/logs, sobre os dados sintéticos de benchmarks.datagen.
+
+Cada caso é executado `--repeat` vezes para o tempo (mínimo, mediana, média)
+e uma vez sob tracemalloc para o pico de memória Python. O resultado é gravado
+em JSON para ser comparado entre versões com benchmarks.compare.
+
+Uso: python -m benchmarks.run --size 1m [--output resultados.json]
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import logging
+import os
+import platform
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks import datagen
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_REPEAT = 5
+
+# Linhas do pihole.log usadas nos casos que mantêm tudo em memória (app.py)
+DEFAULT_SAMPLE = 200_000
+
+# Linhas do banco FTL convertidas por vez na importação completa
+IMPORT_CHUNK_ROWS = 200_000
+
+# Linhas serializadas nos casos de formato de resposta
+RESPONSE_ROWS = 50_000
+
+# O banco local guarda o horário local (FTL em UTC - 3h)
+UTC_OFFSET = timedelta(hours=3)
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+class BenchmarkRunner:
+    """Executa os casos e acumula os resultados"""
+
+    def __init__(self, repeat=DEFAULT_REPEAT, memory=True, only=None):
+        self.repeat = repeat
+        self.memory = memory
+        self.only = only
+        self.results = []
+
+    def wanted(self, name):
+        return not self.only or any(name.startswith(prefix) for prefix in self.only)
+
+    def measure(self, name, func, rows, setup=None, repeat=None, response_bytes=None):
+        """Mede `func()`; `setup()` roda antes de cada execução, fora da medição"""
+        if not self.wanted(name):
+            return None
+        times = []
+        for _ in range(repeat or self.repeat):
+            if setup:
+                setup()
+            gc.collect()
+            started = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - started)
+
+        peak = None
+        if self.memory:
+            if setup:
+                setup()
+            gc.collect()
+            tracemalloc.start()
+            try:
+                func()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        return self.record(name, times, rows, peak, response_bytes)
+
+    def record(self, name, times, rows, peak=None, response_bytes=None):
+        median = statistics.median(times)
+        result = {
+            'name': name,
+            'rows': rows,
+            'runs': len(times),
+            'seconds': {
+                'min': round(min(times), 6),
+                'median': round(median, 6),
+                'mean': round(statistics.fmean(times), 6)
+            },
+            'rows_per_second': round(rows / median) if rows and median else None,
+            'peak_python_bytes': peak
+        }
+        if response_bytes is not None:
+            result['response_bytes'] = response_bytes
+        self.results.append(result)
+        memory = f"{peak / 1048576:8.1f} MB" if peak is not None else '       -   '
+        size = f", {response_bytes / 1024:,.0f} KB" if response_bytes is not None else ''
+        print(f"  {name:<36} {median * 1000:10.1f} ms  {memory}  ({rows:,} linhas{size})", file=sys.stderr)
+        return result
+
+def _read_sample(log_path, sample):
+    with open(log_path, 'r', encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in itertools.islice(f, sample)]
+
+def bench_log_parsing(runner, log_path, sample):
+    """Caminho do app.py: pihole.log -> parse -> filtro -> agrupamento"""
+    import app as log_app
+    # Os resumos em INFO de filter_logs não fazem parte da medição
+    log_app.logger.setLevel(logging.WARNING)
+
+    lines = _read_sample(log_path, sample)
+    parsed = [entry for entry in map(log_app.parse_log_line, lines) if entry]
+    timestamps = [entry['timestamp'] for entry in parsed]
+    if not parsed:
+        return
+
+    first = log_app.parse_timestamp(timestamps[0])
+    last = log_app.parse_timestamp(timestamps[-1])
+    start_date = first + (last - first) / 4
+    end_date = first + (last - first) * 3 / 4
+
+    runner.measure('log.parse_log_line', lambda: [log_app.parse_log_line(line) for line in lines], len(lines))
+    runner.measure('log.parse_timestamp', lambda: [log_app.parse_timestamp(ts) for ts in timestamps], len(timestamps))
+    runner.measure('log.filter_logs.query', lambda: log_app.filter_logs(parsed, query='google'), len(parsed))
+    runner.measure('log.filter_logs.date_range',
+                   lambda: log_app.filter_logs(parsed, start_date=start_date, end_date=end_date), len(parsed))
+    runner.measure('log.group_logs.domain', lambda: log_app.group_logs(parsed, 'domain', 'count'), len(parsed))
+    runner.measure('log.group_logs.ip', lambda: log_app.group_logs(parsed, 'ip', 'timestamp'), len(parsed))
+
+    # Corpo da resposta de /logs: um objeto por linha (jsonify) x colunas (fast_json), com e sem gzip
+    import fast_json
+    response_logs = parsed[:RESPONSE_ROWS]
+    formats = {
+        'json': lambda: json.dumps({'logs': log_app.logs_to_json(response_logs)},
+                                   sort_keys=True, separators=(',', ':')).encode('utf-8'),
+        'columnar': lambda: fast_json.dumps({'format': 'columnar', 'logs': log_app.logs_to_columnar(response_logs)})
+    }
+    for name, build in formats.items():
+        body = build()
+        runner.measure(f'log.response.{name}', build, len(response_logs), response_bytes=len(body))
+        runner.measure(f'log.response.{name}.gzip', lambda build=build: fast_json.compress(build(), 'gzip'),
+                       len(response_logs), response_bytes=len(fast_json.compress(body, 'gzip')))
+
+def _ftl_output_chunks(ftl_path, chunk_rows=IMPORT_CHUNK_ROWS, limit=None):
+    """Saída no formato do `sqlite3` remoto (data|domínio|cliente|status|id), em blocos"""
+    conn = sqlite3.connect(ftl_path)
+    try:
+        last_id = 0
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_rows if remaining is None else min(chunk_rows, remaining)
+            rows = conn.execute("""
+                SELECT id, datetime(timestamp, 'unixepoch'), domain, client, status
+                FROM queries WHERE id > ? ORDER BY id LIMIT ?
+            """, (last_id, size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+            yield '\n'.join(f"{ts}|{domain}|{client}|{status}|{query_id}"
+                             for query_id, ts, domain, client, status in rows) + '\n'
+    finally:
+        conn.close()
+
+def _data_end(ftl_path):
+    conn = sqlite3.connect(ftl_path)
+    try:
+        last = conn.execute("SELECT MAX(timestamp) FROM queries").fetchone()[0]
+    finally:
+        conn.close()
+    return datetime(1970, 1, 1) + timedelta(seconds=last) - UTC_OFFSET
+
+def bench_import(runner, ftl_path, sample, local_db):
+    """Loop de importação do app_local_db: parsing da saída do FTL e inserção"""
+    import ingest
+    import partition_store
+
+    current_time = (_data_end(ftl_path) + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+    output = next(_ftl_output_chunks(ftl_path, sample, sample), '')
+    parsed_rows, _ = ingest.parse_rows(output, partition_store.DEFAULT_SOURCE, current_time)
+
+    runner.measure('import.parse_rows',
+                   lambda: ingest.parse_rows(output, partition_store.DEFAULT_SOURCE, current_time),
+                   len(parsed_rows))
+
+    scratch = tempfile.mkdtemp(prefix='bench-import-')
+    scratch_db = os.path.join(scratch, 'pihole_logs.db')
+    state = {}
+
+    def fresh_db():
+        if 'conn' in state:
+            state['conn'].close()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(scratch_db + suffix):
+                os.unlink(scratch_db + suffix)
+        state['conn'] = partition_store.connect(scratch_db)
+        partition_store.init_storage(state['conn'])
+
+    runner.measure('import.insert_rows', lambda: partition_store.insert_rows(state['conn'], parsed_rows),
+                   len(parsed_rows), setup=fresh_db)
+    if 'conn' in state:
+        state['conn'].close()
+    for name in os.listdir(scratch):
+        os.unlink(os.path.join(scratch, name))
+    os.rmdir(scratch)
+
+    if local_db is None:
+        return
+
+    # Importação completa, uma única vez: gera o banco usado pelas rotas
+    conn = partition_store.connect(local_db)
+    partition_store.init_storage(conn)
+    total = 0
+    parse_seconds = insert_seconds = 0.0
+    for chunk in _ftl_output_chunks(ftl_path):
+        started = time.perf_counter()
+        rows, _ = ingest.parse_rows(chunk, partition_store.DEFAULT_SOURCE, current_time)
+        parse_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        total += len(partition_store.insert_rows(conn, rows))
+        insert_seconds += time.perf_counter() - started
+    runner.record('import.full', [parse_seconds + insert_seconds], total)
+    runner.record('import.full.parse', [parse_seconds], total)
+    runner.record('import.full.insert', [insert_seconds], total)
+
+    import aggregates
+    aggregates.init_aggregates(conn)
+    now = _data_end(ftl_path) + timedelta(hours=1)
+    started = time.perf_counter()
+    while aggregates.compact(conn, now, max_hours=24 * 7) != (0, 0):
+        pass
+    runner.record('aggregates.compact.full', [time.perf_counter() - started], total)
+    conn.close()
+
+def bench_queries(runner, work_dir, ftl_path, rows):
+    """Rotas do dashboard e dos logs (app_local_db) via cliente de teste do Flask"""
+    last_day = (_data_end(ftl_path) - timedelta(days=1)).date()
+    first_day = last_day - timedelta(days=5)
+    day = last_day.isoformat()
+    period = f"start_date={first_day.isoformat()}&end_date={day}"
+
+    # O app usa caminhos relativos (pihole_logs.db, alert_settings.json)
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        import app_local_db
+        import aggregates
+        import partition_store
+        client = app_local_db.app.test_client()
+        # Mede o cálculo das rotas, não as leituras do cache compartilhado
+        app_local_db.dashboard_cache.enabled = False
+
+        endpoints = [
+            ('api.stats.day', f'/api/stats?date={day}'),
+            ('api.stats.range', f'/api/stats?{period}'),
+            ('api.activity_chart.day', f'/api/activity-chart?date={day}'),
+            ('api.timeseries.day', f'/api/timeseries?date={day}&points=144'),
+            ('api.timeseries.range', f'/api/timeseries?{period}&points=300'),
+            ('api.top_domains.day', f'/api/top-domains?date={day}'),
+            ('api.top_blocked_domains.day', f'/api/top-blocked-domains?date={day}'),
+            ('api.top_ips.day', f'/api/top-ips?date={day}'),
+            ('api.top_domains.range', f'/api/top-domains?{period}'),
+            ('api.recent_activity', '/api/recent-activity'),
+            ('api.logs.day', f'/api/logs?start_date={day}&end_date={day}'),
+            ('api.logs.domain_filter', f'/api/logs?start_date={first_day.isoformat()}&end_date={day}&domain=google'),
+            ('api.export.csv.day', f'/api/export/csv?start_date={day}&end_date={day}'),
+            ('api.export.ndjson.day', f'/api/export/ndjson?start_date={day}&end_date={day}')
+        ]
+
+        def request(url, headers=None):
+            response = client.get(url, headers=headers)
+            # Exportações são geradas em fluxo: consome o corpo inteiro
+            data = response.get_data()
+            if response.mimetype == 'application/json' and not response.get_json().get('success', True):
+                raise RuntimeError(f"{url}: {response.get_json().get('error')}")
+            return data
+
+        for name, url in endpoints:
+            runner.measure(name, lambda url=url: request(url), rows)
+
+        # /api/logs em cada formato e codificação (tamanho do corpo enviado)
+        logs_url = f'/api/logs?start_date={first_day.isoformat()}&end_date={day}&lines={RESPONSE_ROWS}'
+        for name, suffix, encoding in (('json', '', None), ('columnar', '&format=columnar', None),
+                                       ('json.gzip', '', 'gzip'), ('columnar.gzip', '&format=columnar', 'gzip')):
+            url = logs_url + suffix
+            headers = {'Accept-Encoding': encoding} if encoding else {}
+            size = len(client.get(url, headers=headers).get_data())
+            runner.measure(f'api.logs.format.{name}', lambda url=url, headers=headers: client.get(
+                url, headers=headers).get_data(), rows, response_bytes=size)
+
+        # As mesmas consultas do dashboard na resolução dos agregados
+        conn = partition_store.connect()
+        try:
+            for resolution in ('hourly', 'daily'):
+                runner.measure(f'aggregates.query_stats.{resolution}',
+                               lambda resolution=resolution: aggregates.query_stats(
+                                   conn, first_day, last_day, resolution), rows)
+                runner.measure(f'aggregates.query_top.{resolution}',
+                               lambda resolution=resolution: aggregates.query_top(
+                                   conn, first_day, last_day, 'domain', resolution=resolution), rows)
+        finally:
+            conn.close()
+    finally:
+        os.chdir(previous_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do Pi-hole Log Viewer')
+    parser.add_argument('--size', default='1m', help="1m, 10m, 50m ou número de linhas")
+    parser.add_argument('--seed', type=int, default=datagen.DEFAULT_SEED)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--sample', type=int, default=DEFAULT_SAMPLE,
+                        help='linhas usadas nos casos em memória (parsing e importação parcial)')
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'benchmarks', 'data'))
+    parser.add_argument('--output', help='arquivo JSON de saída (padrão: benchmarks/results/)')
+    parser.add_argument('--only', action='append', help='executa só os casos com este prefixo (repetível)')
+    parser.add_argument('--no-memory', action='store_true', help='não medir o pico de memória')
+    parser.add_argument('--reuse-db', action='store_true',
+                        help='reutiliza o banco local já importado (pula import.full)')
+    args = parser.parse_args()
+
+    rows = datagen.size_rows(args.size)
+    os.makedirs(args.data_dir, exist_ok=True)
+    ftl_path, log_path = datagen.dataset_paths(args.data_dir, rows, args.seed)
+
+    print(f"📦 Preparando dados sintéticos ({rows:,} consultas, semente {args.seed})...", file=sys.stderr)
+    datagen.write_ftl_db(ftl_path, rows, args.seed)
+    datagen.write_pihole_log(log_path, rows, args.seed)
+
+    work_dir = os.path.join(args.data_dir, f"work-{rows}-s{args.seed}")
+    os.makedirs(work_dir, exist_ok=True)
+    local_db = os.path.join(work_dir, 'pihole_logs.db')
+    if not args.reuse_db or not os.path.exists(local_db):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(local_db + suffix):
+                os.unlink(local_db + suffix)
+    else:
+        local_db = None
+
+    runner = BenchmarkRunner(args.repeat, not args.no_memory, args.only)
+    started_at = datetime.now()
+    print("⏱️  Executando benchmarks...", file=sys.stderr)
+    bench_log_parsing(runner, log_path, args.sample)
+    bench_import(runner, ftl_path, args.sample, local_db)
+    bench_queries(runner, work_dir, ftl_path, rows)
+
+    report = {
+        'meta': {
+            'started_at': started_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'rows': rows,
+            'seed': args.seed,
+            'sample': args.sample,
+            'repeat': args.repeat,
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        },
+        'results': runner.results
+    }
+
+    output = args.output
+    if not output:
+        results_dir = os.path.join(ROOT, 'benchmarks', 'results')
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir, f"{started_at.strftime('%Y%m%d-%H%M%S')}-{rows}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Resultados gravados em {output}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,81 @@ SSH_CONFIG = {
     "db_path": "/etc/pihole/pihole-FTL.db"
 }
 
+# Várias instâncias do Pi-hole (opcional). Cada fonte é importada em paralelo
+# com sua própria marca d'água e os registros ficam marcados com o `id`.
+# Sem PIHOLE_SOURCES, o SSH_CONFIG acima é usado como a fonte "default".
+# PIHOLE_SOURCES = [
+#     {"id": "site1-primario", "host": "192.168.1.2", "username": "pi", "password": "SENHA",
+#      "db_path": "/etc/pihole/pihole-FTL.db"},
+#     {"id": "site1-secundario", "host": "192.168.1.3", "username": "pi", "password": "SENHA"},
+# ]
+
+# Importação: número máximo de fontes buscadas ao mesmo tempo
+INGEST_CONFIG = {
+    "max_workers": 4
+}
+
+# Janela quente: últimas horas em memória (NumPy) para o dashboard do dia e os
+# alertas de pico; deve cobrir 24h de linha de base + o período de análise
+HOT_WINDOW_CONFIG = {
+    "enabled": True,
+    "hours": 30
+}
+
+# Perfil de desempenho: consultas lentas, Server-Timing e amostragem de pilha
+# (?profile=1 e /api/debug/profile só funcionam com sampling_enabled)
+PROFILING_CONFIG = {
+    "slow_query_ms": 250,
+    "server_timing": True,
+    "sampling_enabled": False,
+    "profile_dir": "profiles"
+}
+
+# Orçamentos das buscas no SQLite: tempo (segundos) e linhas lidas; ao esgotar,
+# a resposta traz as linhas lidas até ali com "truncated": true. A busca também
+# é interrompida quando o navegador fecha a conexão. None desliga um limite.
+QUERY_BUDGET_CONFIG = {
+    "seconds": 30,
+    "rows": 500000,
+    "endpoints": {
+        # /api/logs do app_local_db.py
+        "api_logs": {"seconds": 10},
+        # /logs do app.py e do app_server.py (banco FTL)
+        "ftl_logs": {"seconds": 20, "rows": 100000}
+    }
+}
+
+# Servidor de produção (serve.py): "prefork" (um processo por CPU, cada um com
+# um pool de threads) ou "threaded" (um processo). workers None usa todas as
+# CPUs; graceful_timeout é a espera pelas requisições em andamento no SIGTERM.
+SERVER_CONFIG = {
+    "mode": "prefork",
+    "workers": None,
+    "threads": 8,
+    "graceful_timeout": 30,
+    "keepalive_seconds": 5,
+    "pid_file": "serve.pid"
+}
+
+# Cache dos resultados do dashboard compartilhado entre os workers (SQLite em
+# /dev/shm), invalidado a cada importação; ttl_seconds é a validade máxima
+SHARED_CACHE_CONFIG = {
+    "enabled": True,
+    "ttl_seconds": 300
+}
+
+# Backends de leitura: o roteador usa o backend mais barato que tem dados do
+# período pedido e passa ao próximo se ele falhar. "ftl" lê o pihole-FTL.db
+# direto (aplicação no próprio Pi-hole) e "ssh" consulta o Pi-hole remoto.
+# costs troca o custo de uma operação (query, aggregate, tail, status).
+BACKENDS_CONFIG = {
+    "enabled": ["local_db"],
+    # "enabled": ["local_db", "ftl"],
+    # "ftl": {"db_path": "/etc/pihole/pihole-FTL.db"},
+    # "ssh": {"source": "site1-primario"},
+    "costs": {}
+}
+
 # Configurações da aplicação Flask
 FLASK_CONFIG = {
     "host": "0.0.0.0",
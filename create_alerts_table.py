@@ -10,10 +10,25 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def create_alerts_table():
+def migrate_alerts_table(cursor):
+    """Adiciona as colunas novas em bancos criados por versões anteriores"""
+    cursor.execute("PRAGMA table_info(alerts)")
+    existing = {row[1] for row in cursor.fetchall()}
+    
+    new_columns = [
+        ('window_start', 'DATETIME'),
+        ('last_seen_at', 'DATETIME'),
+        ('occurrences', 'INTEGER DEFAULT 1'),
+        ('notified_at', 'DATETIME')
+    ]
+    for name, definition in new_columns:
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE alerts ADD COLUMN {name} {definition}')
+
+def create_alerts_table(db_path='pihole_logs.db'):
     """Cria a tabela de alertas"""
     try:
-        conn = sqlite3.connect('pihole_logs.db')
+        conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
         # Criar tabela alerts
@@ -34,11 +49,30 @@ def create_alerts_table():
             )
         ''')
         
+        # Colunas do ciclo de vida (janela, última ocorrência, notificação)
+        migrate_alerts_table(cursor)
+        
         # Criar índices para performance
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_type ON alerts(type)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_target ON alerts(target)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_created ON alerts(created_at)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_resolved ON alerts(resolved)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_open ON alerts(resolved, type, target)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_active ON alerts(resolved, created_at)')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_window ON alerts(type, target, window_start)')
+        
+        # Janelas de supressão por tipo/alvo
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alert_suppressions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT NOT NULL,
+                target TEXT NOT NULL, -- '*' suprime todos os alvos do tipo
+                suppressed_until DATETIME NOT NULL,
+                reason TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_suppressions_lookup ON alert_suppressions(type, target, suppressed_until)')
         
         conn.commit()
         conn.close()
@@ -50,10 +84,10 @@ def create_alerts_table():
         logger.error(f"❌ Erro ao criar tabela de alertas: {e}")
         return False
 
-def create_alert_settings_table():
+def create_alert_settings_table(db_path='pihole_logs.db'):
     """Cria a tabela de configurações de alertas"""
     try:
-        conn = sqlite3.connect('pihole_logs.db')
+        conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
         # Criar tabela alert_settings
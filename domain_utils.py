@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Utilitários de domínio compartilhados entre as aplicações
+"""
+
+# Lista expandida de domínios conhecidos para agrupamento
+KNOWN_DOMAINS = [
+    # Google/Alphabet
+    "google.com", "gstatic.com", "gvt1.com", "gvt2.com", "gvt3.com", "googleapis.com",
+    "googlevideo.com", "googleusercontent.com", "google-analytics.com",
+    
+    # Amazon
+    "amazon.com", "amazon.com.br", "amazonaws.com", "amazon-adsystem.com",
+    
+    # Facebook/Meta
+    "facebook.com", "fbcdn.net", "instagram.com", "messenger.com",
+    
+    # Microsoft
+    "microsoft.com", "microsoftonline.com", "office.com", "live.com",
+    "bing.com", "msn.com", "skype.com",
+    
+    # Apple
+    "apple.com", "icloud.com", "me.com", "mzstatic.com",
+    
+    # Netflix
+    "netflix.com", "nflxvideo.net", "nflximg.net",
+    
+    # WhatsApp
+    "whatsapp.net", "whatsapp.com",
+    
+    # Cloudflare
+    "cloudflare.com", "cloudflare.net",
+    
+    # Datadog
+    "datadoghq.com", "datadog.com",
+    
+    # Betha (sistema específico)
+    "betha.cloud",
+    
+    # Amurel
+    "amurel.org.br",
+    
+    # CDNs comuns
+    "cdn.jsdelivr.net", "cdnjs.cloudflare.com", "unpkg.com",
+    "jsdelivr.net", "bootstrapcdn.com",
+    
+    # Analytics e tracking
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com",
+    "facebook.net", "fbsbx.com",
+    
+    # Streaming
+    "youtube.com", "ytimg.com", "googlevideo.com",
+    "twitch.tv", "ttvnw.net",
+    
+    # Redes sociais
+    "twitter.com", "t.co", "twimg.com",
+    "linkedin.com", "licdn.com",
+    "reddit.com", "redd.it",
+    
+    # E-commerce
+    "shopify.com", "shopifycdn.com",
+    "ebay.com", "ebaystatic.com",
+    
+    # Outros serviços populares
+    "github.com", "githubusercontent.com",
+    "stackoverflow.com", "stackexchange.com",
+    "wikipedia.org", "wikimedia.org",
+    "dropbox.com", "db.tt",
+    "slack.com", "slack-msgs.com"
+]
+
+def extract_base_domain(domain):
+    """Extrai o domínio base com agrupamento mais inteligente"""
+    if not domain or domain == "N/A":
+        return domain
+    
+    # Verificar se o domínio termina com algum dos domínios conhecidos
+    for known_domain in KNOWN_DOMAINS:
+        if domain.endswith("." + known_domain) or domain == known_domain:
+            return known_domain
+    
+    # Para domínios .com.br, usar domínio de segundo nível
+    if domain.endswith(".com.br"):
+        parts = domain.split(".")
+        if len(parts) >= 3:
+            return f"{parts[-3]}.{parts[-2]}.{parts[-1]}"
+    
+    # Para outros domínios, tentar extrair domínio de segundo nível
+    parts = domain.split(".")
+    if len(parts) >= 2:
+        # Retornar domínio de segundo nível (ex: example.com de sub.example.com)
+        return f"{parts[-2]}.{parts[-1]}"
+    
+    # Se não conseguir, retornar o domínio original
+    return domain
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Respostas JSON compactas para as rotas de logs
+- formato colunar opcional (`?format=columnar`): uma lista por coluna em vez
+  de um objeto por linha, com domínio, cliente, status e tipo trocados por
+  índices em tabelas de dicionário (static/js/columnar.js reconstrói as
+  linhas no navegador);
+- serialização com orjson quando instalado (json da biblioteca padrão, sem
+  espaços, caso contrário);
+- compressão brotli (se o pacote `brotli` estiver instalado) ou gzip
+  conforme o Accept-Encoding da requisição;
+- respostas em fluxo (`?stream=1`): as linhas saem do cursor em lotes de
+  `fetchmany` e o JSON é enviado aos pedaços, com os totais no final, sem
+  montar a lista inteira em memória.
+"""
+
+import gzip
+import json
+import logging
+import zlib
+
+from flask import Response, request, stream_with_context
+
+import profiling
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Colunas com muitos valores repetidos, enviadas como índices de um dicionário
+DICTIONARY_COLUMNS = frozenset(('domain', 'ip', 'status', 'type', 'reply', 'reply_type', 'activity_time', 'types'))
+
+# Respostas menores que isso não compensam a compressão
+MIN_COMPRESS_BYTES = 1024
+
+# Níveis rápidos: as respostas são geradas a cada requisição e vão pela rede local
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 4
+
+# Linhas lidas do cursor por vez nas respostas em fluxo
+STREAM_BATCH_ROWS = 1000
+
+logger = logging.getLogger(__name__)
+
+def wants_columnar(args):
+    """True se a requisição pediu o formato colunar"""
+    return args.get('format') == 'columnar'
+
+def wants_stream(args):
+    """True se a requisição pediu a resposta em fluxo"""
+    return args.get('stream') == '1'
+
+def columnar(rows, columns, dictionary=DICTIONARY_COLUMNS):
+    """Converte linhas (dicionários ou LogRecord) em colunas
+
+    Retorna {'count', 'columns', 'data', 'dictionaries'}: data[coluna] é a
+    lista de valores ou, para colunas em `dictionary`, de índices em
+    dictionaries[coluna].
+    """
+    data = {}
+    dictionaries = {}
+    for name in columns:
+        values = [row.get(name) for row in rows]
+        if name in dictionary:
+            index = {}
+            data[name] = [index.setdefault(value, len(index)) for value in values]
+            dictionaries[name] = list(index)
+        else:
+            data[name] = values
+    return {
+        'count': len(rows),
+        'columns': list(columns),
+        'data': data,
+        'dictionaries': dictionaries
+    }
+
+def dumps(payload):
+    """JSON compacto em bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def accepted_encoding(header):
+    """'br', 'gzip' ou None conforme o cabeçalho Accept-Encoding"""
+    weights = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+
+    def weight(name):
+        return weights.get(name, weights.get('*', 0.0))
+
+    if brotli is not None and weight('br') > 0:
+        return 'br'
+    if weight('gzip') > 0:
+        return 'gzip'
+    return None
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+def response(payload, status=200):
+    """Resposta JSON serializada e comprimida conforme a requisição"""
+    with profiling.phase('serialize'):
+        body = dumps(payload)
+        encoding = accepted_encoding(request.headers.get('Accept-Encoding')) \
+            if len(body) >= MIN_COMPRESS_BYTES else None
+        body = compress(body, encoding)
+
+    result = Response(body, status=status, mimetype='application/json')
+    result.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        result.headers['Content-Encoding'] = encoding
+    return result
+
+def iter_batches(cursor, size=STREAM_BATCH_ROWS):
+    """Lotes de até `size` linhas de um cursor já executado"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+def iter_json(batches, trailer, key='logs'):
+    """Objeto {"<key>": [...], ...} em pedaços, um por lote de itens
+
+    `trailer(erro)` é chamado depois do último lote (erro é a exceção que
+    interrompeu a leitura, ou None) e devolve os campos finais, como
+    total_found e limited, que só são conhecidos no fim.
+    """
+    yield b'{"' + key.encode('utf-8') + b'":['
+    first = True
+    error = None
+    try:
+        for batch in batches:
+            if not batch:
+                continue
+            body = dumps(batch)[1:-1]
+            yield body if first else b',' + body
+            first = False
+    except Exception as e:
+        # O status HTTP já foi enviado: o erro vai nos campos finais
+        logger.error(f"❌ Erro durante a resposta em fluxo: {e}")
+        error = e
+    tail = dumps(trailer(error))
+    yield b']' + (b',' + tail[1:] if len(tail) > 2 else b'}')
+
+def _compress_stream(chunks, encoding):
+    """Comprime pedaço a pedaço, liberando cada um para o cliente"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def stream_response(chunks):
+    """Resposta JSON em fluxo (pedaços de iter_json), comprimida se aceito"""
+    encoding = accepted_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        chunks = _compress_stream(chunks, encoding)
+    result = Response(stream_with_context(chunks), mimetype='application/json')
+    result.headers['Vary'] = 'Accept-Encoding'
+    result.headers['X-Accel-Buffering'] = 'no'
+    if encoding:
+        result.headers['Content-Encoding'] = encoding
+    return result
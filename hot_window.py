@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Janela quente em memória com as consultas das últimas horas
+As consultas recentes ficam em arrays NumPy colunares ordenados por tempo
+(epoch, domínio, cliente, bloqueada, fonte), com domínios, clientes e fontes
+codificados como inteiros. A importação acrescenta as linhas novas e as mais
+antigas que `hours` saem da janela. Estatísticas, gráfico por hora, top N e
+as matrizes da detecção de picos de períodos cobertos pela janela são
+calculados com fatias + bincount, sem passar pelo SQLite.
+
+Os epochs são do horário local tratado como UTC (o mesmo texto
+'AAAA-MM-DD HH:MM:SS' do banco), então hora e dia saem de divisões inteiras.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import partition_store
+
+DEFAULT_CONFIG = {
+    'enabled': True,
+    # 24h de linha de base + até 6h de análise dos alertas de pico
+    'hours': 30
+}
+
+# Colunas da janela e seus tipos
+DTYPES = {
+    'epoch': np.int64,
+    'domain': np.int32,
+    'client': np.int32,
+    'blocked': np.bool_,
+    'source': np.int32
+}
+
+# Colunas codificadas por dicionário
+CODED = ('domain', 'client', 'source')
+
+# Capacidade mínima dos buffers (linhas)
+MIN_CAPACITY = 4096
+
+# Linhas lidas por vez ao carregar a janela do banco
+LOAD_BATCH = 50000
+
+def load_config():
+    """HOT_WINDOW_CONFIG do config.py sobre os padrões"""
+    try:
+        import config
+        overrides = getattr(config, 'HOT_WINDOW_CONFIG', {})
+    except ImportError:
+        overrides = {}
+    return dict(DEFAULT_CONFIG, **overrides)
+
+def to_epochs(timestamps):
+    """Timestamps 'AAAA-MM-DD HH:MM:SS' em segundos (int64)"""
+    return np.array(timestamps, dtype='datetime64[s]').astype(np.int64)
+
+def to_epoch(moment):
+    """date (meia-noite) ou datetime em segundos, na mesma escala de to_epochs"""
+    if not isinstance(moment, datetime):
+        moment = datetime.combine(moment, datetime.min.time())
+    return int(np.datetime64(moment.replace(microsecond=0), 's').astype(np.int64))
+
+def from_epoch(epoch):
+    """Inverso de to_epoch (datetime ingênuo)"""
+    return datetime(1970, 1, 1) + timedelta(seconds=int(epoch))
+
+def _day_range(start_day, end_day):
+    return to_epoch(start_day), to_epoch(end_day + timedelta(days=1))
+
+class _Vocabulary:
+    """Valor <-> código inteiro de uma coluna (só cresce; recriado na compactação)"""
+
+    __slots__ = ('index', 'names')
+
+    def __init__(self, names=()):
+        self.names = list(names)
+        self.index = {name: code for code, name in enumerate(self.names)}
+
+    def encode(self, values):
+        index, names = self.index, self.names
+
+        def code(value):
+            found = index.get(value)
+            if found is None:
+                found = index[value] = len(names)
+                names.append(value)
+            return found
+
+        return np.fromiter(map(code, values), dtype=np.int32, count=len(values))
+
+class _Slice:
+    """Linhas de um intervalo de tempo (visões dos arrays) e os dicionários da época"""
+
+    def __init__(self, columns, vocab):
+        self.columns = columns
+        self.vocab = vocab
+
+    def __len__(self):
+        return len(self.columns['epoch'])
+
+    def filter_source(self, source):
+        if not source:
+            return self
+        return self.filter_value('source', source)
+
+    def filter_value(self, column, value):
+        """Só as linhas em que a coluna codificada `column` vale `value`"""
+        code = self.vocab[column].index.get(value)
+        if code is None:
+            return _Slice({name: values[:0] for name, values in self.columns.items()}, self.vocab)
+        mask = self.columns[column] == code
+        return _Slice({name: values[mask] for name, values in self.columns.items()}, self.vocab)
+
+class HotWindow:
+    """Últimas `hours` horas de consultas em arrays NumPy ordenados por tempo"""
+
+    def __init__(self, hours=DEFAULT_CONFIG['hours'], enabled=True):
+        self.hours = hours
+        self.enabled = enabled and hours > 0
+        self._lock = threading.Lock()
+        self._vocab = {name: _Vocabulary() for name in CODED}
+        self._columns = {name: np.empty(MIN_CAPACITY, dtype) for name, dtype in DTYPES.items()}
+        self._start = 0
+        self._end = 0
+        # Epoch a partir do qual a janela tem todas as linhas (None antes da carga)
+        self.covered_from = None
+
+    @classmethod
+    def from_config(cls):
+        config = load_config()
+        return cls(int(config['hours']), bool(config['enabled']))
+
+    def __len__(self):
+        return self._end - self._start
+
+    def nbytes(self):
+        """Memória ocupada pelos buffers (sem os dicionários)"""
+        return sum(column.nbytes for column in self._columns.values())
+
+    def covers(self, start):
+        """True se todas as linhas a partir de `start` (date ou datetime) estão na janela"""
+        covered_from = self.covered_from
+        return covered_from is not None and to_epoch(start) >= covered_from
+
+    def _cutoff(self, now):
+        return to_epoch(now or datetime.now()) - self.hours * 3600
+
+    def load(self, conn, now=None):
+        """Preenche a janela com as linhas das últimas `hours` horas do banco"""
+        if not self.enabled:
+            return 0
+        cutoff = self._cutoff(now)
+        since = from_epoch(cutoff)
+        source = partition_store.source_sql(conn, since.date(), (now or datetime.now()).date())
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT timestamp, domain, client, status, source
+            FROM {source}
+            WHERE timestamp >= ?
+        """, (since.strftime('%Y-%m-%d %H:%M:%S'),))
+        with self._lock:
+            # Buffers novos: leitores em andamento continuam com os antigos
+            self._vocab = {name: _Vocabulary() for name in CODED}
+            self._columns = {name: np.empty(MIN_CAPACITY, dtype) for name, dtype in DTYPES.items()}
+            self._start = self._end = 0
+            while True:
+                rows = cursor.fetchmany(LOAD_BATCH)
+                if not rows:
+                    break
+                self._append_locked(rows, cutoff)
+            self.covered_from = cutoff
+        return len(self)
+
+    def append(self, rows, now=None):
+        """Acrescenta linhas (timestamp, domain, client, status, source) recém-importadas
+
+        Devem ser só as linhas que insert_rows acabou de gravar: a janela não
+        tem a identidade das linhas e contaria de novo uma que já está nela.
+        Consultas repetidas no mesmo segundo são linhas distintas, como nas
+        partições; as anteriores ao início da janela são descartadas.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            cutoff = self._cutoff(now)
+            self._append_locked(list(rows), cutoff)
+            if self.covered_from is not None:
+                self.covered_from = max(self.covered_from, cutoff)
+
+    def _append_locked(self, rows, cutoff):
+        # Sai da janela o que ficou mais antigo que o corte
+        epochs_live = self._columns['epoch'][self._start:self._end]
+        self._start += int(np.searchsorted(epochs_live, cutoff))
+        if not rows:
+            return
+
+        timestamps, domains, clients, statuses, sources = zip(*rows)
+        epochs = to_epochs(timestamps)
+        order = np.argsort(epochs, kind='stable')
+        order = order[epochs[order] >= cutoff]
+        if order.size == 0:
+            return
+        picked = order.tolist()
+        batch = {
+            'epoch': epochs[order],
+            'domain': self._vocab['domain'].encode([domains[i] for i in picked]),
+            'client': self._vocab['client'].encode([clients[i] for i in picked]),
+            'blocked': np.fromiter((statuses[i] == 'blocked' for i in picked), dtype=np.bool_, count=len(picked)),
+            'source': self._vocab['source'].encode([sources[i] for i in picked])
+        }
+
+        size = len(self)
+        in_order = size == 0 or batch['epoch'][0] >= self._columns['epoch'][self._end - 1]
+        if in_order and self._end + order.size <= len(self._columns['epoch']):
+            # Caso comum: o lote é mais novo que tudo e cabe no buffer
+            for name, column in self._columns.items():
+                column[self._end:self._end + order.size] = batch[name]
+            self._end += order.size
+            return
+
+        live = {name: np.concatenate((column[self._start:self._end], batch[name]))
+                for name, column in self._columns.items()}
+        if not in_order:
+            # Fontes com relógios diferentes ou lotes atrasados: reordena tudo
+            merged = np.argsort(live['epoch'], kind='stable')
+            live = {name: column[merged] for name, column in live.items()}
+        self._reallocate(live)
+
+    def _reallocate(self, live):
+        """Copia as linhas vivas para buffers novos (os antigos seguem válidos para leitores)"""
+        size = len(live['epoch'])
+        for name in CODED:
+            names = self._vocab[name].names
+            used = np.unique(live[name])
+            # Dicionário com muitos valores que já saíram da janela: recodifica
+            if used.size * 2 < len(names):
+                remap = np.full(len(names), -1, dtype=np.int32)
+                remap[used] = np.arange(used.size, dtype=np.int32)
+                live[name] = remap[live[name]]
+                self._vocab[name] = _Vocabulary(names[code] for code in used.tolist())
+
+        capacity = max(MIN_CAPACITY, size * 2)
+        columns = {}
+        for name, dtype in DTYPES.items():
+            column = np.empty(capacity, dtype)
+            column[:size] = live[name]
+            columns[name] = column
+        self._columns = columns
+        self._start, self._end = 0, size
+
+    def _slice(self, start_epoch, end_epoch):
+        with self._lock:
+            epochs = self._columns['epoch'][self._start:self._end]
+            first = self._start + int(np.searchsorted(epochs, start_epoch))
+            last = self._start + int(np.searchsorted(epochs, end_epoch))
+            columns = {name: column[first:last] for name, column in self._columns.items()}
+            return _Slice(columns, dict(self._vocab))
+
+    def stats(self, start_day, end_day, source=None):
+        """(total, bloqueados, clientes únicos, domínios únicos) do período"""
+        rows = self._slice(*_day_range(start_day, end_day)).filter_source(source)
+        columns = rows.columns
+        return (
+            len(rows),
+            int(np.count_nonzero(columns['blocked'])),
+            int(np.count_nonzero(np.bincount(columns['client'], minlength=1))),
+            int(np.count_nonzero(np.bincount(columns['domain'], minlength=1)))
+        )
+
+    def activity(self, start_day, end_day, source=None):
+        """Série (rótulo, total, bloqueados) por hora (um dia) ou por dia"""
+        start_epoch, end_epoch = _day_range(start_day, end_day)
+        rows = self._slice(start_epoch, end_epoch).filter_source(source)
+        by_hour = start_day == end_day
+        step = 3600 if by_hour else 86400
+        buckets = (rows.columns['epoch'] - start_epoch) // step
+        n_buckets = (end_epoch - start_epoch) // step
+        totals = np.bincount(buckets, minlength=n_buckets)
+        blocked = np.bincount(buckets, weights=rows.columns['blocked'], minlength=n_buckets)
+
+        series = []
+        for bucket in np.flatnonzero(totals).tolist():
+            if by_hour:
+                label = f"{bucket:02d}:00"
+            else:
+                label = (start_day + timedelta(days=bucket)).isoformat()
+            series.append((label, int(totals[bucket]), int(blocked[bucket])))
+        return series
+
+    def top(self, start_day, end_day, kind, blocked_only=False, exclude=None, limit=10, source=None):
+        """Top `limit` de domínios ou clientes do período: [(valor, contagem)]"""
+        rows = self._slice(*_day_range(start_day, end_day)).filter_source(source)
+        vocab = rows.vocab[kind]
+        codes = rows.columns[kind]
+        if blocked_only:
+            codes = codes[rows.columns['blocked']]
+        counts = np.bincount(codes, minlength=len(vocab.names))
+        if exclude is not None and exclude in vocab.index:
+            counts[vocab.index[exclude]] = 0
+
+        candidates = np.flatnonzero(counts)
+        if candidates.size > limit:
+            candidates = candidates[np.argpartition(-counts[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-counts[candidates], kind='stable')]
+        return [(vocab.names[code], int(counts[code])) for code in candidates.tolist()]
+
+    def buckets(self, start, end, step, kind=None, key=None, source=None):
+        """(totais, bloqueados) em buckets de `step` segundos de [start, end)
+
+        `kind` ('client' ou 'domain') e `key` restringem a um cliente ou domínio.
+        """
+        start_epoch, end_epoch = to_epoch(start), to_epoch(end)
+        rows = self._slice(start_epoch, end_epoch).filter_source(source)
+        if kind:
+            rows = rows.filter_value(kind, key)
+        n_buckets = -(-(end_epoch - start_epoch) // step)
+        index = (rows.columns['epoch'] - start_epoch) // step
+        totals = np.bincount(index, minlength=n_buckets)
+        blocked = np.bincount(index, weights=rows.columns['blocked'], minlength=n_buckets)
+        return totals[:n_buckets], blocked[:n_buckets].astype(np.int64)
+
+    def hourly_matrix(self, column, start, end):
+        """(entidades, matriz entidade x hora) de [start, end), como load_hourly_matrix"""
+        start_epoch = to_epoch(start)
+        n_hours = int((end - start).total_seconds() // 3600)
+        rows = self._slice(start_epoch, to_epoch(end))
+        if len(rows) == 0:
+            return [], np.zeros((0, n_hours), dtype=np.float64)
+
+        hours = (rows.columns['epoch'] - start_epoch) // 3600
+        valid = hours < n_hours
+        used, codes = np.unique(rows.columns[column], return_inverse=True)
+        cells = np.bincount(codes[valid] * n_hours + hours[valid], minlength=used.size * n_hours)
+        names = rows.vocab[column].names
+        return [names[code] for code in used.tolist()], cells.reshape(used.size, n_hours).astype(np.float64)
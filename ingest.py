@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Importação concorrente de várias instâncias do Pi-hole
+Cada fonte (Pi-hole) tem sua própria marca d'água em `sync_state`; as buscas
+via SSH rodam em um pool limitado de threads e as linhas de cada fonte são
+gravadas no banco local (marcadas com o id da fonte) pela thread que chamou,
+à medida que as buscas terminam. A falha de uma fonte não impede as demais.
+"""
+
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import paramiko
+
+import metrics
+import partition_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCE = partition_store.DEFAULT_SOURCE
+
+DEFAULT_FTL_DB = '/etc/pihole/pihole-FTL.db'
+
+# Buscas SSH simultâneas (padrão; INGEST_CONFIG['max_workers'] sobrescreve)
+MAX_WORKERS = 4
+
+# O Pi-hole grava em UTC; o banco local usa o horário local (-03)
+UTC_OFFSET_HOURS = partition_store.UTC_OFFSET_HOURS
+
+SOURCE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+def load_sources():
+    """Lista de fontes configuradas
+
+    Usa PIHOLE_SOURCES do config.py; sem ela, o SSH_CONFIG antigo vira a
+    fonte única 'default' (compatível com os dados já importados).
+    """
+    import config
+    sources = getattr(config, 'PIHOLE_SOURCES', None)
+    if not sources:
+        sources = [dict(config.SSH_CONFIG, id=DEFAULT_SOURCE)]
+
+    seen = set()
+    result = []
+    for source in sources:
+        source_id = str(source.get('id') or source.get('host'))
+        if not SOURCE_ID_PATTERN.match(source_id):
+            raise ValueError(f"Id de fonte inválido: {source_id!r}")
+        if source_id in seen:
+            raise ValueError(f"Id de fonte duplicado: {source_id}")
+        seen.add(source_id)
+        result.append(dict(source, id=source_id))
+    return result
+
+def max_workers():
+    """Tamanho do pool de importação (INGEST_CONFIG['max_workers'])"""
+    import config
+    return max(1, int(getattr(config, 'INGEST_CONFIG', {}).get('max_workers', MAX_WORKERS)))
+
+def init_sync_state(conn):
+    """Cria a tabela de marcas d'água por fonte"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            source TEXT PRIMARY KEY,
+            last_timestamp TEXT,
+            last_sync_at TEXT,
+            last_success_at TEXT,
+            last_error TEXT,
+            rows_inserted INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.commit()
+
+def get_watermark(conn, source_id):
+    """Último timestamp importado da fonte
+
+    Bancos anteriores à importação por fonte não têm linha em sync_state: a
+    fonte 'default' herda o último timestamp armazenado.
+    """
+    row = conn.execute("SELECT last_timestamp FROM sync_state WHERE source = ?", (source_id,)).fetchone()
+    if row:
+        return row[0]
+    if source_id == DEFAULT_SOURCE:
+        return partition_store.last_timestamp(conn)
+    return None
+
+def to_utc(timestamp):
+    """'AAAA-MM-DD HH:MM:SS' no horário local -> o mesmo instante em UTC (horário do Pi-hole)"""
+    return (datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
+            + timedelta(hours=UTC_OFFSET_HOURS)).strftime('%Y-%m-%d %H:%M:%S')
+
+def build_command(db_path, last_timestamp, current_time, inclusive=True):
+    """Comando sqlite3 executado no Pi-hole para buscar os registros novos
+
+    A marca d'água e o limite estão no horário local e são convertidos para
+    UTC antes de comparar com os epochs do FTL. Com `inclusive`, o segundo da
+    marca d'água é buscado de novo (consultas gravadas nele depois da última
+    importação); as já importadas são descartadas pelo id do FTL.
+    """
+    current_utc = to_utc(current_time)
+    if last_timestamp:
+        last_utc = to_utc(last_timestamp)
+        operator = '>=' if inclusive else '>'
+        where = (f"timestamp {operator} (SELECT strftime(\"%s\", \"{last_utc}\")) "
+                 f"AND datetime(timestamp, \"unixepoch\") <= \"{current_utc}\"")
+    else:
+        where = f"datetime(timestamp, \"unixepoch\") <= \"{current_utc}\""
+    return (f"sqlite3 {db_path} 'SELECT datetime(timestamp, \"unixepoch\"), domain, client, status, id "
+            f"FROM queries WHERE {where} ORDER BY timestamp DESC;'")
+
+def fetch_source(source, command):
+    """Executa o comando na fonte via SSH e retorna a saída"""
+    ssh = paramiko.SSHClient()
+    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        with metrics.ssh_connect_seconds.time(source=source['id']):
+            ssh.connect(
+                source['host'],
+                port=source.get('port', 22),
+                username=source['username'],
+                password=source.get('password'),
+                timeout=source.get('timeout', 10)
+            )
+        with metrics.ssh_transfer_seconds.time(source=source['id']):
+            stdin, stdout, stderr = ssh.exec_command(command)
+            raw_output = stdout.read()
+            raw_error = stderr.read()
+        metrics.ssh_bytes.inc(len(raw_output) + len(raw_error), source=source['id'])
+        output = raw_output.decode('utf-8')
+        error = raw_error.decode('utf-8')
+    finally:
+        ssh.close()
+    if error:
+        raise RuntimeError(f"Erro SSH: {error.strip()}")
+    return output
+
+def parse_rows(output, source_id, current_time):
+    """Converte a saída do sqlite3 em linhas (timestamp local, domain, client, status, source, ftl_id)
+
+    Retorna (linhas, futuros ignorados).
+    """
+    current_dt = datetime.strptime(current_time, '%Y-%m-%d %H:%M:%S')
+    limit = current_dt + timedelta(hours=1)
+    rows = []
+    skipped_future = 0
+    for line in output.split('\n'):
+        if not line.strip():
+            continue
+        parts = line.split('|')
+        if len(parts) < 4:
+            continue
+        timestamp, domain, client, status = parts[:4]
+        ftl_id = int(parts[4]) if len(parts) > 4 and parts[4].isdigit() else None
+        try:
+            timestamp_local = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S') - timedelta(hours=UTC_OFFSET_HOURS)
+        except ValueError as e:
+            logger.warning(f"⚠️ [{source_id}] Erro ao processar timestamp: {timestamp} - {e}")
+            continue
+        if timestamp_local > limit:
+            skipped_future += 1
+            if skipped_future <= 5:
+                logger.warning(f"⚠️ [{source_id}] Ignorando registro futuro: {timestamp} (atual: {current_time})")
+            continue
+        # Status 1 = bloqueado, outros = permitido
+        rows.append((timestamp_local.strftime('%Y-%m-%d %H:%M:%S'), domain, client,
+                     'blocked' if status == '1' else 'allowed', source_id, ftl_id))
+    return rows, skipped_future
+
+def _fetch_and_parse(source, command, current_time):
+    started = time.perf_counter()
+    output = fetch_source(source, command)
+    rows, skipped_future = parse_rows(output, source['id'], current_time)
+    return rows, skipped_future, started
+
+def _record_sync(conn, source_id, now, last_timestamp=None, inserted=0, error=None):
+    conn.execute("INSERT OR IGNORE INTO sync_state (source) VALUES (?)", (source_id,))
+    if error:
+        conn.execute("UPDATE sync_state SET last_sync_at = ?, last_error = ? WHERE source = ?",
+                     (now, error, source_id))
+    else:
+        conn.execute("""
+            UPDATE sync_state SET
+                last_timestamp = CASE WHEN last_timestamp IS NULL OR ? > last_timestamp
+                                      THEN ? ELSE last_timestamp END,
+                last_sync_at = ?, last_success_at = ?, last_error = NULL,
+                rows_inserted = rows_inserted + ?
+            WHERE source = ?
+        """, (last_timestamp or None, last_timestamp or None, now, now, inserted, source_id))
+    conn.commit()
+
+def sync_sources(conn, sources, current_time, workers=MAX_WORKERS, on_rows=None):
+    """Importa todas as fontes em paralelo até `current_time` (horário local)
+
+    As buscas rodam em até `workers` threads; a inserção acontece nesta thread
+    (a conexão SQLite não é compartilhada). `on_rows(linhas)` recebe as linhas
+    de cada fonte que foram de fato inseridas (ex.: detector de anomalias). Retorna um dicionário
+    {fonte: {'inserted', 'fetched', 'skipped_future', 'error'}}.
+    """
+    init_sync_state(conn)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources))),
+                            thread_name_prefix='pihole-ingest') as pool:
+        futures = {}
+        watermarks = {}
+        for source in sources:
+            watermark = watermarks[source['id']] = get_watermark(conn, source['id'])
+            # Sem ftl_id nas linhas do segundo da marca d'água (importadas antes
+            # da coluna), buscá-lo de novo as duplicaria: só a partir do próximo
+            inclusive = bool(watermark) and partition_store.has_ftl_ids(conn, source['id'], watermark)
+            command = build_command(source.get('db_path', DEFAULT_FTL_DB), watermark, current_time, inclusive)
+            logger.info(f"🔄 [{source['id']}] Importando registros após {watermark or 'o início'} até {current_time}...")
+            futures[pool.submit(_fetch_and_parse, source, command, current_time)] = source['id']
+
+        for future in as_completed(futures):
+            source_id = futures[future]
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            try:
+                rows, skipped_future, started = future.result()
+            except Exception as e:
+                logger.error(f"❌ [{source_id}] Falha na importação: {e}")
+                metrics.ingest_errors.inc(source=source_id)
+                _record_sync(conn, source_id, now, error=str(e))
+                results[source_id] = {'inserted': 0, 'fetched': 0, 'skipped_future': 0, 'error': str(e)}
+                continue
+
+            inserted_rows = partition_store.insert_rows(conn, rows)
+            inserted = len(inserted_rows)
+            last = max([row[0] for row in rows] + [watermarks[source_id] or ''])
+            _record_sync(conn, source_id, now, last, inserted)
+            elapsed = time.perf_counter() - started
+            metrics.ingest_duration_seconds.observe(elapsed, source=source_id)
+            metrics.ingest_rows.inc(inserted, source=source_id)
+            metrics.ingest_fetched_rows.inc(len(rows), source=source_id)
+            metrics.ingest_rows_per_second.set(inserted / elapsed if elapsed > 0 else 0, source=source_id)
+            if on_rows and inserted_rows:
+                on_rows(inserted_rows)
+            logger.info(f"✅ [{source_id}] {inserted} inseridos de {len(rows)} ({skipped_future} futuros ignorados)")
+            results[source_id] = {'inserted': inserted, 'fetched': len(rows),
+                                  'skipped_future': skipped_future, 'error': None}
+    return results
+
+def source_lag(conn, sources, now=None):
+    """Situação de cada fonte: último registro, última sincronização e atraso em segundos"""
+    init_sync_state(conn)
+    now = now or datetime.now()
+    state = {row[0]: row for row in conn.execute(
+        "SELECT source, last_timestamp, last_sync_at, last_success_at, last_error, rows_inserted FROM sync_state")}
+    result = []
+    for source in sources:
+        _, last_timestamp, last_sync_at, last_success_at, last_error, rows_inserted = \
+            state.get(source['id'], (source['id'], None, None, None, None, 0))
+        if last_timestamp is None:
+            last_timestamp = get_watermark(conn, source['id'])
+        lag = None
+        if last_timestamp:
+            lag = max(0, int((now - datetime.strptime(last_timestamp, '%Y-%m-%d %H:%M:%S')).total_seconds()))
+        result.append({
+            'id': source['id'],
+            'host': source.get('host'),
+            'last_timestamp': last_timestamp,
+            'last_sync_at': last_sync_at,
+            'last_success_at': last_success_at,
+            'last_error': last_error,
+            'rows_inserted': rows_inserted,
+            'lag_seconds': lag
+        })
+    return result
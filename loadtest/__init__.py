@@ -0,0 +1,7 @@
+"""
+Teste de carga HTTP das três aplicações
+Sobe um Pi-hole falso (servidor SSH/SFTP com paramiko servindo um
+pihole-FTL.db e um pihole.log sintéticos), inicia a variante escolhida e
+reproduz o tráfego de vários navegadores, medindo a latência por rota
+(python -m loadtest.run)
+"""
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Pi-hole falso acessível por SSH
+Servidor paramiko que aceita senha, executa os comandos que as aplicações
+enviam ao Pi-hole (sqlite3, tail, cat, cp, rm, ls, wc) sobre arquivos locais
+mapeados para os caminhos reais (/etc/pihole/pihole-FTL.db,
+/var/log/pihole/pihole.log) e atende SFTP somente leitura.
+
+Uso: python -m loadtest.fake_pihole --ftl-db dados.db --log pihole.log --port 2222
+"""
+
+import argparse
+import logging
+import os
+import shlex
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+FTL_DB_PATH = '/etc/pihole/pihole-FTL.db'
+LOG_PATH = '/var/log/pihole/pihole.log'
+
+DEFAULT_USERNAME = 'pi'
+DEFAULT_PASSWORD = 'loadtest'
+
+# Bytes enviados por vez no canal SSH
+SEND_CHUNK = 64 * 1024
+
+class FakeFilesystem:
+    """Caminhos remotos mapeados para arquivos locais (cópias ficam em um diretório temporário)"""
+
+    def __init__(self, files):
+        self._files = dict(files)
+        self._lock = threading.Lock()
+        self._tmp_dir = tempfile.mkdtemp(prefix='fake-pihole-')
+
+    def resolve(self, path):
+        with self._lock:
+            return self._files.get(path)
+
+    def copy(self, source, target):
+        real = self.resolve(source)
+        if real is None:
+            return False
+        fd, copy_path = tempfile.mkstemp(dir=self._tmp_dir)
+        os.close(fd)
+        shutil.copyfile(real, copy_path)
+        with self._lock:
+            previous = self._files.get(target)
+            self._files[target] = copy_path
+        if previous and previous.startswith(self._tmp_dir):
+            os.unlink(previous)
+        return True
+
+    def remove(self, path):
+        with self._lock:
+            real = self._files.pop(path, None)
+        if real and real.startswith(self._tmp_dir):
+            os.unlink(real)
+
+    def cleanup(self):
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+def _sqlite_value(value):
+    return '' if value is None else str(value)
+
+class _CommandRunner:
+    """Emula os comandos de shell usados pelas aplicações"""
+
+    def __init__(self, fs, latency=0.0):
+        self.fs = fs
+        self.latency = latency
+
+    def run(self, command, channel):
+        """Executa o comando escrevendo no canal; retorna o código de saída"""
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            args = shlex.split(command)
+        except ValueError as e:
+            channel.sendall_stderr(f"sh: {e}\n".encode('utf-8'))
+            return 2
+        if not args:
+            return 0
+        handler = getattr(self, f"_cmd_{args[0]}", None)
+        if handler is None:
+            channel.sendall_stderr(f"sh: {args[0]}: command not found\n".encode('utf-8'))
+            return 127
+        return handler(args[1:], channel)
+
+    def _missing(self, channel, name, path):
+        channel.sendall_stderr(f"{name}: {path}: No such file or directory\n".encode('utf-8'))
+        return 1
+
+    def _cmd_sqlite3(self, args, channel):
+        if len(args) != 2:
+            channel.sendall_stderr(b"sqlite3: uso esperado: sqlite3 <banco> '<sql>'\n")
+            return 1
+        path, sql = args
+        real = self.fs.resolve(path)
+        if real is None:
+            channel.sendall_stderr(f"Error: unable to open database \"{path}\"\n".encode('utf-8'))
+            return 1
+        conn = sqlite3.connect(f"file:{real}?mode=ro", uri=True)
+        try:
+            cursor = conn.execute(sql)
+            while True:
+                rows = cursor.fetchmany(5000)
+                if not rows:
+                    break
+                channel.sendall(''.join('|'.join(map(_sqlite_value, row)) + '\n' for row in rows).encode('utf-8'))
+        except sqlite3.Error as e:
+            channel.sendall_stderr(f"Error: {e}\n".encode('utf-8'))
+            return 1
+        finally:
+            conn.close()
+        return 0
+
+    def _cmd_tail(self, args, channel):
+        lines, path = 10, args[-1]
+        if '-n' in args:
+            lines = int(args[args.index('-n') + 1])
+        real = self.fs.resolve(path)
+        if real is None:
+            return self._missing(channel, 'tail', path)
+        with open(real, 'rb') as f:
+            # Lê blocos do fim do arquivo até ter linhas suficientes
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b''
+            while position > 0 and data.count(b'\n') <= lines:
+                step = min(SEND_CHUNK, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+        channel.sendall(b'\n'.join(data.split(b'\n')[-lines - 1:]))
+        return 0
+
+    def _cmd_cat(self, args, channel):
+        real = self.fs.resolve(args[0]) if args else None
+        if real is None:
+            return self._missing(channel, 'cat', args[0] if args else '')
+        with open(real, 'rb') as f:
+            while True:
+                chunk = f.read(SEND_CHUNK)
+                if not chunk:
+                    break
+                channel.sendall(chunk)
+        return 0
+
+    def _cmd_cp(self, args, channel):
+        if len(args) != 2 or not self.fs.copy(args[0], args[1]):
+            return self._missing(channel, 'cp', args[0] if args else '')
+        return 0
+
+    def _cmd_rm(self, args, channel):
+        for path in args:
+            if not path.startswith('-'):
+                self.fs.remove(path)
+        return 0
+
+    def _cmd_ls(self, args, channel):
+        path = args[-1] if args else ''
+        real = self.fs.resolve(path)
+        if real is None:
+            return self._missing(channel, 'ls', path)
+        stat = os.stat(real)
+        modified = time.strftime('%b %d %H:%M', time.localtime(stat.st_mtime))
+        channel.sendall(f"-rw-r--r-- 1 pihole pihole {stat.st_size} {modified} {path}\n".encode('utf-8'))
+        return 0
+
+    def _cmd_wc(self, args, channel):
+        path = args[-1] if args else ''
+        real = self.fs.resolve(path)
+        if real is None:
+            return self._missing(channel, 'wc', path)
+        count = 0
+        with open(real, 'rb') as f:
+            for chunk in iter(lambda: f.read(SEND_CHUNK), b''):
+                count += chunk.count(b'\n')
+        channel.sendall(f"{count} {path}\n".encode('utf-8'))
+        return 0
+
+class _SFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+class _SFTPInterface(paramiko.SFTPServerInterface):
+    """SFTP somente leitura sobre o sistema de arquivos falso"""
+
+    def __init__(self, server, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.fs = server.fs
+
+    def _stat(self, path):
+        real = self.fs.resolve(path)
+        if real is None:
+            return paramiko.SFTP_NO_SUCH_FILE
+        return paramiko.SFTPAttributes.from_stat(os.stat(real))
+
+    stat = lstat = _stat
+
+    def open(self, path, flags, attr):
+        if flags & (os.O_WRONLY | os.O_RDWR | os.O_CREAT):
+            return paramiko.SFTP_PERMISSION_DENIED
+        real = self.fs.resolve(path)
+        if real is None:
+            return paramiko.SFTP_NO_SUCH_FILE
+        handle = _SFTPHandle(flags)
+        handle.filename = path
+        handle.readfile = open(real, 'rb')
+        return handle
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, fs, runner, username, password):
+        self.fs = fs
+        self.runner = runner
+        self.username = username
+        self.password = password
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        if username == self.username and password == self.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        command = command.decode('utf-8') if isinstance(command, bytes) else command
+        threading.Thread(target=self._exec, args=(channel, command), daemon=True).start()
+        return True
+
+    def _exec(self, channel, command):
+        status = 1
+        try:
+            status = self.runner.run(command, channel)
+        except Exception as e:
+            logger.error(f"❌ Erro no comando '{command}': {e}")
+            try:
+                channel.sendall_stderr(f"{e}\n".encode('utf-8'))
+            except Exception:
+                pass
+        finally:
+            # Sem close(): fechar o canal antes de o transporte responder ao
+            # pedido exec faz o cliente ver "Channel closed"; o cliente fecha
+            # o canal depois de ler a saída
+            try:
+                channel.send_exit_status(status)
+                channel.shutdown_write()
+            except Exception:
+                pass
+
+class FakePiholeServer:
+    """Servidor SSH em segundo plano; use start()/stop() ou como context manager"""
+
+    def __init__(self, ftl_db, log_path, host='127.0.0.1', port=0, username=DEFAULT_USERNAME,
+                 password=DEFAULT_PASSWORD, latency_ms=0):
+        self.fs = FakeFilesystem({FTL_DB_PATH: os.path.abspath(ftl_db), LOG_PATH: os.path.abspath(log_path)})
+        self.runner = _CommandRunner(self.fs, latency_ms / 1000.0)
+        self.username = username
+        self.password = password
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self.host, self.port = self._socket.getsockname()
+        self._transports = []
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._socket.listen(64)
+        self._running = True
+        self._thread = threading.Thread(target=self._accept_loop, name='fake-pihole-ssh', daemon=True)
+        self._thread.start()
+        logger.info(f"🛰️ Pi-hole falso ouvindo em {self.host}:{self.port}")
+        return self
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, _ = self._socket.accept()
+            except OSError:
+                break
+            try:
+                transport = paramiko.Transport(client)
+                transport.add_server_key(self.host_key)
+                transport.set_subsystem_handler('sftp', paramiko.SFTPServer, _SFTPInterface)
+                transport.start_server(server=_ServerInterface(self.fs, self.runner, self.username, self.password))
+                self._transports = [t for t in self._transports if t.is_active()] + [transport]
+            except Exception as e:
+                logger.warning(f"⚠️ Conexão SSH recusada: {e}")
+                client.close()
+
+    def stop(self):
+        self._running = False
+        try:
+            self._socket.close()
+        except OSError:
+            pass
+        for transport in self._transports:
+            transport.close()
+        self.fs.cleanup()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='Pi-hole falso acessível por SSH')
+    parser.add_argument('--ftl-db', required=True, help='banco com a tabela queries do FTL')
+    parser.add_argument('--log', required=True, help='pihole.log servido em ' + LOG_PATH)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2222)
+    parser.add_argument('--username', default=DEFAULT_USERNAME)
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--latency-ms', type=int, default=0, help='atraso adicionado a cada comando')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = FakePiholeServer(args.ftl_db, args.log, args.host, args.port, args.username,
+                              args.password, args.latency_ms).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Teste de carga ponta a ponta
+Gera (ou reutiliza) os dados sintéticos de benchmarks.datagen, sobe o Pi-hole
+falso via SSH, inicia a variante escolhida (app_local_db.py, app.py ou
+app_server.py) com um config.py temporário apontando para ele e simula
+usuários simultâneos: a cada `--poll-interval` segundos cada usuário faz o
+mesmo leque de requisições que o dashboard faz a cada 30s (até 6 conexões em
+paralelo, como um navegador) e, ocasionalmente, uma busca de logs ou uma
+exportação. Ao final mostra p50/p95/p99 e vazão por rota e grava um JSON.
+
+Uso: python -m loadtest.run --variant local_db --users 20 --duration 120
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+from benchmarks import datagen
+from loadtest.fake_pihole import FakePiholeServer, FTL_DB_PATH, LOG_PATH
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_ROWS = 200_000
+DEFAULT_DAYS = 3
+
+# Conexões simultâneas por usuário (limite típico de um navegador por host)
+BROWSER_CONNECTIONS = 6
+
+REQUEST_TIMEOUT = 120
+
+# Rotas de cada variante: leque do poll do dashboard, buscas e exportações.
+# {day}, {domain} e {client} são preenchidos a cada requisição.
+VARIANTS = {
+    'local_db': {
+        'script': 'app_local_db.py',
+        'ready': '/api/last-update',
+        'warmup': ['/api/update-data'],
+        'poll': [
+            '/api/stats?date={day}',
+            '/api/activity-chart?date={day}',
+            '/api/top-domains?date={day}',
+            '/api/top-blocked-domains?date={day}',
+            '/api/top-ips?date={day}',
+            '/api/recent-activity',
+            '/api/alerts',
+            '/api/last-update'
+        ],
+        'search': [
+            '/api/logs?domain={domain}&start_date={day}&end_date={day}',
+            '/api/logs?ip={client}&start_date={day}&end_date={day}',
+            '/api/logs?start_date={day}&end_date={day}&lines=1000'
+        ],
+        'export': [
+            '/api/export/csv?start_date={day}&end_date={day}&domain={domain}',
+            '/api/export/ndjson?start_date={day}&end_date={day}&ip={client}'
+        ]
+    },
+    'ssh': {
+        'script': 'app.py',
+        'ready': '/',
+        'warmup': [],
+        'poll': [
+            '/status',
+            '/dashboard/stats',
+            '/dashboard/top-domains',
+            '/dashboard/hourly-activity',
+            '/dashboard/recent-activity'
+        ],
+        'search': [
+            '/logs?query={domain}&start_date={day}&end_date={day}',
+            '/logs?query={client}&start_date={day}&end_date={day}&group_by=domain',
+            '/logs'
+        ],
+        'export': []
+    },
+    'server': {
+        'script': 'app_server.py',
+        'ready': '/status',
+        'warmup': [],
+        'poll': ['/status'],
+        'search': [
+            '/logs?query={domain}&start_date={day}&end_date={day}',
+            '/logs?query={client}&start_date={day}&end_date={day}',
+            '/logs?status=blocked'
+        ],
+        'export': []
+    }
+}
+
+CONFIG_TEMPLATE = '''# Gerado por loadtest.run
+SSH_CONFIG = {{
+    "host": "127.0.0.1",
+    "port": {ssh_port},
+    "username": "{username}",
+    "password": "{password}",
+    "timeout": 30,
+    "log_path": "{log_path}",
+    "db_path": "{db_path}"
+}}
+FLASK_CONFIG = {{"host": "127.0.0.1", "port": {http_port}, "debug": False}}
+LOGGING_CONFIG = {{
+    "level": "WARNING",
+    "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    "date_format": "%Y-%m-%d %H:%M:%S"
+}}
+FILTER_CONFIG = {{"max_results": 5000, "default_sort": "timestamp_desc"}}
+DNS_QUERY_TYPES = ["A", "AAAA", "CNAME", "MX", "TXT", "NS", "PTR", "SOA", "SRV", "CAA"]
+LOCAL_DB_CONFIG = {{"path": "pihole_logs.db", "enabled": True}}
+'''
+
+# Executa o app como __main__ com o config.py gerado à frente no sys.path
+BOOTSTRAP = "import runpy, sys; sys.path[:0] = [{config_dir!r}, {root!r}]; runpy.run_path({script!r}, run_name='__main__')"
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def percentile(values, fraction):
+    """Percentil por posição mais próxima (valores já ordenados)"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+class LatencyRecorder:
+    """Latências e erros por rota, compartilhados entre os usuários"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, name, seconds, ok, size=0):
+        with self._lock:
+            entry = self.samples.setdefault(name, {'latencies': [], 'errors': 0, 'bytes': 0})
+            entry['latencies'].append(seconds)
+            entry['bytes'] += size
+            if not ok:
+                entry['errors'] += 1
+
+    def summary(self, wall_seconds):
+        result = []
+        for name, entry in sorted(self.samples.items()):
+            latencies = sorted(entry['latencies'])
+            result.append({
+                'endpoint': name,
+                'requests': len(latencies),
+                'errors': entry['errors'],
+                'throughput_rps': round(len(latencies) / wall_seconds, 3) if wall_seconds else None,
+                'bytes': entry['bytes'],
+                'latency_ms': {
+                    'p50': round(percentile(latencies, 0.50) * 1000, 2),
+                    'p95': round(percentile(latencies, 0.95) * 1000, 2),
+                    'p99': round(percentile(latencies, 0.99) * 1000, 2),
+                    'mean': round(statistics.fmean(latencies) * 1000, 2),
+                    'max': round(latencies[-1] * 1000, 2)
+                }
+            })
+        return result
+
+class VirtualUser(threading.Thread):
+    """Um navegador com o dashboard aberto"""
+
+    def __init__(self, index, base_url, routes, recorder, params, deadline, poll_interval,
+                 search_probability, export_probability, seed):
+        super().__init__(name=f'user-{index}', daemon=True)
+        self.base_url = base_url
+        self.routes = routes
+        self.recorder = recorder
+        self.params = params
+        self.deadline = deadline
+        self.poll_interval = poll_interval
+        self.search_probability = search_probability
+        self.export_probability = export_probability
+        self.random = random.Random(seed + index)
+        self.session = requests.Session()
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=BROWSER_CONNECTIONS))
+
+    def _fill(self, template):
+        return template.format(day=self.params['day'],
+                               domain=self.random.choice(self.params['domains']),
+                               client=self.random.choice(self.params['clients']))
+
+    def request(self, template):
+        name = template.split('?')[0]
+        started = time.perf_counter()
+        ok, size = False, 0
+        try:
+            with self.session.get(self.base_url + self._fill(template), timeout=REQUEST_TIMEOUT,
+                                  stream=True) as response:
+                # Exportações chegam em fluxo: mede até o último byte
+                is_json = response.headers.get('Content-Type', '').startswith('application/json')
+                body = []
+                for chunk in response.iter_content(64 * 1024):
+                    size += len(chunk)
+                    if is_json:
+                        body.append(chunk)
+                ok = response.status_code < 400
+                if ok and is_json:
+                    # As rotas respondem 200 mesmo em erro; o JSON diz se deu certo
+                    payload = json.loads(b''.join(body) or b'{}')
+                    ok = not (isinstance(payload, dict) and (payload.get('success') is False or 'error' in payload))
+        except (requests.RequestException, ValueError):
+            ok = False
+        self.recorder.add(name, time.perf_counter() - started, ok, size)
+
+    def run(self):
+        # Usuários entram espalhados ao longo do primeiro intervalo
+        next_poll = time.monotonic() + self.random.uniform(0, self.poll_interval)
+        with ThreadPoolExecutor(max_workers=BROWSER_CONNECTIONS) as pool:
+            while True:
+                delay = next_poll - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                if time.monotonic() >= self.deadline:
+                    break
+                started = time.perf_counter()
+                list(pool.map(self.request, self.routes['poll']))
+                self.recorder.add('(dashboard poll)', time.perf_counter() - started, True)
+
+                if self.routes['search'] and self.random.random() < self.search_probability:
+                    self.request(self.random.choice(self.routes['search']))
+                if self.routes['export'] and self.random.random() < self.export_probability:
+                    self.request(self.random.choice(self.routes['export']))
+                next_poll += self.poll_interval
+
+def _top_values(ftl_path, column, limit=20):
+    import sqlite3
+    conn = sqlite3.connect(ftl_path)
+    try:
+        return [row[0] for row in conn.execute(
+            f"SELECT {column} FROM queries WHERE id % 10 = 0 GROUP BY {column} ORDER BY COUNT(*) DESC LIMIT ?",
+            (limit,))]
+    finally:
+        conn.close()
+
+def start_app(variant, work_dir, ssh_server, ftl_path):
+    """Inicia a variante em um subprocesso; retorna (processo, url base, arquivo de log)"""
+    http_port = _free_port()
+    config_dir = os.path.join(work_dir, 'config')
+    os.makedirs(config_dir, exist_ok=True)
+    with open(os.path.join(config_dir, 'config.py'), 'w') as f:
+        f.write(CONFIG_TEMPLATE.format(ssh_port=ssh_server.port, username=ssh_server.username,
+                                       password=ssh_server.password, log_path=LOG_PATH,
+                                       db_path=FTL_DB_PATH, http_port=http_port))
+
+    env = dict(os.environ, PIHOLE_FTL_DB=os.path.abspath(ftl_path), PYTHONUNBUFFERED='1')
+    log_file = open(os.path.join(work_dir, f"{variant}.log"), 'w')
+    script = os.path.join(ROOT, VARIANTS[variant]['script'])
+    process = subprocess.Popen(
+        [sys.executable, '-c', BOOTSTRAP.format(config_dir=config_dir, root=ROOT, script=script)],
+        cwd=work_dir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+    base_url = f"http://127.0.0.1:{http_port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{script} terminou ao iniciar (veja {log_file.name})")
+        try:
+            requests.get(base_url + VARIANTS[variant]['ready'], timeout=5)
+            return process, base_url, log_file
+        except requests.RequestException:
+            time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError(f"{script} não respondeu em 60s (veja {log_file.name})")
+
+def run_load(args):
+    rows = datagen.size_rows(args.rows)
+    data_dir = args.data_dir
+    os.makedirs(data_dir, exist_ok=True)
+    # Os dados terminam na hora atual para que o dashboard de "hoje" tenha registros
+    start = (datetime.utcnow() - timedelta(days=args.days)).replace(minute=0, second=0, microsecond=0)
+    ftl_path, log_path = datagen.dataset_paths(data_dir, rows, args.seed)
+    print(f"📦 Preparando dados sintéticos ({rows:,} consultas)...", file=sys.stderr)
+    datagen.write_ftl_db(ftl_path, rows, args.seed, start, args.days)
+    datagen.write_pihole_log(log_path, rows, args.seed, start, args.days)
+
+    work_dir = tempfile.mkdtemp(prefix=f'loadtest-{args.variant}-')
+    ssh_server = FakePiholeServer(ftl_path, log_path, latency_ms=args.ssh_latency_ms).start()
+    process = log_file = None
+    try:
+        process, base_url, log_file = start_app(args.variant, work_dir, ssh_server, ftl_path)
+        print(f"🚀 {VARIANTS[args.variant]['script']} em {base_url} (SSH falso na porta {ssh_server.port})",
+              file=sys.stderr)
+
+        for path in VARIANTS[args.variant]['warmup']:
+            started = time.perf_counter()
+            response = requests.get(base_url + path, timeout=None)
+            print(f"   aquecimento {path}: {response.status_code} em {time.perf_counter() - started:.1f}s",
+                  file=sys.stderr)
+
+        params = {
+            'day': datetime.now().strftime('%Y-%m-%d'),
+            'domains': _top_values(ftl_path, 'domain'),
+            'clients': [client for client in _top_values(ftl_path, 'client') if client != '127.0.0.1']
+        }
+        recorder = LatencyRecorder()
+        deadline = time.monotonic() + args.duration
+        users = [VirtualUser(i, base_url, VARIANTS[args.variant], recorder, params, deadline,
+                             args.poll_interval, args.search_probability, args.export_probability, args.seed)
+                 for i in range(args.users)]
+        print(f"⏱️  {args.users} usuário(s) por {args.duration}s (poll a cada {args.poll_interval}s)...",
+              file=sys.stderr)
+        started = time.monotonic()
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        wall = time.monotonic() - started
+    finally:
+        if process:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if log_file:
+            log_file.close()
+        ssh_server.stop()
+
+    summary = recorder.summary(wall)
+    report = {
+        'meta': {
+            'variant': args.variant,
+            'script': VARIANTS[args.variant]['script'],
+            'started_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'rows': rows,
+            'users': args.users,
+            'duration_s': round(wall, 1),
+            'poll_interval_s': args.poll_interval,
+            'ssh_latency_ms': args.ssh_latency_ms
+        },
+        'endpoints': summary
+    }
+
+    print(f"\n{'rota':<34} {'req':>6} {'erros':>6} {'req/s':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for item in summary:
+        latency = item['latency_ms']
+        print(f"{item['endpoint']:<34} {item['requests']:>6} {item['errors']:>6} {item['throughput_rps']:>7.2f} "
+              f"{latency['p50']:>7.0f}ms {latency['p95']:>7.0f}ms {latency['p99']:>7.0f}ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Resultados gravados em {args.output}", file=sys.stderr)
+    if args.keep_work_dir:
+        print(f"📁 Diretório de trabalho mantido em {work_dir}", file=sys.stderr)
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga HTTP com Pi-hole falso')
+    parser.add_argument('--variant', choices=sorted(VARIANTS), default='local_db',
+                        help='local_db = app_local_db.py, ssh = app.py, server = app_server.py')
+    parser.add_argument('--rows', default=str(DEFAULT_ROWS), help='consultas sintéticas (ex.: 200000, 1m)')
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS)
+    parser.add_argument('--seed', type=int, default=datagen.DEFAULT_SEED)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--duration', type=int, default=120, help='segundos de carga')
+    parser.add_argument('--poll-interval', type=float, default=30.0, help='intervalo do poll do dashboard')
+    parser.add_argument('--search-probability', type=float, default=0.3)
+    parser.add_argument('--export-probability', type=float, default=0.05)
+    parser.add_argument('--ssh-latency-ms', type=int, default=0, help='atraso de rede simulado no SSH')
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'benchmarks', 'data', 'loadtest'))
+    parser.add_argument('--output', help='arquivo JSON com os resultados')
+    parser.add_argument('--keep-work-dir', action='store_true', help='mantém banco local e logs do app')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # O app fecha a conexão SSH sem despedida; o paramiko registra isso como erro
+    logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+    run_load(args)
+
+if __name__ == '__main__':
+    main()
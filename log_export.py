@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Exportação de logs em fluxo contínuo (CSV, NDJSON e PDF)
+Os registros são lidos do SQLite em lotes (fetchmany), uma partição diária
+por vez e já em ordem pelo índice de horário, e cada lote é enviado assim que
+é formatado; a memória usada não depende do tamanho da exportação
+"""
+
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+
+import partition_store
+from pdf_writer import StreamingPDFWriter, PAGE_HEIGHT, PAGE_WIDTH
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = ('timestamp', 'domain', 'client', 'status', 'source')
+
+# Linhas lidas do cursor por vez
+FETCH_SIZE = 5000
+
+# Layout do PDF (pontos)
+PDF_MARGIN = 40
+PDF_FONT_SIZE = 8
+PDF_LEADING = 11
+PDF_COLUMNS = (('Horário', 0), ('Domínio', 85), ('IP', 330), ('Status', 410), ('Fonte', 465))
+PDF_MAX_DOMAIN = 56
+PDF_MAX_SOURCE = 12
+
+def parse_log_filters(args):
+    """Filtros de /api/logs e das exportações a partir dos parâmetros da URL"""
+    filters = {
+        'ip': args.get('ip', '').strip(),
+        'domain': args.get('domain', '').strip(),
+        'source': args.get('source', '').strip(),
+        'start_date': args.get('start_date') or None,
+        'end_date': args.get('end_date') or None,
+        'start_time': args.get('start_time', '00:00'),
+        'end_time': args.get('end_time', '23:59')
+    }
+    # Datas e horários inválidos falham aqui, antes de qualquer consulta
+    for key in ('start_date', 'end_date'):
+        if filters[key]:
+            datetime.strptime(filters[key], '%Y-%m-%d')
+    for key in ('start_time', 'end_time'):
+        datetime.strptime(filters[key], '%H:%M')
+    return filters
+
+def filter_sql(filters):
+    """Cláusulas AND e parâmetros correspondentes aos filtros"""
+    sql = ''
+    params = []
+    if filters['ip']:
+        sql += " AND client LIKE ?"
+        params.append(f"%{filters['ip']}%")
+    if filters['domain']:
+        sql += " AND domain LIKE ?"
+        params.append(f"%{filters['domain']}%")
+    if filters['source']:
+        sql += " AND source = ?"
+        params.append(filters['source'])
+    if filters['start_date']:
+        sql += " AND timestamp >= ?"
+        params.append(f"{filters['start_date']} {filters['start_time']}")
+    if filters['end_date']:
+        sql += " AND timestamp <= ?"
+        params.append(f"{filters['end_date']} {filters['end_time']}")
+    return sql, params
+
+def summary_filter_sql(filters):
+    """Cláusulas AND sobre activity_summary, ou None se o período não cobre dias inteiros
+
+    O resumo só distingue dias: horários diferentes de 00:00-23:59 exigem os
+    registros brutos.
+    """
+    if filters['start_time'] != '00:00' or filters['end_time'] != '23:59':
+        return None
+    sql = ''
+    params = []
+    if filters['ip']:
+        sql += " AND client LIKE ?"
+        params.append(f"%{filters['ip']}%")
+    if filters['domain']:
+        sql += " AND domain LIKE ?"
+        params.append(f"%{filters['domain']}%")
+    if filters['source']:
+        sql += " AND source = ?"
+        params.append(filters['source'])
+    if filters['start_date'] and filters['start_date'] == filters['end_date']:
+        # Um único dia: a chave primária já entrega os grupos em ordem
+        sql += " AND day = ?"
+        params.append(filters['start_date'])
+        return sql, params
+    if filters['start_date']:
+        sql += " AND day >= ?"
+        params.append(filters['start_date'])
+    if filters['end_date']:
+        sql += " AND day <= ?"
+        params.append(filters['end_date'])
+    return sql, params
+
+def describe_filters(filters):
+    """Resumo legível dos filtros (cabeçalho do PDF)"""
+    parts = []
+    if filters['start_date'] or filters['end_date']:
+        parts.append(f"Período: {filters['start_date'] or 'início'} {filters['start_time']} "
+                     f"a {filters['end_date'] or 'hoje'} {filters['end_time']}")
+    if filters['ip']:
+        parts.append(f"IP: {filters['ip']}")
+    if filters['domain']:
+        parts.append(f"Domínio: {filters['domain']}")
+    if filters['source']:
+        parts.append(f"Fonte: {filters['source']}")
+    return ' | '.join(parts) or 'Sem filtros'
+
+def iter_log_batches(filters, limit=None, db_path=partition_store.DB_PATH, budget=None):
+    """Lotes de (timestamp, domain, client, status, source) em ordem cronológica
+
+    Com um QueryBudget, a leitura para quando o orçamento acaba
+    (budget.truncated indica o corte).
+    """
+    conn = partition_store.connect(db_path)
+    if budget is not None:
+        budget.attach(conn)
+    try:
+        where, params = filter_sql(filters)
+        remaining = limit
+        for table in partition_store.iter_tables(conn, filters['start_date'], filters['end_date'],
+                                                 filters['domain'], filters['ip'], filters['source']):
+            cursor = conn.cursor()
+            sql = f"""
+                SELECT {', '.join(EXPORT_COLUMNS)} FROM {table}
+                WHERE 1=1{where}
+                ORDER BY timestamp
+            """
+            if budget is None:
+                cursor.execute(sql, params)
+                batches = iter(lambda: cursor.fetchmany(FETCH_SIZE), [])
+            elif budget.execute(cursor, sql, params):
+                batches = budget.batches(cursor, FETCH_SIZE)
+            else:
+                break
+            for rows in batches:
+                if remaining is not None:
+                    rows = rows[:remaining]
+                    remaining -= len(rows)
+                    if not rows:
+                        break
+                yield rows
+                if remaining is not None and remaining <= 0:
+                    break
+            cursor.close()
+            partition_store.release_table(conn, table)
+            if (remaining is not None and remaining <= 0) or (budget is not None and budget.truncated):
+                break
+    finally:
+        conn.close()
+
+def csv_chunks(batches):
+    """CSV com cabeçalho, um bloco por lote"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode('utf-8')
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+
+def ndjson_chunks(batches):
+    """Um objeto JSON por linha"""
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + '\n'
+                      for row in rows).encode('utf-8')
+
+def pdf_chunks(batches, title, author, subject, description=''):
+    """PDF paginado no servidor, enviado página a página"""
+    writer = StreamingPDFWriter(title, author, subject)
+    yield writer.begin()
+
+    top = PAGE_HEIGHT - PDF_MARGIN
+    bottom = PDF_MARGIN + 20
+    generated = datetime.now().strftime('%d/%m/%Y %H:%M')
+    total = 0
+
+    def new_page(first):
+        texts = []
+        y = top
+        if first:
+            texts.append((PDF_MARGIN, y, 16, title, True))
+            y -= 20
+            texts.append((PDF_MARGIN, y, 9, f"Gerado em {generated} — {description}", False))
+            y -= 20
+        for label, offset in PDF_COLUMNS:
+            texts.append((PDF_MARGIN + offset, y, 9, label, True))
+        lines = [(PDF_MARGIN, y - 4, PAGE_WIDTH - PDF_MARGIN, y - 4)]
+        return texts, lines, y - PDF_LEADING - 4
+
+    texts, lines, y = new_page(True)
+    for rows in batches:
+        for timestamp, domain, client, status, source in rows:
+            if y < bottom:
+                texts.append((PDF_MARGIN, PDF_MARGIN, 8, f"Página {writer.page_count + 1}", False))
+                yield writer.page(texts, lines)
+                texts, lines, y = new_page(False)
+            domain = domain or ''
+            if len(domain) > PDF_MAX_DOMAIN:
+                domain = domain[:PDF_MAX_DOMAIN - 3] + '...'
+            values = (timestamp, domain, client or 'N/A', 'Bloqueado' if status == 'blocked' else 'Permitido',
+                      (source or '')[:PDF_MAX_SOURCE])
+            for (_, offset), value in zip(PDF_COLUMNS, values):
+                texts.append((PDF_MARGIN + offset, y, PDF_FONT_SIZE, value, False))
+            y -= PDF_LEADING
+            total += 1
+
+    texts.append((PDF_MARGIN, PDF_MARGIN, 8,
+                  f"Página {writer.page_count + 1} — Total de registros: {total:,}".replace(',', '.'), False))
+    yield writer.page(texts, lines)
+    yield writer.end()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Registro compacto de uma consulta DNS
+Substitui o dicionário por linha usado no parsing do pihole.log e nas
+buscas no pihole-FTL.db: a classe usa __slots__ (sem __dict__ por objeto),
+tipo, status, cliente, domínio e resposta são internados (as mesmas poucas
+strings se repetem em milhares de linhas) e o `raw_line` das linhas vindas
+do banco só é montado quando alguém o lê. A conversão para dicionário
+acontece apenas na resposta JSON (`to_dict`).
+"""
+
+import sys
+import time
+
+_intern = sys.intern
+
+# Chaves antigas dos dicionários que continuam aceitas em get()/[]
+_ALIASES = {'reply_type': 'reply'}
+
+class LogRecord:
+    """Uma consulta DNS; aceita também `record['campo']` e `record.get('campo')`"""
+
+    __slots__ = ('timestamp', 'type', 'domain', 'ip', 'status', 'reply', '_raw_line')
+
+    def __init__(self, timestamp, type, domain, ip, status, reply=None, raw_line=None):
+        self.timestamp = timestamp
+        self.type = _intern(type)
+        self.domain = _intern(domain)
+        self.ip = _intern(ip)
+        self.status = _intern(status)
+        self.reply = _intern(reply) if reply else reply
+        self._raw_line = raw_line
+
+    @property
+    def raw_line(self):
+        if self._raw_line is None:
+            return f"{self.timestamp} query[{self.type}] {self.domain} from {self.ip}"
+        return self._raw_line
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, _ALIASES.get(key, key))
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, _ALIASES.get(key, key), default)
+
+    def to_dict(self, *extra, **values):
+        """Dicionário da resposta: campos básicos + atributos em `extra` + `values`"""
+        data = {
+            'timestamp': self.timestamp,
+            'type': self.type,
+            'domain': self.domain,
+            'ip': self.ip,
+            'status': self.status
+        }
+        for name in extra:
+            data[name] = getattr(self, name)
+        data.update(values)
+        return data
+
+    def __repr__(self):
+        return f"LogRecord({self.timestamp!r}, {self.type!r}, {self.domain!r}, {self.ip!r}, {self.status!r})"
+
+def text(value):
+    """Campo do banco como string ('' para NULL/0), como nos dicionários antigos"""
+    return str(value) if value else ''
+
+class TimestampFormatter:
+    """Formata epochs do FTL com strftime reaproveitando o último resultado
+
+    As linhas chegam ordenadas por tempo e várias caem no mesmo segundo; elas
+    compartilham o mesmo objeto string. Com `utc_offset` (segundos), usa esse
+    deslocamento fixo em vez do fuso da máquina.
+    """
+
+    __slots__ = ('fmt', 'utc_offset', '_last_epoch', '_last_text')
+
+    def __init__(self, fmt, utc_offset=None):
+        self.fmt = fmt
+        self.utc_offset = utc_offset
+        self._last_epoch = None
+        self._last_text = None
+
+    def __call__(self, epoch):
+        if epoch != self._last_epoch:
+            moment = time.localtime(epoch) if self.utc_offset is None else time.gmtime(epoch + self.utc_offset)
+            self._last_text = time.strftime(self.fmt, moment)
+            self._last_epoch = epoch
+        return self._last_text
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Métricas no formato de texto do Prometheus
+Contadores, gauges e histogramas em memória (por processo), com rótulos, sem
+dependências externas. Os pontos quentes registram latência por rota, tempo
+das consultas SQL nomeadas, importação e SSH por fonte, avaliação de alertas
+e acertos de cache; `render()` gera o texto servido em /metrics. Valores que
+dependem de estado (atraso da importação, fila do Telegram) são lidos no
+momento da coleta por funções registradas com `register_collector()`.
+
+Com o serve.py em prefork cada worker tem seus próprios valores: depois de
+`share_across_processes()` cada um publica os seus no cache compartilhado
+(a cada PUBLISH_INTERVAL_SECONDS e a cada coleta) e `render()` soma os de
+todos os workers, inclusive os que já saíram (os contadores não regridem).
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limites (segundos) dos histogramas de latência
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Intervalo de publicação dos valores de cada worker no cache compartilhado
+PUBLISH_INTERVAL_SECONDS = 5
+
+# Prefixo das entradas de cada worker no meta do cache compartilhado
+SHARED_PREFIX = 'metrics:'
+
+_registry = {}
+_collectors = []
+_process_collectors = []
+_registry_lock = threading.Lock()
+
+# Cache compartilhado (shared_cache.SharedCache) com os valores dos workers
+_shared = None
+# (pid, início) do processo atual: um pid reaproveitado não sobrescreve o worker anterior
+_worker = None
+_publisher_stop = threading.Event()
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name}: rótulos esperados {self.label_names}, recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def export(self):
+        """Valores deste processo, serializáveis em JSON: [[rótulos, valor], ...]"""
+        with self._lock:
+            return [[list(key), self._export_value(key, value)] for key, value in self._values.items()]
+
+    def _export_value(self, key, value):
+        return value
+
+    def _combine(self, current, value):
+        return current + value
+
+    def combined(self, exports):
+        """Junta os valores exportados por vários processos: {rótulos: valor}"""
+        values = {}
+        for exported in exports:
+            for key, value in exported:
+                key = tuple(key)
+                values[key] = value if key not in values else self._combine(values[key], value)
+        return values
+
+    def _sample_value(self, value):
+        return value
+
+    def samples(self, values=None):
+        values = self.combined([self.export()]) if values is None else values
+        return [(self.name, _format_labels(self.label_names, key), self._sample_value(value))
+                for key, value in sorted(values.items())]
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._updated = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+            self._updated[key] = time.time()
+
+    def _export_value(self, key, value):
+        return [value, self._updated.get(key, 0)]
+
+    def _combine(self, current, value):
+        # Entre os workers vale o valor gravado por último (ex.: a última importação)
+        return current if current[1] >= value[1] else value
+
+    def _sample_value(self, value):
+        return value[0]
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Mede o bloco (também serve como decorador)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _export_value(self, key, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def _combine(self, current, value):
+        return [[a + b for a, b in zip(current[0], value[0])], current[1] + value[1], current[2] + value[2]]
+
+    def samples(self, values=None):
+        values = self.combined([self.export()]) if values is None else values
+        result = []
+        for key, (counts, count, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                result.append((f"{self.name}_bucket",
+                               _format_labels(self.label_names, key, [('le', _format_value(float(bound)))]),
+                               cumulative))
+            result.append((f"{self.name}_bucket",
+                           _format_labels(self.label_names, key, [('le', '+Inf')]), count))
+            result.append((f"{self.name}_count", _format_labels(self.label_names, key), count))
+            result.append((f"{self.name}_sum", _format_labels(self.label_names, key), total))
+        return result
+
+def _register(metric_class, name, documentation, labels=(), **kwargs):
+    """Cria a métrica ou devolve a existente (módulos podem ser recarregados)"""
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = metric_class(name, documentation, labels, **kwargs)
+        return metric
+
+def counter(name, documentation, labels=()):
+    return _register(Counter, name, documentation, labels)
+
+def gauge(name, documentation, labels=()):
+    return _register(Gauge, name, documentation, labels)
+
+def histogram(name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, documentation, labels, buckets=buckets)
+
+def register_collector(collect, per_process=False):
+    """Registra uma função chamada a cada coleta
+
+    Ela retorna uma lista de (nome, tipo, descrição, [(rótulos, valor)]),
+    com os rótulos como dicionário. Com `per_process` ela descreve o estado
+    do próprio worker (ex.: sua fila do Telegram): roda em cada worker e os
+    valores são somados; sem ele, lê estado comum a todos (banco, cache) e
+    roda só no worker que atende a coleta.
+    """
+    (_process_collectors if per_process else _collectors).append(collect)
+
+# Métricas dos pontos quentes (compartilhadas entre os módulos)
+http_request_seconds = histogram(
+    'pihole_http_request_duration_seconds', 'Latência das rotas HTTP', ('route', 'method', 'status'))
+sql_query_seconds = histogram(
+    'pihole_sql_query_duration_seconds', 'Tempo de execução das consultas SQL nomeadas', ('query',))
+ingest_rows = counter(
+    'pihole_ingest_rows_total', 'Registros importados do Pi-hole', ('source',))
+ingest_fetched_rows = counter(
+    'pihole_ingest_fetched_rows_total', 'Registros recebidos do Pi-hole (antes da deduplicação)', ('source',))
+ingest_errors = counter(
+    'pihole_ingest_errors_total', 'Falhas de importação', ('source',))
+ingest_rows_per_second = gauge(
+    'pihole_ingest_rows_per_second', 'Registros inseridos por segundo na última importação', ('source',))
+ingest_duration_seconds = histogram(
+    'pihole_ingest_duration_seconds', 'Duração da importação de cada fonte (busca + inserção)', ('source',))
+ssh_connect_seconds = histogram(
+    'pihole_ssh_connect_duration_seconds', 'Tempo de conexão SSH', ('source',))
+ssh_transfer_seconds = histogram(
+    'pihole_ssh_transfer_duration_seconds', 'Tempo de execução do comando remoto e leitura da saída', ('source',))
+ssh_bytes = counter(
+    'pihole_ssh_received_bytes_total', 'Bytes recebidos via SSH', ('source',))
+alert_evaluation_seconds = histogram(
+    'pihole_alert_evaluation_duration_seconds', 'Tempo de avaliação das regras de alerta', ('engine',))
+cache_requests = counter(
+    'pihole_cache_requests_total', 'Consultas aos caches em memória', ('cache', 'result'))
+backend_requests = counter(
+    'pihole_backend_requests_total', 'Operações encaminhadas aos backends de leitura', ('backend', 'operation', 'result'))
+
+def timed_query(name):
+    """Mede uma consulta SQL nomeada (decorador ou bloco `with`)"""
+    return sql_query_seconds.time(query=name)
+
+def cache_hit(cache, hit):
+    cache_requests.inc(cache=cache, result='hit' if hit else 'miss')
+
+def _collected_samples(collectors):
+    families = []
+    for collect in list(collectors):
+        try:
+            families.extend(collect())
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao coletar métricas: {e}")
+    return families
+
+def _combine_collected(collected_lists):
+    """Soma, rótulo a rótulo, as famílias coletadas em cada worker"""
+    families = {}
+    for collected in collected_lists:
+        for name, kind, documentation, values in collected:
+            family = families.setdefault(name, (kind, documentation, {}))
+            for labels, value in values:
+                if value is not None:
+                    key = tuple(labels.items())
+                    family[2][key] = family[2].get(key, 0) + value
+    return [(name, kind, documentation, [(dict(key), value) for key, value in values.items()])
+            for name, (kind, documentation, values) in families.items()]
+
+def _snapshot():
+    """Valores deste processo (métricas e coletores por processo), em JSON"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {'metrics': {metric.name: metric.export() for metric in metrics},
+            'collected': _collected_samples(_process_collectors)}
+
+def share_across_processes(store):
+    """Passa a somar os valores de todos os processos que usam `store`
+
+    Chamado uma vez no processo mestre, antes dos forks: descarta os valores
+    de uma execução anterior do servidor.
+    """
+    global _shared
+    store.delete_meta(SHARED_PREFIX)
+    _shared = store
+
+def publish():
+    """Grava os valores deste processo no cache compartilhado"""
+    global _worker
+    if _shared is None:
+        return
+    if _worker is None or _worker[0] != os.getpid():
+        _worker = (os.getpid(), int(time.time()))
+    try:
+        _shared.set_meta(f"{SHARED_PREFIX}{_worker[0]}-{_worker[1]}", json.dumps(_snapshot()))
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao publicar métricas: {e}")
+
+def start_publisher(interval=PUBLISH_INTERVAL_SECONDS):
+    """Publica os valores deste worker periodicamente (serve.py: em cada worker)"""
+    if _shared is None:
+        return
+
+    def run():
+        while not _publisher_stop.wait(interval):
+            publish()
+
+    _publisher_stop.clear()
+    threading.Thread(target=run, name='metrics-publisher', daemon=True).start()
+
+def stop_publisher():
+    """Para a publicação periódica e grava os valores finais"""
+    _publisher_stop.set()
+    publish()
+
+def _worker_snapshots():
+    """Valores de todos os workers, ou só deste processo sem cache compartilhado"""
+    if _shared is None:
+        return [_snapshot()]
+    publish()
+    snapshots = []
+    for name, value in _shared.meta_items(SHARED_PREFIX):
+        try:
+            snapshots.append(json.loads(value))
+        except (TypeError, ValueError):
+            logger.warning(f"⚠️ Métricas ilegíveis em {name}")
+    return snapshots
+
+def render():
+    """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+    lines = []
+    snapshots = _worker_snapshots()
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+    for metric in metrics:
+        samples = metric.samples(metric.combined(snapshot['metrics'].get(metric.name, [])
+                                                 for snapshot in snapshots))
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in samples)
+
+    families = _collected_samples(_collectors)
+    families += _combine_collected(snapshot['collected'] for snapshot in snapshots)
+    for name, kind, documentation, values in families:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in values:
+            if value is None:
+                continue
+            lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+def init_app(app):
+    """Mede todas as rotas do Flask pelo padrão da rota (não pela URL)"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            http_request_seconds.observe(time.perf_counter() - started, route=route,
+                                         method=request.method, status=response.status_code)
+        return response
+
+    return app
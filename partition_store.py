@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+"""
+Armazenamento local particionado por dia
+Cada dia de consultas fica em sua própria tabela (queries_AAAAMMDD) registrada
+no catálogo `partitions`. As leituras consultam apenas as partições do período
+pedido e a retenção passa a ser um DROP TABLE por dia, em vez de um DELETE
+sobre a tabela inteira. Dias antigos podem ser movidos para a camada de
+arquivo comprimido (archive_store) e continuam consultáveis: ao entrar em uma
+consulta, o dia arquivado é carregado em uma tabela temporária da conexão.
+
+O resumo `activity_summary` guarda, por (dia, domínio, cliente, status,
+fonte), o total de consultas e o primeiro/último horário. As linhas novas de
+cada lote inserido (id acima do maior id anterior da partição) são agrupadas
+e somadas a ele na mesma transação; a visão agrupada de /api/logs soma os
+dias do período no resumo em vez de agrupar os registros brutos.
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import zlib
+from datetime import date, datetime, timedelta
+
+import archive_store
+import metrics
+import profiling
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'pihole_logs.db'
+
+PARTITION_PREFIX = 'queries_'
+
+QUERY_COLUMNS = ('timestamp', 'domain', 'client', 'status', 'source')
+
+# Colunas gravadas por insert_rows: ftl_id é o `queries.id` do FTL de origem
+INSERT_COLUMNS = QUERY_COLUMNS + ('ftl_id',)
+
+# Fonte atribuída aos registros de instalações com um único Pi-hole
+DEFAULT_SOURCE = archive_store.DEFAULT_SOURCE
+
+# Os timestamps são gravados no horário local (-03); o Pi-hole grava em UTC
+UTC_OFFSET_HOURS = 3
+
+# SQLite limita um SELECT composto a 500 termos; acima disso as uniões são aninhadas
+MAX_UNION_TERMS = 400
+
+def _as_day(value):
+    """Normaliza date/datetime/'AAAA-MM-DD[ HH:MM:SS]' para date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+def partition_table(day):
+    """Nome da tabela de um dia (o nome é derivado de uma data validada)"""
+    return f"{PARTITION_PREFIX}{_as_day(day).strftime('%Y%m%d')}"
+
+def connect(db_path=DB_PATH):
+    """Abre uma conexão com o banco local já inicializado (consultas lentas são registradas)"""
+    conn = sqlite3.connect(db_path, factory=profiling.ProfiledConnection)
+    # Só vale em um banco novo (antes da primeira tabela e do WAL); bancos
+    # antigos passam a usar com `python partition_store.py vacuum`
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+def init_storage(conn):
+    """Cria o catálogo de partições e migra a tabela `queries` antiga, se existir"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS partitions (
+            day TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            min_ts TEXT,
+            max_ts TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            archive_path TEXT
+        )
+    """)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(partitions)")]
+    if 'archive_path' not in columns:
+        conn.execute("ALTER TABLE partitions ADD COLUMN archive_path TEXT")
+    # Dias já contados no resumo de atividade (os anteriores a ele são reconstruídos abaixo)
+    if 'summary_ready' not in columns:
+        conn.execute("ALTER TABLE partitions ADD COLUMN summary_ready INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS activity_summary (
+            day TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            client TEXT NOT NULL,
+            status TEXT NOT NULL,
+            source TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            first_seen TEXT NOT NULL,
+            last_seen TEXT NOT NULL,
+            PRIMARY KEY (day, domain, client, status, source)
+        ) WITHOUT ROWID
+    """)
+    conn.commit()
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = 'queries'")
+    row = cursor.fetchone()
+    if row and row[0] == 'table':
+        _migrate_legacy_table(conn)
+    _migrate_partition_tables(conn)
+
+    cursor.execute("SELECT day FROM partitions WHERE summary_ready = 0 ORDER BY day")
+    pending = [row[0] for row in cursor.fetchall()]
+    if pending:
+        logger.info(f"🔄 Montando o resumo de atividade de {len(pending)} dia(s)...")
+        for day in pending:
+            rebuild_summary(conn, day)
+        conn.commit()
+
+    # Em um banco existente, auto_vacuum só é ativado por um VACUUM completo, que
+    # trava o banco por minutos: fica para a manutenção manual (enable_auto_vacuum)
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 0:
+        logger.warning("⚠️ auto_vacuum desativado: a retenção não devolve espaço ao disco. "
+                       "Com a aplicação parada, rode `python partition_store.py vacuum`")
+
+def _migrate_legacy_table(conn):
+    """Move os registros da tabela única `queries` para partições diárias"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT substr(timestamp, 1, 10) FROM queries WHERE timestamp IS NOT NULL")
+    days = [row[0] for row in cursor.fetchall()]
+    logger.info(f"🔄 Migrando tabela queries para {len(days)} partições diárias...")
+
+    for day_str in days:
+        try:
+            day = _as_day(day_str)
+        except ValueError:
+            logger.warning(f"⚠️ Ignorando registros com timestamp inválido: {day_str}")
+            continue
+        table = ensure_partition(conn, day)
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO {table} (timestamp, domain, client, status)
+            SELECT timestamp, domain, client, status FROM queries
+            WHERE timestamp >= ? AND timestamp < ?
+        """, (f"{day} 00:00:00", f"{day + timedelta(days=1)} 00:00:00"))
+        _refresh_stats(conn, day)
+        rebuild_summary(conn, day)
+    conn.commit()
+
+    cursor.execute("DROP TABLE queries")
+    conn.commit()
+    logger.info("✅ Migração para partições concluída")
+
+def _migrate_partition_tables(conn):
+    """Recria as partições anteriores à coluna `ftl_id`
+
+    A chave única antiga (timestamp, domain, client, status[, source])
+    descartava consultas repetidas no mesmo segundo; a nova é o id do FTL.
+    As linhas existentes são copiadas com os mesmos ids e sem ftl_id.
+    """
+    for table in sorted(_hot_tables(conn)):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if 'ftl_id' in columns:
+            # Partições criadas com a chave nova antes do índice de horário
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_ts ON {table}(timestamp)")
+            continue
+        logger.info(f"🔄 Atualizando a chave única da partição {table}...")
+        source = 'source' if 'source' in columns else '?'
+        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+        _create_partition_table(conn, table)
+        conn.execute(f"""
+            INSERT INTO {table} (id, timestamp, domain, client, status, source)
+            SELECT id, timestamp, domain, client, status, {source} FROM {table}_old
+        """, () if 'source' in columns else (DEFAULT_SOURCE,))
+        conn.execute(f"DROP TABLE {table}_old")
+        conn.commit()
+
+def _create_partition_table(conn, table):
+    # Linhas sem ftl_id (importadas antes dele) nunca conflitam: NULLs são distintos no UNIQUE
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            domain TEXT,
+            client TEXT,
+            status TEXT,
+            source TEXT NOT NULL DEFAULT '{DEFAULT_SOURCE}',
+            ftl_id INTEGER,
+            UNIQUE (source, ftl_id)
+        )
+    """)
+    # Filtros de período e ORDER BY timestamp (exportação, tail, compactação)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_ts ON {table}(timestamp)")
+
+def ensure_partition(conn, day):
+    """Cria a tabela do dia se necessário e retorna seu nome"""
+    day = _as_day(day)
+    table = partition_table(day)
+    _create_partition_table(conn, table)
+    # Um dia novo começa vazio: insert_rows mantém seu resumo desde a primeira linha
+    conn.execute("INSERT OR IGNORE INTO partitions (day, table_name, summary_ready) VALUES (?, ?, 1)",
+                 (day.isoformat(), table))
+    return table
+
+def _add_to_summary(conn, day, table, after_id=None):
+    """Soma ao resumo do dia as linhas de `table` (só as com id maior que `after_id`, se dado)"""
+    # O WHERE antes do GROUP BY também evita a ambiguidade do ON CONFLICT após um SELECT;
+    # tabelas de dias arquivados não têm id
+    where, params = ("id > ?", (after_id,)) if after_id is not None else ("1", ())
+    conn.execute(f"""
+        INSERT INTO activity_summary (day, domain, client, status, source, count, first_seen, last_seen)
+        SELECT ?, COALESCE(domain, ''), COALESCE(client, ''), COALESCE(status, ''), source,
+               COUNT(*), MIN(timestamp), MAX(timestamp)
+        FROM {table}
+        WHERE {where}
+        GROUP BY 2, 3, 4, 5
+        ON CONFLICT (day, domain, client, status, source) DO UPDATE SET
+            count = count + excluded.count,
+            first_seen = MIN(first_seen, excluded.first_seen),
+            last_seen = MAX(last_seen, excluded.last_seen)
+    """, (_as_day(day).isoformat(),) + params)
+
+def rebuild_summary(conn, day):
+    """Recalcula o resumo de atividade de um dia a partir dos registros (inclusive arquivados)"""
+    day = _as_day(day)
+    conn.execute("DELETE FROM activity_summary WHERE day = ?", (day.isoformat(),))
+    for table in iter_tables(conn, day, day):
+        _add_to_summary(conn, day, table)
+        release_table(conn, table)
+    conn.execute("UPDATE partitions SET summary_ready = 1 WHERE day = ?", (day.isoformat(),))
+
+def _refresh_stats(conn, day):
+    table = partition_table(day)
+    conn.execute(f"""
+        UPDATE partitions SET
+            row_count = (SELECT COUNT(*) FROM {table}),
+            min_ts = (SELECT MIN(timestamp) FROM {table}),
+            max_ts = (SELECT MAX(timestamp) FROM {table})
+        WHERE day = ?
+    """, (_as_day(day).isoformat(),))
+
+@metrics.timed_query('partition.insert_rows')
+def insert_rows(conn, rows):
+    """Insere (timestamp, domain, client, status, source, ftl_id) roteando cada linha para seu dia
+
+    Uma linha cujo (source, ftl_id) já está na partição é ignorada; consultas
+    repetidas no mesmo segundo têm ids diferentes e são todas gravadas.
+    Retorna as linhas efetivamente inseridas, como QUERY_COLUMNS, lidas de
+    volta das partições na ordem de inserção.
+    """
+    by_day = {}
+    for row in rows:
+        by_day.setdefault(row[0][:10], []).append(row)
+
+    inserted = []
+    for day_str, day_rows in by_day.items():
+        day = _as_day(day_str)
+        table = ensure_partition(conn, day)
+        # Ids são AUTOINCREMENT: as linhas novas do lote ficam acima do maior id atual
+        last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+        before = conn.total_changes
+        conn.executemany(f"""
+            INSERT OR IGNORE INTO {table} ({', '.join(INSERT_COLUMNS)})
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, day_rows)
+        added = conn.total_changes - before
+        if added:
+            inserted += conn.execute(f"""
+                SELECT {', '.join(QUERY_COLUMNS)} FROM {table} WHERE id > ? ORDER BY id
+            """, (last_id,)).fetchall()
+            first = min(r[0] for r in day_rows)
+            last = max(r[0] for r in day_rows)
+            conn.execute("""
+                UPDATE partitions SET
+                    row_count = row_count + ?,
+                    min_ts = CASE WHEN min_ts IS NULL OR ? < min_ts THEN ? ELSE min_ts END,
+                    max_ts = CASE WHEN max_ts IS NULL OR ? > max_ts THEN ? ELSE max_ts END
+                WHERE day = ?
+            """, (added, first, first, last, last, day.isoformat()))
+            _add_to_summary(conn, day, table, last_id)
+    conn.commit()
+    return inserted
+
+def list_partitions(conn, start=None, end=None):
+    """Partições (dia, tabela, arquivo) que cobrem o intervalo, em ordem cronológica
+
+    `arquivo` é o caminho do .npz quando o dia foi arquivado (None se só está no banco).
+    """
+    sql = "SELECT day, table_name, archive_path FROM partitions WHERE 1=1"
+    params = []
+    if start:
+        sql += " AND day >= ?"
+        params.append(_as_day(start).isoformat())
+    if end:
+        sql += " AND day <= ?"
+        params.append(_as_day(end).isoformat())
+    sql += " ORDER BY day"
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+def _hot_tables(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?",
+                   (PARTITION_PREFIX + '%',))
+    return {row[0] for row in cursor.fetchall()}
+
+def _load_archived(conn, day, table, archive_path, domain_like=None, client_like=None, source=None):
+    """Carrega um dia arquivado em uma tabela temporária da conexão
+
+    Retorna o nome da tabela, ou None se os dicionários mostram que nenhuma
+    linha do dia casa com os filtros. A tabela é reaproveitada enquanto a
+    conexão estiver aberta.
+    """
+    key = 'all'
+    if domain_like or client_like or source:
+        key = format(zlib.crc32(f"{domain_like or ''}|{client_like or ''}|{source or ''}".encode('utf-8')), '08x')
+    temp_table = f"archived_{table}_{key}"
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_temp_master WHERE type = 'table' AND name = ?", (temp_table,))
+    if cursor.fetchone():
+        return temp_table
+
+    # Em blocos: o dia inteiro nunca fica em memória como tuplas Python
+    created = False
+    for rows in archive_store.iter_rows(archive_path, _as_day(day).isoformat(), domain_like, client_like, source):
+        if not created:
+            conn.execute(f"""
+                CREATE TEMP TABLE {temp_table} (
+                    timestamp TEXT NOT NULL,
+                    domain TEXT,
+                    client TEXT,
+                    status TEXT,
+                    source TEXT
+                )
+            """)
+            created = True
+        conn.executemany(f"INSERT INTO {temp_table} (timestamp, domain, client, status, source) "
+                         f"VALUES (?, ?, ?, ?, ?)", rows)
+    return temp_table if created else None
+
+def iter_tables(conn, start=None, end=None, domain_like=None, client_like=None, source=None):
+    """Tabelas com os registros do intervalo, em ordem cronológica
+
+    Dias arquivados são carregados em tabelas temporárias à medida que o
+    gerador avança; `domain_like`/`client_like`/`source` (os mesmos filtros
+    da consulta) permitem descartar um dia arquivado sem descomprimi-lo.
+    """
+    partitions = list_partitions(conn, start, end)
+    hot = _hot_tables(conn) if any(path for _, _, path in partitions) else None
+
+    for day, table, archive_path in partitions:
+        if not archive_path:
+            yield table
+            continue
+        archived = _load_archived(conn, day, table, archive_path, domain_like, client_like, source)
+        if archived:
+            yield archived
+        # Registros que chegaram depois do arquivamento do dia
+        if table in hot:
+            yield table
+
+def release_table(conn, table):
+    """Descarta a tabela temporária de um dia arquivado (no-op para partições)"""
+    if table.startswith('archived_'):
+        conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+
+def source_sql(conn, start=None, end=None, columns=QUERY_COLUMNS, domain_like=None, client_like=None,
+               source=None):
+    """Subconsulta com a união das partições do intervalo, para uso em FROM
+
+    As datas selecionam apenas quais partições entram na união; filtros de
+    horário continuam sendo aplicados pela consulta externa. Dias arquivados
+    entram de forma transparente (ver iter_tables).
+    """
+    column_list = ', '.join(columns)
+    tables = list(iter_tables(conn, start, end, domain_like, client_like, source))
+    if not tables:
+        empty = ', '.join(f"NULL AS {column}" for column in columns)
+        return f"(SELECT {empty} WHERE 0)"
+
+    terms = [f"SELECT {column_list} FROM {table}" for table in tables]
+    while len(terms) > MAX_UNION_TERMS:
+        terms = [f"SELECT {column_list} FROM ({' UNION ALL '.join(terms[i:i + MAX_UNION_TERMS])})"
+                 for i in range(0, len(terms), MAX_UNION_TERMS)]
+    return f"({' UNION ALL '.join(terms)})"
+
+def day_source(conn, day, columns=QUERY_COLUMNS):
+    """Fonte de um único dia ('AAAA-MM-DD' ou date)"""
+    return source_sql(conn, day, day, columns)
+
+def recent_source(conn, days=2, columns=QUERY_COLUMNS):
+    """Fonte das `days` partições mais recentes (para 'atividade recente')"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT day FROM partitions ORDER BY day DESC LIMIT ?", (days,))
+    recent = [row[0] for row in cursor.fetchall()]
+    if not recent:
+        return source_sql(conn, columns=columns)
+    return source_sql(conn, min(recent), max(recent), columns)
+
+def count_rows(conn):
+    """Total de registros em todas as partições (pelo catálogo)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(SUM(row_count), 0) FROM partitions")
+    return cursor.fetchone()[0]
+
+def last_timestamp(conn):
+    """Timestamp mais recente armazenado"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(max_ts) FROM partitions")
+    return cursor.fetchone()[0]
+
+def has_ftl_ids(conn, source, timestamp):
+    """True se todas as linhas da fonte naquele segundo têm ftl_id
+
+    Linhas migradas (anteriores à coluna) não têm: buscar esse segundo de
+    novo as duplicaria. Partição arquivada ou ausente também conta como False.
+    """
+    table = partition_table(timestamp)
+    if table not in _hot_tables(conn):
+        return False
+    row = conn.execute(f"""
+        SELECT COUNT(*), COUNT(ftl_id) FROM {table} WHERE timestamp = ? AND source = ?
+    """, (timestamp, source)).fetchone()
+    return row[0] > 0 and row[0] == row[1]
+
+def drop_partition(conn, day):
+    """Remove a partição de um dia (inclusive do arquivo frio)"""
+    day = _as_day(day)
+    cursor = conn.cursor()
+    cursor.execute("SELECT archive_path FROM partitions WHERE day = ?", (day.isoformat(),))
+    row = cursor.fetchone()
+    conn.execute(f"DROP TABLE IF EXISTS {partition_table(day)}")
+    conn.execute("DELETE FROM partitions WHERE day = ?", (day.isoformat(),))
+    conn.execute("DELETE FROM activity_summary WHERE day = ?", (day.isoformat(),))
+    if row and row[0]:
+        archive_store.delete_archive(day.isoformat(), os.path.dirname(row[0]))
+
+@metrics.timed_query('partition.drop_expired')
+def drop_expired(conn, retention_days, today=None, keep_from=None):
+    """Aplica a retenção removendo partições inteiras; retorna os dias removidos
+
+    Dias a partir de `keep_from` nunca são removidos (ex.: ainda não compactados).
+    """
+    today = today or date.today()
+    cutoff = (today - timedelta(days=int(retention_days))).isoformat()
+    if keep_from:
+        cutoff = min(cutoff, _as_day(keep_from).isoformat())
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT day FROM partitions WHERE day < ? ORDER BY day", (cutoff,))
+    expired = [row[0] for row in cursor.fetchall()]
+    for day in expired:
+        drop_partition(conn, day)
+    conn.commit()
+
+    if expired:
+        # Devolve ao sistema as páginas liberadas (sem VACUUM completo); via
+        # executescript porque cada passo do cursor libera uma única página
+        conn.executescript('PRAGMA incremental_vacuum;')
+        logger.info(f"🗑️ Retenção: {len(expired)} partição(ões) removida(s) ({expired[0]} a {expired[-1]})")
+    return expired
+
+def archive_partition(conn, day, archive_dir=archive_store.ARCHIVE_DIR):
+    """Move um dia do banco para o arquivo comprimido; retorna os metadados"""
+    day = _as_day(day)
+    table = partition_table(day)
+    if table not in _hot_tables(conn):
+        return None
+
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT timestamp, domain, client, status, source FROM {table}")
+    rows = cursor.fetchall()
+
+    # Rearquivar um dia que recebeu registros atrasados junta as duas partes (a
+    # partição só tem as linhas que chegaram depois do arquivamento anterior)
+    cursor.execute("SELECT archive_path FROM partitions WHERE day = ?", (day.isoformat(),))
+    previous = cursor.fetchone()
+    if previous and previous[0]:
+        rows = archive_store.read_rows(previous[0], day.isoformat()) + rows
+
+    if not rows:
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute("DELETE FROM partitions WHERE day = ?", (day.isoformat(),))
+        conn.commit()
+        return None
+
+    metadata = archive_store.write_archive(day.isoformat(), rows, archive_dir)
+    data_path, _ = archive_store.archive_paths(day.isoformat(), archive_dir)
+    conn.execute("""
+        UPDATE partitions SET archive_path = ?, row_count = ?, min_ts = ?, max_ts = ?
+        WHERE day = ?
+    """, (data_path, metadata['rows'], metadata['min_ts'], metadata['max_ts'], day.isoformat()))
+    conn.execute(f"DROP TABLE {table}")
+    conn.commit()
+    return metadata
+
+@metrics.timed_query('partition.archive_closed_days')
+def archive_closed_days(conn, archive_after_days, archive_dir=archive_store.ARCHIVE_DIR, today=None):
+    """Arquiva os dias com mais de `archive_after_days` dias; retorna os dias arquivados"""
+    today = today or date.today()
+    cutoff = (today - timedelta(days=int(archive_after_days))).isoformat()
+
+    hot = _hot_tables(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT day, table_name FROM partitions WHERE day < ? ORDER BY day", (cutoff,))
+    candidates = [day for day, table in cursor.fetchall() if table in hot]
+
+    archived = []
+    for day in candidates:
+        metadata = archive_partition(conn, day, archive_dir)
+        if metadata:
+            archived.append(day)
+            logger.info(f"🗜️ Dia {day} arquivado: {metadata['rows']} registros, {metadata['bytes']} bytes")
+
+    if archived:
+        conn.executescript('PRAGMA incremental_vacuum;')
+    return archived
+
+def enable_auto_vacuum(db_path=DB_PATH):
+    """Ativa o auto_vacuum incremental com um VACUUM completo (manutenção, aplicação parada)"""
+    conn = connect(db_path)
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 0:
+            logger.info("✅ auto_vacuum já está ativado")
+            return False
+        logger.info(f"🔄 VACUUM de {db_path} ({os.path.getsize(db_path) / 1e6:.0f} MB)...")
+        started = datetime.now()
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+        logger.info(f"✅ auto_vacuum ativado em {(datetime.now() - started).total_seconds():.1f}s")
+        return True
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Manutenção do banco local')
+    parser.add_argument('command', choices=['vacuum'], help='vacuum: ativa o auto_vacuum (VACUUM completo)')
+    parser.add_argument('--db', default=DB_PATH, help='caminho do banco (padrão: %(default)s)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    enable_auto_vacuum(args.db)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Gerador de PDF mínimo em fluxo contínuo
+Cada página é serializada e devolvida assim que é montada; do documento só
+ficam em memória os offsets dos objetos (necessários para a tabela xref no
+final), então exportações com milhões de linhas usam memória praticamente
+constante. Usa as fontes padrão Helvetica (sem embutir fontes).
+"""
+
+import zlib
+from datetime import datetime
+
+# A4 em pontos
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+
+CATALOG_ID = 1
+PAGES_ID = 2
+FONT_ID = 3
+BOLD_FONT_ID = 4
+INFO_ID = 5
+
+def _escape(text):
+    """Texto de uma página (WinAnsiEncoding das fontes padrão)"""
+    text = ''.join(ch if ch >= ' ' else ' ' for ch in str(text))
+    data = text.encode('cp1252', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+def _info_string(text):
+    """String do dicionário de informações (UTF-16 quando necessário)"""
+    text = str(text)
+    try:
+        text.encode('latin-1')
+    except UnicodeEncodeError:
+        return b'<FEFF' + text.encode('utf-16-be').hex().upper().encode('ascii') + b'>'
+    return b'(' + _escape(text) + b')'
+
+class StreamingPDFWriter:
+    """Escreve um PDF página a página; cada método retorna os bytes a enviar"""
+
+    def __init__(self, title='', author='', subject='', creator='Pi-hole Log Viewer',
+                 width=PAGE_WIDTH, height=PAGE_HEIGHT):
+        self.title = title
+        self.author = author
+        self.subject = subject
+        self.creator = creator
+        self.width = width
+        self.height = height
+        self.page_count = 0
+        self._position = 0
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = INFO_ID + 1
+
+    def _emit(self, data):
+        self._position += len(data)
+        return data
+
+    def _object(self, obj_id, body):
+        self._offsets[obj_id] = self._position
+        return self._emit(b'%d 0 obj\n' % obj_id + body + b'\nendobj\n')
+
+    def _allocate(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def begin(self):
+        """Cabeçalho, catálogo, fontes e metadados"""
+        created = datetime.now().strftime("D:%Y%m%d%H%M%S")
+        chunks = [
+            self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'),
+            self._object(CATALOG_ID, b'<< /Type /Catalog /Pages %d 0 R >>' % PAGES_ID),
+            self._object(FONT_ID, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+                                  b'/Encoding /WinAnsiEncoding >>'),
+            self._object(BOLD_FONT_ID, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold '
+                                       b'/Encoding /WinAnsiEncoding >>'),
+            self._object(INFO_ID, b'<< /Title ' + _info_string(self.title) +
+                                  b' /Author ' + _info_string(self.author) +
+                                  b' /Subject ' + _info_string(self.subject) +
+                                  b' /Creator ' + _info_string(self.creator) +
+                                  b' /CreationDate (' + created.encode('ascii') + b') >>')
+        ]
+        return b''.join(chunks)
+
+    def page(self, texts, lines=(), rects=()):
+        """Adiciona uma página
+
+        `texts` são tuplas (x, y, tamanho, texto, negrito), `lines` tuplas
+        (x1, y1, x2, y2) e `rects` retângulos preenchidos (x, y, largura,
+        altura, cinza de 0 a 1), com a origem no canto inferior esquerdo.
+        """
+        commands = []
+        for x, y, w, h, gray in rects:
+            commands.append(b'%.2f g %.2f %.2f %.2f %.2f re f 0 g' % (gray, x, y, w, h))
+        for x, y, size, text, bold in texts:
+            font = b'/F2' if bold else b'/F1'
+            commands.append(b'BT %s %.1f Tf %.2f %.2f Td (%s) Tj ET'
+                            % (font, size, x, y, _escape(text)))
+        for x1, y1, x2, y2 in lines:
+            commands.append(b'0.5 w %.2f %.2f m %.2f %.2f l S' % (x1, y1, x2, y2))
+        content = zlib.compress(b'\n'.join(commands))
+
+        content_id = self._allocate()
+        page_id = self._allocate()
+        self._page_ids.append(page_id)
+        self.page_count += 1
+        return (self._object(content_id, b'<< /Length %d /Filter /FlateDecode >>\nstream\n'
+                             % len(content) + content + b'\nendstream')
+                + self._object(page_id, b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] '
+                               b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> '
+                               b'/Contents %d 0 R >>'
+                               % (PAGES_ID, self.width, self.height, FONT_ID, BOLD_FONT_ID, content_id)))
+
+    def end(self):
+        """Árvore de páginas, tabela xref e trailer"""
+        if not self._page_ids:
+            # Um PDF precisa de ao menos uma página
+            empty = self.page([])
+        else:
+            empty = b''
+
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self._page_ids)
+        pages = self._object(PAGES_ID, b'<< /Type /Pages /Kids [' + kids +
+                             b'] /Count %d >>' % len(self._page_ids))
+
+        xref_offset = self._position
+        size = self._next_id
+        xref = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+        for obj_id in range(1, size):
+            xref.append(b'%010d 00000 n \n' % self._offsets[obj_id])
+        trailer = (b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                   % (size, CATALOG_ID, INFO_ID, xref_offset))
+        return empty + pages + self._emit(b''.join(xref) + trailer)
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Perfil de desempenho das aplicações Flask
+Três partes, configuradas por PROFILING_CONFIG no config.py:
+
+- consultas lentas: conexões abertas com `factory=ProfiledConnection` medem
+  cada comando SQL e guardam texto, parâmetros, duração e EXPLAIN QUERY PLAN
+  dos que passam de `slow_query_ms` (em memória e no log);
+- cabeçalho Server-Timing com o tempo exclusivo das fases ssh, sql,
+  serialize (JSON) e python (o restante) de cada requisição;
+- amostragem opcional da pilha (`?profile=1` ou /api/debug/profile) gravada
+  em formato "collapsed" para flamegraph.pl / speedscope.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    'slow_query_ms': 250,
+    'slow_query_keep': 100,
+    'explain_slow_queries': True,
+    'server_timing': True,
+    # Amostragem de pilha só quando habilitada (expõe detalhes internos)
+    'sampling_enabled': False,
+    'sample_interval_ms': 5,
+    'max_profile_seconds': 60,
+    'profile_dir': 'profiles'
+}
+
+PHASES = ('ssh', 'sql', 'serialize')
+
+# Parâmetros longos são truncados no registro
+MAX_PARAM_LENGTH = 200
+
+def load_config():
+    """PROFILING_CONFIG do config.py sobre os padrões"""
+    try:
+        import config
+        overrides = getattr(config, 'PROFILING_CONFIG', {})
+    except ImportError:
+        overrides = {}
+    return dict(DEFAULT_CONFIG, **overrides)
+
+_config = load_config()
+_slow_queries = deque(maxlen=_config['slow_query_keep'])
+_slow_lock = threading.Lock()
+_local = threading.local()
+
+class _PhaseTimer:
+    """Tempo exclusivo por fase: uma fase aninhada pausa a de fora"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self._stack = []
+        self._switched = self.started
+
+    def enter(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            self.totals[self._stack[-1]] += now - self._switched
+        self._stack.append(name)
+        self._switched = now
+
+    def leave(self):
+        now = time.perf_counter()
+        self.totals[self._stack.pop()] += now - self._switched
+        self._switched = now
+
+    def header(self):
+        total = time.perf_counter() - self.started
+        parts = [f"{name};dur={self.totals[name] * 1000:.1f}" for name in PHASES if self.totals[name]]
+        python = max(0.0, total - sum(self.totals.values()))
+        parts.append(f"python;dur={python * 1000:.1f}")
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ', '.join(parts)
+
+@contextmanager
+def phase(name):
+    """Atribui o bloco a uma fase do Server-Timing (sem efeito fora de requisições)"""
+    timer = getattr(_local, 'timer', None)
+    if timer is None:
+        yield
+        return
+    timer.enter(name)
+    try:
+        yield
+    finally:
+        timer.leave()
+
+def _short_params(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: _short_value(value) for key, value in params.items()}
+    return [_short_value(value) for value in params]
+
+def _short_value(value):
+    if isinstance(value, str) and len(value) > MAX_PARAM_LENGTH:
+        return value[:MAX_PARAM_LENGTH] + '…'
+    return value
+
+def _explain(conn, sql, params):
+    if not _config['explain_slow_queries'] or not re.match(r'\s*(SELECT|WITH)\b', sql, re.IGNORECASE):
+        return None
+    try:
+        # Cursor comum: o EXPLAIN não entra no registro de consultas lentas
+        rows = sqlite3.Connection.cursor(conn, sqlite3.Cursor).execute(
+            f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+        return [row[-1] for row in rows]
+    except sqlite3.Error as e:
+        return [f"(EXPLAIN falhou: {e})"]
+
+def _record(conn, sql, params, seconds):
+    """Registra o comando se passou do limite de consulta lenta"""
+    if seconds * 1000 < _config['slow_query_ms']:
+        return
+    entry = {
+        'at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'duration_ms': round(seconds * 1000, 1),
+        'sql': ' '.join(sql.split()),
+        'params': _short_params(params),
+        'plan': _explain(conn, sql, params),
+        'route': getattr(_local, 'route', None)
+    }
+    with _slow_lock:
+        _slow_queries.append(entry)
+    logger.warning(f"🐢 Consulta lenta ({entry['duration_ms']} ms): {entry['sql'][:300]}")
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor que mede execute + leitura de cada comando"""
+
+    _sql = None
+    _params = None
+    _elapsed = 0.0
+
+    def _finish(self):
+        if self._sql is not None:
+            _record(self.connection, self._sql, self._params, self._elapsed)
+            self._sql = None
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        with phase('sql'):
+            try:
+                return method(self, *args)
+            finally:
+                self._elapsed += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._sql, self._params, self._elapsed = sql, parameters, 0.0
+        self._timed(sqlite3.Cursor.execute, sql, parameters)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        started = time.perf_counter()
+        with phase('sql'):
+            sqlite3.Cursor.executemany(self, sql, seq_of_parameters)
+        _record(self.connection, sql, None, time.perf_counter() - started)
+        return self
+
+    def fetchone(self):
+        row = self._timed(sqlite3.Cursor.fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(sqlite3.Cursor.fetchmany, self.arraysize if size is None else size)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(sqlite3.Cursor.fetchall)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Cursores percorridos com `for` terminam aqui
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+class ProfiledConnection(sqlite3.Connection):
+    """Conexão cujos cursores registram consultas lentas (sqlite3.connect(..., factory=...))"""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def slow_queries(limit=None):
+    """Consultas lentas mais recentes primeiro"""
+    with _slow_lock:
+        entries = list(_slow_queries)
+    entries.reverse()
+    return entries[:limit] if limit else entries
+
+def clear_slow_queries():
+    with _slow_lock:
+        _slow_queries.clear()
+
+def _frame_stack(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    stack.reverse()
+    return ';'.join(stack)
+
+class StackSampler:
+    """Amostra periodicamente a pilha de uma thread (ou de todas) em uma thread própria"""
+
+    def __init__(self, thread_id=None, interval=None):
+        self.thread_id = thread_id
+        self.interval = (interval or _config['sample_interval_ms']) / 1000.0
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frames = {self.thread_id: frames[self.thread_id]} if self.thread_id in frames else {}
+            for ident, frame in frames.items():
+                if ident != own:
+                    self.counts[_frame_stack(frame)] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self
+
+    def collapsed(self):
+        """Linhas "pilha;separada;por;ponto-e-vírgula contagem" (mais frequentes primeiro)"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+def save_profile(sampler, label):
+    """Grava o perfil em profile_dir e retorna o nome do arquivo"""
+    os.makedirs(_config['profile_dir'], exist_ok=True)
+    safe_label = re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_') or 'profile'
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{safe_label}.folded"
+    with open(os.path.join(_config['profile_dir'], name), 'w') as f:
+        f.write(sampler.collapsed())
+    return name
+
+def list_profiles():
+    directory = _config['profile_dir']
+    if not os.path.isdir(directory):
+        return []
+    return sorted((name for name in os.listdir(directory) if name.endswith('.folded')), reverse=True)
+
+def profile_path(name):
+    """Caminho de um perfil gravado (None se o nome for inválido ou não existir)"""
+    if name != os.path.basename(name) or not name.endswith('.folded'):
+        return None
+    path = os.path.join(_config['profile_dir'], name)
+    return path if os.path.exists(path) else None
+
+def profile_process(seconds):
+    """Amostra todas as threads por `seconds` segundos; retorna o sampler já parado"""
+    seconds = max(0.1, min(float(seconds), _config['max_profile_seconds']))
+    sampler = StackSampler().start()
+    time.sleep(seconds)
+    return sampler.stop()
+
+def init_app(app):
+    """Server-Timing, contexto das consultas lentas e `?profile=1` por requisição"""
+    from flask import request
+    from flask.json.provider import DefaultJSONProvider
+
+    class TimedJSONProvider(DefaultJSONProvider):
+        def response(self, *args, **kwargs):
+            with phase('serialize'):
+                return super().response(*args, **kwargs)
+
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_profiling():
+        _local.timer = _PhaseTimer()
+        _local.route = request.url_rule.rule if request.url_rule else request.path
+        _local.sampler = None
+        if _config['sampling_enabled'] and request.args.get('profile') == '1':
+            _local.sampler = StackSampler(threading.get_ident()).start()
+
+    @app.after_request
+    def _finish_profiling(response):
+        timer = getattr(_local, 'timer', None)
+        sampler = getattr(_local, 'sampler', None)
+        if sampler:
+            name = save_profile(sampler.stop(), _local.route)
+            response.headers['X-Profile'] = name
+            logger.info(f"🔬 Perfil gravado: {name} ({sampler.samples} amostras)")
+        if timer and _config['server_timing']:
+            response.headers['Server-Timing'] = timer.header()
+        return response
+
+    @app.teardown_request
+    def _clear_profiling(exc):
+        sampler = getattr(_local, 'sampler', None)
+        if sampler:
+            sampler.stop()
+        _local.timer = _local.sampler = _local.route = None
+
+    return app
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Orçamentos de tempo e de linhas para as leituras no SQLite
+Cada busca pesada roda com um QueryBudget ligado à conexão: o progress
+handler do SQLite é chamado a cada `check_every` instruções da VM e
+interrompe o comando quando o tempo acaba, quando alguém chama cancel() ou
+quando o cliente HTTP fechou a conexão. As linhas lidas até ali são
+devolvidas com `truncated` e o motivo, em vez de um erro. Os limites são
+configurados por rota em QUERY_BUDGET_CONFIG no config.py.
+"""
+
+import logging
+import select
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # Tempo máximo (segundos) e linhas lidas por busca; None desliga o limite
+    'seconds': 30,
+    'rows': 500000,
+    # Instruções da VM do SQLite entre duas verificações
+    'check_every': 20000,
+    # Limites próprios de cada rota (sobre os de cima)
+    'endpoints': {}
+}
+
+# Intervalo mínimo entre duas verificações do socket do cliente
+DISCONNECT_CHECK_SECONDS = 0.5
+
+# Linhas lidas do cursor por vez
+FETCH_SIZE = 1000
+
+# Chaves do environ WSGI com o socket do cliente (servidor do Werkzeug e gunicorn)
+SOCKET_KEYS = ('werkzeug.socket', 'gunicorn.socket')
+
+REASONS = {
+    'time': 'tempo esgotado',
+    'rows': 'limite de linhas',
+    'cancelled': 'cancelada',
+    'disconnected': 'cliente desconectado'
+}
+
+def load_config():
+    """QUERY_BUDGET_CONFIG do config.py sobre os padrões"""
+    try:
+        import config
+        overrides = getattr(config, 'QUERY_BUDGET_CONFIG', {})
+    except ImportError:
+        overrides = {}
+    return dict(DEFAULT_CONFIG, **overrides)
+
+_config = load_config()
+
+def endpoint_limits(name):
+    """(segundos, linhas) configurados para a rota `name`"""
+    limits = dict(_config, **_config['endpoints'].get(name, {}))
+    return limits['seconds'], limits['rows']
+
+def peer_closed(sock):
+    """True se o cliente do outro lado do socket já fechou a conexão
+
+    Um socket legível cujo recv (sem consumir) devolve b'' recebeu o FIN.
+    Dados pendentes (ex.: a próxima requisição do keep-alive) não contam.
+    """
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except ConnectionError:
+        return True
+    except (OSError, ValueError):
+        # Socket já fechado aqui ou que não aceita MSG_PEEK (TLS): não dá para saber
+        return False
+
+class QueryBudget:
+    """Limites de uma busca; ligue à conexão com `bind` e leia com `execute`/`fetch`"""
+
+    def __init__(self, seconds=None, rows=None, name=None, client_socket=None,
+                 check_every=None):
+        self.seconds = seconds
+        self.rows = rows
+        self.name = name
+        self.client_socket = client_socket
+        self.check_every = check_every or _config['check_every']
+        self.reason = None
+        self.started = time.monotonic()
+        self.fetched = 0
+        self._cancelled = threading.Event()
+        self._next_socket_check = 0.0
+
+    @classmethod
+    def for_endpoint(cls, name, environ=None):
+        """Orçamento configurado para a rota; com o environ WSGI, também detecta desconexão"""
+        seconds, rows = endpoint_limits(name)
+        client_socket = None
+        if environ is not None:
+            client_socket = next((environ[key] for key in SOCKET_KEYS if environ.get(key)), None)
+        return cls(seconds, rows, name, client_socket)
+
+    @property
+    def truncated(self):
+        return self.reason is not None
+
+    def cancel(self):
+        """Interrompe a busca no próximo ponto de verificação (pode vir de outra thread)"""
+        self._cancelled.set()
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def _progress(self):
+        """Progress handler do SQLite: um valor verdadeiro interrompe o comando"""
+        if self._cancelled.is_set():
+            self.reason = self.reason or 'cancelled'
+            return 1
+        now = time.monotonic()
+        if self.seconds is not None and now - self.started > self.seconds:
+            self.reason = 'time'
+            return 1
+        if self.client_socket is not None and now >= self._next_socket_check:
+            self._next_socket_check = now + DISCONNECT_CHECK_SECONDS
+            if peer_closed(self.client_socket):
+                self.reason = 'disconnected'
+                return 1
+        return 0
+
+    @contextmanager
+    def bind(self, conn):
+        """Aplica o orçamento aos comandos da conexão dentro do bloco"""
+        self.attach(conn)
+        try:
+            yield self
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def attach(self, conn):
+        """Como `bind`, para conexões que continuam em uso depois da rota (respostas em fluxo)"""
+        # O relógio começa aqui: a cópia do banco via SSH (app.py) não conta
+        self.started = time.monotonic()
+        conn.set_progress_handler(self._progress, self.check_every)
+        return self
+
+    def _interrupted(self, error):
+        # Só interrupções pedidas pelo próprio orçamento viram resultado parcial
+        return self.reason is not None and 'interrupted' in str(error)
+
+    def execute(self, cursor, sql, params=()):
+        """Executa o comando; False se o orçamento o interrompeu antes da primeira linha"""
+        try:
+            cursor.execute(sql, params)
+            return True
+        except sqlite3.OperationalError as e:
+            if not self._interrupted(e):
+                raise
+            self._log()
+            return False
+
+    def batches(self, cursor, size=FETCH_SIZE):
+        """Lotes do cursor até o fim, o limite de linhas ou a interrupção"""
+        while True:
+            if self.rows is not None:
+                size = min(size, self.rows - self.fetched)
+                if size <= 0:
+                    # Só é truncado se ainda havia linhas
+                    if self._fetch(cursor, 1):
+                        self.reason = 'rows'
+                        self._log()
+                    return
+            rows = self._fetch(cursor, size)
+            if not rows:
+                return
+            self.fetched += len(rows)
+            yield rows
+
+    def _fetch(self, cursor, size):
+        try:
+            return cursor.fetchmany(size)
+        except sqlite3.OperationalError as e:
+            if not self._interrupted(e):
+                raise
+            self._log()
+            return []
+
+    def fetch(self, cursor, size=FETCH_SIZE):
+        """Todas as linhas que couberem no orçamento"""
+        rows = []
+        for batch in self.batches(cursor, size):
+            rows.extend(batch)
+        return rows
+
+    def info(self):
+        """Campos da resposta: truncated, truncated_reason e elapsed_ms"""
+        return {
+            'truncated': self.truncated,
+            'truncated_reason': REASONS.get(self.reason),
+            'elapsed_ms': round(self.elapsed() * 1000, 1)
+        }
+
+    def _log(self):
+        label = f" {self.name}" if self.name else ''
+        logger.warning(f"⏱️ Busca{label} interrompida ({REASONS[self.reason]}) "
+                       f"após {self.elapsed():.1f}s e {self.fetched} linhas")
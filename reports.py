@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Relatórios diários e semanais pré-gerados
+Quando um dia (ou semana) fecha e seus agregados já foram compactados, o
+relatório é renderizado uma única vez a partir dos agregados e gravado em
+reports/ como um artefato versionado, registrado no manifest.json. As rotas
+apenas entregam o arquivo pronto.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import aggregates
+from pdf_writer import StreamingPDFWriter, PAGE_HEIGHT, PAGE_WIDTH
+
+logger = logging.getLogger(__name__)
+
+REPORTS_DIR = 'reports'
+MANIFEST_FILE = 'manifest.json'
+
+REPORT_KINDS = ('daily', 'weekly')
+
+KIND_LABELS = {
+    'daily': 'Relatório Diário',
+    'weekly': 'Relatório Semanal'
+}
+
+# Itens em cada tabela de top N
+TOP_N = 10
+
+MARGIN = 40
+
+_manifest_lock = threading.Lock()
+
+def report_period(kind, day):
+    """Primeiro e último dia do período do relatório que contém `day`"""
+    if kind == 'daily':
+        return day, day
+    if kind == 'weekly':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    raise ValueError(f"Tipo de relatório inválido: {kind}")
+
+def period_id(kind, start_day):
+    """Identificador do período: AAAA-MM-DD (diário) ou AAAA-Wss (semanal)"""
+    if kind == 'daily':
+        return start_day.isoformat()
+    year, week, _ = start_day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+def parse_period_id(kind, period):
+    """Dia inicial a partir do identificador do período"""
+    if kind == 'daily':
+        return datetime.strptime(period, '%Y-%m-%d').date()
+    return datetime.strptime(f"{period}-1", '%G-W%V-%u').date()
+
+def last_closed_periods(today):
+    """(tipo, dia inicial) dos últimos períodos já encerrados em `today`"""
+    yesterday = today - timedelta(days=1)
+    last_sunday = yesterday - timedelta(days=(yesterday.weekday() + 1) % 7)
+    return [('daily', yesterday), ('weekly', last_sunday - timedelta(days=6))]
+
+def is_ready(conn, end_day):
+    """O período só é renderizado depois que suas horas foram compactadas"""
+    watermark = aggregates.get_watermark(conn, 'hourly')
+    return watermark is not None and watermark.date() > end_day
+
+def _fmt_int(value):
+    return f"{int(value or 0):,}".replace(',', '.')
+
+def render_report(conn, kind, start_day, end_day, settings):
+    """Renderiza o PDF do relatório a partir dos agregados; retorna os bytes"""
+    resolution = 'hourly' if kind == 'daily' else 'daily'
+    total, blocked, clients, domains, _ = aggregates.query_stats(conn, start_day, end_day, resolution)
+    activity, _ = aggregates.query_activity(conn, start_day, end_day, resolution)
+    sections = [
+        ('Domínios mais consultados',
+         aggregates.query_top(conn, start_day, end_day, 'domain', limit=TOP_N, resolution=resolution)[0]),
+        ('Domínios mais bloqueados',
+         aggregates.query_top(conn, start_day, end_day, 'domain', blocked_only=True, limit=TOP_N,
+                              resolution=resolution)[0]),
+        ('Clientes mais ativos',
+         aggregates.query_top(conn, start_day, end_day, 'client', exclude='127.0.0.1', limit=TOP_N,
+                              resolution=resolution)[0])
+    ]
+
+    title = settings.get('pdf_title') or 'Relatório de Logs do Pi-hole'
+    if kind == 'daily':
+        period_text = start_day.strftime('%d/%m/%Y')
+    else:
+        period_text = f"{start_day.strftime('%d/%m/%Y')} a {end_day.strftime('%d/%m/%Y')}"
+
+    writer = StreamingPDFWriter(title, settings.get('pdf_author', ''),
+                                f"{KIND_LABELS[kind]} — {period_text}")
+    chunks = [writer.begin()]
+    texts, lines, rects = [], [], []
+    y = PAGE_HEIGHT - MARGIN
+
+    def ensure_space(height):
+        nonlocal texts, lines, rects, y
+        if y - height < MARGIN:
+            chunks.append(writer.page(texts, lines, rects))
+            texts, lines, rects = [], [], []
+            y = PAGE_HEIGHT - MARGIN
+
+    texts.append((MARGIN, y, 16, title, True))
+    y -= 20
+    texts.append((MARGIN, y, 11, f"{KIND_LABELS[kind]} — {period_text}", False))
+    y -= 14
+    texts.append((MARGIN, y, 8, f"Gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}", False))
+    y -= 26
+
+    # Resumo
+    block_rate = (blocked / total * 100) if total else 0
+    summary = [('Consultas', _fmt_int(total)), ('Bloqueadas', _fmt_int(blocked)),
+               ('Taxa de bloqueio', f"{block_rate:.1f}%"), ('Clientes', _fmt_int(clients)),
+               ('Domínios', _fmt_int(domains))]
+    column_width = (PAGE_WIDTH - 2 * MARGIN) / len(summary)
+    for i, (label, value) in enumerate(summary):
+        x = MARGIN + i * column_width
+        texts.append((x, y, 8, label, False))
+        texts.append((x, y - 14, 12, value, True))
+    y -= 40
+
+    # Gráfico de barras da atividade (por hora ou por dia)
+    texts.append((MARGIN, y, 11, 'Atividade', True))
+    y -= 14
+    chart_height = 120
+    if activity:
+        peak = max(row[1] or 0 for row in activity) or 1
+        slot = (PAGE_WIDTH - 2 * MARGIN) / len(activity)
+        base = y - chart_height
+        for i, (label, count, blocked_count) in enumerate(activity):
+            x = MARGIN + i * slot
+            height = (count or 0) / peak * (chart_height - 20)
+            rects.append((x + 1, base + 12, slot - 2, height, 0.6))
+            rects.append((x + 1, base + 12, slot - 2, (blocked_count or 0) / peak * (chart_height - 20), 0.2))
+            short = label[:2] if kind == 'daily' else label[8:10] + '/' + label[5:7]
+            texts.append((x + 1, base, 6, short, False))
+        lines.append((MARGIN, base + 12, PAGE_WIDTH - MARGIN, base + 12))
+        texts.append((PAGE_WIDTH - MARGIN - 150, y, 7, f"Pico: {_fmt_int(peak)} consultas", False))
+    else:
+        texts.append((MARGIN, y - 20, 9, 'Sem dados no período', False))
+    y -= chart_height + 24
+
+    # Tabelas de top N
+    for heading, rows in sections:
+        ensure_space(30 + 12 * max(len(rows), 1))
+        texts.append((MARGIN, y, 11, heading, True))
+        y -= 6
+        lines.append((MARGIN, y, PAGE_WIDTH - MARGIN, y))
+        y -= 12
+        if not rows:
+            texts.append((MARGIN, y, 8, 'Nenhum registro', False))
+            y -= 12
+        for position, (key, count) in enumerate(rows, 1):
+            key = key if len(key) <= 80 else key[:77] + '...'
+            texts.append((MARGIN, y, 8, f"{position}.", False))
+            texts.append((MARGIN + 20, y, 8, key, False))
+            texts.append((PAGE_WIDTH - MARGIN - 60, y, 8, _fmt_int(count), False))
+            y -= 12
+        y -= 14
+
+    chunks.append(writer.page(texts, lines, rects))
+    chunks.append(writer.end())
+    return b''.join(chunks)
+
+def load_manifest(reports_dir=REPORTS_DIR):
+    """Lista de relatórios gerados (mais recentes primeiro)"""
+    try:
+        with open(os.path.join(reports_dir, MANIFEST_FILE), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def _save_manifest(entries, reports_dir):
+    fd, tmp_path = tempfile.mkstemp(prefix='.manifest.', suffix='.tmp', dir=reports_dir)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(reports_dir, MANIFEST_FILE))
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def find_report(kind, period, version=None, reports_dir=REPORTS_DIR):
+    """Entrada do manifesto (última versão se `version` não for informada)"""
+    matches = [entry for entry in load_manifest(reports_dir)
+               if entry['kind'] == kind and entry['period'] == period
+               and (version is None or entry['version'] == version)]
+    return max(matches, key=lambda entry: entry['version']) if matches else None
+
+def generate_report(conn, kind, day, settings, reports_dir=REPORTS_DIR, force=False):
+    """Renderiza e registra o relatório do período que contém `day`
+
+    Sem `force`, um período que já tem relatório não é renderizado de novo;
+    com `force`, uma nova versão é criada. Retorna (entrada, criado).
+    """
+    start_day, end_day = report_period(kind, day)
+    period = period_id(kind, start_day)
+    existing = find_report(kind, period, reports_dir=reports_dir)
+    if existing and not force:
+        return existing, False
+
+    data = render_report(conn, kind, start_day, end_day, settings)
+
+    with _manifest_lock:
+        os.makedirs(reports_dir, exist_ok=True)
+        entries = load_manifest(reports_dir)
+        version = 1 + max((entry['version'] for entry in entries
+                           if entry['kind'] == kind and entry['period'] == period), default=0)
+        filename = f"{kind}-{period}-v{version}.pdf"
+        path = os.path.join(reports_dir, filename)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        entry = {
+            'kind': kind,
+            'period': period,
+            'start_day': start_day.isoformat(),
+            'end_day': end_day.isoformat(),
+            'version': version,
+            'file': filename,
+            'bytes': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'sent_at': None
+        }
+        entries.insert(0, entry)
+        _save_manifest(entries, reports_dir)
+
+    logger.info(f"📄 Relatório {kind} {period} v{version} gerado ({len(data)} bytes)")
+    return entry, True
+
+def mark_sent(entry, reports_dir=REPORTS_DIR):
+    """Registra no manifesto que o relatório foi enviado"""
+    with _manifest_lock:
+        entries = load_manifest(reports_dir)
+        for item in entries:
+            if item['kind'] == entry['kind'] and item['period'] == entry['period'] \
+                    and item['version'] == entry['version']:
+                item['sent_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        _save_manifest(entries, reports_dir)
+
+def report_path(entry, reports_dir=REPORTS_DIR):
+    return os.path.join(reports_dir, entry['file'])
+
+def generate_due_reports(conn, settings, today=None, reports_dir=REPORTS_DIR, on_generated=None):
+    """Gera os relatórios dos períodos encerrados que ainda não existem
+
+    `on_generated(entrada, caminho)` é chamado para cada relatório novo (ex.:
+    envio ao Telegram). Retorna as entradas criadas.
+    """
+    today = today or datetime.now().date()
+    created = []
+    for kind, start_day in last_closed_periods(today):
+        _, end_day = report_period(kind, start_day)
+        if find_report(kind, period_id(kind, start_day), reports_dir=reports_dir):
+            continue
+        # Sem nenhum dado no período não há o que relatar
+        if not conn.execute("SELECT 1 FROM agg_hourly WHERE bucket >= ? AND bucket < ? LIMIT 1",
+                            (start_day.isoformat(), (end_day + timedelta(days=1)).isoformat())).fetchone():
+            continue
+        if not is_ready(conn, end_day):
+            continue
+        entry, new = generate_report(conn, kind, start_day, settings, reports_dir)
+        if new:
+            created.append(entry)
+            if on_generated:
+                try:
+                    on_generated(entry, report_path(entry, reports_dir))
+                except Exception as e:
+                    logger.error(f"❌ Erro ao entregar relatório {entry['file']}: {e}")
+    return created
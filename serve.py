@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Servidor de produção do Pi-hole Log Viewer
+O app.run do Flask atende tudo em um único processo: uma consulta pesada
+segura o GIL e atrasa as demais requisições. Aqui o servidor do Werkzeug roda
+em dois modos:
+
+- prefork (padrão): o processo mestre abre o socket, importa a aplicação uma
+  única vez (a janela quente e os módulos carregados são compartilhados com
+  os filhos por copy-on-write) e cria um worker por CPU. Cada worker atende o
+  mesmo socket com um pool de threads; um worker que morre é recriado.
+- threaded: um único processo com o pool de threads (máquinas com pouca
+  memória ou depuração).
+
+SIGTERM (ou Ctrl+C) encerra com drenagem: os workers param de aceitar
+conexões, terminam as requisições em andamento por até graceful_timeout
+segundos e só então saem. A aplicação pode definir os ganchos pre_fork()
+(no mestre, antes dos forks), post_fork() (em cada worker) e on_shutdown()
+(em cada worker, depois da drenagem).
+
+Uso: python serve.py [app_local_db|app|app_server] [--workers N] [--threads N] [--mode prefork|threaded]
+Configurado por SERVER_CONFIG no config.py; host e porta vêm do FLASK_CONFIG.
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    'mode': 'prefork',
+    # Processos; None usa um por CPU disponível
+    'workers': None,
+    # Requisições simultâneas por worker
+    'threads': 8,
+    # Espera máxima pelas requisições em andamento ao encerrar (segundos)
+    'graceful_timeout': 30,
+    # Conexão keep-alive ociosa é fechada depois disso (segundos)
+    'keepalive_seconds': 5,
+    'pid_file': 'serve.pid'
+}
+
+# Um worker que morre antes disso é recriado só depois de RESPAWN_DELAY_SECONDS
+MIN_WORKER_SECONDS = 5
+RESPAWN_DELAY_SECONDS = 2
+
+LISTEN_BACKLOG = 128
+
+def load_config():
+    """SERVER_CONFIG do config.py sobre os padrões"""
+    try:
+        import config
+        overrides = getattr(config, 'SERVER_CONFIG', {})
+    except ImportError:
+        overrides = {}
+    return dict(DEFAULT_CONFIG, **overrides)
+
+def cpu_count():
+    """CPUs que este processo pode usar (respeita taskset/cgroups)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def flask_address():
+    """(host, porta) do FLASK_CONFIG"""
+    try:
+        from config import FLASK_CONFIG
+    except ImportError:
+        FLASK_CONFIG = {}
+    return FLASK_CONFIG.get('host', '0.0.0.0'), FLASK_CONFIG.get('port', 5000)
+
+def call_hook(module, name):
+    """Chama o gancho `name` da aplicação, se existir"""
+    hook = getattr(module, name, None)
+    if hook is None:
+        return
+    try:
+        hook()
+    except Exception as e:
+        logger.error(f"❌ Erro no gancho {name}: {e}")
+
+class RequestHandler(WSGIRequestHandler):
+    """HTTP/1.1 com keep-alive; conexões ociosas liberam a thread após o timeout"""
+
+    protocol_version = 'HTTP/1.1'
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Servidor do Werkzeug que atende cada conexão em um pool de threads fixo
+
+    Diferente do ThreadingMixIn (uma thread nova por conexão, sem limite), o
+    pool limita a concorrência por worker e é drenado no encerramento.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, keepalive_seconds, fd=None):
+        handler = type('PoolRequestHandler', (RequestHandler,), {'timeout': keepalive_seconds})
+        super().__init__(host, port, app, handler=handler, fd=fd)
+        # Vários processos esperam no mesmo socket: quem perde a corrida do
+        # accept recebe EAGAIN e volta ao select em vez de ficar preso
+        self.socket.setblocking(False)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self, timeout):
+        """Espera as requisições em andamento por até `timeout` segundos"""
+        done = threading.Event()
+
+        def wait():
+            self.pool.shutdown(wait=True)
+            done.set()
+
+        threading.Thread(target=wait, daemon=True).start()
+        if not done.wait(timeout):
+            logger.warning(f"⚠️ Requisições ainda em andamento após {timeout}s; encerrando assim mesmo")
+
+def bind_socket(host, port):
+    """Socket de escuta herdado pelos workers"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(LISTEN_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+def serve(module, sock, host, port, config):
+    """Atende o socket até SIGTERM/SIGINT e drena as requisições em andamento"""
+    server = PooledWSGIServer(host, port, module.app, config['threads'], config['keepalive_seconds'],
+                              fd=sock.fileno())
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        if not stopping.is_set():
+            stopping.set()
+            # shutdown() espera o laço de serve_forever: não pode rodar nesta thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    server.serve_forever()
+    server.drain(config['graceful_timeout'])
+    call_hook(module, 'on_shutdown')
+
+class Master:
+    """Processo mestre do modo prefork: cria, vigia e encerra os workers"""
+
+    def __init__(self, module, sock, host, port, config):
+        self.module = module
+        self.sock = sock
+        self.host = host
+        self.port = port
+        self.config = config
+        self.workers = {}
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return
+        # Worker
+        code = 0
+        try:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            call_hook(self.module, 'post_fork')
+            serve(self.module, self.sock, self.host, self.port, self.config)
+        except Exception as e:
+            logger.error(f"❌ Worker {os.getpid()} falhou: {e}")
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def reap(self):
+        """Recolhe os workers que saíram; retorna quantos"""
+        exited = 0
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            exited += 1
+            if not self.stopping:
+                logger.warning(f"⚠️ Worker {pid} saiu (status {os.waitstatus_to_exitcode(status)}); recriando")
+                if time.monotonic() - started < MIN_WORKER_SECONDS:
+                    time.sleep(RESPAWN_DELAY_SECONDS)
+        return exited
+
+    def run(self, workers):
+        def stop(signum, frame):
+            self.stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        call_hook(self.module, 'pre_fork')
+        for _ in range(workers):
+            self.spawn()
+        logger.info(f"🚀 {workers} worker(s) x {self.config['threads']} threads em http://{self.host}:{self.port}")
+
+        while not self.stopping:
+            self.reap()
+            while not self.stopping and len(self.workers) < workers:
+                self.spawn()
+            time.sleep(0.5)
+        self.shutdown()
+
+    def shutdown(self):
+        """SIGTERM aos workers; SIGKILL em quem passar do graceful_timeout"""
+        logger.info(f"🛑 Encerrando {len(self.workers)} worker(s)...")
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        # Um pouco além do prazo dos workers, que também drenam com graceful_timeout
+        deadline = time.monotonic() + self.config['graceful_timeout'] + 5
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            logger.warning(f"⚠️ Worker {pid} não terminou a tempo; SIGKILL")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.workers.clear()
+
+def main():
+    config = load_config()
+    parser = argparse.ArgumentParser(description='Servidor de produção do Pi-hole Log Viewer')
+    parser.add_argument('app', nargs='?', default='app_local_db',
+                        choices=('app_local_db', 'app', 'app_server'), help='Módulo da aplicação')
+    parser.add_argument('--mode', choices=('prefork', 'threaded'), default=config['mode'])
+    parser.add_argument('--workers', type=int, default=config['workers'])
+    parser.add_argument('--threads', type=int, default=config['threads'])
+    args = parser.parse_args()
+    config['threads'] = args.threads
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    host, port = flask_address()
+    sock = bind_socket(host, port)
+
+    # Pré-carregamento: a aplicação é importada uma vez, antes dos forks
+    module = importlib.import_module(args.app)
+
+    pid_file = config['pid_file']
+    if pid_file:
+        with open(pid_file, 'w') as f:
+            f.write(str(os.getpid()))
+    try:
+        if args.mode == 'threaded':
+            logger.info(f"🚀 1 processo x {args.threads} threads em http://{host}:{port}")
+            serve(module, sock, host, port, config)
+        else:
+            Master(module, sock, host, port, config).run(args.workers or cpu_count())
+    finally:
+        if pid_file and os.path.exists(pid_file):
+            os.remove(pid_file)
+        logger.info("✅ Servidor encerrado")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Serviço de configurações em memória para alert_settings.json
+Mantém um objeto validado e tipado, recarrega o arquivo apenas quando ele muda
+(mtime/inode/tamanho), grava de forma atômica e publica eventos de mudança
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field, fields, asdict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ALERT_SETTINGS_FILE = 'alert_settings.json'
+
+# Intervalo mínimo entre duas verificações do arquivo em get() (segundos)
+STAT_INTERVAL_SECONDS = 1.0
+
+# Intervalo da thread de observação do arquivo (segundos)
+WATCH_INTERVAL_SECONDS = 2.0
+
+# Nomes usados pela página de configurações (config.js) -> campos do objeto
+CAMEL_ALIASES = {
+    'alertsEnabled': 'alerts_enabled',
+    'ipSpikeThreshold': 'ip_spike_threshold',
+    'domainSpikeThreshold': 'domain_spike_threshold',
+    'networkSpikeThreshold': 'network_spike_threshold',
+    'analysisPeriodHours': 'analysis_period_hours',
+    'telegramEnabled': 'telegram_enabled',
+    'telegramChatId': 'telegram_chat_id',
+    'telegramBotToken': 'telegram_bot_token',
+    'dataRetention': 'data_retention_days',
+    'archiveAfterDays': 'archive_after_days',
+    'hourlyRetentionDays': 'hourly_retention_days',
+    'dailyRetentionDays': 'daily_retention_days',
+    'reportsEnabled': 'reports_enabled',
+    'reportTelegram': 'report_telegram',
+    'pdfTitle': 'pdf_title',
+    'pdfAuthor': 'pdf_author',
+    'pdfSubject': 'pdf_subject',
+    'updateInterval': 'update_interval',
+    'maxResults': 'max_results'
+}
+
+# Limites aceitos para campos numéricos (mínimo, máximo)
+BOUNDS = {
+    'ip_spike_threshold': (1.0, 1000.0),
+    'domain_spike_threshold': (1.0, 1000.0),
+    'network_spike_threshold': (1.0, 1000.0),
+    'analysis_period_hours': (1, 24),
+    'data_retention_days': (1, 3650),
+    'archive_after_days': (1, 3650),
+    'hourly_retention_days': (1, 3650),
+    'daily_retention_days': (1, 36500),
+    'update_interval': (1, 1440),
+    'max_results': (1, 10000000)
+}
+
+@dataclass
+class AlertSettings:
+    """Configurações da aplicação já validadas"""
+    alerts_enabled: bool = True
+    ip_spike_threshold: float = 3.0
+    domain_spike_threshold: float = 5.0
+    network_spike_threshold: float = 2.5
+    analysis_period_hours: int = 2
+    telegram_enabled: bool = False
+    telegram_chat_id: str = ''
+    telegram_bot_token: str = ''
+    data_retention_days: int = 90
+    # Dias mantidos no banco antes de ir para o arquivo comprimido
+    archive_after_days: int = 7
+    # Retenção dos agregados por hora e por dia (após a remoção dos brutos)
+    hourly_retention_days: int = 365
+    daily_retention_days: int = 1825
+    # Relatórios diários/semanais pré-gerados e envio pelo Telegram
+    reports_enabled: bool = True
+    report_telegram: bool = False
+    pdf_title: str = 'Relatório de Logs do Pi-hole'
+    pdf_author: str = 'Pi-hole Log Viewer'
+    pdf_subject: str = 'Relatório de Logs'
+    update_interval: int = 30
+    max_results: int = 5000
+    # Chaves desconhecidas (ex.: cacheTimeout, autoRefresh) são preservadas
+    extra: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Constrói e valida a partir do JSON (snake_case ou camelCase)"""
+        defaults = cls()
+        known = {f.name: f for f in fields(cls) if f.name != 'extra'}
+        values = {}
+        extra = {}
+
+        for key, value in (data or {}).items():
+            name = CAMEL_ALIASES.get(key, key)
+            if name not in known:
+                extra[key] = value
+                continue
+            # snake_case tem precedência sobre o alias camelCase equivalente
+            if name in values and key != name:
+                continue
+            values[name] = value
+
+        settings = cls(extra=extra)
+        for name, value in values.items():
+            default = getattr(defaults, name)
+            try:
+                coerced = _coerce(value, type(default))
+            except (TypeError, ValueError):
+                logger.warning(f"⚠️ Configuração inválida '{name}': {value!r}, usando {default!r}")
+                continue
+            if name in BOUNDS:
+                low, high = BOUNDS[name]
+                if not low <= coerced <= high:
+                    logger.warning(f"⚠️ Configuração '{name}' fora do intervalo [{low}, {high}]: {coerced!r}")
+                    coerced = min(max(coerced, type(default)(low)), type(default)(high))
+            setattr(settings, name, coerced)
+        return settings
+
+    def to_dict(self, with_aliases=True):
+        """Formato das APIs; inclui os aliases camelCase lidos pelo config.js"""
+        data = asdict(self)
+        extra = data.pop('extra')
+        data.update({k: v for k, v in extra.items() if k not in data})
+        if with_aliases:
+            for camel, name in CAMEL_ALIASES.items():
+                data[camel] = data[name]
+        return data
+
+    def to_file_dict(self):
+        """Formato gravado em disco (snake_case + chaves extras)"""
+        return self.to_dict(with_aliases=False)
+
+def _coerce(value, kind):
+    if kind is bool:
+        if isinstance(value, str):
+            lowered = value.strip().lower()
+            if lowered in ('true', '1', 'yes', 'on', 'sim'):
+                return True
+            if lowered in ('false', '0', 'no', 'off', 'nao', 'não', ''):
+                return False
+            raise ValueError(value)
+        return bool(value)
+    if kind is int:
+        return int(float(value))
+    if kind is float:
+        return float(value)
+    return '' if value is None else str(value)
+
+class SettingsService:
+    """Cache das configurações com detecção de mudança no arquivo"""
+
+    def __init__(self, path=ALERT_SETTINGS_FILE, stat_interval=STAT_INTERVAL_SECONDS):
+        self.path = path
+        self.stat_interval = stat_interval
+        self._lock = threading.RLock()
+        self._settings = AlertSettings()
+        self._signature = None
+        self._checked_at = 0.0
+        self._subscribers = []
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reloads = 0
+        self.hits = 0
+        self._reload(force=True)
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def _reload(self, force=False):
+        """Relê o arquivo se a assinatura mudou; retorna True se houve mudança"""
+        signature = self._stat_signature()
+        if not force and signature == self._signature:
+            return False
+
+        if signature is None:
+            new_settings = AlertSettings()
+        else:
+            try:
+                with open(self.path, 'r') as f:
+                    new_settings = AlertSettings.from_dict(json.load(f))
+            except (OSError, ValueError) as e:
+                # Mantém a última versão válida se o arquivo estiver corrompido
+                logger.error(f"❌ Erro ao ler {self.path}: {e}")
+                self._signature = signature
+                return False
+
+        old = self._settings
+        self._settings = new_settings
+        self._signature = signature
+        self.reloads += 1
+        if old != new_settings:
+            self._publish(old, new_settings)
+            return True
+        return False
+
+    def get(self):
+        """Retorna as configurações atuais (relê só se o arquivo mudou)"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at >= self.stat_interval:
+                self._checked_at = now
+                self._reload()
+                metrics.cache_hit('settings', False)
+            else:
+                self.hits += 1
+                metrics.cache_hit('settings', True)
+            return self._settings
+
+    def save(self, data):
+        """Valida e grava atomicamente (arquivo temporário + rename)"""
+        with self._lock:
+            current = self._settings.to_dict(with_aliases=False)
+            merged = dict(current)
+            merged.update(data or {})
+            # Um alias camelCase enviado pela UI substitui o valor snake_case atual
+            for camel, name in CAMEL_ALIASES.items():
+                if camel in (data or {}):
+                    merged[name] = data[camel]
+                    merged.pop(camel, None)
+            new_settings = AlertSettings.from_dict(merged)
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix='.alert_settings.', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(new_settings.to_file_dict(), f, indent=2, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+
+            old = self._settings
+            self._settings = new_settings
+            self._signature = self._stat_signature()
+            self._checked_at = time.monotonic()
+            if old != new_settings:
+                self._publish(old, new_settings)
+            return new_settings
+
+    def subscribe(self, callback):
+        """Registra `callback(antigas, novas)` chamado a cada mudança"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def _publish(self, old, new):
+        for callback in list(self._subscribers):
+            try:
+                callback(old, new)
+            except Exception as e:
+                logger.error(f"❌ Erro ao notificar mudança de configurações: {e}")
+
+    def start_watcher(self, interval=WATCH_INTERVAL_SECONDS):
+        """Observa o arquivo em segundo plano para publicar edições externas"""
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                with self._lock:
+                    self._checked_at = time.monotonic()
+                    self._reload()
+
+        self._watcher = threading.Thread(target=watch, name='settings-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self, timeout=5):
+        self._stop.set()
+        if self._watcher:
+            self._watcher.join(timeout)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Cache de resultados do dashboard compartilhado entre os processos do servidor
+Com o servidor prefork (serve.py) cada worker tem sua própria memória; este
+cache guarda os resultados já calculados em um banco SQLite em /dev/shm
+(tmpfs: fica na memória e é lido via mmap), visível a todos os workers. Cada
+entrada guarda a geração dos dados em que foi calculada: uma importação
+incrementa a geração (bump) e todas as entradas anteriores deixam de valer de
+uma vez, em todos os processos. Configurado por SHARED_CACHE_CONFIG no
+config.py.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    'enabled': True,
+    # Validade máxima de uma entrada mesmo sem importação (segundos)
+    'ttl_seconds': 300,
+    # Diretório do banco; None usa /dev/shm (ou o diretório temporário do sistema)
+    'directory': None,
+    # Acima disso as entradas expiradas são apagadas na próxima gravação
+    'max_entries': 2000
+}
+
+SHM_DIR = '/dev/shm'
+
+# Janela de leitura via mmap
+MMAP_BYTES = 64 * 1024 * 1024
+
+def load_config():
+    """SHARED_CACHE_CONFIG do config.py sobre os padrões"""
+    try:
+        import config
+        overrides = getattr(config, 'SHARED_CACHE_CONFIG', {})
+    except ImportError:
+        overrides = {}
+    return dict(DEFAULT_CONFIG, **overrides)
+
+def default_path(name):
+    """Arquivo do cache em memória compartilhada (tmpfs) quando disponível"""
+    directory = load_config()['directory']
+    if directory is None:
+        directory = SHM_DIR if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK) else tempfile.gettempdir()
+    return os.path.join(directory, f"pihole-log-viewer-{name}.cache.db")
+
+class SharedCache:
+    """Chave -> valor JSON, invalidado pela geração dos dados"""
+
+    def __init__(self, path, ttl=None, enabled=None, max_entries=None):
+        config = load_config()
+        self.path = path
+        self.ttl = config['ttl_seconds'] if ttl is None else ttl
+        self.enabled = config['enabled'] if enabled is None else enabled
+        self.max_entries = max_entries or config['max_entries']
+        self._local = threading.local()
+        self._init()
+
+    @classmethod
+    def for_app(cls, name):
+        return cls(default_path(name))
+
+    def _connect(self):
+        """Conexão da thread atual; refeita depois de um fork (conexões não atravessam processos)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # Cache descartável: não precisa sobreviver a uma queda do sistema
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute(f'PRAGMA mmap_size={MMAP_BYTES}')
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _init(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                value BLOB NOT NULL
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)")
+        conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('generation', 0)")
+
+    def generation(self):
+        """Geração atual dos dados (incrementada a cada importação)
+
+        A geração e os valores avulsos (meta) funcionam mesmo com o cache
+        desligado: os workers também os usam para saber que outro processo
+        importou registros.
+        """
+        return self._connect().execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()[0]
+
+    def bump(self):
+        """Invalida todas as entradas (em todos os processos); retorna a nova geração"""
+        conn = self._connect()
+        conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'generation'")
+        conn.execute("DELETE FROM entries WHERE generation < (SELECT value FROM meta WHERE name = 'generation')")
+        return self.generation()
+
+    def get_meta(self, name, default=None):
+        """Valor avulso compartilhado entre os processos (ex.: importação em andamento)"""
+        row = self._connect().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return default if row is None or row[0] is None else row[0]
+
+    def set_meta(self, name, value):
+        self._connect().execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def meta_items(self, prefix):
+        """Valores avulsos cujo nome começa com `prefix` (ex.: um por worker): [(nome, valor)]"""
+        return self._connect().execute("""
+            SELECT name, value FROM meta WHERE substr(name, 1, length(?)) = ? ORDER BY name
+        """, (prefix, prefix)).fetchall()
+
+    def delete_meta(self, prefix):
+        self._connect().execute("DELETE FROM meta WHERE substr(name, 1, length(?)) = ?", (prefix, prefix))
+
+    def get(self, key):
+        """Valor da chave, ou None se ausente, expirado ou de uma geração anterior"""
+        if not self.enabled:
+            return None
+        row = self._connect().execute("""
+            SELECT value FROM entries
+            WHERE key = ? AND expires > ?
+              AND generation = (SELECT value FROM meta WHERE name = 'generation')
+        """, (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None, generation=None):
+        """Grava o valor calculado na geração `generation` (a atual, se omitida)
+
+        Um resultado calculado antes de uma importação que terminou no meio
+        do cálculo chega com a geração antiga e já nasce invalidado.
+        """
+        if not self.enabled:
+            return
+        conn = self._connect()
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        body = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        conn.execute("""
+            INSERT OR REPLACE INTO entries (key, generation, expires, value)
+            VALUES (?, COALESCE(?, (SELECT value FROM meta WHERE name = 'generation')), ?, ?)
+        """, (key, generation, expires, body))
+        if conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] > self.max_entries:
+            conn.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),))
+
+    def get_or_compute(self, key, compute, ttl=None, store_if=None):
+        """Valor em cache ou calculado por `compute()` e gravado
+
+        `store_if(valor)` decide se o valor pode ser guardado (ex.: só sucessos).
+        """
+        try:
+            value = self.get(key)
+            if value is not None:
+                return value
+            generation = self.generation()
+        except sqlite3.Error as e:
+            # O cache é só um atalho: falhar nele não derruba a requisição
+            logger.warning(f"⚠️ Cache compartilhado indisponível: {e}")
+            return compute()
+        value = compute()
+        if store_if is None or store_if(value):
+            try:
+                self.set(key, value, ttl, generation)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Cache compartilhado indisponível: {e}")
+        return value
+
+    def cached(self, key_func, ttl=None, store_if=None):
+        """Decorador: guarda o retorno (dict serializável) da função sob key_func(*args)"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                return self.get_or_compute(key_func(*args, **kwargs), lambda: func(*args, **kwargs),
+                                           ttl, store_if)
+            return wrapper
+        return decorator
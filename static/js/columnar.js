@@ -0,0 +1,99 @@
+// Respostas colunares das rotas de logs (?format=columnar)
+// Cada coluna chega como uma lista; colunas de dicionário trazem índices
+// em `dictionaries[coluna]`. Aqui as linhas voltam a ser objetos.
+function decodeColumnar(table) {
+    const columns = table.columns.map(name => [
+        name,
+        table.data[name],
+        table.dictionaries[name] || null
+    ]);
+    const rows = new Array(table.count);
+    for (let i = 0; i < table.count; i++) {
+        const row = {};
+        for (const [name, values, dictionary] of columns) {
+            row[name] = dictionary ? dictionary[values[i]] : values[i];
+        }
+        rows[i] = row;
+    }
+    return rows;
+}
+
+// Lista de logs de uma resposta, colunar ou não
+function logsFromResponse(data) {
+    if (data.format === 'columnar') {
+        return decodeColumnar(data.logs);
+    }
+    return data.logs || [];
+}
+
+// Tabela colunar de uma resposta; nas respostas comuns todas as colunas
+// são codificadas por dicionário aqui mesmo
+function tableFromResponse(data) {
+    if (data.format === 'columnar') {
+        return data.logs;
+    }
+    const rows = data.logs || [];
+    const columns = rows.length ? Object.keys(rows[0]) : [];
+    const table = {count: rows.length, columns: columns, data: {}, dictionaries: {}};
+    for (const name of columns) {
+        const index = new Map();
+        table.data[name] = rows.map(row => {
+            let code = index.get(row[name]);
+            if (code === undefined) {
+                code = index.size;
+                index.set(row[name], code);
+            }
+            return code;
+        });
+        table.dictionaries[name] = Array.from(index.keys());
+    }
+    return table;
+}
+
+// Uma linha da tabela colunar como objeto, sem decodificar as demais
+function columnarRow(table, i) {
+    const row = {};
+    for (const name of table.columns) {
+        const dictionary = table.dictionaries[name];
+        row[name] = dictionary ? dictionary[table.data[name][i]] : table.data[name][i];
+    }
+    return row;
+}
+
+// Acrescenta uma página à tabela já carregada. Cada resposta tem os seus
+// próprios dicionários: os índices da página são traduzidos para os da tabela.
+function appendColumnar(table, page) {
+    for (const name of table.columns) {
+        const values = table.data[name];
+        const pageValues = page.data[name] || [];
+        const dictionary = table.dictionaries[name];
+        if (!dictionary) {
+            for (let i = 0; i < page.count; i++) values.push(pageValues[i]);
+            continue;
+        }
+        const index = dictionaryIndex(table, name);
+        const remap = (page.dictionaries[name] || []).map(value => {
+            let code = index.get(value);
+            if (code === undefined) {
+                code = dictionary.length;
+                dictionary.push(value);
+                index.set(value, code);
+            }
+            return code;
+        });
+        for (let i = 0; i < page.count; i++) values.push(remap[pageValues[i]]);
+    }
+    table.count += page.count;
+    return table;
+}
+
+// Valor -> índice de um dicionário (guardado na tabela entre as páginas)
+function dictionaryIndex(table, name) {
+    if (!table.indexes) {
+        Object.defineProperty(table, 'indexes', {value: {}, enumerable: false});
+    }
+    if (!table.indexes[name]) {
+        table.indexes[name] = new Map(table.dictionaries[name].map((value, code) => [value, code]));
+    }
+    return table.indexes[name];
+}
@@ -8,6 +8,9 @@ function saveConfig() {
         autoRefresh: document.getElementById('auto-refresh').value,
         updateInterval: document.getElementById('update-interval').value,
         dataRetention: document.getElementById('data-retention').value,
+        archiveAfterDays: document.getElementById('archive-after').value,
+        hourlyRetentionDays: document.getElementById('hourly-retention').value,
+        dailyRetentionDays: document.getElementById('daily-retention').value,
         dashboardUpdate: document.getElementById('dashboard-update').value,
         pdfTitle: document.getElementById('pdf-title').value,
         pdfAuthor: document.getElementById('pdf-author').value,
@@ -19,6 +22,8 @@ function saveConfig() {
         networkSpikeThreshold: document.getElementById('network-spike-threshold').value,
         analysisPeriodHours: document.getElementById('analysis-period-hours').value,
         telegramEnabled: document.getElementById('telegram-enabled').value,
+        reportsEnabled: document.getElementById('reports-enabled').value,
+        reportTelegram: document.getElementById('report-telegram').value,
         telegramChatId: document.getElementById('telegram-chat-id').value,
         telegramBotToken: document.getElementById('telegram-bot-token').value
     };
@@ -53,6 +58,9 @@ function resetConfig() {
         document.getElementById('auto-refresh').value = '0';
         document.getElementById('update-interval').value = '30';
         document.getElementById('data-retention').value = '90';
+        document.getElementById('archive-after').value = '7';
+        document.getElementById('hourly-retention').value = '365';
+        document.getElementById('daily-retention').value = '1825';
         document.getElementById('dashboard-update').value = '30';
         document.getElementById('pdf-title').value = 'Relatório de Logs do Pi-hole';
         document.getElementById('pdf-author').value = 'Pi-hole Log Viewer';
@@ -64,6 +72,8 @@ function resetConfig() {
         document.getElementById('network-spike-threshold').value = '2.5';
         document.getElementById('analysis-period-hours').value = '2';
         document.getElementById('telegram-enabled').value = 'false';
+        document.getElementById('reports-enabled').value = 'true';
+        document.getElementById('report-telegram').value = 'false';
         document.getElementById('telegram-chat-id').value = '';
         document.getElementById('telegram-bot-token').value = '';
         
@@ -79,6 +89,9 @@ function exportConfig() {
         autoRefresh: document.getElementById('auto-refresh').value,
         updateInterval: document.getElementById('update-interval').value,
         dataRetention: document.getElementById('data-retention').value,
+        archiveAfterDays: document.getElementById('archive-after').value,
+        hourlyRetentionDays: document.getElementById('hourly-retention').value,
+        dailyRetentionDays: document.getElementById('daily-retention').value,
         dashboardUpdate: document.getElementById('dashboard-update').value,
         pdfTitle: document.getElementById('pdf-title').value,
         pdfAuthor: document.getElementById('pdf-author').value,
@@ -90,6 +103,8 @@ function exportConfig() {
         networkSpikeThreshold: document.getElementById('network-spike-threshold').value,
         analysisPeriodHours: document.getElementById('analysis-period-hours').value,
         telegramEnabled: document.getElementById('telegram-enabled').value,
+        reportsEnabled: document.getElementById('reports-enabled').value,
+        reportTelegram: document.getElementById('report-telegram').value,
         telegramChatId: document.getElementById('telegram-chat-id').value,
         telegramBotToken: document.getElementById('telegram-bot-token').value
     };
@@ -125,6 +140,9 @@ function importConfig() {
                 if (config.autoRefresh) document.getElementById('auto-refresh').value = config.autoRefresh;
                 if (config.updateInterval) document.getElementById('update-interval').value = config.updateInterval;
                 if (config.dataRetention) document.getElementById('data-retention').value = config.dataRetention;
+                if (config.archiveAfterDays) document.getElementById('archive-after').value = config.archiveAfterDays;
+                if (config.hourlyRetentionDays) document.getElementById('hourly-retention').value = config.hourlyRetentionDays;
+                if (config.dailyRetentionDays) document.getElementById('daily-retention').value = config.dailyRetentionDays;
                 if (config.dashboardUpdate) document.getElementById('dashboard-update').value = config.dashboardUpdate;
                 if (config.pdfTitle) document.getElementById('pdf-title').value = config.pdfTitle;
                 if (config.pdfAuthor) document.getElementById('pdf-author').value = config.pdfAuthor;
@@ -136,6 +154,8 @@ function importConfig() {
                 if (config.networkSpikeThreshold) document.getElementById('network-spike-threshold').value = config.networkSpikeThreshold;
                 if (config.analysisPeriodHours) document.getElementById('analysis-period-hours').value = config.analysisPeriodHours;
                 if (config.telegramEnabled) document.getElementById('telegram-enabled').value = config.telegramEnabled;
+                if (config.reportsEnabled !== undefined) document.getElementById('reports-enabled').value = String(config.reportsEnabled);
+                if (config.reportTelegram !== undefined) document.getElementById('report-telegram').value = String(config.reportTelegram);
                 if (config.telegramChatId) document.getElementById('telegram-chat-id').value = config.telegramChatId;
                 if (config.telegramBotToken) document.getElementById('telegram-bot-token').value = config.telegramBotToken;
                 
@@ -165,6 +185,9 @@ function loadConfig() {
                 if (config.autoRefresh) document.getElementById('auto-refresh').value = config.autoRefresh;
                 if (config.updateInterval) document.getElementById('update-interval').value = config.updateInterval;
                 if (config.dataRetention) document.getElementById('data-retention').value = config.dataRetention;
+                if (config.archiveAfterDays) document.getElementById('archive-after').value = config.archiveAfterDays;
+                if (config.hourlyRetentionDays) document.getElementById('hourly-retention').value = config.hourlyRetentionDays;
+                if (config.dailyRetentionDays) document.getElementById('daily-retention').value = config.dailyRetentionDays;
                 if (config.dashboardUpdate) document.getElementById('dashboard-update').value = config.dashboardUpdate;
                 if (config.pdfTitle) document.getElementById('pdf-title').value = config.pdfTitle;
                 if (config.pdfAuthor) document.getElementById('pdf-author').value = config.pdfAuthor;
@@ -176,6 +199,8 @@ function loadConfig() {
                 if (config.networkSpikeThreshold) document.getElementById('network-spike-threshold').value = config.networkSpikeThreshold;
                 if (config.analysisPeriodHours) document.getElementById('analysis-period-hours').value = config.analysisPeriodHours;
                 if (config.telegramEnabled) document.getElementById('telegram-enabled').value = config.telegramEnabled;
+                if (config.reportsEnabled !== undefined) document.getElementById('reports-enabled').value = String(config.reportsEnabled);
+                if (config.reportTelegram !== undefined) document.getElementById('report-telegram').value = String(config.reportTelegram);
                 if (config.telegramChatId) document.getElementById('telegram-chat-id').value = config.telegramChatId;
                 if (config.telegramBotToken) document.getElementById('telegram-bot-token').value = config.telegramBotToken;
             }
@@ -57,9 +57,41 @@ function loadDashboardData() {
     updateLastUpdate();
 }
 
+// Parâmetros comuns (data e fonte) das consultas do dashboard
+function dashboardQuery(selectedDate = null) {
+    const params = new URLSearchParams();
+    const source = document.getElementById('dashboard-source');
+    if (selectedDate) params.append('date', selectedDate);
+    if (source && source.value) params.append('source', source.value);
+    const query = params.toString();
+    return query ? `?${query}` : '';
+}
+
+// Carregar fontes (Pi-hole) no seletor; só aparece com mais de uma fonte
+function loadSources() {
+    return fetch('/api/sources')
+        .then(res => res.json())
+        .then(data => {
+            const select = document.getElementById('dashboard-source');
+            if (!data.success || !select || data.sources.length < 2) return;
+            data.sources.forEach(source => {
+                const option = document.createElement('option');
+                option.value = source.id;
+                option.textContent = source.lag_seconds === null
+                    ? source.id
+                    : `${source.id} (atraso ${Math.round(source.lag_seconds / 60)} min)`;
+                select.appendChild(option);
+            });
+            document.getElementById('source-selector').classList.remove('d-none');
+        })
+        .catch(err => {
+            console.error('Erro ao carregar fontes:', err);
+        });
+}
+
 // Carregar estatísticas
 function loadStats(selectedDate = null) {
-    const url = selectedDate ? `/api/stats?date=${selectedDate}` : '/api/stats';
+    const url = `/api/stats${dashboardQuery(selectedDate)}`;
     return fetch(url)
         .then(res => res.json())
         .then(data => {
@@ -75,14 +107,18 @@ function loadStats(selectedDate = null) {
         });
 }
 
+// Pontos do gráfico de atividade (o servidor escolhe o bucket e reduz com LTTB)
+const ACTIVITY_POINTS = 144;
+
 // Carregar gráfico de atividade
 function loadActivityChart(selectedDate = null) {
-    const url = selectedDate ? `/api/activity-chart?date=${selectedDate}` : '/api/activity-chart';
+    const query = dashboardQuery(selectedDate);
+    const url = `/api/timeseries${query}${query ? '&' : '?'}points=${ACTIVITY_POINTS}`;
     return fetch(url)
         .then(res => res.json())
         .then(data => {
             if (data.success) {
-                createActivityChart(data.data);
+                createActivityChart(data);
             }
         })
         .catch(err => {
@@ -98,14 +134,20 @@ function createActivityChart(data) {
         activityChart.destroy();
     }
     
+    // Os pontos escolhidos pelo LTTB não são equidistantes: eixo x linear em milissegundos
+    const times = data.timestamps.map(ts => new Date(ts.length === 10 ? `${ts}T00:00` : ts.replace(' ', 'T')).getTime());
+    const points = values => values.map((value, i) => ({x: times[i], y: value}));
+    const formatTime = value => data.bucket === 'day'
+        ? new Date(value).toLocaleDateString('pt-BR')
+        : new Date(value).toLocaleTimeString('pt-BR', {hour: '2-digit', minute: '2-digit'});
+    
     activityChart = new Chart(ctx, {
         type: 'line',
         data: {
-            labels: data.labels,
             datasets: [
                 {
                     label: 'Consultas',
-                    data: data.queries,
+                    data: points(data.series.total),
                     borderColor: '#28a745',
                     backgroundColor: 'rgba(40, 167, 69, 0.1)',
                     tension: 0.4,
@@ -113,7 +155,7 @@ function createActivityChart(data) {
                 },
                 {
                     label: 'Bloqueadas',
-                    data: data.blocked,
+                    data: points(data.series.blocked),
                     borderColor: '#dc3545',
                     backgroundColor: 'rgba(220, 53, 69, 0.1)',
                     tension: 0.4,
@@ -124,6 +166,10 @@ function createActivityChart(data) {
         options: {
             responsive: true,
             maintainAspectRatio: false,
+            interaction: {
+                mode: 'index',
+                intersect: false
+            },
             plugins: {
                 legend: {
                     position: 'top',
@@ -134,6 +180,13 @@ function createActivityChart(data) {
                         usePointStyle: true,
                         padding: 15
                     }
+                },
+                tooltip: {
+                    callbacks: {
+                        title: items => data.bucket === 'day'
+                            ? new Date(items[0].parsed.x).toLocaleDateString('pt-BR')
+                            : new Date(items[0].parsed.x).toLocaleString('pt-BR')
+                    }
                 }
             },
             scales: {
@@ -150,7 +203,12 @@ function createActivityChart(data) {
                     }
                 },
                 x: {
+                    type: 'linear',
+                    min: times[0],
+                    max: times[times.length - 1],
                     ticks: {
+                        callback: formatTime,
+                        maxTicksLimit: 12,
                         font: {
                             size: 9
                         }
@@ -163,7 +221,7 @@ function createActivityChart(data) {
             },
             elements: {
                 point: {
-                    radius: 3,
+                    radius: 0,
                     hoverRadius: 5
                 }
             }
@@ -173,7 +231,7 @@ function createActivityChart(data) {
 
 // Carregar top domínios
 function loadTopDomains(selectedDate = null) {
-    const url = selectedDate ? `/api/top-domains?date=${selectedDate}` : '/api/top-domains';
+    const url = `/api/top-domains${dashboardQuery(selectedDate)}`;
     return fetch(url)
         .then(res => res.json())
         .then(data => {
@@ -188,7 +246,7 @@ function loadTopDomains(selectedDate = null) {
 
 // Carregar top domínios bloqueados
 function loadTopBlockedDomains(selectedDate = null) {
-    const url = selectedDate ? `/api/top-blocked-domains?date=${selectedDate}` : '/api/top-blocked-domains';
+    const url = `/api/top-blocked-domains${dashboardQuery(selectedDate)}`;
     return fetch(url)
         .then(res => res.json())
         .then(data => {
@@ -203,7 +261,7 @@ function loadTopBlockedDomains(selectedDate = null) {
 
 // Carregar top IPs
 function loadTopIPs(selectedDate = null) {
-    const url = selectedDate ? `/api/top-ips?date=${selectedDate}` : '/api/top-ips';
+    const url = `/api/top-ips${dashboardQuery(selectedDate)}`;
     return fetch(url)
         .then(res => res.json())
         .then(data => {
@@ -249,7 +307,7 @@ function displayTopList(containerId, items, labelField, countField) {
 
 // Carregar atividade recente
 function loadRecentActivity() {
-    return fetch('/api/recent-activity')
+    return fetch(`/api/recent-activity${dashboardQuery()}`)
         .then(res => res.json())
         .then(data => {
             if (data.success) {
@@ -294,9 +352,9 @@ function displayRecentActivity(activities) {
     container.innerHTML = html;
 }
 
-// Carregar alertas
+// Carregar alertas (persistidos e ainda não resolvidos)
 function loadAlerts() {
-    return fetch('/api/alerts')
+    return fetch('/alerts/active')
         .then(res => res.json())
         .then(data => {
             if (data.success) {
@@ -325,15 +383,22 @@ function displayAlerts(alerts) {
     
     let html = '';
     alerts.forEach(alert => {
+        const level = alert.severity === 'medium' ? 'warning' : 'danger';
+        const occurrences = alert.occurrences > 1 ? ` · ${alert.occurrences} ocorrências` : '';
         html += `
-            <div class="alert-item ${alert.type}">
+            <div class="alert-item ${level}">
                 <div class="d-flex justify-content-between align-items-start">
                     <div>
                         <strong>${alert.title}</strong>
                         <p class="mb-1">${alert.message}</p>
-                        <small class="text-muted">${formatTimestamp(alert.timestamp)}</small>
+                        <small class="text-muted">${formatTimestamp(alert.created_at.replace(' ', 'T'))}${occurrences}</small>
+                    </div>
+                    <div class="text-end">
+                        <span class="badge bg-${level}">${alert.severity_label}</span>
+                        <button class="btn btn-sm btn-outline-success d-block mt-2" onclick="resolveAlert(${alert.id})">
+                            <i class="fas fa-check"></i> Resolver
+                        </button>
                     </div>
-                    <span class="badge bg-${alert.type === 'warning' ? 'warning' : 'danger'}">${alert.severity}</span>
                 </div>
             </div>
         `;
@@ -342,13 +407,15 @@ function displayAlerts(alerts) {
     container.innerHTML = html;
 }
 
-// Verificar alertas
+// Verificar alertas (força uma nova avaliação; retorna só os recém-abertos)
 function checkAlerts() {
-    fetch('/api/check-alerts')
+    fetch('/alerts/check')
         .then(res => res.json())
         .then(data => {
             if (data.success) {
-                showNotification('Alertas verificados com sucesso!', 'success');
+                const opened = data.alerts.length;
+                showNotification(opened ? `${opened} novo(s) alerta(s)` : 'Alertas verificados com sucesso!',
+                                 opened ? 'warning' : 'success');
                 loadAlerts();
             }
         })
@@ -358,6 +425,24 @@ function checkAlerts() {
         });
 }
 
+// Resolver um alerta (o mesmo tipo/alvo fica suprimido por um período)
+function resolveAlert(alertId) {
+    fetch(`/alerts/resolve/${alertId}`, { method: 'POST' })
+        .then(res => res.json())
+        .then(data => {
+            if (data.success) {
+                showNotification('Alerta resolvido', 'success');
+            } else {
+                showNotification(data.error || 'Erro ao resolver alerta', 'error');
+            }
+            loadAlerts();
+        })
+        .catch(err => {
+            console.error('Erro ao resolver alerta:', err);
+            showNotification('Erro ao resolver alerta', 'error');
+        });
+}
+
 // Atualizar última atualização
 function updateLastUpdate() {
     return fetch('/api/last-update')
@@ -410,6 +495,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Inicializar data com hoje
     initializeDashboardDate();
     
+    // Seletor de fontes (vários Pi-hole)
+    loadSources();
+    
     // Carregar dados
     loadDashboardData();
     
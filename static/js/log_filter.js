@@ -0,0 +1,67 @@
+// Cliente do Web Worker de filtros (static/js/logs_worker.js)
+// Envia ao worker as colunas de dicionário de uma tabela colunar (só as
+// linhas e valores de dicionário ainda não enviados) e devolve os filtros
+// como Promises de Int32Array com os índices das linhas.
+class LogFilter {
+    constructor(columns) {
+        this.columns = columns;
+        this.worker = new Worker('/static/js/logs_worker.js');
+        this.pending = new Map();
+        this.nextId = 0;
+        this.sentRows = 0;
+        this.sentValues = {};
+        this.worker.onmessage = event => {
+            const reply = event.data;
+            const pending = this.pending.get(reply.id);
+            if (!pending) return;
+            this.pending.delete(reply.id);
+            if (reply.error) {
+                pending.reject(new Error(reply.error));
+            } else {
+                pending.resolve(reply.result);
+            }
+        };
+    }
+
+    call(type, message, transfer) {
+        const id = this.nextId++;
+        return new Promise((resolve, reject) => {
+            this.pending.set(id, {resolve, reject});
+            this.worker.postMessage(Object.assign({id: id, type: type}, message), transfer || []);
+        });
+    }
+
+    // Nova consulta: substitui as linhas do worker
+    load(table) {
+        this.sentRows = 0;
+        this.sentValues = {};
+        return this.send('load', table);
+    }
+
+    // Linhas acrescentadas à tabela desde o último envio (páginas seguintes)
+    append(table) {
+        return this.send('append', table);
+    }
+
+    send(type, table) {
+        const columns = {};
+        const transfer = [];
+        for (const name of this.columns) {
+            const dictionary = table.dictionaries[name];
+            if (!dictionary) continue;
+            const values = table.data[name];
+            const codes = new Int32Array(table.count - this.sentRows);
+            for (let i = 0; i < codes.length; i++) codes[i] = values[this.sentRows + i];
+            columns[name] = {codes: codes, dictionary: dictionary.slice(this.sentValues[name] || 0)};
+            this.sentValues[name] = dictionary.length;
+            transfer.push(codes.buffer);
+        }
+        this.sentRows = table.count;
+        return this.call(type, {columns: columns}, transfer);
+    }
+
+    // Índices das linhas cujo `column` contém `text`
+    filter(column, text) {
+        return this.call('filter', {column: column, text: text}).then(result => result.indexes);
+    }
+}
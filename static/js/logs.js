@@ -1,15 +1,22 @@
 // Logs JavaScript
-let originalLogs = [];
 
-// Carregar logs
-function loadLogs() {
-    showLoading();
-    
+// Linhas pedidas ao servidor por vez; as seguintes vêm conforme a rolagem
+const PAGE_SIZE = 500;
+
+// Tabela colunar com as páginas já carregadas e a consulta em andamento
+let logTable = null;
+let logQuery = null;
+let logView = null;
+let logFilter = null;
+
+// Montar parâmetros de filtro (consulta e exportação)
+function buildLogParams() {
     const params = new URLSearchParams();
     
     // Adicionar filtros
     const ipSearch = document.getElementById('ip-search').value;
     const domainSearch = document.getElementById('domain-search').value;
+    const source = document.getElementById('source-filter').value;
     const startDate = document.getElementById('start-date').value;
     const endDate = document.getElementById('end-date').value;
     const startTime = document.getElementById('start-time').value;
@@ -18,89 +25,153 @@ function loadLogs() {
     
     if (ipSearch) params.append('ip', ipSearch);
     if (domainSearch) params.append('domain', domainSearch);
+    if (source) params.append('source', source);
     if (startDate) params.append('start_date', startDate);
     if (endDate) params.append('end_date', endDate);
     if (startTime) params.append('start_time', startTime);
     if (endTime) params.append('end_time', endTime);
     if (lines && lines !== '0') params.append('lines', lines);
     
+    return params;
+}
+
+// Tabela virtual e worker de filtros, criados na primeira consulta
+function initLogView() {
+    if (logView) return;
+    logView = new VirtualTable(document.getElementById('logs-scroll'), document.getElementById('logs'), {
+        colspan: 6,
+        renderRow: i => renderLogRow(columnarRow(logTable, i)),
+        onNearEnd: loadNextPage
+    });
+    logFilter = new LogFilter(['domain']);
+}
+
+// Carregar logs
+function loadLogs() {
+    initLogView();
+    showLoading();
+    
+    const params = buildLogParams();
+    // `lines` passa a ser o total desejado; sem ele ("Todos"), sem limite
+    const limit = params.has('lines') ? parseInt(params.get('lines'), 10) : Infinity;
+    params.delete('lines');
+    
+    logQuery = {params: params, limit: limit, offset: 0, loading: false, done: false};
+    loadNextPage();
+}
+
+// Buscar a próxima página da consulta atual
+function loadNextPage() {
+    const query = logQuery;
+    if (!query || query.loading || query.done) return;
+    query.loading = true;
+    
+    const params = new URLSearchParams(query.params);
+    params.set('lines', Math.min(PAGE_SIZE, query.limit - query.offset));
+    params.set('offset', query.offset);
+    params.set('format', 'columnar');
+    
     fetch(`/api/logs?${params.toString()}`)
         .then(res => res.json())
         .then(data => {
+            // Resposta de uma consulta já substituída
+            if (query !== logQuery) return;
+            query.loading = false;
             hideLoading();
             
-            if (data.success) {
-                originalLogs = data.logs;
-                displayLogs(data.logs);
-                updateLogCount(data.total_found);
-            } else {
+            if (!data.success) {
+                query.done = true;
                 showNotification('Erro ao carregar logs: ' + data.error, 'error');
-                displayNoLogs();
+                if (query.offset === 0) displayNoLogs();
+                return;
+            }
+            
+            const page = tableFromResponse(data);
+            const first = query.offset === 0;
+            query.offset += page.count;
+            query.done = !data.limited || query.offset >= query.limit;
+            if (data.truncated) {
+                // Orçamento da busca esgotado no servidor: as próximas páginas também seriam cortadas
+                query.done = true;
+                showNotification(`Busca interrompida (${data.truncated_reason}): resultados parciais`, 'warning');
+            }
+            
+            if (first) {
+                logTable = page;
+                logFilter.load(logTable);
+            } else {
+                appendColumnar(logTable, page);
+                logFilter.append(logTable);
             }
+            displayLogs(first);
         })
         .catch(err => {
+            if (query !== logQuery) return;
+            query.loading = false;
+            query.done = true;
             hideLoading();
             console.error('Erro ao carregar logs:', err);
             showNotification('Erro ao carregar logs', 'error');
-            displayNoLogs();
+            if (query.offset === 0) displayNoLogs();
         });
 }
 
-// Exibir logs
-function displayLogs(logs) {
-    originalLogs = logs;
-    
-    const tbody = document.getElementById('logs');
-    let html = '';
-    
-    logs.forEach((log, index) => {
-        const statusClass = getStatusClass(log.status);
-        const statusText = getStatusText(log.status);
-        const timestamp = formatTimestamp(log.timestamp);
-        
-        html += `
-            <tr>
-                <td style="white-space: nowrap; font-size: 0.9em;">${timestamp}</td>
-                <td style="max-width: 200px; overflow: hidden; text-overflow: ellipsis;">${log.domain}</td>
-                <td style="white-space: nowrap; font-size: 0.9em;">
-                    <span class="badge bg-secondary" style="font-size: 0.8em;">
-                        <i class="fas fa-network-wired"></i> ${log.ip || 'N/A'}
-                    </span>
-                </td>
-                <td style="white-space: nowrap;">
-                    <span class="badge bg-info" style="font-size: 0.8em;">
-                        <i class="fas fa-clock"></i> ${log.activity_time || 'N/A'}
-                    </span>
-                </td>
-                <td style="white-space: nowrap;">
-                    <span class="status-indicator ${statusClass}"></span>
-                    <span class="badge ${statusClass === 'status-blocked' ? 'bg-danger' : 'bg-success'}" style="font-size: 0.8em;">
-                        ${statusText}
-                    </span>
-                </td>
-                <td style="white-space: nowrap;">
-                    <button class="btn btn-sm btn-outline-primary" onclick="showDetails('${log.domain}', '${log.subdomains || ''}')" style="font-size: 0.8em;">
-                        <i class="fas fa-eye"></i> Detalhes
-                    </button>
-                </td>
-            </tr>
-        `;
-    });
-    
-    tbody.innerHTML = html;
+// Exibir logs (só as linhas visíveis vão para o DOM)
+function displayLogs(reset) {
+    if (logTable.count === 0) {
+        displayNoLogs();
+        return;
+    }
     document.getElementById('no-logs').style.display = 'none';
+    updateLogCount(logTable.count, !logQuery.done);
+    logView.setCount(logTable.count, reset);
+}
+
+// HTML de uma linha da tabela
+function renderLogRow(log) {
+    const statusClass = getStatusClass(log.status);
+    const statusText = getStatusText(log.status);
+    const timestamp = formatTimestamp(log.timestamp);
+    
+    return `
+        <tr>
+            <td style="white-space: nowrap; font-size: 0.9em;">${timestamp}</td>
+            <td style="max-width: 200px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;">${log.domain}</td>
+            <td style="white-space: nowrap; font-size: 0.9em;">
+                <span class="badge bg-secondary" style="font-size: 0.8em;">
+                    <i class="fas fa-network-wired"></i> ${log.ip || 'N/A'}
+                </span>
+            </td>
+            <td style="white-space: nowrap;">
+                <span class="badge bg-info" style="font-size: 0.8em;">
+                    <i class="fas fa-clock"></i> ${log.activity_time || 'N/A'}
+                </span>
+            </td>
+            <td style="white-space: nowrap;">
+                <span class="status-indicator ${statusClass}"></span>
+                <span class="badge ${statusClass === 'status-blocked' ? 'bg-danger' : 'bg-success'}" style="font-size: 0.8em;">
+                    ${statusText}
+                </span>
+            </td>
+            <td style="white-space: nowrap;">
+                <button class="btn btn-sm btn-outline-primary" onclick="showDetails('${log.domain}', '${log.subdomains || ''}')" style="font-size: 0.8em;">
+                    <i class="fas fa-eye"></i> Detalhes
+                </button>
+            </td>
+        </tr>
+    `;
 }
 
 // Exibir mensagem de nenhum log
 function displayNoLogs() {
-    document.getElementById('logs').innerHTML = '';
+    if (logView) logView.clear();
     document.getElementById('no-logs').style.display = 'block';
     updateLogCount(0);
 }
 
-// Atualizar contador de logs
-function updateLogCount(count) {
-    document.getElementById('log-count').textContent = count.toLocaleString();
+// Atualizar contador de logs (`more`: ainda há páginas a carregar)
+function updateLogCount(count, more) {
+    document.getElementById('log-count').textContent = count.toLocaleString() + (more ? '+' : '');
 }
 
 // Mostrar loading
@@ -120,6 +191,7 @@ function hideLoading() {
 function clearFilters() {
     document.getElementById('ip-search').value = '';
     document.getElementById('domain-search').value = '';
+    document.getElementById('source-filter').value = '';
     document.getElementById('start-date').value = '';
     document.getElementById('end-date').value = '';
     document.getElementById('start-time').value = '00:00';
@@ -129,108 +201,19 @@ function clearFilters() {
     loadLogs();
 }
 
-// Exportar PDF
-async function exportPDF() {
-    if (originalLogs.length === 0) {
-        showNotification('Nenhum log para exportar', 'warning');
-        return;
-    }
+// Exportar logs (CSV, NDJSON ou PDF) gerados no servidor
+function exportLogs(format) {
+    const params = buildLogParams();
+    // A exportação inclui todos os registros filtrados, não só os exibidos
+    params.delete('lines');
     
-    try {
-        // Criar PDF usando jsPDF
-        const { jsPDF } = window.jspdf;
-        const doc = new jsPDF();
-        
-        // Obter configurações de exportação da API
-        let pdfTitle = 'Relatório de Logs do Pi-hole';
-        let pdfAuthor = 'Pi-hole Log Viewer';
-        let pdfSubject = 'Relatório de Logs';
-        
-        // Tentar pegar das configurações da API
-        try {
-            const response = await fetch('/api/config');
-            const config = await response.json();
-            if (config.success && config.settings) {
-                pdfTitle = config.settings.pdfTitle || pdfTitle;
-                pdfAuthor = config.settings.pdfAuthor || pdfAuthor;
-                pdfSubject = config.settings.pdfSubject || pdfSubject;
-            }
-        } catch (e) {
-            console.log('Usando configurações padrão para PDF');
-        }
-        
-        // Definir metadados do PDF
-        doc.setProperties({
-            title: pdfTitle,
-            author: pdfAuthor,
-            subject: pdfSubject,
-            creator: 'Pi-hole Log Viewer'
-        });
-        
-        // Título
-        doc.setFontSize(18);
-        doc.text(pdfTitle, 20, 20);
-        
-        // Informações
-        doc.setFontSize(12);
-        doc.text(`Data: ${new Date().toLocaleDateString('pt-BR')}`, 20, 35);
-        doc.text(`Total de logs: ${originalLogs.length}`, 20, 45);
-        
-        // Cabeçalho da tabela com espaçamento melhorado
-        doc.setFontSize(10);
-        doc.setFont(undefined, 'bold');
-        doc.text('Horário', 15, 60);
-        doc.text('Domínio', 50, 60);
-        doc.text('IP', 120, 60);
-        doc.text('Tempo de Atividade', 170, 60);
-        
-        // Linha separadora
-        doc.setLineWidth(0.5);
-        doc.line(15, 65, 270, 65);
-        
-        // Dados
-        doc.setFont(undefined, 'normal');
-        doc.setFontSize(9); // Fonte menor para melhor ajuste
-        let y = 75;
-        originalLogs.forEach((log, index) => {
-            if (y > 280) {
-                doc.addPage();
-                y = 20;
-            }
-            
-            // Truncar domínio se muito longo
-            let domain = log.domain;
-            if (domain.length > 25) {
-                domain = domain.substring(0, 22) + '...';
-            }
-            
-            // Truncar IP se muito longo
-            let ip = log.ip || 'N/A';
-            if (ip.length > 15) {
-                ip = ip.substring(0, 12) + '...';
-            }
-            
-            // Truncar tempo de atividade se muito longo
-            let activityTime = log.activity_time || 'N/A';
-            if (activityTime.length > 15) {
-                activityTime = activityTime.substring(0, 12) + '...';
-            }
-            
-            doc.text(formatTimestamp(log.timestamp), 15, y);
-            doc.text(domain, 50, y);
-            doc.text(ip, 120, y);
-            doc.text(activityTime, 170, y);
-            
-            y += 8;
-        });
-    
-        // Salvar PDF
-        doc.save('pihole-logs.pdf');
-        showNotification('PDF exportado com sucesso!', 'success');
-    } catch (error) {
-        console.error('Erro ao exportar PDF:', error);
-        showNotification('Erro ao exportar PDF. Verifique o console.', 'error');
-    }
+    window.location.href = `/api/export/${format}?${params.toString()}`;
+    showNotification(`Exportação ${format.toUpperCase()} iniciada`, 'info');
+}
+
+// Exportar PDF
+function exportPDF() {
+    exportLogs('pdf');
 }
 
 // Formatar timestamp
@@ -296,66 +279,91 @@ function showDetails(domain, subdomains) {
     modalContent.innerHTML = '<div class="text-center"><div class="spinner-border" role="status"></div><p>Carregando detalhes...</p></div>';
     modal.show();
     
-    // Filtrar os logs originais pelo domínio
-    const domainLogs = originalLogs.filter(log => {
-        return log.domain && log.domain.includes(domain);
-    });
-    
-    if (domainLogs.length === 0) {
-        modalContent.innerHTML = '<div class="alert alert-warning">Nenhum log encontrado para este domínio</div>';
-        return;
-    }
-    
-    // Criar tabela de detalhes
-    let tableHtml = `
-        <h6>Domínio: <code>${domain}</code></h6>
-        <p class="text-muted">${domainLogs.length} registros encontrados</p>
-        <div class="table-responsive">
-            <table class="table table-sm table-striped">
-                <thead>
-                    <tr>
-                        <th>Horário</th>
-                        <th>Domínio</th>
-                        <th>Tempo de Atividade</th>
-                        <th>Status</th>
-                    </tr>
-                </thead>
-                <tbody>
-    `;
-    
-    domainLogs.forEach(log => {
-        const statusClass = getStatusClass(log.status);
-        const statusText = getStatusText(log.status);
-        
-        tableHtml += `
-            <tr>
-                <td>${formatTimestamp(log.timestamp)}</td>
-                <td><code>${log.domain}</code></td>
-                <td>
-                    <span class="badge bg-info">
-                        <i class="fas fa-clock"></i> ${log.activity_time || 'N/A'}
-                    </span>
-                </td>
-                <td>
-                    <span class="status-indicator ${statusClass}"></span>
-                    <span class="badge ${statusClass === 'status-blocked' ? 'bg-danger' : 'bg-success'}">
-                        ${statusText}
-                    </span>
-                </td>
-            </tr>
-        `;
-    });
+    // Filtro no worker sobre as linhas já carregadas
+    const table = logTable;
+    logFilter.filter('domain', domain)
+        .then(indexes => {
+            if (indexes.length === 0) {
+                modalContent.innerHTML = '<div class="alert alert-warning">Nenhum log encontrado para este domínio</div>';
+                return;
+            }
+            
+            modalContent.innerHTML = `
+                <h6>Domínio: <code>${domain}</code></h6>
+                <p class="text-muted">${indexes.length.toLocaleString()} registros encontrados</p>
+                <div class="table-responsive virtual-scroll" id="details-scroll" style="max-height: 60vh;">
+                    <table class="table table-sm table-striped">
+                        <thead>
+                            <tr>
+                                <th>Horário</th>
+                                <th>Domínio</th>
+                                <th>Tempo de Atividade</th>
+                                <th>Status</th>
+                            </tr>
+                        </thead>
+                        <tbody id="details-rows"></tbody>
+                    </table>
+                </div>
+            `;
+            
+            const details = new VirtualTable(document.getElementById('details-scroll'), document.getElementById('details-rows'), {
+                colspan: 4,
+                rowHeight: 37,
+                renderRow: i => renderDetailRow(columnarRow(table, indexes[i]))
+            });
+            details.setCount(indexes.length, true);
+        })
+        .catch(err => {
+            console.error('Erro ao filtrar logs:', err);
+            modalContent.innerHTML = '<div class="alert alert-danger">Erro ao carregar detalhes</div>';
+        });
+}
+
+// HTML de uma linha do modal de detalhes
+function renderDetailRow(log) {
+    const statusClass = getStatusClass(log.status);
+    const statusText = getStatusText(log.status);
     
-    tableHtml += `
-                </tbody>
-            </table>
-        </div>
+    return `
+        <tr>
+            <td style="white-space: nowrap;">${formatTimestamp(log.timestamp)}</td>
+            <td style="white-space: nowrap;"><code>${log.domain}</code></td>
+            <td>
+                <span class="badge bg-info">
+                    <i class="fas fa-clock"></i> ${log.activity_time || 'N/A'}
+                </span>
+            </td>
+            <td>
+                <span class="status-indicator ${statusClass}"></span>
+                <span class="badge ${statusClass === 'status-blocked' ? 'bg-danger' : 'bg-success'}">
+                    ${statusText}
+                </span>
+            </td>
+        </tr>
     `;
-    
-    modalContent.innerHTML = tableHtml;
+}
+
+// Carregar fontes (Pi-hole) no filtro
+function loadSources() {
+    return fetch('/api/sources')
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) return;
+            const select = document.getElementById('source-filter');
+            data.sources.forEach(source => {
+                const option = document.createElement('option');
+                option.value = source.id;
+                option.textContent = source.id;
+                select.appendChild(option);
+            });
+        })
+        .catch(error => {
+            console.error('Erro ao carregar fontes:', error);
+        });
 }
 
 // Carregar logs ao iniciar
 document.addEventListener('DOMContentLoaded', function() {
+    loadSources();
     loadLogs();
 }); 
\ No newline at end of file
@@ -0,0 +1,74 @@
+// Web Worker das tabelas de logs: filtros fora da thread principal
+// Cada coluna de dicionário fica como um Int32Array de índices mais o
+// dicionário; um filtro testa cada valor distinto uma única vez e depois
+// percorre só inteiros, sem criar objetos por linha.
+
+let columns = {};
+let count = 0;
+
+// Capacidade mínima dos arrays de índices
+const MIN_CAPACITY = 1024;
+
+function ensureCapacity(column, needed) {
+    if (needed <= column.codes.length) return;
+    const codes = new Int32Array(Math.max(needed, column.codes.length * 2));
+    codes.set(column.codes.subarray(0, count));
+    column.codes = codes;
+}
+
+const handlers = {
+    // Substitui as linhas carregadas
+    load(message) {
+        columns = {};
+        count = 0;
+        return handlers.append(message);
+    },
+
+    // Acrescenta linhas: índices das linhas novas e valores novos dos dicionários
+    append(message) {
+        let added = 0;
+        for (const [name, part] of Object.entries(message.columns)) {
+            let column = columns[name];
+            if (!column) {
+                column = columns[name] = {codes: new Int32Array(MIN_CAPACITY), dictionary: []};
+            }
+            ensureCapacity(column, count + part.codes.length);
+            column.codes.set(part.codes, count);
+            for (const value of part.dictionary) column.dictionary.push(value);
+            added = part.codes.length;
+        }
+        count += added;
+        return {count: count};
+    },
+
+    // Índices (crescentes) das linhas cujo valor em `column` contém `text`
+    filter(message) {
+        const column = columns[message.column];
+        if (!column) return {indexes: new Int32Array(0)};
+
+        const dictionary = column.dictionary;
+        const matches = new Uint8Array(dictionary.length);
+        for (let code = 0; code < dictionary.length; code++) {
+            const value = dictionary[code];
+            matches[code] = value !== null && value !== undefined && String(value).includes(message.text) ? 1 : 0;
+        }
+
+        const codes = column.codes;
+        const indexes = new Int32Array(count);
+        let found = 0;
+        for (let i = 0; i < count; i++) {
+            if (matches[codes[i]]) indexes[found++] = i;
+        }
+        return {indexes: indexes.slice(0, found)};
+    }
+};
+
+onmessage = event => {
+    const message = event.data;
+    try {
+        const result = handlers[message.type](message);
+        postMessage({id: message.id, result: result}, result.indexes ? [result.indexes.buffer] : []);
+    } catch (error) {
+        postMessage({id: message.id, error: String(error)});
+    }
+};
@@ -0,0 +1,92 @@
+// Tabela com rolagem virtual: só as linhas visíveis (mais uma margem) ficam
+// no DOM; a altura das demais é ocupada por duas linhas espaçadoras.
+// `renderRow(i)` devolve o HTML da linha i; `onNearEnd` é chamado quando a
+// rolagem chega perto da última linha (para buscar a próxima página).
+class VirtualTable {
+    constructor(container, tbody, options) {
+        this.container = container;
+        this.tbody = tbody;
+        this.renderRow = options.renderRow;
+        this.colspan = options.colspan || 1;
+        // Altura estimada; corrigida pela média das primeiras linhas renderizadas
+        this.rowHeight = options.rowHeight || 40;
+        this.overscan = options.overscan || 20;
+        this.onNearEnd = options.onNearEnd || null;
+        this.count = 0;
+        this.first = -1;
+        this.last = -1;
+        this.measured = false;
+        this.frame = null;
+        container.addEventListener('scroll', () => this.schedule(), {passive: true});
+        window.addEventListener('resize', () => this.schedule());
+    }
+
+    // Novo total de linhas; `reset` volta ao topo (nova consulta)
+    setCount(count, reset) {
+        this.count = count;
+        if (reset) {
+            this.container.scrollTop = 0;
+            this.measured = false;
+        }
+        this.first = this.last = -1;
+        this.render();
+    }
+
+    clear() {
+        this.count = 0;
+        this.first = this.last = -1;
+        this.tbody.innerHTML = '';
+    }
+
+    // Uma renderização por quadro, por mais eventos de rolagem que cheguem
+    schedule() {
+        if (this.frame !== null) return;
+        this.frame = requestAnimationFrame(() => {
+            this.frame = null;
+            this.render();
+        });
+    }
+
+    spacer(height) {
+        if (height <= 0) return '';
+        return `<tr class="virtual-spacer" aria-hidden="true"><td colspan="${this.colspan}" style="height: ${height}px; padding: 0; border: 0;"></td></tr>`;
+    }
+
+    render() {
+        if (this.count === 0) return;
+        const viewport = this.container.clientHeight || window.innerHeight;
+        const scrollTop = this.container.scrollTop;
+        const first = Math.max(0, Math.floor(scrollTop / this.rowHeight) - this.overscan);
+        const last = Math.min(this.count, Math.ceil((scrollTop + viewport) / this.rowHeight) + this.overscan);
+        if (first === this.first && last === this.last) return;
+        this.first = first;
+        this.last = last;
+
+        let html = this.spacer(first * this.rowHeight);
+        for (let i = first; i < last; i++) {
+            html += this.renderRow(i);
+        }
+        html += this.spacer((this.count - last) * this.rowHeight);
+        this.tbody.innerHTML = html;
+
+        if (!this.measured && this.measure()) return;
+        if (this.onNearEnd && last >= this.count - this.overscan) {
+            this.onNearEnd();
+        }
+    }
+
+    // Ajusta a altura estimada; true se precisou renderizar de novo
+    measure() {
+        const rows = this.tbody.querySelectorAll('tr:not(.virtual-spacer)');
+        let total = 0;
+        rows.forEach(row => { total += row.offsetHeight; });
+        if (total === 0) return false;  // tabela ainda oculta
+        this.measured = true;
+        const height = total / rows.length;
+        if (Math.abs(height - this.rowHeight) < 1) return false;
+        this.rowHeight = height;
+        this.first = this.last = -1;
+        this.render();
+        return true;
+    }
+}
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Fila assíncrona de notificações do Telegram
+Agrupa alertas em mensagens de resumo, respeita o limite de envio com um
+token bucket, refaz tentativas com backoff e guarda falhas definitivas
+em uma tabela de dead-letter. Arquivos (relatórios) passam pela mesma fila,
+um por envio.
+"""
+
+import html
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import requests
+
+from alert_engine import _setting
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'pihole_logs.db'
+
+# Permite apontar para um servidor local (stub) em testes
+TELEGRAM_API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org')
+
+# Limite de tamanho de uma mensagem do Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+# Tempo de espera por novos alertas antes de fechar um resumo (segundos)
+COALESCE_SECONDS = 5.0
+
+# Máximo de alertas em uma mesma mensagem de resumo
+MAX_BATCH = 20
+
+# Token bucket: mensagens por segundo e rajada máxima
+RATE_PER_SECOND = 1.0
+BURST = 3
+
+# Tentativas de envio antes de mover a mensagem para o dead-letter
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# Arquivo agendado na fila; lido do disco só na hora do envio
+Document = namedtuple('Document', 'filename path caption mime_type')
+
+def telegram_config(settings):
+    """Extrai (habilitado, chat_id, token) aceitando snake_case e camelCase"""
+    enabled = bool(_setting(settings, 'telegram_enabled', 'telegramEnabled', False))
+    chat_id = str(_setting(settings, 'telegram_chat_id', 'telegramChatId', '') or '')
+    bot_token = str(_setting(settings, 'telegram_bot_token', 'telegramBotToken', '') or '')
+    return enabled, chat_id, bot_token
+
+class TokenBucket:
+    """Limitador de taxa simples (thread-safe)"""
+
+    def __init__(self, rate=RATE_PER_SECOND, capacity=BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, stop_event=None):
+        """Bloqueia até haver um token disponível; retorna False se interrompido"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def penalize(self, seconds):
+        """Esvazia o bucket por `seconds` (ex.: retry_after de um HTTP 429)"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+class TelegramNotifier:
+    """Entrega de notificações em uma thread de fundo"""
+
+    def __init__(self, settings_provider, db_path=DB_PATH, api_base=None,
+                 coalesce_seconds=COALESCE_SECONDS, max_batch=MAX_BATCH,
+                 rate_per_second=RATE_PER_SECOND, burst=BURST,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE_SECONDS,
+                 timeout=10):
+        self.settings_provider = settings_provider
+        self.db_path = db_path
+        self.api_base = (api_base or TELEGRAM_API_BASE).rstrip('/')
+        self.coalesce_seconds = coalesce_seconds
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.session = requests.Session()
+
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            'enqueued': 0,
+            'sent_messages': 0,
+            'sent_alerts': 0,
+            'coalesced': 0,
+            'retries': 0,
+            'rate_limited': 0,
+            'failures': 0,
+            'dead_lettered': 0,
+            'last_error': None,
+            'last_success_at': None
+        }
+
+        self._create_dead_letter_table()
+
+    def _create_dead_letter_table(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS telegram_dead_letter (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at DATETIME NOT NULL,
+                    chat_id TEXT,
+                    text TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    error TEXT
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _count(self, key, amount=1):
+        with self._metrics_lock:
+            self.metrics[key] += amount
+
+    def get_metrics(self):
+        """Métricas de entrega (inclui a profundidade atual da fila)"""
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        metrics['queue_depth'] = self._queue.qsize()
+        metrics['running'] = bool(self._thread and self._thread.is_alive())
+        return metrics
+
+    def get_dead_letters(self, limit=50):
+        """Mensagens que esgotaram as tentativas"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, created_at, chat_id, text, attempts, error
+                FROM telegram_dead_letter ORDER BY id DESC LIMIT ?
+            """, (limit,))
+            columns = ('id', 'created_at', 'chat_id', 'text', 'attempts', 'error')
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def start(self):
+        """Inicia a thread de entrega (idempotente)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='telegram-notifier', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Interrompe a thread de entrega"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def enqueue(self, message, on_sent=None):
+        """Agenda uma mensagem; `on_sent` é chamado após a entrega"""
+        self._queue.put((message, on_sent))
+        self._count('enqueued')
+
+    def enqueue_document(self, filename, path, caption='', on_sent=None, mime_type='application/pdf'):
+        """Agenda o envio de um arquivo (ex.: relatórios); `on_sent` é chamado após a entrega"""
+        self._queue.put((Document(filename, path, caption, mime_type), on_sent))
+        self._count('enqueued')
+
+    def flush(self, timeout=30):
+        """Aguarda a fila esvaziar (útil em testes e no desligamento)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._queue.unfinished_tasks == 0:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def send_now(self, text):
+        """Envio síncrono (teste de notificação); retorna (ok, erro)"""
+        enabled, chat_id, bot_token = telegram_config(self.settings_provider())
+        if not chat_id or not bot_token:
+            return False, 'Chat ID ou Bot Token não configurados'
+        ok, error, _ = self._post(bot_token, chat_id, text)
+        return ok, error
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            # Coalescer tudo o que chegar dentro da janela em um único resumo
+            batch = [first]
+            deadline = time.monotonic() + self.coalesce_seconds
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self._deliver(batch)
+            except Exception as e:
+                logger.error(f"❌ Erro na fila do Telegram: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _deliver(self, batch):
+        # Configurações lidas uma vez por resumo, não por mensagem
+        enabled, chat_id, bot_token = telegram_config(self.settings_provider())
+        if not enabled or not chat_id or not bot_token:
+            return
+
+        documents = [item for item in batch if isinstance(item[0], Document)]
+        messages = [item for item in batch if not isinstance(item[0], Document)]
+        if len(messages) > 1:
+            self._count('coalesced', len(messages) - 1)
+
+        for text, items in build_digests(messages) if messages else []:
+            if not self.bucket.acquire(self._stop):
+                return
+            if self._send_with_retry(bot_token, chat_id, text):
+                self._count('sent_messages')
+                self._count('sent_alerts', len(items))
+                for _, on_sent in items:
+                    if on_sent:
+                        try:
+                            on_sent()
+                        except Exception as e:
+                            logger.error(f"❌ Erro no callback de notificação: {e}")
+
+        for document, on_sent in documents:
+            if not self.bucket.acquire(self._stop):
+                return
+            sent = self._send_with_retry(bot_token, chat_id, f"[{document.filename}] {document.caption}",
+                                         lambda document=document: self._post_document(bot_token, chat_id, document))
+            if sent:
+                self._count('sent_messages')
+                if on_sent:
+                    try:
+                        on_sent()
+                    except Exception as e:
+                        logger.error(f"❌ Erro no callback do envio de {document.filename}: {e}")
+
+    def _send_with_retry(self, bot_token, chat_id, text, post=None):
+        """Envia com novas tentativas; `post` troca o envio da mensagem `text` (ex.: arquivos)"""
+        post = post or (lambda: self._post(bot_token, chat_id, text))
+        error = None
+        for attempt in range(self.max_retries):
+            ok, error, retry_after = post()
+            if ok:
+                with self._metrics_lock:
+                    self.metrics['last_success_at'] = datetime.now().isoformat()
+                return True
+            if retry_after is None and error and error.startswith('HTTP 4'):
+                # Erros de requisição (chat inválido, bot bloqueado) não melhoram com nova tentativa
+                break
+
+            self._count('retries')
+            if retry_after is not None:
+                self._count('rate_limited')
+                self.bucket.penalize(retry_after)
+                delay = retry_after
+            else:
+                delay = min(self.backoff_base * (2 ** attempt), BACKOFF_MAX_SECONDS)
+            if self._stop.wait(delay):
+                break
+
+        self._count('failures')
+        with self._metrics_lock:
+            self.metrics['last_error'] = error
+        self._dead_letter(chat_id, text, attempt + 1, error)
+        return False
+
+    def _post(self, bot_token, chat_id, text):
+        """Faz a chamada HTTP; retorna (ok, erro, retry_after)"""
+        url = f"{self.api_base}/bot{bot_token}/sendMessage"
+        try:
+            response = self.session.post(url, data={
+                'chat_id': chat_id,
+                'text': text,
+                'parse_mode': 'HTML'
+            }, timeout=self.timeout)
+        except requests.RequestException as e:
+            return False, str(e), None
+        return self._result(response)
+
+    def _post_document(self, bot_token, chat_id, document):
+        """Envia um arquivo da fila; retorna (ok, erro, retry_after)"""
+        url = f"{self.api_base}/bot{bot_token}/sendDocument"
+        try:
+            with open(document.path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            logger.error(f"❌ Arquivo {document.path} indisponível para envio: {e}")
+            return False, str(e), None
+        try:
+            response = self.session.post(url, data={
+                'chat_id': chat_id,
+                'caption': document.caption[:1024]
+            }, files={'document': (document.filename, data, document.mime_type)}, timeout=self.timeout * 6)
+        except requests.RequestException as e:
+            return False, str(e), None
+        return self._result(response)
+
+    def _result(self, response):
+        """Interpreta a resposta da API; retorna (ok, erro, retry_after)"""
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+
+        if response.status_code == 200 and payload.get('ok'):
+            return True, None, None
+
+        description = payload.get('description', response.text[:200])
+        if response.status_code == 429:
+            retry_after = (payload.get('parameters') or {}).get('retry_after', 1)
+            return False, f"HTTP 429: {description}", float(retry_after)
+        return False, f"HTTP {response.status_code}: {description}", None
+
+    def _dead_letter(self, chat_id, text, attempts, error):
+        self._count('dead_lettered')
+        logger.error(f"❌ Notificação Telegram descartada após {attempts} tentativa(s): {error}")
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                INSERT INTO telegram_dead_letter (created_at, chat_id, text, attempts, error)
+                VALUES (?, ?, ?, ?, ?)
+            """, (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), chat_id, text, attempts, error))
+            conn.commit()
+        finally:
+            conn.close()
+
+def build_digests(batch):
+    """Monta mensagens de resumo respeitando o limite de tamanho do Telegram
+
+    Retorna uma lista de (texto, itens) onde itens são as entradas da fila
+    incluídas naquela mensagem.
+    """
+    if len(batch) == 1:
+        text = f"🚨 <b>Pi-hole Alert</b>\n\n{html.escape(batch[0][0])}"
+        return [(text[:MAX_MESSAGE_LENGTH], batch)]
+
+    digests = []
+    header = f"🚨 <b>Pi-hole Alert</b> — {len(batch)} alertas\n"
+    text, items = header, []
+    for item in batch:
+        line = f"\n• {html.escape(item[0])}"
+        if items and len(text) + len(line) > MAX_MESSAGE_LENGTH:
+            digests.append((text, items))
+            text, items = header, []
+        text += line[:MAX_MESSAGE_LENGTH - len(header)]
+        items.append(item)
+    digests.append((text, items))
+    return digests
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Séries temporais com resolução adaptativa para os gráficos de atividade
+O tamanho do bucket (minuto, 5 minutos, hora ou dia) é escolhido pelo número
+de pontos pedido: o mais fino com até `points * OVERSAMPLE` buckets no
+período, entre os disponíveis (minuto e 5 minutos só enquanto há registros
+brutos). As contagens vêm da janela quente, dos brutos agrupados por minuto
+ou dos agregados agg_hourly/agg_daily; a série densa (buckets vazios valem 0)
+é reduzida a ~`points` pontos com LTTB (Largest-Triangle-Three-Buckets), que
+mantém picos e vales que uma média apagaria.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import aggregates
+from hot_window import from_epoch, to_epoch, to_epochs
+
+# Buckets possíveis, do mais fino ao mais grosso (segundos)
+BUCKETS = (
+    ('minute', 60),
+    ('5min', 300),
+    ('hour', 3600),
+    ('day', 86400)
+)
+BUCKET_SECONDS = dict(BUCKETS)
+
+# Bucket mais fino disponível para cada resolução de aggregates.pick_resolution
+FINEST_BUCKET = {
+    'raw': 'minute',
+    'hourly': 'hour',
+    'daily': 'day'
+}
+
+# Buckets por ponto pedido antes da redução (dá ao LTTB de onde escolher)
+OVERSAMPLE = 4
+
+DEFAULT_POINTS = 300
+MIN_POINTS = 3
+MAX_POINTS = 5000
+
+DEFAULT_SERIES = ('total', 'blocked')
+
+# Séries por cliente/domínio em uma requisição
+MAX_ENTITY_SERIES = 10
+
+def parse_moment(value, end=False):
+    """'AAAA-MM-DD' ou 'AAAA-MM-DD[T ]HH:MM[:SS]' em datetime
+
+    Uma data sozinha no fim do período inclui o dia inteiro.
+    """
+    moment = datetime.fromisoformat(value.strip())
+    if end and len(value.strip()) == 10:
+        moment += timedelta(days=1)
+    return moment
+
+def parse_series(value):
+    """Lista de séries ('total', 'blocked', 'client:<ip>', 'domain:<nome>')"""
+    if not value:
+        return list(DEFAULT_SERIES)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    entities = 0
+    for name in names:
+        kind, _, key = name.partition(':')
+        if name in DEFAULT_SERIES:
+            continue
+        if kind not in ('client', 'domain') or not key:
+            raise ValueError(f"Série inválida: {name}")
+        entities += 1
+    if entities > MAX_ENTITY_SERIES:
+        raise ValueError(f"Máximo de {MAX_ENTITY_SERIES} séries por cliente/domínio")
+    return names
+
+def choose_bucket(span_seconds, points, finest='minute'):
+    """Bucket mais fino (a partir de `finest`) com até points * OVERSAMPLE buckets"""
+    names = [name for name, _ in BUCKETS]
+    for name in names[names.index(finest):]:
+        if span_seconds / BUCKET_SECONDS[name] <= points * OVERSAMPLE:
+            return name
+    return names[-1]
+
+def lttb(y, threshold):
+    """Índices dos `threshold` pontos escolhidos pelo LTTB (x = posição)
+
+    O primeiro e o último ponto ficam; no meio, um ponto por faixa: o que forma
+    o maior triângulo com o ponto escolhido antes e a média da faixa seguinte.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_lo, next_hi = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        ax, ay = x[previous], y[previous]
+        area = np.abs((ax - avg_x) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y - ay))
+        previous = lo + int(np.argmax(area))
+        picked[i + 1] = previous
+    return picked
+
+def _densify(rows, start_epoch, step, n_buckets):
+    """Linhas (bucket, total, bloqueados) esparsas em arrays densos de n_buckets"""
+    if not rows:
+        zeros = np.zeros(n_buckets, dtype=np.int64)
+        return zeros, zeros.copy()
+    labels, totals, blocked = zip(*rows)
+    index = (to_epochs(labels) - start_epoch) // step
+    valid = (index >= 0) & (index < n_buckets)
+    totals = np.bincount(index[valid], weights=np.array(totals, dtype=np.float64)[valid], minlength=n_buckets)
+    blocked = np.bincount(index[valid], weights=np.array(blocked, dtype=np.float64)[valid], minlength=n_buckets)
+    return totals.astype(np.int64), blocked.astype(np.int64)
+
+def build(conn, start, end, points=DEFAULT_POINTS, series=DEFAULT_SERIES, source=None,
+          window=None, now=None):
+    """Série de [start, end) com ~`points` pontos
+
+    `window` é a janela quente (usada quando cobre o início do período). O
+    fim é limitado ao instante atual, para que o dia corrente não termine
+    em uma sequência de zeros.
+    """
+    points = max(MIN_POINTS, min(int(points), MAX_POINTS))
+    end = min(end, now or datetime.now())
+    if end <= start:
+        raise ValueError('Período vazio')
+
+    span = (end - start).total_seconds()
+    from_window = False
+    if window is not None and window.covers(start):
+        bucket = choose_bucket(span, points)
+        step = BUCKET_SECONDS[bucket]
+        # O primeiro bucket começa antes de `start`: também precisa estar na janela
+        from_window = window.covers(from_epoch(to_epoch(start) // step * step))
+    if not from_window:
+        # Buckets de minuto precisam dos registros, mesmo dos dias arquivados
+        finest = FINEST_BUCKET[aggregates.pick_resolution(conn, start.date(), read_archive=True)]
+        bucket = choose_bucket(span, points, finest)
+    step = BUCKET_SECONDS[bucket]
+
+    # Buckets alinhados (epochs do horário local: dias começam à meia-noite)
+    start_epoch = to_epoch(start) // step * step
+    end_epoch = -(-to_epoch(end) // step) * step
+    n_buckets = (end_epoch - start_epoch) // step
+    aligned_start, aligned_end = from_epoch(start_epoch), from_epoch(end_epoch)
+
+    if from_window:
+        resolution = 'hot_window'
+    elif bucket in ('minute', '5min'):
+        resolution = 'raw'
+    elif bucket == 'hour':
+        resolution = 'hourly'
+    else:
+        resolution = 'daily'
+
+    def counts(kind=None, key=None):
+        if from_window:
+            return window.buckets(aligned_start, aligned_end, step, kind, key, source)
+        rows = aggregates.query_buckets(conn, aligned_start, aligned_end, resolution, kind, key, source)
+        return _densify(rows, start_epoch, step, n_buckets)
+
+    values = {}
+    if 'total' in series or 'blocked' in series:
+        values['total'], values['blocked'] = counts()
+    for name in series:
+        if name not in values:
+            kind, _, key = name.partition(':')
+            values[name] = counts(kind, key)[0]
+    values = {name: values[name] for name in series}
+
+    # Pontos escolhidos pelo LTTB em cada série, unidos (mesmos instantes para todas)
+    threshold = max(MIN_POINTS, points // len(values))
+    picked = np.unique(np.concatenate([lttb(column, threshold) for column in values.values()]))
+
+    epochs = (start_epoch + picked * step).astype('datetime64[s]')
+    unit = 'D' if bucket == 'day' else 'm'
+    timestamps = [text.replace('T', ' ') for text in np.datetime_as_string(epochs, unit=unit).tolist()]
+
+    return {
+        'bucket': bucket,
+        'bucket_seconds': step,
+        'resolution': resolution,
+        'start': aligned_start.strftime('%Y-%m-%d %H:%M:%S'),
+        'end': aligned_end.strftime('%Y-%m-%d %H:%M:%S'),
+        'buckets': int(n_buckets),
+        'points': int(picked.size),
+        'timestamps': timestamps,
+        'series': {name: column[picked].tolist() for name, column in values.items()}
+    }